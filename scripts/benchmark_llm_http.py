@@ -0,0 +1,132 @@
+"""LLM HTTP连接池基准测试
+
+在本地启动一个OpenAI兼容的模拟服务，用不同的连接池配置发送批量请求，
+对比新建连接数、复用连接数、连接池等待时间和延迟分位数。
+
+用法：
+    python scripts/benchmark_llm_http.py
+    python scripts/benchmark_llm_http.py --requests 500 --concurrency 20 --rounds 3 --idle 6
+"""
+
+import sys
+import os
+import json
+import time
+import asyncio
+import argparse
+import statistics
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import httpx
+import uvicorn
+
+from src.core.llm_client import DeepSeekR1Client
+from src.core.llm_http import ConnectionMetrics, InstrumentedTransport, create_llm_http_client
+from src.mock_llm import MockLLMConfig, create_mock_llm_app
+
+
+def build_configs(concurrency: int, keepalive_expiry: float):
+    """待对比的连接池配置：(名称, httpx.AsyncClient工厂)"""
+    def no_keepalive(metrics):
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=0)
+        return httpx.AsyncClient(transport=InstrumentedTransport(metrics, limits=limits), timeout=60.0)
+    
+    def httpx_default(metrics):
+        # AsyncOpenAI默认参数：最多100个连接、20个keep-alive连接，httpx默认空闲5秒过期
+        limits = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+        return httpx.AsyncClient(transport=InstrumentedTransport(metrics, limits=limits), timeout=60.0)
+    
+    def tuned(metrics):
+        return create_llm_http_client(
+            max_connections=concurrency,
+            keepalive_expiry=keepalive_expiry,
+            metrics=metrics
+        )
+    
+    return [("no-keepalive", no_keepalive), ("openai-default", httpx_default), ("tuned", tuned)]
+
+
+async def run_config(name, factory, base_url, args) -> dict:
+    """用一种连接池配置跑完所有轮次"""
+    metrics = ConnectionMetrics()
+    client = DeepSeekR1Client(
+        api_key="benchmark",
+        base_url=base_url,
+        enable_cache=False,
+        max_concurrent=args.concurrency,
+        http_client=factory(metrics)
+    )
+    latencies = []
+    
+    async def one(i: int) -> None:
+        start = time.perf_counter()
+        await client.generate(f"benchmark request {i}", max_tokens=16)
+        latencies.append(time.perf_counter() - start)
+    
+    started = time.perf_counter()
+    for round_index in range(args.rounds):
+        if round_index and args.idle:
+            await asyncio.sleep(args.idle)
+        await asyncio.gather(*[one(i) for i in range(args.requests)])
+    elapsed = time.perf_counter() - started - args.idle * (args.rounds - 1)
+    await client.close()
+    await client.http_client.aclose()  # 传入的连接池由调用方关闭
+    
+    latencies.sort()
+    stats = metrics.get_stats()
+    return {
+        "config": name,
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+        "new_connections": stats["new_connections"],
+        "reused_connections": stats["reused_connections"],
+        "reuse_rate": stats["reuse_rate"],
+        "avg_pool_wait_ms": stats["avg_pool_wait_ms"],
+        "avg_connect_time_ms": stats["avg_connect_time_ms"]
+    }
+
+
+async def run_benchmark(args) -> None:
+    """启动模拟服务并依次测试各配置"""
+    server = uvicorn.Server(uvicorn.Config(
+        create_mock_llm_app(MockLLMConfig(latency_ms=args.latency * 1000, latency_distribution="fixed")),
+        host="127.0.0.1", port=args.port, log_level="warning",
+        timeout_keep_alive=75  # 服务端保持连接的时间长于客户端，只比较客户端连接池配置
+    ))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    
+    base_url = f"http://127.0.0.1:{args.port}/v1"
+    try:
+        results = [
+            await run_config(name, factory, base_url, args)
+            for name, factory in build_configs(args.concurrency, args.keepalive_expiry)
+        ]
+    finally:
+        server.should_exit = True
+        await server_task
+    
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+def main():
+    """主函数入口"""
+    parser = argparse.ArgumentParser(description="LLM HTTP连接池基准测试")
+    parser.add_argument("--requests", type=int, default=200, help="每轮请求数")
+    parser.add_argument("--concurrency", type=int, default=10, help="并发上限（LLM_MAX_CONCURRENT）")
+    parser.add_argument("--rounds", type=int, default=3, help="轮次（模拟多个批次）")
+    parser.add_argument("--idle", type=float, default=0.0, help="轮次之间的空闲时间（秒）")
+    parser.add_argument("--latency", type=float, default=0.02, help="模拟服务的响应延迟（秒）")
+    parser.add_argument("--keepalive-expiry", type=float, default=30.0, help="tuned配置的keep-alive过期时间（秒）")
+    parser.add_argument("--port", type=int, default=18080, help="模拟服务端口")
+    
+    asyncio.run(run_benchmark(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""MCP消息编码基准测试
+
+用JD分析流程中的典型负载（单个JD解析结果、批量评估结果、共享上下文）测量各编码的编解码耗时、吞吐和大小：
+- json-pydantic：旧版MCPMessage.to_json/from_json
+- json：编码层的旧版格式（编码不变，解码用orjson解析再校验）
+- orjson / msgpack：带版本头的编码（msgpack未安装时跳过）
+
+用法：
+    python scripts/benchmark_mcp_codec.py
+    python scripts/benchmark_mcp_codec.py --iterations 5000 --jd-kb 16 --batch-size 50
+"""
+
+import sys
+import os
+import json
+import time
+import argparse
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.mcp.codec import available_codecs
+from src.mcp.context import MCPContext, create_context
+from src.mcp.message import MCPMessage, create_request_message
+
+
+def build_jd(index: int, jd_kb: int) -> dict:
+    """模拟一个JD解析结果：JD全文加结构化字段"""
+    return {
+        "jd_id": f"jd_{index:05d}",
+        "jd_text": "岗位职责：负责核心系统的设计与开发，参与需求评审和技术方案制定；任职要求：熟悉Python和分布式系统。"
+                   * (jd_kb * 1024 // 150 + 1),
+        "parsed": {
+            "job_title": "高级后端工程师",
+            "department": "技术部",
+            "location": "北京",
+            "salary_range": {"min": 30000, "max": 50000, "months": 14},
+            "responsibilities": [f"负责模块{i}的设计、开发和维护" for i in range(12)],
+            "required_skills": ["Python", "Redis", "PostgreSQL", "Kubernetes", "FastAPI", "异步编程"],
+            "preferred_skills": ["Go", "Kafka", "LLM应用开发"],
+            "experience_years": 5,
+            "remote": None
+        }
+    }
+
+
+def build_cases(args) -> dict:
+    """构造待测消息和上下文"""
+    jd = build_jd(0, args.jd_kb)
+    request = create_request_message("coordinator", "parser", "parse_jd", jd, context_id="ctx_bench")
+    
+    evaluations = [
+        {
+            "jd_id": f"jd_{i:05d}",
+            "overall_score": 7.5 + i % 3 * 0.5,
+            "dimension_scores": {f"dimension_{d}": round(6 + d * 0.3, 2) for d in range(8)},
+            "strengths": ["职责描述清晰", "技能要求具体"],
+            "improvements": ["补充团队规模", "明确晋升路径", "薪资结构说明"],
+            "summary": "整体质量良好，结构完整，部分信息可进一步细化。" * 4
+        }
+        for i in range(args.batch_size)
+    ]
+    response = request.create_response({"results": evaluations, "total": args.batch_size}, "evaluator")
+    
+    context = create_context(
+        "task_bench",
+        "jd_analysis",
+        shared_data={"jd": jd, "evaluations": evaluations[:10]},
+        expiration_seconds=3600
+    )
+    return {"parse_request": request, "batch_response": response, "context": context}
+
+
+def measure(func, iterations: int) -> float:
+    """返回每次调用的平均耗时（微秒）"""
+    func()  # 预热
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def run_case(name: str, model, iterations: int) -> list:
+    """对一个消息或上下文测量所有编码"""
+    cls = MCPContext if isinstance(model, MCPContext) else MCPMessage
+    variants = [("json-pydantic", model.to_json, cls.from_json)]
+    for codec in ("json", "orjson", "msgpack"):
+        if codec in available_codecs():
+            variants.append((codec, lambda codec=codec: model.encode(codec), cls.decode))
+    
+    results = []
+    for label, encode, decode in variants:
+        data = encode()
+        assert decode(data) == model, f"{label} roundtrip mismatch"
+        encode_us = measure(encode, iterations)
+        decode_us = measure(lambda: decode(data), iterations)
+        results.append({
+            "case": name,
+            "codec": label,
+            "size_kb": round(len(data.encode("utf-8")) / 1024, 1),
+            "encode_us": round(encode_us, 1),
+            "decode_us": round(decode_us, 1),
+            "encode_ops": round(1e6 / encode_us),
+            "decode_ops": round(1e6 / decode_us)
+        })
+    return results
+
+
+def main(args) -> None:
+    print(f"可用编码: {', '.join(sorted(available_codecs()))}, 迭代次数: {args.iterations}\n")
+    
+    results = []
+    for name, model in build_cases(args).items():
+        results.extend(run_case(name, model, args.iterations))
+    
+    print(f"{'负载':<16}{'编码':<15}{'大小(KB)':>10}{'编码(µs)':>11}{'解码(µs)':>11}{'编码(ops/s)':>14}{'解码(ops/s)':>14}")
+    for r in results:
+        print(
+            f"{r['case']:<16}{r['codec']:<15}{r['size_kb']:>10}{r['encode_us']:>11}{r['decode_us']:>11}"
+            f"{r['encode_ops']:>14}{r['decode_ops']:>14}"
+        )
+    
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MCP消息编码基准测试")
+    parser.add_argument("--iterations", type=int, default=2000, help="每项测量的迭代次数")
+    parser.add_argument("--jd-kb", type=int, default=8, help="JD全文大小（KB）")
+    parser.add_argument("--batch-size", type=int, default=20, help="批量评估结果的条数")
+    parser.add_argument("--json", action="store_true", help="额外输出JSON结果")
+    main(parser.parse_args())
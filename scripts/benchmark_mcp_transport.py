@@ -0,0 +1,148 @@
+"""MCP消息总线传输基准测试
+
+两个Agent之间做请求-响应往返，对比各传输的吞吐量和往返延迟分位数：
+- memory：进程内队列，按引用传递
+- memory+json：进程内队列，但每跳做一次JSON编码和解码（隔离出序列化本身的开销）
+- pubsub / streams：经Redis转发（需要可连接的Redis，--redis-host/--redis-port，连接失败时跳过）
+
+用法：
+    python scripts/benchmark_mcp_transport.py
+    python scripts/benchmark_mcp_transport.py --requests 2000 --concurrency 20 --payload-kb 16
+    python scripts/benchmark_mcp_transport.py --transports memory memory+json streams --redis-host localhost
+"""
+
+import sys
+import os
+import json
+import time
+import asyncio
+import argparse
+import statistics
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.mcp.agent import MCPAgent
+from src.mcp.memory import InMemoryTransport
+from src.mcp.message import MCPMessage
+from src.mcp.server import MCPServer
+
+
+class JsonRoundTripTransport(InMemoryTransport):
+    """每条消息先编码再解码的进程内传输（对照组：只有序列化开销，没有网络）"""
+    
+    async def send(self, message: MCPMessage, codec: str = "json") -> str:
+        return await super().send(MCPMessage.decode(message.encode(codec)))
+
+
+def build_payload(payload_kb: int) -> dict:
+    """模拟JD解析结果：长文本加若干结构化字段"""
+    return {
+        "jd_text": "负责核心系统的设计与开发，参与需求评审和技术方案制定。" * (payload_kb * 1024 // 81 + 1),
+        "parsed": {
+            "job_title": "高级后端工程师",
+            "responsibilities": [f"职责{i}" for i in range(20)],
+            "required_skills": [f"技能{i}" for i in range(20)],
+            "scores": {f"factor_{i}": i * 1.5 for i in range(30)}
+        }
+    }
+
+
+async def create_servers(transport: str, args) -> list:
+    """创建并启动服务器：memory共用一个，Redis传输每个Agent一个（各自的订阅连接）"""
+    if transport.startswith("memory"):
+        server = MCPServer(transport="memory")
+        await server.start()
+        if transport == "memory+json":
+            server.transport = JsonRoundTripTransport()
+        return [server, server]
+    
+    servers = []
+    for _ in range(2):
+        server = MCPServer(redis_host=args.redis_host, redis_port=args.redis_port, transport=transport)
+        await server.start()
+        servers.append(server)
+    return servers
+
+
+async def run_transport(transport: str, payload: dict, args) -> dict:
+    """用一种传输跑完所有请求"""
+    servers = await create_servers(transport, args)
+    worker = MCPAgent("bench_worker", "bench_worker", servers[0])
+    caller = MCPAgent("bench_caller", "bench_caller", servers[1])
+    
+    async def echo(message: MCPMessage) -> None:
+        await worker.send_response(message, message.payload)
+    
+    worker.register_handler("echo", echo)
+    await worker.start()
+    await caller.start()
+    if transport == "pubsub":
+        await asyncio.sleep(0.2)  # 等待订阅生效
+    
+    latencies = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+    
+    async def one() -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await caller.send_request("bench_worker", "echo", payload, timeout=30)
+            latencies.append(time.perf_counter() - start)
+    
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*[one() for _ in range(args.requests)])
+        elapsed = time.perf_counter() - started
+    finally:
+        await caller.stop()
+        await worker.stop()
+        for server in set(servers):
+            await server.stop()
+    
+    latencies.sort()
+    return {
+        "transport": transport,
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 3),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 3)
+    }
+
+
+async def main(args) -> None:
+    payload = build_payload(args.payload_kb)
+    message_bytes = len(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+    print(f"负载大小: {message_bytes / 1024:.1f} KB, 请求数: {args.requests}, 并发: {args.concurrency}\n")
+    
+    results = []
+    for transport in args.transports:
+        try:
+            results.append(await run_transport(transport, payload, args))
+        except Exception as e:
+            print(f"⚠️  跳过 {transport}: {e}")
+    
+    print(f"{'传输':<14}{'吞吐(req/s)':>14}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}")
+    for r in results:
+        print(f"{r['transport']:<14}{r['throughput_rps']:>14}{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}")
+    
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MCP消息总线传输基准测试")
+    parser.add_argument("--requests", type=int, default=1000, help="请求数")
+    parser.add_argument("--concurrency", type=int, default=10, help="并发请求数")
+    parser.add_argument("--payload-kb", type=int, default=8, help="请求负载大小（KB，响应原样返回）")
+    parser.add_argument(
+        "--transports",
+        nargs="+",
+        default=["memory", "memory+json", "pubsub", "streams"],
+        choices=["memory", "memory+json", "pubsub", "streams"],
+        help="要对比的传输"
+    )
+    parser.add_argument("--redis-host", default="localhost", help="Redis主机（pubsub/streams）")
+    parser.add_argument("--redis-port", type=int, default=6379, help="Redis端口")
+    parser.add_argument("--json", action="store_true", help="额外输出JSON结果")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,116 @@
+"""LLM磁盘缓存管理工具
+
+用于在环境之间迁移SQLite磁盘缓存（LLM_CACHE_BACKEND=sqlite），
+避免重新部署后重复调用DeepSeek API。
+
+用法：
+    python scripts/llm_cache_cli.py stats
+    python scripts/llm_cache_cli.py export llm_cache.jsonl
+    python scripts/llm_cache_cli.py import llm_cache.jsonl --overwrite
+    python scripts/llm_cache_cli.py compact --vacuum
+    python scripts/llm_cache_cli.py invalidate --tag agent:parser --tag category_tree:<企业ID>
+    python scripts/llm_cache_cli.py clear
+"""
+
+import sys
+import os
+import json
+import asyncio
+import argparse
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.core.config import settings
+from src.core.llm_cache import SQLiteCache
+
+
+async def run_command(args) -> int:
+    """执行子命令"""
+    cache = SQLiteCache(
+        db_path=args.db_path,
+        max_entries=settings.LLM_CACHE_DISK_MAX_ENTRIES,
+        max_bytes=settings.LLM_CACHE_DISK_MAX_BYTES,
+        compact_interval=0
+    )
+    
+    try:
+        if args.command == "stats":
+            stats = await cache.get_stats()
+            print(json.dumps(stats, ensure_ascii=False, indent=2))
+        
+        elif args.command == "export":
+            count = await cache.export_entries(args.file)
+            print(f"✅ 已导出 {count} 个条目到 {args.file}")
+        
+        elif args.command == "import":
+            if not os.path.exists(args.file):
+                print(f"❌ 文件不存在: {args.file}")
+                return 1
+            count = await cache.import_entries(args.file, overwrite=args.overwrite)
+            print(f"✅ 已导入 {count} 个条目")
+        
+        elif args.command == "compact":
+            result = await cache.compact()
+            if args.vacuum:
+                await cache.vacuum()
+            print(f"✅ 压缩完成: 清理过期 {result['expired']} 个, 淘汰 {result['evicted']} 个")
+        
+        elif args.command == "invalidate":
+            for tag in args.tag:
+                count = await cache.invalidate_tag(tag)
+                print(f"✅ 标签 {tag}: 已删除 {count} 个条目")
+        
+        elif args.command == "clear":
+            if not args.yes:
+                confirm = input("⚠️  确认清空所有LLM磁盘缓存？(yes/no): ").strip().lower()
+                if confirm != "yes":
+                    print("❌ 操作已取消")
+                    return 1
+            await cache.clear()
+            print("✅ 磁盘缓存已清空")
+    
+    finally:
+        await cache.close()
+    
+    return 0
+
+
+def main():
+    """主函数入口"""
+    parser = argparse.ArgumentParser(description="LLM磁盘缓存管理工具")
+    parser.add_argument(
+        "--db-path",
+        default=settings.LLM_CACHE_DISK_PATH,
+        help=f"缓存数据库路径 (默认: {settings.LLM_CACHE_DISK_PATH})"
+    )
+    
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    subparsers.add_parser("stats", help="查看缓存统计信息")
+    
+    export_parser = subparsers.add_parser("export", help="导出缓存到JSON Lines文件")
+    export_parser.add_argument("file", help="导出文件路径")
+    
+    import_parser = subparsers.add_parser("import", help="从JSON Lines文件导入缓存")
+    import_parser.add_argument("file", help="导入文件路径")
+    import_parser.add_argument("--overwrite", action="store_true", help="覆盖已存在的键")
+    
+    compact_parser = subparsers.add_parser("compact", help="清理过期条目并回收空间")
+    compact_parser.add_argument("--vacuum", action="store_true", help="同时执行VACUUM重建数据库文件")
+    
+    invalidate_parser = subparsers.add_parser("invalidate", help="按标签删除缓存条目")
+    invalidate_parser.add_argument(
+        "--tag", action="append", required=True,
+        help="标签，如agent:parser、company:<企业ID>、category_tree:<企业ID>（可重复）"
+    )
+    
+    clear_parser = subparsers.add_parser("clear", help="清空缓存")
+    clear_parser.add_argument("-y", "--yes", action="store_true", help="跳过确认")
+    
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run_command(args)))
+
+
+if __name__ == "__main__":
+    main()
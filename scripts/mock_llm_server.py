@@ -0,0 +1,68 @@
+"""模拟LLM服务（OpenAI兼容）
+
+在本地提供chat.completions接口（含流式输出），按提示词类型返回结构合法的JSON，
+用于性能测试和负载测试，不消耗DeepSeek额度。Agent只需把OPENAI_BASE_URL指向本服务：
+
+    OPENAI_BASE_URL=http://127.0.0.1:18000/v1 python scripts/start_agents.py
+
+运行时可通过 GET /mock/stats 查看统计，POST /mock/config 调整延迟和故障注入，POST /mock/reset 清空统计。
+
+用法：
+    python scripts/mock_llm_server.py
+    python scripts/mock_llm_server.py --latency-ms 800 --distribution lognormal --jitter-ms 400
+    python scripts/mock_llm_server.py --rate-limit-rate 0.05 --timeout-rate 0.01 --max-concurrency 20
+"""
+
+import sys
+import os
+import argparse
+
+# 添加项目根目录到路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import uvicorn
+
+from src.mock_llm import MockLLMConfig, create_mock_llm_app
+from src.mock_llm.server import LATENCY_DISTRIBUTIONS
+
+
+def main():
+    """主函数入口"""
+    parser = argparse.ArgumentParser(description="OpenAI兼容的模拟LLM服务")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=18000, help="监听端口")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="首token前的平均延迟（毫秒）")
+    parser.add_argument("--distribution", choices=LATENCY_DISTRIBUTIONS, default="lognormal", help="延迟分布")
+    parser.add_argument("--jitter-ms", type=float, default=100.0, help="延迟抖动（毫秒）")
+    parser.add_argument("--ms-per-token", type=float, default=0.0, help="每个输出token的生成耗时（毫秒）")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="随机返回429的概率")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="随机挂起请求的概率")
+    parser.add_argument("--hang-seconds", type=float, default=120.0, help="挂起请求的时长（秒）")
+    parser.add_argument("--max-concurrency", type=int, default=0, help="服务端并发上限，超出返回429（0不限制）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    args = parser.parse_args()
+    
+    config = MockLLMConfig(
+        latency_ms=args.latency_ms,
+        latency_distribution=args.distribution,
+        latency_jitter_ms=args.jitter_ms,
+        ms_per_token=args.ms_per_token,
+        rate_limit_rate=args.rate_limit_rate,
+        timeout_rate=args.timeout_rate,
+        hang_seconds=args.hang_seconds,
+        max_concurrency=args.max_concurrency,
+        seed=args.seed
+    )
+    
+    print(f"模拟LLM服务: OPENAI_BASE_URL=http://{args.host}:{args.port}/v1")
+    uvicorn.run(
+        create_mock_llm_app(config),
+        host=args.host,
+        port=args.port,
+        log_level="warning",
+        timeout_keep_alive=75  # 长于客户端keep-alive过期时间，避免服务端先断开空闲连接
+    )
+
+
+if __name__ == "__main__":
+    main()
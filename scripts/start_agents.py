@@ -15,7 +15,8 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.core.config import settings
 from src.core.database import init_db
-from src.mcp.server import MCPServer
+from src.core.llm_client import deepseek_client
+from src.mcp.server import create_mcp_server_from_settings
 from src.agents.parser_agent import ParserAgent
 from src.agents.evaluator_agent import EvaluatorAgent
 from src.agents.optimizer_agent import OptimizerAgent
@@ -54,7 +55,7 @@ class AgentManager:
             await init_db()
             
             logger.info("正在启动MCP Server...")
-            self.mcp_server = MCPServer()
+            self.mcp_server = create_mcp_server_from_settings()
             await self.mcp_server.start()
             
             logger.info("正在启动Agents...")
@@ -111,6 +112,12 @@ class AgentManager:
             except Exception as e:
                 logger.error(f"停止MCP Server失败: {e}")
         
+        # 关闭LLM HTTP连接池
+        try:
+            await deepseek_client.close()
+        except Exception as e:
+            logger.error(f"关闭LLM连接池失败: {e}")
+        
         logger.info("所有服务已停止")
 
 
@@ -11,6 +11,7 @@ from src.mcp.message import MCPMessage
 from src.mcp.context import MCPContext, create_context
 from src.utils.file_parser import FileParser, FileParserService
 from src.core.performance import monitor_performance, batch_processor
+from src.core.llm_rate_limiter import LLMPriority
 
 logger = logging.getLogger(__name__)
 
@@ -185,6 +186,9 @@ class BatchUploadAgent(MCPAgent):
         )
         
         # 步骤2：批量处理解析成功的文件
+        # 下游Agent的LLM调用以批量优先级执行，按context_id与其他批次公平调度
+        priority_metadata = {"llm_priority": LLMPriority.BATCH.value, "batch_id": context_id}
+        
         async def process_single_file(file_info: Dict, parsed_result: Dict, idx: int):
             """处理单个文件"""
             try:
@@ -212,7 +216,8 @@ class BatchUploadAgent(MCPAgent):
                     action="parse_jd",
                     payload={"jd_text": jd_text},
                     context_id=context_id,
-                    timeout=60.0
+                    timeout=60.0,
+                    metadata=priority_metadata
                 )
                 
                 if not parse_response.payload.get("success", True):
@@ -227,7 +232,8 @@ class BatchUploadAgent(MCPAgent):
                     action="evaluate_quality",
                     payload={"jd_id": jd_id},
                     context_id=context_id,
-                    timeout=60.0
+                    timeout=60.0,
+                    metadata=priority_metadata
                 )
                 
                 if not eval_response.payload.get("success", True):
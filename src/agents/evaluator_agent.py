@@ -9,11 +9,54 @@ from datetime import datetime
 from src.mcp.agent import MCPAgent
 from src.mcp.server import MCPServer
 from src.mcp.message import MCPMessage
+from src.core.config import settings
 from src.core.llm_client import DeepSeekR1Client
+from src.core.llm_prompts import PromptTemplate, prompt_registry
+from src.core.llm_tokens import render_for_prompt
 from src.models.schemas import CategoryTag, DimensionContribution, ManualModification
 
 logger = logging.getLogger(__name__)
 
+# 分类标签分析模板（标签和岗位数据在最后）
+TAG_ANALYSIS_TEMPLATE = prompt_registry.register(PromptTemplate(
+    instruction="作为HR专家，请分析以下分类标签对岗位评估的影响。",
+    schema="""{
+    "has_tags": true,
+    "strategic_importance": "高/中/低",
+    "business_value": "高/中/低",
+    "skill_scarcity": "高/中/低",
+    "market_competition": "高/中/低",
+    "development_potential": "高/中/低",
+    "risk_level": "高/中/低",
+    "impact_summary": "标签对评估的整体影响说明",
+    "value_adjustment": 5,  # 对企业价值评级的调整分数（-10到+10）
+    "core_position_indicator": 0.8  # 核心岗位指标（0-1，越高越可能是核心岗位）
+}""",
+    template_id="evaluator.tag_analysis",
+    version="1"
+))
+
+# 三维度整合模板
+INTEGRATION_TEMPLATE = prompt_registry.register(PromptTemplate(
+    instruction="""作为HR专家，请整合以下三个维度的信息，给出综合评估分析。
+
+三个维度：
+- 维度1：JD内容
+- 维度2：评估模板及其评估结果
+- 维度3：分类标签
+
+请综合分析这三个维度。""",
+    schema="""{
+    "integrated_score": 85,  # 综合后的最终分数（0-100）
+    "dimension_synergy": "三个维度的协同分析",
+    "key_insights": ["关键洞察1", "关键洞察2"],
+    "conflicts": ["维度间的冲突或不一致"],
+    "recommendations": ["基于三维度的综合建议"]
+}""",
+    template_id="evaluator.integration",
+    version="1"
+))
+
 
 class EvaluationModelBase:
     """评估模型基类"""
@@ -39,34 +82,46 @@ class StandardEvaluationModel(EvaluationModelBase):
             "专业性": 0.3
         }
     
-    async def evaluate(self, jd_data: Dict, llm_client: DeepSeekR1Client) -> Dict:
-        """基于标准模型评估"""
-        prompt = f"""作为HR专家，请评估以下岗位JD的质量。
-
-岗位信息：
-职位名称: {jd_data.get('job_title', '未知')}
-职责: {json.dumps(jd_data.get('responsibilities', []), ensure_ascii=False)}
-必备技能: {json.dumps(jd_data.get('required_skills', []), ensure_ascii=False)}
-任职资格: {json.dumps(jd_data.get('qualifications', []), ensure_ascii=False)}
+    # 评估模板（不含岗位数据，批量评估时多个岗位共用）
+    TEMPLATE = prompt_registry.register(PromptTemplate(
+        instruction="""作为HR专家，请评估以下岗位JD的质量。
 
 请从以下三个维度评估（每个维度0-100分）：
 1. 完整性：JD是否包含所有必要信息（职责、技能、资格等）
 2. 清晰度：描述是否清晰明确，易于理解
-3. 专业性：语言是否专业，是否符合行业标准
-
-返回JSON格式：
-{{
-    "dimension_scores": {{"完整性": 85, "清晰度": 75, "专业性": 80}},
+3. 专业性：语言是否专业，是否符合行业标准""",
+        schema="""{
+    "dimension_scores": {"完整性": 85, "清晰度": 75, "专业性": 80},
     "overall_score": 80,
     "analysis": "详细分析...",
     "issues": [
-        {{"type": "缺失信息", "severity": "high", "description": "缺少薪资范围"}},
-        {{"type": "描述模糊", "severity": "medium", "description": "职责描述不够具体"}}
+        {"type": "缺失信息", "severity": "high", "description": "缺少薪资范围"},
+        {"type": "描述模糊", "severity": "medium", "description": "职责描述不够具体"}
     ]
-}}
-"""
+}""",
+        template_id="evaluator.standard",
+        version="1"
+    ))
+    
+    def _is_valid_result(self, result: Dict[str, Any]) -> bool:
+        """校验评估结果包含所有维度的数值评分"""
+        scores = result.get("dimension_scores")
+        return isinstance(scores, dict) and all(
+            isinstance(scores.get(dim), (int, float)) for dim in self.dimensions
+        )
+    
+    async def evaluate(self, jd_data: Dict, llm_client: DeepSeekR1Client) -> Dict:
+        """基于标准模型评估
         
-        result = await llm_client.generate_json(prompt, temperature=0.3)
+        批量评估时（非交互式优先级且启用了LLM_PACK_SIZE），多个岗位打包为一次LLM调用
+        """
+        jd_info = f"""职位名称: {jd_data.get('job_title', '未知')}
+职责: {json.dumps(jd_data.get('responsibilities', []), ensure_ascii=False)}
+必备技能: {json.dumps(jd_data.get('required_skills', []), ensure_ascii=False)}
+任职资格: {json.dumps(jd_data.get('qualifications', []), ensure_ascii=False)}"""
+        
+        pack = self.TEMPLATE.pack_item(jd_info, "岗位信息", validator=self._is_valid_result)
+        result = await llm_client.generate_json(pack.prompt, temperature=0.3, pack=pack)
         
         # 应用权重计算总分
         weighted_score = sum(
@@ -91,27 +146,29 @@ class MercerIPEModel(EvaluationModelBase):
             "知识技能": 0.20
         }
     
-    async def evaluate(self, jd_data: Dict, llm_client: DeepSeekR1Client) -> Dict:
-        """基于美世法评估"""
-        prompt = f"""作为HR专家，请使用美世国际职位评估法（Mercer IPE）评估以下岗位。
-
-岗位信息：
-{json.dumps(jd_data, ensure_ascii=False, indent=2)}
+    TEMPLATE = prompt_registry.register(PromptTemplate(
+        instruction="""作为HR专家，请使用美世国际职位评估法（Mercer IPE）评估以下岗位。
 
 请从以下四个维度评估（每个维度0-100分）：
 1. 影响力（Impact）：岗位对组织的影响范围和程度
 2. 沟通（Communication）：岗位所需的沟通复杂度和频率
 3. 创新（Innovation）：岗位所需的创新和问题解决能力
-4. 知识技能（Knowledge & Skills）：岗位所需的专业知识和技能水平
-
-返回JSON格式：
-{{
-    "dimension_scores": {{"影响力": 85, "沟通": 75, "创新": 70, "知识技能": 80}},
+4. 知识技能（Knowledge & Skills）：岗位所需的专业知识和技能水平""",
+        schema="""{
+    "dimension_scores": {"影响力": 85, "沟通": 75, "创新": 70, "知识技能": 80},
     "overall_score": 78,
     "analysis": "详细分析...",
     "issues": ["问题1", "问题2"]
-}}
-"""
+}""",
+        template_id="evaluator.mercer_ipe",
+        version="1"
+    ))
+    
+    async def evaluate(self, jd_data: Dict, llm_client: DeepSeekR1Client) -> Dict:
+        """基于美世法评估"""
+        prompt = self.TEMPLATE.render(
+            ("岗位信息", render_for_prompt(jd_data, settings.LLM_PROMPT_DATA_TOKEN_BUDGET))
+        )
         
         result = await llm_client.generate_json(prompt, temperature=0.3)
         
@@ -138,27 +195,29 @@ class FactorComparisonModel(EvaluationModelBase):
             "工作条件": 0.20
         }
     
-    async def evaluate(self, jd_data: Dict, llm_client: DeepSeekR1Client) -> Dict:
-        """基于因素比较法评估"""
-        prompt = f"""作为HR专家，请使用因素比较法评估以下岗位。
-
-岗位信息：
-{json.dumps(jd_data, ensure_ascii=False, indent=2)}
+    TEMPLATE = prompt_registry.register(PromptTemplate(
+        instruction="""作为HR专家，请使用因素比较法评估以下岗位。
 
 请从以下四个因素评估（每个因素0-100分）：
 1. 技能要求：岗位所需的技能水平和复杂度
 2. 责任程度：岗位承担的责任大小和重要性
 3. 努力程度：岗位所需的体力和脑力努力
-4. 工作条件：工作环境和条件的优劣
-
-返回JSON格式：
-{{
-    "dimension_scores": {{"技能要求": 85, "责任程度": 75, "努力程度": 70, "工作条件": 80}},
+4. 工作条件：工作环境和条件的优劣""",
+        schema="""{
+    "dimension_scores": {"技能要求": 85, "责任程度": 75, "努力程度": 70, "工作条件": 80},
     "overall_score": 78,
     "analysis": "详细分析...",
     "issues": ["问题1", "问题2"]
-}}
-"""
+}""",
+        template_id="evaluator.factor_comparison",
+        version="1"
+    ))
+    
+    async def evaluate(self, jd_data: Dict, llm_client: DeepSeekR1Client) -> Dict:
+        """基于因素比较法评估"""
+        prompt = self.TEMPLATE.render(
+            ("岗位信息", render_for_prompt(jd_data, settings.LLM_PROMPT_DATA_TOKEN_BUDGET))
+        )
         
         result = await llm_client.generate_json(prompt, temperature=0.3)
         
@@ -281,28 +340,10 @@ class ComprehensiveEvaluator:
             for tag in category_tags
         ]
         
-        prompt = f"""作为HR专家，请分析以下分类标签对岗位评估的影响。
-
-岗位信息：
-职位名称: {jd_data.get('job_title', '未知')}
-
-分类标签：
-{json.dumps(tags_info, ensure_ascii=False, indent=2)}
-
-请分析这些标签对岗位评估的影响，并返回JSON格式：
-{{
-    "has_tags": true,
-    "strategic_importance": "高/中/低",
-    "business_value": "高/中/低",
-    "skill_scarcity": "高/中/低",
-    "market_competition": "高/中/低",
-    "development_potential": "高/中/低",
-    "risk_level": "高/中/低",
-    "impact_summary": "标签对评估的整体影响说明",
-    "value_adjustment": 5,  # 对企业价值评级的调整分数（-10到+10）
-    "core_position_indicator": 0.8  # 核心岗位指标（0-1，越高越可能是核心岗位）
-}}
-"""
+        prompt = TAG_ANALYSIS_TEMPLATE.render(
+            ("分类标签", json.dumps(tags_info, ensure_ascii=False, indent=2)),
+            ("岗位信息", f"职位名称: {jd_data.get('job_title', '未知')}")
+        )
         
         try:
             analysis = await self.llm.generate_json(prompt, temperature=0.3)
@@ -341,30 +382,25 @@ class ComprehensiveEvaluator:
         Returns:
             整合后的分析结果
         """
-        prompt = f"""作为HR专家，请整合以下三个维度的信息，给出综合评估分析。
-
-**维度1：JD内容**
-职位名称: {jd_data.get('job_title', '未知')}
-职责: {json.dumps(jd_data.get('responsibilities', []), ensure_ascii=False)}
-必备技能: {json.dumps(jd_data.get('required_skills', []), ensure_ascii=False)}
-
-**维度2：评估模板（{type(evaluation_model).__name__}）**
-评估维度: {json.dumps(evaluation_model.dimensions, ensure_ascii=False)}
-维度得分: {json.dumps(base_evaluation.get('dimension_scores', {}), ensure_ascii=False)}
-基础分数: {base_evaluation.get('overall_score', 0)}
-
-**维度3：分类标签**
-{json.dumps(tag_analysis, ensure_ascii=False, indent=2)}
-
-请综合分析这三个维度，返回JSON格式：
-{{
-    "integrated_score": 85,  # 综合后的最终分数（0-100）
-    "dimension_synergy": "三个维度的协同分析",
-    "key_insights": ["关键洞察1", "关键洞察2"],
-    "conflicts": ["维度间的冲突或不一致"],
-    "recommendations": ["基于三维度的综合建议"]
-}}
-"""
+        # 评估模板只有几种取值，放在每次都不同的评估结果和JD内容之前
+        prompt = INTEGRATION_TEMPLATE.render(
+            (
+                f"维度2：评估模板（{type(evaluation_model).__name__}）",
+                f"评估维度: {json.dumps(evaluation_model.dimensions, ensure_ascii=False)}"
+            ),
+            (
+                "维度2：评估结果",
+                f"维度得分: {json.dumps(base_evaluation.get('dimension_scores', {}), ensure_ascii=False)}\n"
+                f"基础分数: {base_evaluation.get('overall_score', 0)}"
+            ),
+            ("维度3：分类标签", json.dumps(tag_analysis, ensure_ascii=False, indent=2)),
+            (
+                "维度1：JD内容",
+                f"职位名称: {jd_data.get('job_title', '未知')}\n"
+                f"职责: {json.dumps(jd_data.get('responsibilities', []), ensure_ascii=False)}\n"
+                f"必备技能: {json.dumps(jd_data.get('required_skills', []), ensure_ascii=False)}"
+            )
+        )
         
         try:
             result = await self.llm.generate_json(prompt, temperature=0.3)
@@ -526,7 +562,9 @@ class EvaluatorAgent(MCPAgent):
             agent_id=agent_id,
             agent_type="evaluator",
             mcp_server=mcp_server,
-            metadata=metadata
+            metadata=metadata,
+            # 手动修改是读-改-写，同一Agent内按到达顺序逐条处理
+            ordered_actions=["update_evaluation"]
         )
         
         self.llm = llm_client
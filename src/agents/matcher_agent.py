@@ -1,7 +1,6 @@
 """匹配评估Agent - 评估候选人匹配度"""
 
 import logging
-import json
 import uuid
 from typing import Dict, Any, Optional
 from datetime import datetime
@@ -9,10 +8,38 @@ from datetime import datetime
 from src.mcp.agent import MCPAgent
 from src.mcp.server import MCPServer
 from src.mcp.message import MCPMessage
+from src.core.config import settings
 from src.core.llm_client import DeepSeekR1Client
+from src.core.llm_prompts import PromptTemplate, prompt_registry
+from src.core.llm_tokens import compact_json, render_for_prompt
 
 logger = logging.getLogger(__name__)
 
+# 匹配评估模板（岗位要求、问卷问题、候选人回答依次在后）
+MATCH_TEMPLATE = prompt_registry.register(PromptTemplate(
+    instruction="""作为HR专家，请评估候选人与岗位的匹配度。
+
+请评估：
+1. 总体匹配度（0-100分）
+2. 各维度匹配度
+3. 候选人优势
+4. 能力差距
+5. 发展建议""",
+    schema="""{
+    "overall_score": 85,
+    "dimension_scores": {
+        "技能匹配": 90,
+        "经验匹配": 80,
+        "资质匹配": 85
+    },
+    "strengths": ["优势1", "优势2"],
+    "gaps": ["差距1", "差距2"],
+    "recommendations": ["建议1", "建议2"]
+}""",
+    template_id="matcher.match",
+    version="1"
+))
+
 
 class MatcherAgent(MCPAgent):
     """匹配评估Agent
@@ -104,38 +131,17 @@ class MatcherAgent(MCPAgent):
             })
     
     async def _calculate_match(self, jd_data: Dict, questionnaire: Dict, responses: Dict) -> Dict:
-        """计算匹配度"""
-        prompt = f"""作为HR专家，请评估候选人与岗位的匹配度。
-
-岗位要求：
-{json.dumps(jd_data, ensure_ascii=False, indent=2)}
-
-问卷问题：
-{json.dumps(questionnaire.get('questions', []), ensure_ascii=False, indent=2)}
-
-候选人回答：
-{json.dumps(responses, ensure_ascii=False, indent=2)}
-
-请评估：
-1. 总体匹配度（0-100分）
-2. 各维度匹配度
-3. 候选人优势
-4. 能力差距
-5. 发展建议
-
-返回JSON格式：
-{{
-    "overall_score": 85,
-    "dimension_scores": {{
-        "技能匹配": 90,
-        "经验匹配": 80,
-        "资质匹配": 85
-    }},
-    "strengths": ["优势1", "优势2"],
-    "gaps": ["差距1", "差距2"],
-    "recommendations": ["建议1", "建议2"]
-}}
-"""
+        """计算匹配度
+        
+        岗位数据和候选人回答按LLM_PROMPT_DATA_TOKEN_BUDGET紧凑渲染，超出预算时优先截断raw_text等低价值字段
+        """
+        budget = settings.LLM_PROMPT_DATA_TOKEN_BUDGET
+        # 同一岗位、同一问卷的多个候选人共享岗位要求和问卷问题，候选人回答放在最后
+        prompt = MATCH_TEMPLATE.render(
+            ("岗位要求", render_for_prompt(jd_data, budget)),
+            ("问卷问题", compact_json(questionnaire.get('questions', []))),
+            ("候选人回答", render_for_prompt(responses, budget))
+        )
         
         result = await self.llm.generate_json(prompt, temperature=0.3)
         return result
@@ -1,16 +1,43 @@
 """优化建议Agent - 生成JD优化建议"""
 
 import logging
-import json
 from typing import Dict, Any, Optional
 
 from src.mcp.agent import MCPAgent
 from src.mcp.server import MCPServer
 from src.mcp.message import MCPMessage
+from src.core.config import settings
 from src.core.llm_client import DeepSeekR1Client
+from src.core.llm_prompts import PromptTemplate, prompt_registry
+from src.core.llm_tokens import compact_json, render_for_prompt
 
 logger = logging.getLogger(__name__)
 
+# 优化建议模板（岗位信息、评估结果依次在后）
+OPTIMIZE_TEMPLATE = prompt_registry.register(PromptTemplate(
+    instruction="""作为HR专家，请基于评估结果为岗位JD提供优化建议。
+
+请提供：
+1. 具体的优化建议（按优先级排序）
+2. 每条建议的改写示例
+3. 缺失信息的补充建议""",
+    schema="""{
+    "suggestions": [
+        {
+            "priority": "high",
+            "category": "职责描述",
+            "issue": "职责描述过于笼统",
+            "suggestion": "具体建议...",
+            "example": "改写示例..."
+        }
+    ],
+    "missing_info": ["薪资范围", "福利待遇"],
+    "overall_recommendation": "总体建议..."
+}""",
+    template_id="optimizer.optimize",
+    version="1"
+))
+
 
 class OptimizerAgent(MCPAgent):
     """优化建议Agent
@@ -85,35 +112,14 @@ class OptimizerAgent(MCPAgent):
     
     async def _generate_suggestions(self, jd_data: Dict, evaluation: Dict) -> Dict:
         """生成优化建议"""
-        prompt = f"""作为HR专家，请为以下岗位JD提供优化建议。
-
-岗位信息：
-{json.dumps(jd_data, ensure_ascii=False, indent=2)}
-
-评估结果：
-总分: {evaluation.get('overall_score', 0)}
-问题: {json.dumps(evaluation.get('issues', []), ensure_ascii=False)}
-
-请提供：
-1. 具体的优化建议（按优先级排序）
-2. 每条建议的改写示例
-3. 缺失信息的补充建议
-
-返回JSON格式：
-{{
-    "suggestions": [
-        {{
-            "priority": "high",
-            "category": "职责描述",
-            "issue": "职责描述过于笼统",
-            "suggestion": "具体建议...",
-            "example": "改写示例..."
-        }}
-    ],
-    "missing_info": ["薪资范围", "福利待遇"],
-    "overall_recommendation": "总体建议..."
-}}
-"""
+        budget = settings.LLM_PROMPT_DATA_TOKEN_BUDGET
+        prompt = OPTIMIZE_TEMPLATE.render(
+            ("岗位信息", render_for_prompt(jd_data, budget)),
+            ("评估结果", compact_json({
+                "overall_score": evaluation.get('overall_score', 0),
+                "issues": evaluation.get('issues', [])
+            }))
+        )
         
         result = await self.llm.generate_json(prompt, temperature=0.5)
         return result
@@ -10,9 +10,73 @@ from src.mcp.agent import MCPAgent
 from src.mcp.server import MCPServer
 from src.mcp.message import MCPMessage
 from src.core.llm_client import DeepSeekR1Client
+from src.core.llm_cache import cache_tag
+from src.core.llm_packing import PackItem
+from src.core.llm_prompts import PromptTemplate, prompt_registry
 
 logger = logging.getLogger(__name__)
 
+# JD解析模板（自定义字段和JD文本在最后）
+PARSE_TEMPLATE = prompt_registry.register(PromptTemplate(
+    instruction="你是一个专业的HR岗位分析专家。请解析以下岗位JD，提取结构化信息。",
+    schema="""{
+    "job_title": "职位名称",
+    "department": "部门（如果有）",
+    "location": "工作地点（如果有）",
+    "responsibilities": ["职责1", "职责2", ...],
+    "required_skills": ["必备技能1", "必备技能2", ...],
+    "preferred_skills": ["优选技能1", "优选技能2", ...],
+    "qualifications": ["任职资格1", "任职资格2", ...],
+    "custom_fields": {
+        // 自定义字段的提取结果
+    }
+}""",
+    notes="""注意：
+1. 如果某些信息在JD中未提及，请使用空字符串或空数组
+2. responsibilities、required_skills等应该是数组格式
+3. 尽可能详细地提取信息
+4. 保持原文的专业性和准确性""",
+    template_id="parser.parse",
+    version="1"
+))
+
+# 职位分类模板（分类树、样本JD、职位信息依次在后）
+CLASSIFICATION_TEMPLATE = prompt_registry.register(PromptTemplate(
+    instruction="你是一个专业的HR岗位分类专家。请将以下职位归类到合适的分类中。",
+    schema="""{
+    "level1_id": "一级分类ID",
+    "level2_id": "二级分类ID",
+    "level3_id": "三级分类ID",
+    "reasoning": "分类理由（简短说明）"
+}""",
+    notes="""注意：
+1. 必须选择最合适的分类
+2. 如果某个层级没有合适的分类，可以返回null
+3. 优先参考样本JD进行分类
+4. 分类理由要简洁明了""",
+    template_id="parser.classify",
+    version="1"
+))
+
+
+def _category_tree_tags(categories: List[Dict]) -> List[str]:
+    """分类结果的缓存标签：分类树所属企业（分类树变更后按category_tree:<企业ID>失效）"""
+    company_ids = sorted({str(c["company_id"]) for c in categories if c.get("company_id")})
+    if not company_ids:
+        return [cache_tag("category_tree", "default")]
+    return (
+        [cache_tag("category_tree", company_id) for company_id in company_ids]
+        + [cache_tag("company", company_id) for company_id in company_ids]
+    )
+
+
+def _is_valid_parse_result(result: Dict[str, Any]) -> bool:
+    """校验解析结果包含职位名称和列表格式的核心字段"""
+    return isinstance(result.get("job_title"), str) and all(
+        isinstance(result.get(field), list)
+        for field in ("responsibilities", "required_skills", "qualifications")
+    )
+
 
 class ParserAgent(MCPAgent):
     """JD解析Agent
@@ -153,13 +217,16 @@ class ParserAgent(MCPAgent):
         Returns:
             解析后的结构化数据
         """
-        prompt = self._build_parse_prompt(jd_text, custom_fields)
+        # 批量解析时（非交互式优先级且启用了LLM_PACK_SIZE），多个JD打包为一次LLM调用
+        pack = self._build_parse_pack(jd_text, custom_fields)
         
         try:
             result = await self.llm.generate_json(
-                prompt=prompt,
+                prompt=pack.prompt,
                 temperature=0.3,  # 较低温度以获得更稳定的结果
-                max_tokens=2000
+                max_tokens=2000,
+                similarity_text=jd_text,  # 重新上传的近似相同JD可复用缓存结果
+                pack=pack
             )
             
             # 验证必需字段
@@ -184,38 +251,26 @@ class ParserAgent(MCPAgent):
         Returns:
             Prompt字符串
         """
-        custom_fields_str = ""
-        if custom_fields:
-            custom_fields_str = f"\n\n自定义字段（请额外提取）:\n{json.dumps(custom_fields, ensure_ascii=False, indent=2)}"
+        return self._build_parse_pack(jd_text, custom_fields).prompt
+    
+    def _build_parse_pack(self, jd_text: str, custom_fields: Dict[str, Any]) -> PackItem:
+        """构建可打包的解析请求（静态指令在前，自定义字段和JD文本在后）
         
-        prompt = f"""你是一个专业的HR岗位分析专家。请解析以下岗位JD，提取结构化信息。
-
-岗位JD:
-{jd_text}
-{custom_fields_str}
-
-请以JSON格式返回以下信息：
-{{
-    "job_title": "职位名称",
-    "department": "部门（如果有）",
-    "location": "工作地点（如果有）",
-    "responsibilities": ["职责1", "职责2", ...],
-    "required_skills": ["必备技能1", "必备技能2", ...],
-    "preferred_skills": ["优选技能1", "优选技能2", ...],
-    "qualifications": ["任职资格1", "任职资格2", ...],
-    "custom_fields": {{
-        // 自定义字段的提取结果
-    }}
-}}
-
-注意：
-1. 如果某些信息在JD中未提及，请使用空字符串或空数组
-2. responsibilities、required_skills等应该是数组格式
-3. 尽可能详细地提取信息
-4. 保持原文的专业性和准确性
-"""
+        Args:
+            jd_text: JD文本
+            custom_fields: 自定义字段
+            
+        Returns:
+            PackItem实例（批量解析时多个JD共用指令和自定义字段）
+        """
+        context = ()
+        if custom_fields:
+            context = ((
+                "自定义字段（请额外提取，结果放入custom_fields）",
+                json.dumps(custom_fields, ensure_ascii=False, indent=2)
+            ),)
         
-        return prompt
+        return PARSE_TEMPLATE.pack_item(jd_text, "岗位JD", validator=_is_valid_parse_result, context=context)
     
     async def _classify_job(
         self,
@@ -268,7 +323,8 @@ class ParserAgent(MCPAgent):
             classification = await self.llm.generate_json(
                 prompt=prompt,
                 temperature=0.2,  # 更低温度以获得更一致的分类
-                max_tokens=1000
+                max_tokens=1000,
+                cache_tags=_category_tree_tags(categories)
             )
             
             return {
@@ -341,48 +397,24 @@ class ParserAgent(MCPAgent):
         Returns:
             Prompt字符串
         """
-        # 构建分类树结构
-        category_tree = self._build_category_tree(categories)
+        # 分类树和样本JD很少变化，放在职位信息之前，不同职位的分类请求可共享缓存前缀
+        samples = ""
+        for category_id, category_samples in sample_jds.items():
+            category_name = next((c["name"] for c in categories if c["id"] == category_id), "")
+            samples += f"\n分类 '{category_name}' 的样本:\n"
+            for idx, sample in enumerate(category_samples[:2], 1):  # 最多2个样本
+                samples += f"  样本{idx}: {sample.get('job_title', '未知')} - {', '.join(sample.get('required_skills', [])[:3])}\n"
         
-        prompt = f"""你是一个专业的HR岗位分类专家。请将以下职位归类到合适的分类中。
-
-职位信息:
-职位名称: {jd_data.get('job_title', '未知')}
+        job_info = f"""职位名称: {jd_data.get('job_title', '未知')}
 部门: {jd_data.get('department', '未知')}
 职责: {', '.join(jd_data.get('responsibilities', [])[:3])}
-必备技能: {', '.join(jd_data.get('required_skills', [])[:5])}
-
-可用分类（3层级）:
-{category_tree}
-"""
-        
-        # 添加样本JD作为参考
-        if sample_jds:
-            prompt += "\n\n参考样本职位JD（用于提高分类准确性）:\n"
-            for category_id, samples in sample_jds.items():
-                category_name = next((c["name"] for c in categories if c["id"] == category_id), "")
-                prompt += f"\n分类 '{category_name}' 的样本:\n"
-                for idx, sample in enumerate(samples[:2], 1):  # 最多2个样本
-                    prompt += f"  样本{idx}: {sample.get('job_title', '未知')} - {', '.join(sample.get('required_skills', [])[:3])}\n"
-        
-        prompt += """
-
-请返回JSON格式：
-{
-    "level1_id": "一级分类ID",
-    "level2_id": "二级分类ID",
-    "level3_id": "三级分类ID",
-    "reasoning": "分类理由（简短说明）"
-}
+必备技能: {', '.join(jd_data.get('required_skills', [])[:5])}"""
 
-注意：
-1. 必须选择最合适的分类
-2. 如果某个层级没有合适的分类，可以返回null
-3. 优先参考样本JD进行分类
-4. 分类理由要简洁明了
-"""
-        
-        return prompt
+        return CLASSIFICATION_TEMPLATE.render(
+            ("可用分类（3层级）", self._build_category_tree(categories).lstrip("\n")),
+            ("参考样本职位JD（用于提高分类准确性）", samples.strip("\n")),
+            ("职位信息", job_info)
+        )
     
     def _build_category_tree(self, categories: List[Dict]) -> str:
         """构建分类树字符串
@@ -1,7 +1,6 @@
 """问卷生成Agent - 生成评估问卷"""
 
 import logging
-import json
 import uuid
 from typing import Dict, Any, Optional
 from datetime import datetime
@@ -9,10 +8,44 @@ from datetime import datetime
 from src.mcp.agent import MCPAgent
 from src.mcp.server import MCPServer
 from src.mcp.message import MCPMessage
+from src.core.config import settings
 from src.core.llm_client import DeepSeekR1Client
+from src.core.llm_prompts import PromptTemplate, prompt_registry
+from src.core.llm_tokens import render_for_prompt
 
 logger = logging.getLogger(__name__)
 
+# 问卷生成模板（评估模型、岗位信息依次在后）
+QUESTIONNAIRE_TEMPLATE = prompt_registry.register(PromptTemplate(
+    instruction="""作为HR专家，请为岗位生成评估问卷。
+
+请生成包含以下类型问题的问卷：
+1. 单选题（single_choice）：评估具体技能或经验
+2. 多选题（multiple_choice）：评估多项能力
+3. 量表题（scale）：评估能力水平（1-5分）
+4. 开放题（open_ended）：了解详细情况""",
+    schema="""{
+    "title": "问卷标题",
+    "description": "问卷说明",
+    "questions": [
+        {
+            "id": "q1",
+            "question_text": "问题内容",
+            "question_type": "single_choice",
+            "options": ["选项1", "选项2"],
+            "dimension": "技能评估",
+            "weight": 1.0
+        }
+    ]
+}""",
+    notes="""要求：
+- 生成10-15个问题
+- 覆盖岗位的核心要求
+- 问题要具体、可量化""",
+    template_id="questionnaire.generate",
+    version="1"
+))
+
 
 class QuestionnaireAgent(MCPAgent):
     """问卷生成Agent
@@ -94,40 +127,11 @@ class QuestionnaireAgent(MCPAgent):
     
     async def _generate_questionnaire(self, jd_data: Dict, evaluation_model: str) -> Dict:
         """生成问卷"""
-        prompt = f"""作为HR专家，请为以下岗位生成评估问卷。
-
-岗位信息：
-{json.dumps(jd_data, ensure_ascii=False, indent=2)}
-
-评估模型：{evaluation_model}
-
-请生成包含以下类型问题的问卷：
-1. 单选题（single_choice）：评估具体技能或经验
-2. 多选题（multiple_choice）：评估多项能力
-3. 量表题（scale）：评估能力水平（1-5分）
-4. 开放题（open_ended）：了解详细情况
-
-返回JSON格式：
-{{
-    "title": "问卷标题",
-    "description": "问卷说明",
-    "questions": [
-        {{
-            "id": "q1",
-            "question_text": "问题内容",
-            "question_type": "single_choice",
-            "options": ["选项1", "选项2"],
-            "dimension": "技能评估",
-            "weight": 1.0
-        }}
-    ]
-}}
-
-要求：
-- 生成10-15个问题
-- 覆盖岗位的核心要求
-- 问题要具体、可量化
-"""
+        # 评估模型取值很少，放在岗位信息之前
+        prompt = QUESTIONNAIRE_TEMPLATE.render(
+            ("评估模型", evaluation_model),
+            ("岗位信息", render_for_prompt(jd_data, settings.LLM_PROMPT_DATA_TOKEN_BUDGET))
+        )
         
         result = await self.llm.generate_json(prompt, temperature=0.6)
         result["evaluation_model"] = evaluation_model
@@ -42,5 +42,14 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """健康检查"""
-    return {"status": "healthy"}
+    """健康检查
+    
+    LLM熔断器打开时status为degraded（只读和缓存接口仍可用，需要调用LLM的接口会快速失败）
+    """
+    from ..core.llm_client import deepseek_client
+    
+    circuit = deepseek_client.get_circuit_stats()
+    status = "healthy"
+    if circuit is not None and circuit["state"] != "closed":
+        status = "degraded"
+    return {"status": status, "llm_circuit": circuit}
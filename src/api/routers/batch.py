@@ -6,6 +6,7 @@ from typing import List, Dict, Any, Optional
 from ...models.schemas import EvaluationModel
 from ...mcp.simple_client import get_simple_mcp_client
 from ...utils.file_parser import file_parser
+from ...core.llm_rate_limiter import llm_priority_scope, LLMPriority
 
 # 获取简化 MCP 客户端（不依赖 Redis）
 mcp_client = get_simple_mcp_client()
@@ -115,11 +116,12 @@ async def process_batch_upload(
             # 解析文件
             jd_text = file_parser.parse_file(file_content, file.filename)
             
-            # 分析JD
-            result = await mcp_client.analyze_jd(
-                jd_text=jd_text,
-                model_type=model_type
-            )
+            # 分析JD（批量优先级，按batch_id与其他批次公平调度）
+            with llm_priority_scope(LLMPriority.BATCH, batch_id=batch_id):
+                result = await mcp_client.analyze_jd(
+                    jd_text=jd_text,
+                    model_type=model_type
+                )
             
             results.append({
                 "filename": file.filename,
@@ -228,13 +230,15 @@ async def batch_analyze_jds(request: BatchAnalyzeRequest):
         
         # 并发处理（限制并发数）
         semaphore = asyncio.Semaphore(5)  # 最多5个并发
+        batch_id = f"batch_{uuid.uuid4().hex[:8]}"
         
         async def analyze_one(jd_text: str):
             async with semaphore:
-                return await mcp_client.analyze_jd(
-                    jd_text=jd_text,
-                    model_type=request.model_type
-                )
+                with llm_priority_scope(LLMPriority.BATCH, batch_id=batch_id):
+                    return await mcp_client.analyze_jd(
+                        jd_text=jd_text,
+                        model_type=request.model_type
+                    )
         
         # 并发执行
         tasks = [analyze_one(jd_text) for jd_text in request.jd_texts]
@@ -303,6 +307,7 @@ async def batch_match_candidates(request: BatchMatchRequest):
         
         # 并发处理
         semaphore = asyncio.Semaphore(5)
+        batch_id = f"batch_{uuid.uuid4().hex[:8]}"
         
         async def match_one(profile: Dict[str, Any]):
             async with semaphore:
@@ -329,7 +334,11 @@ async def batch_match_candidates(request: BatchMatchRequest):
 ```
 """
                 
-                match_data = await llm_client.generate_json(prompt)
+                match_data = await llm_client.generate_json(
+                    prompt,
+                    priority=LLMPriority.BATCH,
+                    batch_id=batch_id
+                )
                 
                 match_id = f"match_{uuid.uuid4().hex[:8]}"
                 match_result = MatchResult(
@@ -17,14 +17,85 @@ class Settings(BaseSettings):
     LLM_TIMEOUT: float = 60.0  # 请求超时时间（秒）
     LLM_ENABLE_CACHE: bool = True  # 是否启用缓存
     LLM_MAX_CONCURRENT: int = 5  # 批量调用最大并发数
+    LLM_MIN_CONCURRENT: int = 1  # 429/超时后自适应降低的最小并发数
+    LLM_INTERACTIVE_RESERVED: int = 1  # 为交互式请求预留的并发数（批量任务不可占用）
+    LLM_RATE_LIMIT_RPM: int = 0  # 每分钟请求数预算（0表示不限制）
+    LLM_RATE_LIMIT_TPM: int = 0  # 每分钟token数预算（0表示不限制）
     LLM_DEFAULT_TEMPERATURE: float = 0.7  # 默认温度参数
     LLM_DEFAULT_MAX_TOKENS: int = 4000  # 默认最大token数
     
+    # LLM缓存配置（0表示不限制）
+    LLM_CACHE_BACKEND: str = "memory"  # 缓存后端：memory / sqlite / redis / tiered（L1内存 + L2 Redis）
+    LLM_CACHE_MAX_ENTRIES: int = 1000  # 内存缓存最大条目数
+    LLM_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # 内存缓存最大字节数（64MB）
+    LLM_CACHE_DEFAULT_TTL: int = 86400  # 缓存默认过期时间（秒）
+    LLM_CACHE_DISK_PATH: str = "./data/llm_cache.db"  # 磁盘缓存文件路径
+    LLM_CACHE_DISK_MAX_ENTRIES: int = 100000  # 磁盘缓存最大条目数
+    LLM_CACHE_DISK_MAX_BYTES: int = 1024 * 1024 * 1024  # 磁盘缓存最大字节数（1GB）
+    LLM_CACHE_L1_MAX_ENTRIES: int = 256  # 两级缓存L1最大条目数
+    LLM_CACHE_L1_MAX_BYTES: int = 16 * 1024 * 1024  # 两级缓存L1最大字节数（16MB）
+    LLM_CACHE_L1_TTL: int = 300  # 两级缓存L1过期时间（秒），限制跨进程数据陈旧时间
+    LLM_CACHE_NEAR_DUP_ENABLED: bool = False  # 是否启用近似重复JD缓存
+    LLM_CACHE_NEAR_DUP_THRESHOLD: float = 0.9  # 复用缓存所需的最低相似度（0-1）
+    LLM_CACHE_NEAR_DUP_MAX_ENTRIES: int = 10000  # 近似重复索引最大条目数
+    LLM_CACHE_STALE_MAX_ENTRIES: int = 1000  # 过期副本最大条目数（LLM熔断时返回），0表示不保留
+    LLM_CACHE_STALE_MAX_AGE: int = 7 * 86400  # 过期副本最长保留时间（秒）
+    LLM_CACHE_SWR_MAX_STALE: int = 3600  # get_or_compute可返回的旧值最长过期时间（秒），后台刷新，0表示关闭
+    LLM_PROMPT_HISTORY_MAX_ENTRIES: int = 500  # 每个提示词模板记录的历史输入数（新版本离线预热用）
+    
+    # LLM跨进程请求去重（需要Redis）
+    LLM_SINGLE_FLIGHT_ENABLED: bool = False  # 是否启用跨进程single-flight
+    LLM_SINGLE_FLIGHT_LEASE_TTL: float = 120.0  # 租约时长（秒）
+    
+    # LLM多条目打包（批量解析/评估时把多个短JD合并为一次调用）
+    LLM_PACK_SIZE: int = 1  # 每次调用打包的条目数（1表示关闭打包）
+    LLM_PACK_MAX_WAIT_MS: int = 50  # 等待凑包的最长时间（毫秒）
+    LLM_PACK_MAX_TOKENS: int = 8000  # 打包调用的最大生成token数上限
+    
+    # LLM HTTP连接池
+    LLM_HTTP2: bool = True  # 是否启用HTTP/2（需要安装h2，未安装时回退到HTTP/1.1）
+    LLM_HTTP_MAX_CONNECTIONS: int = 0  # 最大连接数（0表示与客户端并发上限一致）
+    LLM_HTTP_KEEPALIVE_EXPIRY: float = 30.0  # 空闲连接保持时间（秒）
+    
+    # LLM请求对冲（降低单个慢响应造成的长尾延迟）
+    LLM_HEDGE_ENABLED: bool = False  # 是否启用对冲请求
+    LLM_HEDGE_PERCENTILE: float = 95.0  # 超过历史延迟的该分位数仍未返回时发出对冲请求
+    LLM_HEDGE_MIN_DELAY_MS: int = 500  # 最短对冲延迟（毫秒）
+    LLM_HEDGE_MAX_EXTRA_PERCENT: float = 5.0  # 对冲请求预估token数占请求总预估token数的上限（%），即额外花费上限
+    LLM_HEDGE_MIN_SAMPLES: int = 20  # 开始对冲前需要的最少延迟样本数
+    
+    # LLM熔断器（窗口内错误率超过阈值后快速失败或返回过期缓存）
+    LLM_CIRCUIT_BREAKER_ENABLED: bool = True  # 是否启用LLM熔断器
+    LLM_CIRCUIT_WINDOW_SECONDS: float = 30.0  # 错误率统计的滚动窗口（秒）
+    LLM_CIRCUIT_MIN_REQUESTS: int = 10  # 窗口内至少有这么多次调用才判断错误率
+    LLM_CIRCUIT_ERROR_RATE: float = 0.5  # 触发熔断的错误率（0-1）
+    LLM_CIRCUIT_OPEN_SECONDS: float = 30.0  # 熔断后快速失败的时间（秒），之后放行探测请求
+    LLM_CIRCUIT_HALF_OPEN_MAX_CALLS: int = 1  # 半开状态下同时放行的探测请求数
+    
+    # LLM token预算与费用统计
+    LLM_PROMPT_TOKEN_BUDGET: int = 16000  # 单次提示词token预算，超出时告警（0表示不检查）
+    LLM_PROMPT_DATA_TOKEN_BUDGET: int = 3000  # 提示词中单个数据段（如jd_data）的token预算，超出时截断低价值字段
+    LLM_CONTEXT_WINDOW_TOKENS: int = 64000  # 模型上下文长度，提示词+max_tokens超出时直接失败（0表示不检查）
+    LLM_COST_PER_1M_INPUT_TOKENS: float = 2.0  # 每百万输入token费用（元，未命中服务端缓存）
+    LLM_COST_PER_1M_CACHED_INPUT_TOKENS: float = 0.5  # 每百万服务端缓存命中输入token费用（元）
+    LLM_COST_PER_1M_OUTPUT_TOKENS: float = 8.0  # 每百万输出token费用（元）
+    
     # Redis配置
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
     REDIS_DB: int = 0
     
+    # MCP消息总线
+    MCP_TRANSPORT: str = "pubsub"  # 消息传输：pubsub（Redis发布订阅）、streams（Redis Streams，多副本）、memory（进程内队列，单进程部署）
+    MCP_STREAM_MAX_LEN: int = 10000  # streams：每个流保留的最大条目数
+    MCP_STREAM_CLAIM_IDLE_MS: int = 60000  # streams：未确认消息空闲超过该时间（毫秒）后由其他副本认领
+    MCP_STREAM_MAX_DELIVERIES: int = 5  # streams：最大投递次数，超过后转入死信流
+    MCP_MEMORY_QUEUE_SIZE: int = 0  # memory：每个Agent请求队列的最大长度，队列满时发送方等待（0表示不限制）
+    MCP_AGENT_INBOX_SIZE: int = 1000  # pubsub：每个Agent收件箱的最大长度，满时丢弃新消息
+    MCP_AGENT_MAX_IN_FLIGHT: int = 1  # 每个Agent同时处理的消息数（三种传输通用），名额用完时停止取消息；默认1逐条处理，确认各Agent处理器无顺序依赖后再调大
+    MCP_CODEC: str = "json"  # 消息和上下文编码：json（旧版格式）、orjson、msgpack（需要安装msgpack）
+    MCP_CODEC_NEGOTIATION: bool = True  # 按接收方登记的编码协商，广播和上下文使用json；所有Agent升级后设为False
+    
     # 数据库配置
     DATABASE_URL: str = "sqlite+aiosqlite:///./data/jd_analyzer.db"
     
@@ -1,23 +1,139 @@
 """LLM调用缓存机制
 
-支持两种缓存策略：
+支持以下缓存策略：
 1. 内存缓存（MemoryCache）- 快速但不持久
-2. Redis缓存（RedisCache）- 持久化且支持分布式
+2. 有界内存缓存（LRUMemoryCache）- 条目数/字节数上限、TTL过期、LRU淘汰
+3. Redis缓存（RedisCache）- 持久化且支持分布式
+4. 两级缓存（TieredCache）- 进程内L1 + Redis L2，通过pub/sub广播失效
+5. 磁盘缓存（SQLiteCache）- SQLite WAL模式持久化，重启后保留，无需Redis
 
 缓存键生成策略：
 - 基于prompt、model、temperature等参数生成唯一哈希
 - 使用MD5确保键的一致性和长度可控
+- 可选近似重复匹配（MinHashLSHIndex）：规范化JD文本后复用相似度超过阈值的历史结果
+
+标签（命名空间）：
+- 条目可带标签（如agent:parser、company:<id>、category_tree:<版本>），按标签精确失效
+- 内存后端维护进程内索引，SQLite使用标签表，Redis使用每个标签一个有序集合（无需SCAN）
+- llm_cache_tags_scope为调用链内的LLM调用统一添加标签
+
+过期副本（LLMCache.stale）：
+- 主缓存过期或淘汰后仍保留最近的结果，LLM熔断时返回
+- get_or_compute的stale-while-revalidate：条目过期不超过max_stale秒时立即返回旧值，后台刷新（每个键最多一个刷新任务）
 """
 
 import hashlib
 import json
 import logging
+import time
+import os
+import uuid
+import asyncio
+import zlib
 from abc import ABC, abstractmethod
-from typing import Optional, Dict, Any
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, Iterator, List, Sequence, Set, Tuple
 from datetime import timedelta
 
+import aiosqlite
+
+from .llm_near_duplicate import MinHashLSHIndex
+
 logger = logging.getLogger(__name__)
 
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+# RedisCache压缩值的信封格式：魔数(4字节，含版本号) + 编码(1字节) + 压缩数据
+# 未压缩的值仍按纯UTF-8存储（旧版本写入的条目、低于阈值的小值），读取时按首字节区分
+_ENVELOPE_MAGIC = b"\x00LC1"
+_CODEC_ZLIB = b"z"
+_CODEC_ZSTD = b"s"
+
+# 当前调用链的缓存标签（由Agent、API路由设置，DeepSeekR1Client写入缓存时读取）
+_current_cache_tags: ContextVar[Tuple[str, ...]] = ContextVar("llm_cache_tags", default=())
+
+
+def cache_tag(kind: str, value: Any) -> str:
+    """构建标签字符串
+    
+    常用类型：agent（Agent类型）、prompt（提示词模板及版本）、category_tree（分类树版本）、company（企业ID）
+    
+    Args:
+        kind: 标签类型
+        value: 标签值
+    
+    Returns:
+        "类型:值"格式的标签
+    """
+    return f"{kind}:{value}"
+
+
+@contextmanager
+def llm_cache_tags_scope(*tags: str) -> Iterator[None]:
+    """为当前调用链内写入的LLM缓存条目添加标签（可嵌套，标签累加）
+    
+    用法：
+        with llm_cache_tags_scope(cache_tag("company", company_id)):
+            await client.generate_json(prompt)
+    
+    Args:
+        *tags: 标签
+    """
+    token = _current_cache_tags.set(_current_cache_tags.get() + tuple(t for t in tags if t))
+    try:
+        yield
+    finally:
+        _current_cache_tags.reset(token)
+
+
+def get_current_cache_tags() -> Tuple[str, ...]:
+    """获取当前调用链的缓存标签"""
+    return _current_cache_tags.get()
+
+
+class _TagIndex:
+    """进程内标签索引（内部使用）"""
+    
+    def __init__(self):
+        self._keys_by_tag: Dict[str, Set[str]] = {}
+        self._tags_by_key: Dict[str, Set[str]] = {}
+    
+    def add(self, key: str, tags: Sequence[str]) -> None:
+        for tag in tags:
+            self._keys_by_tag.setdefault(tag, set()).add(key)
+        self._tags_by_key.setdefault(key, set()).update(tags)
+    
+    def discard_key(self, key: str) -> None:
+        for tag in self._tags_by_key.pop(key, ()):
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+    
+    def keys_for(self, tag: str) -> List[str]:
+        return list(self._keys_by_tag.get(tag, ()))
+    
+    @property
+    def key_count(self) -> int:
+        """带标签的键数量"""
+        return len(self._tags_by_key)
+    
+    def clear(self) -> None:
+        self._keys_by_tag.clear()
+        self._tags_by_key.clear()
+    
+    def __len__(self) -> int:
+        return len(self._keys_by_tag)
+
 
 class CacheBackend(ABC):
     """缓存后端抽象基类"""
@@ -38,6 +154,53 @@ class CacheBackend(ABC):
         """
         pass
     
+    async def get_many(self, keys: List[str]) -> Dict[str, str]:
+        """批量获取缓存值（默认逐个获取，远程后端应覆盖为一次往返）
+        
+        Args:
+            keys: 缓存键列表
+        
+        Returns:
+            命中的{键: 值}，未命中的键不包含在内
+        """
+        results = {}
+        for key in keys:
+            value = await self.get(key)
+            if value is not None:
+                results[key] = value
+        return results
+    
+    async def set_many(self, items: Dict[str, str], ttl: Optional[int] = None):
+        """批量设置缓存值（默认逐个设置，远程后端应覆盖为一次往返）
+        
+        Args:
+            items: {键: 值}
+            ttl: 过期时间（秒），None使用后端默认值
+        """
+        for key, value in items.items():
+            await self.set(key, value, ttl)
+    
+    async def add_tags(self, key: str, tags: Sequence[str], ttl: Optional[int] = None):
+        """为已写入的缓存键添加标签（默认不支持标签，忽略）
+        
+        Args:
+            key: 缓存键
+            tags: 标签列表
+            ttl: 条目的过期时间（秒），用于清理标签索引
+        """
+        logger.debug(f"{self.__class__.__name__}不支持缓存标签，已忽略: {list(tags)}")
+    
+    async def invalidate_tag(self, tag: str) -> int:
+        """删除带有该标签的所有缓存条目
+        
+        Args:
+            tag: 标签
+        
+        Returns:
+            删除的条目数
+        """
+        raise NotImplementedError(f"{self.__class__.__name__}不支持按标签失效")
+    
     @abstractmethod
     async def delete(self, key: str):
         """删除缓存"""
@@ -57,6 +220,10 @@ class CacheBackend(ABC):
     async def get_stats(self) -> Dict[str, Any]:
         """获取缓存统计信息"""
         pass
+    
+    async def close(self) -> None:
+        """释放后端持有的资源（默认无操作）"""
+        pass
 
 
 class MemoryCache(CacheBackend):
@@ -71,6 +238,7 @@ class MemoryCache(CacheBackend):
     
     def __init__(self):
         self._cache: Dict[str, str] = {}
+        self._tags = _TagIndex()
         self._hits = 0
         self._misses = 0
         logger.info("内存缓存初始化完成")
@@ -93,14 +261,29 @@ class MemoryCache(CacheBackend):
     
     async def delete(self, key: str):
         """删除缓存"""
+        self._tags.discard_key(key)
         if key in self._cache:
             del self._cache[key]
             logger.debug(f"缓存已删除: {key[:8]}...")
     
+    async def add_tags(self, key: str, tags: Sequence[str], ttl: Optional[int] = None):
+        """为缓存键添加标签"""
+        if key in self._cache:
+            self._tags.add(key, tags)
+    
+    async def invalidate_tag(self, tag: str) -> int:
+        """删除带有该标签的所有缓存条目"""
+        keys = self._tags.keys_for(tag)
+        for key in keys:
+            await self.delete(key)
+        logger.info(f"内存缓存按标签失效: {tag}, {len(keys)}个条目")
+        return len(keys)
+    
     async def clear(self):
         """清空所有缓存"""
         count = len(self._cache)
         self._cache.clear()
+        self._tags.clear()
         self._hits = 0
         self._misses = 0
         logger.info(f"内存缓存已清空: {count}个条目")
@@ -124,6 +307,213 @@ class MemoryCache(CacheBackend):
         }
 
 
+@dataclass
+class _MemoryEntry:
+    """有界内存缓存条目"""
+    value: str
+    size: int
+    expires_at: Optional[float] = None  # time.monotonic()时间点，None表示永不过期
+    
+    def is_expired(self, now: float) -> bool:
+        """判断是否已过期"""
+        return self.expires_at is not None and now >= self.expires_at
+
+
+class LRUMemoryCache(CacheBackend):
+    """有界内存缓存实现
+    
+    特点：
+    - 条目数上限（max_entries）和字节数上限（max_bytes）
+    - 按条目TTL过期（惰性删除，访问或淘汰时清理）
+    - 超出上限时按LRU顺序淘汰
+    - 统计淘汰、过期和拒绝次数
+    - 适合长时间运行的API进程
+    """
+    
+    def __init__(
+        self,
+        max_entries: Optional[int] = 1000,
+        max_bytes: Optional[int] = 64 * 1024 * 1024,
+        default_ttl: Optional[int] = None
+    ):
+        """初始化有界内存缓存
+        
+        Args:
+            max_entries: 最大条目数，None或0表示不限制
+            max_bytes: 最大字节数（键+值的UTF-8长度），None或0表示不限制
+            default_ttl: 默认过期时间（秒），None表示永不过期
+        """
+        self.max_entries = max_entries or None
+        self.max_bytes = max_bytes or None
+        self.default_ttl = default_ttl or None
+        
+        self._cache: "OrderedDict[str, _MemoryEntry]" = OrderedDict()
+        self._tags = _TagIndex()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._rejections = 0
+        logger.info(
+            f"有界内存缓存初始化完成: max_entries={self.max_entries}, "
+            f"max_bytes={self.max_bytes}, default_ttl={self.default_ttl}"
+        )
+    
+    @staticmethod
+    def _entry_size(key: str, value: str) -> int:
+        """计算条目占用的字节数"""
+        return len(key.encode('utf-8')) + len(value.encode('utf-8'))
+    
+    def _remove(self, key: str, keep_tags: bool = False) -> Optional[_MemoryEntry]:
+        """移除条目并更新字节计数（内部方法）
+        
+        Args:
+            key: 缓存键
+            keep_tags: 是否保留标签（覆盖写入时保留）
+        """
+        entry = self._cache.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+        if not keep_tags:
+            self._tags.discard_key(key)
+        return entry
+    
+    def _get_live_entry(self, key: str) -> Optional[_MemoryEntry]:
+        """获取未过期的条目，过期条目会被删除（内部方法）"""
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        if entry.is_expired(time.monotonic()):
+            self._remove(key)
+            self._expirations += 1
+            logger.debug(f"缓存已过期: {key[:8]}...")
+            return None
+        return entry
+    
+    def _purge_expired(self) -> None:
+        """清理所有已过期条目（内部方法）"""
+        now = time.monotonic()
+        expired = [k for k, e in self._cache.items() if e.is_expired(now)]
+        for key in expired:
+            self._remove(key)
+        self._expirations += len(expired)
+    
+    def _evict_if_needed(self) -> None:
+        """超出上限时按LRU顺序淘汰（内部方法）"""
+        if not self._over_budget():
+            return
+        
+        # 优先清理已过期条目，避免淘汰仍然有效的数据
+        self._purge_expired()
+        
+        while self._cache and self._over_budget():
+            key, entry = self._cache.popitem(last=False)
+            self._bytes -= entry.size
+            self._tags.discard_key(key)
+            self._evictions += 1
+            logger.debug(f"缓存已淘汰(LRU): {key[:8]}...")
+    
+    def _over_budget(self) -> bool:
+        """是否超出条目数或字节数上限（内部方法）"""
+        if self.max_entries is not None and len(self._cache) > self.max_entries:
+            return True
+        if self.max_bytes is not None and self._bytes > self.max_bytes:
+            return True
+        return False
+    
+    async def get(self, key: str) -> Optional[str]:
+        """获取缓存值"""
+        entry = self._get_live_entry(key)
+        if entry is not None:
+            self._cache.move_to_end(key)
+            self._hits += 1
+            logger.debug(f"缓存命中: {key[:8]}...")
+            return entry.value
+        
+        self._misses += 1
+        logger.debug(f"缓存未命中: {key[:8]}...")
+        return None
+    
+    async def set(self, key: str, value: str, ttl: Optional[int] = None):
+        """设置缓存值"""
+        size = self._entry_size(key, value)
+        
+        # 单个条目超过字节上限时直接拒绝，避免清空整个缓存
+        if self.max_bytes is not None and size > self.max_bytes:
+            self._rejections += 1
+            logger.warning(f"缓存条目过大，拒绝保存: {key[:8]}... (size={size})")
+            return
+        
+        ttl = ttl or self.default_ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        
+        self._remove(key, keep_tags=True)
+        self._cache[key] = _MemoryEntry(value=value, size=size, expires_at=expires_at)
+        self._bytes += size
+        self._evict_if_needed()
+        logger.debug(f"缓存已保存: {key[:8]}... (ttl={ttl}, size={size})")
+    
+    async def delete(self, key: str):
+        """删除缓存"""
+        if self._remove(key) is not None:
+            logger.debug(f"缓存已删除: {key[:8]}...")
+    
+    async def add_tags(self, key: str, tags: Sequence[str], ttl: Optional[int] = None):
+        """为缓存键添加标签（条目淘汰或过期时同时移出索引）"""
+        if key in self._cache:
+            self._tags.add(key, tags)
+    
+    async def invalidate_tag(self, tag: str) -> int:
+        """删除带有该标签的所有缓存条目"""
+        count = 0
+        for key in self._tags.keys_for(tag):
+            if self._remove(key) is not None:
+                count += 1
+        logger.info(f"有界内存缓存按标签失效: {tag}, {count}个条目")
+        return count
+    
+    async def clear(self):
+        """清空所有缓存"""
+        count = len(self._cache)
+        self._cache.clear()
+        self._tags.clear()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._rejections = 0
+        logger.info(f"有界内存缓存已清空: {count}个条目")
+    
+    async def exists(self, key: str) -> bool:
+        """检查键是否存在（已过期视为不存在）"""
+        return self._get_live_entry(key) is not None
+    
+    async def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        total = self._hits + self._misses
+        hit_rate = (self._hits / total * 100) if total > 0 else 0
+        
+        return {
+            "backend": "lru_memory",
+            "size": len(self._cache),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "default_ttl": self.default_ttl,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": f"{hit_rate:.2f}%",
+            "evictions": self._evictions,
+            "expirations": self._expirations,
+            "rejections": self._rejections,
+            "tags": len(self._tags),
+            "tagged_keys": self._tags.key_count,
+            "keys_sample": list(self._cache.keys())[-10:]
+        }
+
+
 class RedisCache(CacheBackend):
     """Redis缓存实现
     
@@ -131,14 +521,22 @@ class RedisCache(CacheBackend):
     - 持久化存储
     - 支持TTL自动过期
     - 支持分布式部署
+    - 超过阈值的值透明压缩（zstd，未安装zstandard时使用zlib），旧的未压缩条目仍可读取
+    - 标签：每个标签一个有序集合（成员为键，分数为过期时间），按标签失效无需SCAN
     - 适合生产环境
+    
+    压缩后的值是二进制数据，Redis客户端需使用decode_responses=False（redis-py默认值）
     """
     
     def __init__(
         self,
         redis_client,
         key_prefix: str = "llm_cache:",
-        default_ttl: int = 3600  # 默认1小时
+        default_ttl: int = 3600,  # 默认1小时
+        compression: Optional[str] = "auto",
+        compression_threshold: int = 1024,
+        compression_level: Optional[int] = None,
+        close_client: bool = False
     ):
         """初始化Redis缓存
         
@@ -146,16 +544,104 @@ class RedisCache(CacheBackend):
             redis_client: Redis客户端实例
             key_prefix: 键前缀，用于命名空间隔离
             default_ttl: 默认过期时间（秒）
+            compression: 压缩算法：auto（优先zstd）/ zstd / zlib / None（不压缩）
+            compression_threshold: 超过该字节数（UTF-8）的值才压缩
+            compression_level: 压缩级别，None使用算法默认值（zstd 3，zlib 6）
+            close_client: close()时是否关闭Redis客户端（客户端由缓存独占时设为True）
         """
         self.redis = redis_client
         self.key_prefix = key_prefix
         self.default_ttl = default_ttl
-        logger.info(f"Redis缓存初始化完成: prefix={key_prefix}, ttl={default_ttl}s")
+        self.close_client = close_client
+        
+        if compression == "auto":
+            compression = "zstd" if ZSTD_AVAILABLE else "zlib"
+        elif compression == "zstd" and not ZSTD_AVAILABLE:
+            logger.warning("未安装zstandard，Redis缓存压缩回退到zlib（pip install zstandard）")
+            compression = "zlib"
+        elif compression not in (None, "zlib", "zstd"):
+            raise ValueError(f"不支持的压缩算法: {compression}")
+        
+        connection_kwargs = getattr(getattr(redis_client, "connection_pool", None), "connection_kwargs", {})
+        if compression is not None and connection_kwargs.get("decode_responses"):
+            # 客户端会把返回值解码为str，二进制的压缩值无法读取
+            logger.warning("Redis客户端启用了decode_responses，缓存压缩已关闭")
+            compression = None
+        self.compression = compression
+        self.compression_threshold = compression_threshold
+        self.compression_level = compression_level
+        
+        self._compression_stats = {
+            "compressed_writes": 0,
+            "uncompressed_writes": 0,
+            "original_bytes": 0,
+            "stored_bytes": 0,
+            "decode_errors": 0
+        }
+        logger.info(
+            f"Redis缓存初始化完成: prefix={key_prefix}, ttl={default_ttl}s, "
+            f"compression={compression}, threshold={compression_threshold}"
+        )
+    
+    async def close(self) -> None:
+        """关闭独占的Redis客户端（close_client为False时不关闭）"""
+        if self.close_client:
+            await self.redis.aclose()
     
     def _make_key(self, key: str) -> str:
         """生成带前缀的完整键"""
         return f"{self.key_prefix}{key}"
     
+    def _make_tag_key(self, tag: str) -> str:
+        """生成标签集合的键"""
+        return f"{self.key_prefix}tag:{tag}"
+    
+    def _encode(self, value: str) -> Any:
+        """编码缓存值：超过阈值时压缩并加信封，否则保持纯UTF-8（内部方法）"""
+        raw = value.encode('utf-8')
+        if self.compression is None or len(raw) < self.compression_threshold:
+            self._compression_stats["uncompressed_writes"] += 1
+            return value
+        
+        if self.compression == "zstd":
+            level = self.compression_level if self.compression_level is not None else 3
+            data = _ENVELOPE_MAGIC + _CODEC_ZSTD + zstandard.ZstdCompressor(level=level).compress(raw)
+        else:
+            level = self.compression_level if self.compression_level is not None else 6
+            data = _ENVELOPE_MAGIC + _CODEC_ZLIB + zlib.compress(raw, level)
+        
+        # 压缩无收益（如已压缩的数据）时按原值存储
+        if len(data) >= len(raw):
+            self._compression_stats["uncompressed_writes"] += 1
+            return value
+        
+        self._compression_stats["compressed_writes"] += 1
+        self._compression_stats["original_bytes"] += len(raw)
+        self._compression_stats["stored_bytes"] += len(data)
+        return data
+    
+    def _decode(self, value: Any) -> Optional[str]:
+        """解码缓存值，兼容旧的纯文本条目（内部方法）"""
+        if isinstance(value, str):
+            return value
+        if not value.startswith(_ENVELOPE_MAGIC):
+            return value.decode('utf-8')
+        
+        header = len(_ENVELOPE_MAGIC)
+        codec, payload = value[header:header + 1], value[header + 1:]
+        try:
+            if codec == _CODEC_ZLIB:
+                return zlib.decompress(payload).decode('utf-8')
+            if codec == _CODEC_ZSTD:
+                if not ZSTD_AVAILABLE:
+                    raise ValueError("条目使用zstd压缩，但未安装zstandard")
+                return zstandard.ZstdDecompressor().decompress(payload).decode('utf-8')
+            raise ValueError(f"未知的压缩编码: {codec!r}")
+        except Exception as e:
+            self._compression_stats["decode_errors"] += 1
+            logger.error(f"Redis缓存值解码失败: {e}")
+            return None
+    
     async def get(self, key: str) -> Optional[str]:
         """获取缓存值"""
         full_key = self._make_key(key)
@@ -163,7 +649,7 @@ class RedisCache(CacheBackend):
             value = await self.redis.get(full_key)
             if value:
                 logger.debug(f"Redis缓存命中: {key[:8]}...")
-                return value.decode('utf-8') if isinstance(value, bytes) else value
+                return self._decode(value)
             else:
                 logger.debug(f"Redis缓存未命中: {key[:8]}...")
                 return None
@@ -177,11 +663,91 @@ class RedisCache(CacheBackend):
         ttl = ttl or self.default_ttl
         
         try:
-            await self.redis.set(full_key, value, ex=ttl)
-            logger.debug(f"Redis缓存已保存: {key[:8]}... (ttl={ttl}s, size={len(value)})")
+            data = self._encode(value)
+            await self.redis.set(full_key, data, ex=ttl)
+            logger.debug(f"Redis缓存已保存: {key[:8]}... (ttl={ttl}s, size={len(value)}, stored={len(data)})")
         except Exception as e:
             logger.error(f"Redis保存失败: {e}")
     
+    async def get_many(self, keys: List[str]) -> Dict[str, str]:
+        """批量获取缓存值（一次MGET）"""
+        if not keys:
+            return {}
+        try:
+            values = await self.redis.mget([self._make_key(key) for key in keys])
+        except Exception as e:
+            logger.error(f"Redis批量获取失败: {e}")
+            return {}
+        
+        results = {}
+        for key, value in zip(keys, values):
+            if value:
+                decoded = self._decode(value)
+                if decoded is not None:
+                    results[key] = decoded
+        logger.debug(f"Redis批量获取: {len(results)}/{len(keys)}命中")
+        return results
+    
+    async def set_many(self, items: Dict[str, str], ttl: Optional[int] = None):
+        """批量设置缓存值（一次pipeline往返）"""
+        if not items:
+            return
+        ttl = ttl or self.default_ttl
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for key, value in items.items():
+                pipe.set(self._make_key(key), self._encode(value), ex=ttl)
+            await pipe.execute()
+            logger.debug(f"Redis批量保存: {len(items)}个条目 (ttl={ttl}s)")
+        except Exception as e:
+            logger.error(f"Redis批量保存失败: {e}")
+    
+    async def add_tags(self, key: str, tags: Sequence[str], ttl: Optional[int] = None):
+        """为缓存键添加标签（同时清理标签集合中已过期的成员）"""
+        if not tags:
+            return
+        now = time.time()
+        expires_at = now + (ttl or self.default_ttl)
+        full_key = self._make_key(key)
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for tag in tags:
+                tag_key = self._make_tag_key(tag)
+                pipe.zadd(tag_key, {full_key: expires_at})
+                pipe.zremrangebyscore(tag_key, "-inf", now)
+            await pipe.execute()
+        except Exception as e:
+            logger.error(f"Redis标签保存失败: {e}")
+    
+    async def pop_tag(self, tag: str) -> List[str]:
+        """删除带有该标签的所有缓存条目和标签集合
+        
+        Returns:
+            被删除的缓存键（不含前缀）
+        """
+        tag_key = self._make_tag_key(tag)
+        members = await self.redis.zrange(tag_key, 0, -1)
+        full_keys = [m.decode('utf-8') if isinstance(m, bytes) else m for m in members]
+        
+        pipe = self.redis.pipeline(transaction=False)
+        for start in range(0, len(full_keys), 500):
+            pipe.delete(*full_keys[start:start + 500])
+        pipe.delete(tag_key)
+        await pipe.execute()
+        
+        prefix_length = len(self.key_prefix)
+        return [full_key[prefix_length:] for full_key in full_keys]
+    
+    async def invalidate_tag(self, tag: str) -> int:
+        """删除带有该标签的所有缓存条目"""
+        try:
+            keys = await self.pop_tag(tag)
+        except Exception as e:
+            logger.error(f"Redis按标签失效失败: {e}")
+            return 0
+        logger.info(f"Redis缓存按标签失效: {tag}, {len(keys)}个条目")
+        return len(keys)
+    
     async def delete(self, key: str):
         """删除缓存"""
         full_key = self._make_key(key)
@@ -224,15 +790,20 @@ class RedisCache(CacheBackend):
         try:
             # 统计带前缀的键数量
             pattern = f"{self.key_prefix}*"
+            tag_prefix = self._make_tag_key("")
             cursor = 0
             count = 0
+            tag_count = 0
             sample_keys = []
             
             while True:
                 cursor, keys = await self.redis.scan(cursor, match=pattern, count=100)
-                count += len(keys)
+                keys = [k.decode('utf-8') if isinstance(k, bytes) else k for k in keys]
+                tags = sum(1 for k in keys if k.startswith(tag_prefix))
+                tag_count += tags
+                count += len(keys) - tags
                 if len(sample_keys) < 10:
-                    sample_keys.extend([k.decode('utf-8') if isinstance(k, bytes) else k for k in keys[:10]])
+                    sample_keys.extend(keys[:10])
                 if cursor == 0:
                     break
             
@@ -242,9 +813,11 @@ class RedisCache(CacheBackend):
             return {
                 "backend": "redis",
                 "size": count,
+                "tags": tag_count,
                 "redis_version": info.get("redis_version", "unknown"),
                 "used_memory": info.get("used_memory_human", "unknown"),
-                "keys_sample": sample_keys[:10]
+                "keys_sample": sample_keys[:10],
+                "compression": self.get_compression_stats()
             }
         except Exception as e:
             logger.error(f"Redis统计失败: {e}")
@@ -254,20 +827,792 @@ class RedisCache(CacheBackend):
             }
 
 
+    def get_compression_stats(self) -> Dict[str, Any]:
+        """获取压缩统计（本进程写入的值：压缩比、节省的字节数）"""
+        stats = self._compression_stats
+        original = stats["original_bytes"]
+        return {
+            "algorithm": self.compression,
+            "threshold": self.compression_threshold,
+            **stats,
+            "compression_ratio": f"{stats['stored_bytes'] / original:.2%}" if original else "0.00%",
+            "bytes_saved": original - stats["stored_bytes"]
+        }
+
+
+class TieredCache(CacheBackend):
+    """两级缓存实现（L1进程内 + L2 Redis）
+    
+    特点：
+    - 读取时先查L1，未命中再查L2，L2命中后提升到L1
+    - 写入时同时写L1和L2
+    - delete/clear通过Redis pub/sub广播，使其他进程的L1同步失效
+    - 分别统计L1、L2命中率
+    """
+    
+    def __init__(
+        self,
+        l1: "LRUMemoryCache",
+        l2: "RedisCache",
+        l1_ttl: Optional[int] = 300,
+        invalidation_channel: Optional[str] = None
+    ):
+        """初始化两级缓存
+        
+        Args:
+            l1: 进程内有界缓存
+            l2: Redis缓存
+            l1_ttl: 写入/提升到L1的过期时间（秒），限制跨进程数据陈旧时间
+            invalidation_channel: 失效广播通道，默认为"{key_prefix}invalidate"
+        """
+        self.l1 = l1
+        self.l2 = l2
+        self.l1_ttl = l1_ttl
+        self.invalidation_channel = invalidation_channel or f"{l2.key_prefix}invalidate"
+        
+        # 实例标识，用于忽略自己发出的失效广播
+        self.instance_id = uuid.uuid4().hex
+        
+        self._l1_hits = 0
+        self._l2_hits = 0
+        self._misses = 0
+        self._promotions = 0
+        self._invalidations_sent = 0
+        self._invalidations_received = 0
+        
+        self._listener_task: Optional[asyncio.Task] = None
+        logger.info(f"两级缓存初始化完成: channel={self.invalidation_channel}, l1_ttl={l1_ttl}")
+    
+    # ==================== 失效广播 ====================
+    
+    def _ensure_listener(self) -> None:
+        """确保失效监听任务已启动（内部方法）
+        
+        监听异常退出后不会自动重启，此时L1的陈旧时间仍受l1_ttl限制
+        """
+        if self._listener_task is None:
+            try:
+                self._listener_task = asyncio.get_running_loop().create_task(
+                    self._listen_for_invalidations()
+                )
+            except RuntimeError:
+                # 没有运行中的事件循环，稍后再启动
+                self._listener_task = None
+    
+    async def _listen_for_invalidations(self) -> None:
+        """监听其他进程发出的失效广播（内部方法）"""
+        pubsub = None
+        try:
+            pubsub = self.l2.redis.pubsub()
+            await pubsub.subscribe(self.invalidation_channel)
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                await self._apply_invalidation(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"两级缓存失效监听异常: {e}")
+        finally:
+            if pubsub is not None:
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
+    
+    async def _apply_invalidation(self, data) -> None:
+        """应用失效广播到L1（内部方法）
+        
+        Args:
+            data: 广播内容（JSON字符串或字节）
+        """
+        try:
+            if isinstance(data, bytes):
+                data = data.decode('utf-8')
+            event = json.loads(data)
+        except (ValueError, UnicodeDecodeError) as e:
+            logger.warning(f"无法解析失效广播: {e}")
+            return
+        
+        if event.get("origin") == self.instance_id:
+            return
+        
+        self._invalidations_received += 1
+        if event.get("op") == "clear":
+            await self.l1.clear()
+        elif event.get("op") == "delete" and event.get("key"):
+            await self.l1.delete(event["key"])
+        elif event.get("op") == "delete_many":
+            for key in event.get("keys") or []:
+                await self.l1.delete(key)
+    
+    async def _publish_invalidation(
+        self,
+        op: str,
+        key: Optional[str] = None,
+        keys: Optional[List[str]] = None
+    ) -> None:
+        """广播失效事件（内部方法）"""
+        event = json.dumps({"op": op, "key": key, "keys": keys, "origin": self.instance_id})
+        try:
+            await self.l2.redis.publish(self.invalidation_channel, event)
+            self._invalidations_sent += 1
+        except Exception as e:
+            logger.error(f"失效广播发送失败: {e}")
+    
+    async def close(self) -> None:
+        """停止失效监听任务并关闭L2"""
+        if self._listener_task:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+        await self.l2.close()
+    
+    # ==================== CacheBackend接口 ====================
+    
+    async def get(self, key: str) -> Optional[str]:
+        """获取缓存值（L1 -> L2，L2命中后提升到L1）"""
+        self._ensure_listener()
+        
+        value = await self.l1.get(key)
+        if value is not None:
+            self._l1_hits += 1
+            return value
+        
+        value = await self.l2.get(key)
+        if value is not None:
+            self._l2_hits += 1
+            await self.l1.set(key, value, self.l1_ttl)
+            self._promotions += 1
+            return value
+        
+        self._misses += 1
+        return None
+    
+    async def set(self, key: str, value: str, ttl: Optional[int] = None):
+        """设置缓存值（同时写入L1和L2）"""
+        self._ensure_listener()
+        # L1过期时间不超过条目本身的TTL
+        l1_ttl = self.l1_ttl
+        if ttl and (not l1_ttl or ttl < l1_ttl):
+            l1_ttl = ttl
+        await self.l1.set(key, value, l1_ttl)
+        await self.l2.set(key, value, ttl)
+    
+    async def get_many(self, keys: List[str]) -> Dict[str, str]:
+        """批量获取缓存值（L1未命中的键通过一次L2批量读取，命中后提升到L1）"""
+        self._ensure_listener()
+        
+        results = {}
+        l1_misses = []
+        for key in keys:
+            value = await self.l1.get(key)
+            if value is not None:
+                self._l1_hits += 1
+                results[key] = value
+            else:
+                l1_misses.append(key)
+        
+        if l1_misses:
+            l2_results = await self.l2.get_many(l1_misses)
+            for key, value in l2_results.items():
+                self._l2_hits += 1
+                await self.l1.set(key, value, self.l1_ttl)
+                self._promotions += 1
+            self._misses += len(l1_misses) - len(l2_results)
+            results.update(l2_results)
+        return results
+    
+    async def set_many(self, items: Dict[str, str], ttl: Optional[int] = None):
+        """批量设置缓存值（同时写入L1和L2，L2一次pipeline往返）"""
+        self._ensure_listener()
+        l1_ttl = self.l1_ttl
+        if ttl and (not l1_ttl or ttl < l1_ttl):
+            l1_ttl = ttl
+        for key, value in items.items():
+            await self.l1.set(key, value, l1_ttl)
+        await self.l2.set_many(items, ttl)
+    
+    async def delete(self, key: str):
+        """删除缓存并广播失效"""
+        self._ensure_listener()
+        await self.l1.delete(key)
+        await self.l2.delete(key)
+        await self._publish_invalidation("delete", key)
+    
+    async def add_tags(self, key: str, tags: Sequence[str], ttl: Optional[int] = None):
+        """为缓存键添加标签（记录在L2）"""
+        await self.l2.add_tags(key, tags, ttl)
+    
+    async def invalidate_tag(self, tag: str) -> int:
+        """按L2的标签集合删除条目，并广播使所有进程的L1失效"""
+        self._ensure_listener()
+        try:
+            keys = await self.l2.pop_tag(tag)
+        except Exception as e:
+            logger.error(f"两级缓存按标签失效失败: {e}")
+            return 0
+        for key in keys:
+            await self.l1.delete(key)
+        if keys:
+            await self._publish_invalidation("delete_many", keys=keys)
+        logger.info(f"两级缓存按标签失效: {tag}, {len(keys)}个条目")
+        return len(keys)
+    
+    async def clear(self):
+        """清空所有缓存并广播失效"""
+        self._ensure_listener()
+        await self.l1.clear()
+        await self.l2.clear()
+        self._l1_hits = 0
+        self._l2_hits = 0
+        self._misses = 0
+        self._promotions = 0
+        await self._publish_invalidation("clear")
+    
+    async def exists(self, key: str) -> bool:
+        """检查键是否存在"""
+        if await self.l1.exists(key):
+            return True
+        return await self.l2.exists(key)
+    
+    async def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息（含分层命中率）"""
+        total = self._l1_hits + self._l2_hits + self._misses
+        l2_lookups = self._l2_hits + self._misses
+        
+        def _rate(hits: int, lookups: int) -> str:
+            return f"{(hits / lookups * 100) if lookups > 0 else 0:.2f}%"
+        
+        return {
+            "backend": "tiered",
+            "hits": self._l1_hits + self._l2_hits,
+            "misses": self._misses,
+            "hit_rate": _rate(self._l1_hits + self._l2_hits, total),
+            "l1_hits": self._l1_hits,
+            "l2_hits": self._l2_hits,
+            "l1_hit_rate": _rate(self._l1_hits, total),
+            "l2_hit_rate": _rate(self._l2_hits, l2_lookups),
+            "promotions": self._promotions,
+            "invalidations_sent": self._invalidations_sent,
+            "invalidations_received": self._invalidations_received,
+            "l1": await self.l1.get_stats(),
+            "l2": await self.l2.get_stats()
+        }
+
+
+class SQLiteCache(CacheBackend):
+    """SQLite磁盘缓存实现
+    
+    特点：
+    - WAL模式持久化，进程重启/容器重新部署后缓存仍然有效
+    - 支持TTL（按绝对时间戳过期，跨重启有效）
+    - 条目数/字节数上限，超出时按最近访问时间淘汰（条目数和字节数在内存中累计，写入时不扫描全表）
+    - 命中时的访问时间批量写回，读路径不产生WAL写入
+    - 定期压缩（清理过期条目并回收WAL空间）
+    - 支持导出/导入（JSON Lines），用于在环境间迁移缓存
+    - 标签表（llm_cache_tags），按标签失效
+    - 不依赖Redis
+    """
+    
+    def __init__(
+        self,
+        db_path: str = "./data/llm_cache.db",
+        max_entries: Optional[int] = 100000,
+        max_bytes: Optional[int] = 1024 * 1024 * 1024,
+        default_ttl: Optional[int] = None,
+        compact_interval: int = 1000,
+        access_flush_interval: float = 5.0,
+        access_flush_size: int = 1000
+    ):
+        """初始化SQLite磁盘缓存
+        
+        Args:
+            db_path: 数据库文件路径
+            max_entries: 最大条目数，None或0表示不限制
+            max_bytes: 最大字节数（键+值的UTF-8长度），None或0表示不限制
+            default_ttl: 默认过期时间（秒），None表示永不过期
+            compact_interval: 每写入多少次执行一次自动压缩，0表示不自动压缩
+            access_flush_interval: 命中时的访问时间最多缓冲多久（秒）后批量写回
+            access_flush_size: 缓冲的访问时间达到多少条时立即写回
+        
+        条目数和字节数在打开时统计一次，之后随写入、删除、淘汰增减；
+        多个进程共享同一数据库文件时各自的计数可能偏离，compact时重新统计
+        """
+        self.db_path = db_path
+        self.max_entries = max_entries or None
+        self.max_bytes = max_bytes or None
+        self.default_ttl = default_ttl or None
+        self.compact_interval = compact_interval
+        self.access_flush_interval = access_flush_interval
+        self.access_flush_size = max(1, access_flush_size)
+        
+        self._db = None
+        self._init_lock = asyncio.Lock()
+        self._count = 0
+        self._bytes = 0
+        self._pending_access: Dict[str, float] = {}
+        self._last_access_flush = time.monotonic()
+        self._writes_since_compact = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        logger.info(
+            f"SQLite缓存初始化: path={db_path}, max_entries={self.max_entries}, "
+            f"max_bytes={self.max_bytes}, default_ttl={self.default_ttl}"
+        )
+    
+    async def _get_db(self):
+        """获取数据库连接，首次调用时建表（内部方法）"""
+        if self._db is not None:
+            return self._db
+        
+        async with self._init_lock:
+            if self._db is None:
+                directory = os.path.dirname(os.path.abspath(self.db_path))
+                os.makedirs(directory, exist_ok=True)
+                
+                db = await aiosqlite.connect(self.db_path)
+                await db.execute("PRAGMA journal_mode=WAL")
+                await db.execute("PRAGMA synchronous=NORMAL")
+                await db.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS llm_cache (
+                        key TEXT PRIMARY KEY,
+                        value TEXT NOT NULL,
+                        size INTEGER NOT NULL,
+                        created_at REAL NOT NULL,
+                        accessed_at REAL NOT NULL,
+                        expires_at REAL
+                    )
+                    """
+                )
+                await db.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache(accessed_at)"
+                )
+                await db.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_llm_cache_expires ON llm_cache(expires_at)"
+                )
+                await db.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS llm_cache_tags (
+                        tag TEXT NOT NULL,
+                        key TEXT NOT NULL,
+                        PRIMARY KEY (tag, key)
+                    )
+                    """
+                )
+                await db.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_llm_cache_tags_key ON llm_cache_tags(key)"
+                )
+                await db.commit()
+                await self._load_totals(db)
+                self._db = db
+        
+        return self._db
+    
+    async def _load_totals(self, db) -> None:
+        """从数据库统计条目数和字节数（内部方法，仅在打开、导入和压缩时调用）"""
+        async with db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache") as cursor:
+            self._count, self._bytes = await cursor.fetchone()
+    
+    async def _flush_access(self, db) -> None:
+        """把缓冲的访问时间写回数据库（内部方法，调用方负责提交）"""
+        self._last_access_flush = time.monotonic()
+        if not self._pending_access:
+            return
+        pending = [(accessed_at, key) for key, accessed_at in self._pending_access.items()]
+        self._pending_access.clear()
+        await db.executemany("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", pending)
+    
+    async def close(self) -> None:
+        """关闭数据库连接（先写回缓冲的访问时间）"""
+        if self._db is not None:
+            await self._flush_access(self._db)
+            await self._db.commit()
+            await self._db.close()
+            self._db = None
+    
+    async def get(self, key: str) -> Optional[str]:
+        """获取缓存值"""
+        db = await self._get_db()
+        now = time.time()
+        
+        async with db.execute(
+            "SELECT value, size, expires_at FROM llm_cache WHERE key = ?", (key,)
+        ) as cursor:
+            row = await cursor.fetchone()
+        
+        if row is None:
+            self._misses += 1
+            logger.debug(f"磁盘缓存未命中: {key[:8]}...")
+            return None
+        
+        value, size, expires_at = row
+        if expires_at is not None and now >= expires_at:
+            await db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            await db.execute("DELETE FROM llm_cache_tags WHERE key = ?", (key,))
+            await db.commit()
+            self._pending_access.pop(key, None)
+            self._count -= 1
+            self._bytes -= size
+            self._expirations += 1
+            self._misses += 1
+            logger.debug(f"磁盘缓存已过期: {key[:8]}...")
+            return None
+        
+        # 访问时间先缓冲，按数量或时间批量写回
+        self._pending_access[key] = now
+        if (
+            len(self._pending_access) >= self.access_flush_size
+            or time.monotonic() - self._last_access_flush >= self.access_flush_interval
+        ):
+            await self._flush_access(db)
+            await db.commit()
+        self._hits += 1
+        logger.debug(f"磁盘缓存命中: {key[:8]}...")
+        return value
+    
+    async def set(self, key: str, value: str, ttl: Optional[int] = None):
+        """设置缓存值"""
+        size = len(key.encode('utf-8')) + len(value.encode('utf-8'))
+        if self.max_bytes is not None and size > self.max_bytes:
+            logger.warning(f"磁盘缓存条目过大，拒绝保存: {key[:8]}... (size={size})")
+            return
+        
+        ttl = ttl or self.default_ttl
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        
+        db = await self._get_db()
+        async with db.execute("SELECT size FROM llm_cache WHERE key = ?", (key,)) as cursor:
+            existing = await cursor.fetchone()
+        await db.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, value, size, created_at, accessed_at, expires_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, value, size, now, now, expires_at)
+        )
+        self._pending_access.pop(key, None)
+        if existing is None:
+            self._count += 1
+            self._bytes += size
+        else:
+            self._bytes += size - existing[0]
+        await self._enforce_limits(db)
+        await db.commit()
+        logger.debug(f"磁盘缓存已保存: {key[:8]}... (ttl={ttl}, size={size})")
+        
+        self._writes_since_compact += 1
+        if self.compact_interval and self._writes_since_compact >= self.compact_interval:
+            await self.compact()
+    
+    async def _enforce_limits(self, db) -> None:
+        """超出上限时按最近访问时间淘汰（内部方法，调用方负责提交）"""
+        over_entries = self._count - self.max_entries if self.max_entries is not None else 0
+        over_bytes = self._bytes - self.max_bytes if self.max_bytes is not None else 0
+        if over_entries <= 0 and over_bytes <= 0:
+            return
+        
+        # 淘汰前写回缓冲的访问时间，保证按最近访问排序
+        await self._flush_access(db)
+        
+        # 优先清理已过期条目（连同标签）
+        now = time.time()
+        async with db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache "
+            "WHERE expires_at IS NOT NULL AND expires_at <= ?",
+            (now,)
+        ) as cursor:
+            expired_count, expired_bytes = await cursor.fetchone()
+        if expired_count:
+            await db.execute(
+                "DELETE FROM llm_cache_tags WHERE key IN "
+                "(SELECT key FROM llm_cache WHERE expires_at IS NOT NULL AND expires_at <= ?)",
+                (now,)
+            )
+            await db.execute(
+                "DELETE FROM llm_cache WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                (now,)
+            )
+            self._count -= expired_count
+            self._bytes -= expired_bytes
+            self._expirations += expired_count
+        
+        count, total_bytes = self._count, self._bytes
+        victims = []
+        async with db.execute(
+            "SELECT key, size FROM llm_cache ORDER BY accessed_at ASC"
+        ) as cursor:
+            async for victim_key, victim_size in cursor:
+                over_count = self.max_entries is not None and count > self.max_entries
+                over_size = self.max_bytes is not None and total_bytes > self.max_bytes
+                if not (over_count or over_size):
+                    break
+                victims.append((victim_key,))
+                count -= 1
+                total_bytes -= victim_size
+        
+        if victims:
+            await db.executemany("DELETE FROM llm_cache WHERE key = ?", victims)
+            await db.executemany("DELETE FROM llm_cache_tags WHERE key = ?", victims)
+            self._count, self._bytes = count, total_bytes
+            self._evictions += len(victims)
+            logger.debug(f"磁盘缓存已淘汰: {len(victims)}个条目")
+    
+    async def compact(self) -> Dict[str, int]:
+        """压缩缓存：清理过期条目、执行上限并回收WAL空间
+        
+        Returns:
+            压缩结果（清理的过期条目数、淘汰的条目数）
+        """
+        db = await self._get_db()
+        evictions_before = self._evictions
+        await self._flush_access(db)
+        
+        cursor = await db.execute(
+            "DELETE FROM llm_cache WHERE expires_at IS NOT NULL AND expires_at <= ?",
+            (time.time(),)
+        )
+        expired = max(cursor.rowcount, 0)
+        self._expirations += expired
+        
+        # 重新统计条目数和字节数（修正其他进程写入造成的偏差）
+        await self._load_totals(db)
+        await self._enforce_limits(db)
+        # 清理已删除条目的标签
+        await db.execute("DELETE FROM llm_cache_tags WHERE key NOT IN (SELECT key FROM llm_cache)")
+        await db.commit()
+        await db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self._writes_since_compact = 0
+        
+        result = {"expired": expired, "evicted": self._evictions - evictions_before}
+        logger.info(f"磁盘缓存压缩完成: {result}")
+        return result
+    
+    async def vacuum(self) -> None:
+        """重建数据库文件以回收空间（较慢，适合离线执行）"""
+        db = await self._get_db()
+        await db.commit()
+        await db.execute("VACUUM")
+    
+    async def delete(self, key: str):
+        """删除缓存"""
+        db = await self._get_db()
+        async with db.execute("SELECT size FROM llm_cache WHERE key = ?", (key,)) as cursor:
+            existing = await cursor.fetchone()
+        await db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+        await db.execute("DELETE FROM llm_cache_tags WHERE key = ?", (key,))
+        await db.commit()
+        self._pending_access.pop(key, None)
+        if existing is not None:
+            self._count -= 1
+            self._bytes -= existing[0]
+        logger.debug(f"磁盘缓存已删除: {key[:8]}...")
+    
+    async def add_tags(self, key: str, tags: Sequence[str], ttl: Optional[int] = None):
+        """为缓存键添加标签"""
+        if not tags:
+            return
+        db = await self._get_db()
+        await db.executemany(
+            "INSERT OR IGNORE INTO llm_cache_tags (tag, key) VALUES (?, ?)",
+            [(tag, key) for tag in tags]
+        )
+        await db.commit()
+    
+    async def invalidate_tag(self, tag: str) -> int:
+        """删除带有该标签的所有缓存条目"""
+        db = await self._get_db()
+        async with db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM llm_cache "
+            "WHERE key IN (SELECT key FROM llm_cache_tags WHERE tag = ?)", (tag,)
+        ) as cursor:
+            (removed_bytes,) = await cursor.fetchone()
+        cursor = await db.execute(
+            "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache_tags WHERE tag = ?)", (tag,)
+        )
+        count = max(cursor.rowcount, 0)
+        self._count -= count
+        self._bytes -= removed_bytes
+        await db.execute(
+            "DELETE FROM llm_cache_tags WHERE key IN (SELECT key FROM llm_cache_tags WHERE tag = ?)", (tag,)
+        )
+        await db.commit()
+        logger.info(f"磁盘缓存按标签失效: {tag}, {count}个条目")
+        return count
+    
+    async def clear(self):
+        """清空所有缓存"""
+        db = await self._get_db()
+        cursor = await db.execute("DELETE FROM llm_cache")
+        await db.execute("DELETE FROM llm_cache_tags")
+        await db.commit()
+        self._pending_access.clear()
+        self._count = 0
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        logger.info(f"磁盘缓存已清空: {max(cursor.rowcount, 0)}个条目")
+    
+    async def exists(self, key: str) -> bool:
+        """检查键是否存在（已过期视为不存在）"""
+        db = await self._get_db()
+        async with db.execute(
+            "SELECT 1 FROM llm_cache WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time())
+        ) as cursor:
+            return await cursor.fetchone() is not None
+    
+    async def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        db = await self._get_db()
+        await self._flush_access(db)
+        await db.commit()
+        async with db.execute("SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT 10") as cursor:
+            sample_keys = [row[0] async for row in cursor]
+        async with db.execute("SELECT COUNT(DISTINCT tag), COUNT(DISTINCT key) FROM llm_cache_tags") as cursor:
+            tag_count, tagged_keys = await cursor.fetchone()
+        
+        total = self._hits + self._misses
+        hit_rate = (self._hits / total * 100) if total > 0 else 0
+        file_size = os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0
+        
+        return {
+            "backend": "sqlite",
+            "path": self.db_path,
+            "size": self._count,
+            "bytes": self._bytes,
+            "file_size": file_size,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": f"{hit_rate:.2f}%",
+            "evictions": self._evictions,
+            "expirations": self._expirations,
+            "tags": tag_count,
+            "tagged_keys": tagged_keys,
+            "keys_sample": sample_keys
+        }
+    
+    # ==================== 导出/导入 ====================
+    
+    async def export_entries(self, path: str) -> int:
+        """导出未过期的缓存条目到JSON Lines文件
+        
+        Args:
+            path: 导出文件路径
+            
+        Returns:
+            导出的条目数
+        """
+        db = await self._get_db()
+        count = 0
+        with open(path, "w", encoding="utf-8") as f:
+            async with db.execute(
+                "SELECT key, value, expires_at FROM llm_cache "
+                "WHERE expires_at IS NULL OR expires_at > ?",
+                (time.time(),)
+            ) as cursor:
+                async for key, value, expires_at in cursor:
+                    record = {"key": key, "value": value, "expires_at": expires_at}
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    count += 1
+        
+        logger.info(f"磁盘缓存已导出: {count}个条目 -> {path}")
+        return count
+    
+    async def import_entries(self, path: str, overwrite: bool = False) -> int:
+        """从JSON Lines文件导入缓存条目（跳过已过期条目）
+        
+        Args:
+            path: 导入文件路径
+            overwrite: 是否覆盖已存在的键
+            
+        Returns:
+            导入的条目数
+        """
+        db = await self._get_db()
+        now = time.time()
+        verb = "INSERT OR REPLACE" if overwrite else "INSERT OR IGNORE"
+        count = 0
+        
+        for record in _read_jsonl(path):
+            expires_at = record.get("expires_at")
+            if expires_at is not None and expires_at <= now:
+                continue
+            key, value = record["key"], record["value"]
+            size = len(key.encode('utf-8')) + len(value.encode('utf-8'))
+            cursor = await db.execute(
+                f"{verb} INTO llm_cache (key, value, size, created_at, accessed_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, value, size, now, now, expires_at)
+            )
+            count += max(cursor.rowcount, 0)
+        
+        await self._load_totals(db)
+        await self._enforce_limits(db)
+        await db.commit()
+        logger.info(f"磁盘缓存已导入: {count}个条目 <- {path}")
+        return count
+
+
+def _read_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    """逐行读取JSON Lines文件，跳过空行"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
 class LLMCache:
     """LLM缓存管理器
     
     提供统一的缓存接口，支持多种后端实现
     """
     
-    def __init__(self, backend: CacheBackend):
+    def __init__(
+        self,
+        backend: CacheBackend,
+        near_duplicate: Optional[MinHashLSHIndex] = None,
+        stale: Optional[CacheBackend] = None,
+        max_stale: int = 3600
+    ):
         """初始化缓存管理器
         
         Args:
             backend: 缓存后端实现
+            near_duplicate: 近似重复索引（可选），None表示只做精确匹配
+            stale: 过期副本存储（可选），保存最近写入的结果，主缓存过期后仍可在降级时返回
+            max_stale: get_or_compute返回旧值时允许的最长过期时间（秒），0表示不返回旧值
         """
         self.backend = backend
-        logger.info(f"LLM缓存管理器初始化: backend={backend.__class__.__name__}")
+        self.near_duplicate = near_duplicate
+        self.stale = stale
+        self.max_stale = max_stale
+        self._near_duplicate_hits = 0
+        self._near_duplicate_stale = 0
+        self._stale_served = 0
+        
+        # stale-while-revalidate：每个键最多一个后台刷新任务
+        self._refreshing: Dict[str, asyncio.Task] = {}
+        self._swr_stats = {
+            "stale_serves": 0,
+            "too_stale": 0,
+            "refreshes": 0,
+            "refresh_failures": 0
+        }
+        logger.info(
+            f"LLM缓存管理器初始化: backend={backend.__class__.__name__}, "
+            f"near_duplicate={'on' if near_duplicate else 'off'}"
+        )
     
     @staticmethod
     def generate_cache_key(
@@ -275,7 +1620,8 @@ class LLMCache:
         model: str,
         temperature: float,
         max_tokens: int,
-        system_message: Optional[str] = None
+        system_message: Optional[str] = None,
+        template: Optional[str] = None
     ) -> str:
         """生成缓存键
         
@@ -287,6 +1633,7 @@ class LLMCache:
             temperature: 温度参数
             max_tokens: 最大token数
             system_message: 系统消息
+            template: 提示词模板引用（"ID@版本"），模板版本变化时生成新的缓存键
             
         Returns:
             MD5哈希字符串（32字符）
@@ -299,6 +1646,9 @@ class LLMCache:
             "max_tokens": max_tokens,
             "system_message": system_message or ""
         }
+        # 未使用模板的提示词保持原有的缓存键
+        if template:
+            cache_components["template"] = template
         
         # 序列化为JSON（确保顺序一致）
         cache_str = json.dumps(cache_components, sort_keys=True, ensure_ascii=False)
@@ -309,44 +1659,254 @@ class LLMCache:
         logger.debug(f"生成缓存键: {cache_key} (prompt_len={len(prompt)})")
         return cache_key
     
+    @staticmethod
+    def generate_similarity_namespace(
+        prompt: str,
+        similarity_text: str,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        system_message: Optional[str] = None,
+        template: Optional[str] = None
+    ) -> str:
+        """生成近似重复匹配的命名空间
+        
+        将提示词中的可变文本（如JD原文）替换为占位符后，与其余参数一起哈希。
+        只有模板和模型参数完全一致的提示词才会进行相似度比较。
+        
+        Args:
+            prompt: 用户提示词
+            similarity_text: 提示词中用于相似度匹配的可变文本
+            model: 模型名称
+            temperature: 温度参数
+            max_tokens: 最大token数
+            system_message: 系统消息
+            template: 提示词模板引用（"ID@版本"）
+            
+        Returns:
+            MD5哈希字符串（32字符）
+        """
+        return LLMCache.generate_cache_key(
+            prompt=prompt.replace(similarity_text, "\x00"),
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            system_message=system_message,
+            template=template
+        )
+    
+    async def get_similar(self, similarity_text: str, namespace: str) -> Optional[str]:
+        """查找近似重复的缓存结果
+        
+        Args:
+            similarity_text: 用于相似度匹配的文本
+            namespace: generate_similarity_namespace生成的命名空间
+            
+        Returns:
+            相似度达到阈值的历史结果；未启用或未找到时返回None
+        """
+        if self.near_duplicate is None:
+            return None
+        
+        match = self.near_duplicate.query(similarity_text, namespace)
+        if match is None:
+            return None
+        
+        cache_key, score = match
+        value = await self.backend.get(cache_key)
+        if value is None:
+            # 缓存条目已过期/淘汰，同步清理索引
+            self.near_duplicate.remove(cache_key)
+            self._near_duplicate_stale += 1
+            return None
+        
+        self._near_duplicate_hits += 1
+        logger.info(f"近似重复缓存命中: {cache_key[:8]}... (similarity={score:.2f})")
+        return value
+    
+    def index_similar(self, cache_key: str, similarity_text: str, namespace: str) -> None:
+        """将已缓存的结果加入近似重复索引
+        
+        Args:
+            cache_key: 缓存键
+            similarity_text: 用于相似度匹配的文本
+            namespace: generate_similarity_namespace生成的命名空间
+        """
+        if self.near_duplicate is not None:
+            self.near_duplicate.add(cache_key, similarity_text, namespace)
+    
     async def get(self, cache_key: str) -> Optional[str]:
         """获取缓存结果"""
         return await self.backend.get(cache_key)
     
-    async def set(self, cache_key: str, result: str, ttl: Optional[int] = None):
-        """保存缓存结果"""
+    async def set(
+        self,
+        cache_key: str,
+        result: str,
+        ttl: Optional[int] = None,
+        tags: Optional[Sequence[str]] = None
+    ):
+        """保存缓存结果
+        
+        Args:
+            cache_key: 缓存键
+            result: 结果
+            ttl: 缓存过期时间
+            tags: 标签（如agent:parser、company:<id>），用于invalidate_tag
+        """
         await self.backend.set(cache_key, result, ttl)
+        if self.stale is not None:
+            await self._set_stale_copy(cache_key, result, ttl)
+        if tags:
+            await self.backend.add_tags(cache_key, tags, ttl)
+            if self.stale is not None:
+                await self.stale.add_tags(cache_key, tags)
+    
+    async def invalidate_tag(self, tag: str) -> int:
+        """删除带有该标签的所有缓存结果（包括过期副本）
+        
+        Args:
+            tag: 标签
+        
+        Returns:
+            删除的缓存条目数
+        """
+        count = await self.backend.invalidate_tag(tag)
+        if self.stale is not None:
+            await self.stale.invalidate_tag(tag)
+        return count
+    
+    async def _set_stale_copy(self, cache_key: str, result: str, ttl: Optional[int]) -> None:
+        """保存过期副本（内部方法）"""
+        # 过期副本使用自己的保留时间（不跟随主缓存的ttl），同时记录主缓存条目的过期时间
+        ttl = ttl or getattr(self.backend, "default_ttl", None)
+        expires_at = time.time() + ttl if ttl else None
+        await self.stale.set(cache_key, json.dumps({"value": result, "expires_at": expires_at}, ensure_ascii=False))
+    
+    async def _get_stale_entry(self, cache_key: str) -> Optional[Tuple[str, Optional[float]]]:
+        """读取过期副本，返回(结果, 主缓存条目的过期时间)（内部方法）"""
+        if self.stale is None:
+            return None
+        data = await self.stale.get(cache_key)
+        if data is None:
+            return None
+        try:
+            entry = json.loads(data)
+            return entry["value"], entry.get("expires_at")
+        except (ValueError, TypeError, KeyError):
+            return None
+    
+    async def get_many(self, cache_keys: List[str]) -> Dict[str, str]:
+        """批量获取缓存结果
+        
+        Args:
+            cache_keys: 缓存键列表
+        
+        Returns:
+            命中的{缓存键: 结果}
+        """
+        return await self.backend.get_many(list(dict.fromkeys(cache_keys)))
+    
+    async def set_many(self, items: Dict[str, str], ttl: Optional[int] = None):
+        """批量保存缓存结果
+        
+        Args:
+            items: {缓存键: 结果}
+            ttl: 缓存过期时间
+        """
+        await self.backend.set_many(items, ttl)
+        if self.stale is not None:
+            for cache_key, result in items.items():
+                await self._set_stale_copy(cache_key, result, ttl)
+    
+    async def get_stale(self, cache_key: str) -> Optional[str]:
+        """获取结果，主缓存未命中时返回过期副本（仅用于LLM服务降级时）
+        
+        Args:
+            cache_key: 缓存键
+        
+        Returns:
+            缓存结果或过期副本，都没有时返回None
+        """
+        result = await self.backend.get(cache_key)
+        if result is None:
+            entry = await self._get_stale_entry(cache_key)
+            result = entry[0] if entry is not None else None
+        if result is not None:
+            self._stale_served += 1
+        return result
     
     async def delete(self, cache_key: str):
         """删除缓存"""
         await self.backend.delete(cache_key)
+        if self.stale is not None:
+            await self.stale.delete(cache_key)
+        if self.near_duplicate is not None:
+            self.near_duplicate.remove(cache_key)
     
     async def clear(self):
         """清空所有缓存"""
         await self.backend.clear()
+        if self.stale is not None:
+            await self.stale.clear()
+        if self.near_duplicate is not None:
+            self.near_duplicate.clear()
     
     async def exists(self, cache_key: str) -> bool:
         """检查缓存是否存在"""
         return await self.backend.exists(cache_key)
     
+    async def close(self) -> None:
+        """取消后台刷新任务并关闭后端（两级缓存的失效监听、Redis连接、SQLite连接）"""
+        tasks = list(self._refreshing.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        await self.backend.close()
+        if self.stale is not None:
+            await self.stale.close()
+    
     async def get_stats(self) -> Dict[str, Any]:
         """获取缓存统计信息"""
-        return await self.backend.get_stats()
+        stats = await self.backend.get_stats()
+        if self.near_duplicate is not None:
+            stats["near_duplicate_hits"] = self._near_duplicate_hits
+            stats["near_duplicate"] = {
+                **self.near_duplicate.get_stats(),
+                "stale": self._near_duplicate_stale
+            }
+        if self.stale is not None:
+            stale_stats = await self.stale.get_stats()
+            stats["stale_copies"] = {
+                "size": stale_stats.get("size"),
+                "served": self._stale_served
+            }
+            stats["stale_while_revalidate"] = {
+                **self._swr_stats,
+                "max_stale": self.max_stale,
+                "refreshing": len(self._refreshing)
+            }
+        return stats
     
     async def get_or_compute(
         self,
         cache_key: str,
         compute_fn,
-        ttl: Optional[int] = None
+        ttl: Optional[int] = None,
+        max_stale: Optional[int] = None
     ) -> str:
         """获取缓存或计算新值
         
-        如果缓存存在则返回缓存值，否则调用compute_fn计算并缓存
+        如果缓存存在则返回缓存值，否则调用compute_fn计算并缓存。
+        配置了过期副本存储时支持stale-while-revalidate：条目过期不超过max_stale秒时立即返回旧值，
+        并在后台调用compute_fn刷新（同一个键同时最多一个刷新任务），避免热门条目过期时的延迟尖峰。
         
         Args:
             cache_key: 缓存键
             compute_fn: 计算函数（async callable）
             ttl: 缓存过期时间
+            max_stale: 允许返回的旧值最长过期时间（秒），None使用初始化时的max_stale
             
         Returns:
             结果值
@@ -357,6 +1917,19 @@ class LLMCache:
             logger.debug(f"使用缓存结果: {cache_key[:8]}...")
             return cached_value
         
+        # 已过期但未超过最长过期时间：返回旧值，后台刷新
+        max_stale = self.max_stale if max_stale is None else max_stale
+        entry = await self._get_stale_entry(cache_key) if max_stale > 0 else None
+        if entry is not None:
+            stale_value, expires_at = entry
+            staleness = time.time() - expires_at if expires_at is not None else 0.0
+            if staleness <= max_stale:
+                self._swr_stats["stale_serves"] += 1
+                self._schedule_refresh(cache_key, compute_fn, ttl)
+                logger.debug(f"返回过期缓存并后台刷新: {cache_key[:8]}..., 已过期{staleness:.0f}秒")
+                return stale_value
+            self._swr_stats["too_stale"] += 1
+        
         # 计算新值
         logger.debug(f"计算新值: {cache_key[:8]}...")
         result = await compute_fn()
@@ -365,19 +1938,61 @@ class LLMCache:
         await self.set(cache_key, result, ttl)
         
         return result
+    
+    def _schedule_refresh(self, cache_key: str, compute_fn, ttl: Optional[int]) -> None:
+        """启动后台刷新任务，该键已有刷新任务时跳过（内部方法）"""
+        if cache_key in self._refreshing:
+            return
+        
+        async def refresh() -> None:
+            try:
+                result = await compute_fn()
+                await self.set(cache_key, result, ttl)
+                self._swr_stats["refreshes"] += 1
+            except Exception as e:
+                self._swr_stats["refresh_failures"] += 1
+                logger.warning(f"后台刷新缓存失败: {cache_key[:8]}..., {e}")
+            finally:
+                self._refreshing.pop(cache_key, None)
+        
+        self._refreshing[cache_key] = asyncio.create_task(refresh())
+    
+    async def wait_for_refreshes(self) -> None:
+        """等待所有后台刷新任务完成（关闭前或测试中使用）"""
+        while self._refreshing:
+            await asyncio.gather(*list(self._refreshing.values()), return_exceptions=True)
 
 
 # 工厂函数
-def create_memory_cache() -> LLMCache:
-    """创建内存缓存实例"""
-    backend = MemoryCache()
+def create_memory_cache(
+    max_entries: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    default_ttl: Optional[int] = None
+) -> LLMCache:
+    """创建内存缓存实例
+    
+    未指定任何上限时返回无界的MemoryCache（兼容旧行为），
+    否则返回有界的LRUMemoryCache。
+    
+    Args:
+        max_entries: 最大条目数
+        max_bytes: 最大字节数
+        default_ttl: 默认过期时间（秒）
+    """
+    if max_entries or max_bytes or default_ttl:
+        backend = LRUMemoryCache(max_entries, max_bytes, default_ttl)
+    else:
+        backend = MemoryCache()
     return LLMCache(backend)
 
 
 def create_redis_cache(
     redis_client,
     key_prefix: str = "llm_cache:",
-    default_ttl: int = 3600
+    default_ttl: int = 3600,
+    compression: Optional[str] = "auto",
+    compression_threshold: int = 1024,
+    close_client: bool = False
 ) -> LLMCache:
     """创建Redis缓存实例
     
@@ -385,6 +2000,135 @@ def create_redis_cache(
         redis_client: Redis客户端
         key_prefix: 键前缀
         default_ttl: 默认过期时间（秒）
+        compression: 压缩算法：auto / zstd / zlib / None
+        compression_threshold: 超过该字节数的值才压缩
+        close_client: 关闭缓存时是否同时关闭Redis客户端
     """
-    backend = RedisCache(redis_client, key_prefix, default_ttl)
+    backend = RedisCache(
+        redis_client, key_prefix, default_ttl, compression, compression_threshold, close_client=close_client
+    )
     return LLMCache(backend)
+
+
+def create_tiered_cache(
+    redis_client,
+    key_prefix: str = "llm_cache:",
+    default_ttl: int = 3600,
+    l1_max_entries: int = 256,
+    l1_max_bytes: int = 16 * 1024 * 1024,
+    l1_ttl: int = 300,
+    compression: Optional[str] = "auto",
+    compression_threshold: int = 1024,
+    close_client: bool = False
+) -> LLMCache:
+    """创建两级缓存实例（L1进程内 + L2 Redis）
+    
+    Args:
+        redis_client: Redis客户端
+        key_prefix: L2键前缀
+        default_ttl: L2默认过期时间（秒）
+        l1_max_entries: L1最大条目数
+        l1_max_bytes: L1最大字节数
+        l1_ttl: L1过期时间（秒）
+        compression: L2压缩算法：auto / zstd / zlib / None（L1保存未压缩的值）
+        compression_threshold: 超过该字节数的值才压缩
+        close_client: 关闭缓存时是否同时关闭Redis客户端
+    """
+    l1 = LRUMemoryCache(l1_max_entries, l1_max_bytes, l1_ttl)
+    l2 = RedisCache(
+        redis_client, key_prefix, default_ttl, compression, compression_threshold, close_client=close_client
+    )
+    return LLMCache(TieredCache(l1, l2, l1_ttl=l1_ttl))
+
+
+def create_sqlite_cache(
+    db_path: str = "./data/llm_cache.db",
+    max_entries: Optional[int] = 100000,
+    max_bytes: Optional[int] = 1024 * 1024 * 1024,
+    default_ttl: Optional[int] = None
+) -> LLMCache:
+    """创建SQLite磁盘缓存实例
+    
+    Args:
+        db_path: 数据库文件路径
+        max_entries: 最大条目数
+        max_bytes: 最大字节数
+        default_ttl: 默认过期时间（秒）
+    """
+    backend = SQLiteCache(db_path, max_entries, max_bytes, default_ttl)
+    return LLMCache(backend)
+
+
+def create_cache_from_settings() -> LLMCache:
+    """根据配置（LLM_CACHE_BACKEND）创建缓存实例
+    
+    - memory: 有界内存缓存
+    - sqlite: SQLite磁盘缓存
+    - redis: Redis缓存（REDIS_HOST/REDIS_PORT/REDIS_DB）
+    - tiered: 两级缓存（L1有界内存 + L2 Redis，LLM_CACHE_L1_*控制L1）
+    
+    redis/tiered创建的Redis客户端由缓存独占，LLMCache.close()时关闭。
+    LLM_CACHE_NEAR_DUP_ENABLED为True时附加近似重复索引，
+    LLM_CACHE_STALE_MAX_ENTRIES>0时附加过期副本存储（LLM熔断时返回）
+    
+    Raises:
+        ValueError: 不支持的LLM_CACHE_BACKEND
+    """
+    from .config import settings
+    
+    backend = settings.LLM_CACHE_BACKEND
+    if backend == "memory":
+        cache = create_memory_cache(
+            max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+            max_bytes=settings.LLM_CACHE_MAX_BYTES,
+            default_ttl=settings.LLM_CACHE_DEFAULT_TTL
+        )
+    elif backend == "sqlite":
+        cache = create_sqlite_cache(
+            db_path=settings.LLM_CACHE_DISK_PATH,
+            max_entries=settings.LLM_CACHE_DISK_MAX_ENTRIES,
+            max_bytes=settings.LLM_CACHE_DISK_MAX_BYTES,
+            default_ttl=settings.LLM_CACHE_DEFAULT_TTL
+        )
+    elif backend in ("redis", "tiered"):
+        import redis.asyncio as redis
+        
+        # 压缩后的值是二进制数据，不启用decode_responses
+        redis_client = redis.Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_DB
+        )
+        if backend == "redis":
+            cache = create_redis_cache(
+                redis_client,
+                default_ttl=settings.LLM_CACHE_DEFAULT_TTL,
+                close_client=True
+            )
+        else:
+            cache = create_tiered_cache(
+                redis_client,
+                default_ttl=settings.LLM_CACHE_DEFAULT_TTL,
+                l1_max_entries=settings.LLM_CACHE_L1_MAX_ENTRIES,
+                l1_max_bytes=settings.LLM_CACHE_L1_MAX_BYTES,
+                l1_ttl=settings.LLM_CACHE_L1_TTL,
+                close_client=True
+            )
+    else:
+        raise ValueError(f"不支持的缓存后端: {backend}（可选memory、sqlite、redis、tiered）")
+    
+    if settings.LLM_CACHE_NEAR_DUP_ENABLED:
+        cache.near_duplicate = MinHashLSHIndex(
+            threshold=settings.LLM_CACHE_NEAR_DUP_THRESHOLD,
+            max_entries=settings.LLM_CACHE_NEAR_DUP_MAX_ENTRIES
+        )
+    
+    if settings.LLM_CACHE_STALE_MAX_ENTRIES > 0:
+        cache.stale = LRUMemoryCache(
+            max_entries=settings.LLM_CACHE_STALE_MAX_ENTRIES,
+            max_bytes=settings.LLM_CACHE_MAX_BYTES,
+            default_ttl=settings.LLM_CACHE_STALE_MAX_AGE
+        )
+        cache.max_stale = settings.LLM_CACHE_SWR_MAX_STALE
+    
+    return cache
@@ -0,0 +1,212 @@
+"""LLM熔断器
+
+DeepSeek服务降级时，每个请求都要经历3次带指数退避的重试，API工作协程被大量卡住，
+连只读缓存的接口也被拖慢。熔断器按滚动时间窗口统计错误率：
+1. closed（闭合）- 正常放行，窗口内请求数达到下限且错误率超过阈值时打开
+2. open（打开）- 直接拒绝（调用方快速失败或返回过期缓存），冷却时间后进入半开
+3. half_open（半开）- 只放行少量探测请求，探测成功则闭合，任一失败则重新打开
+"""
+
+import logging
+import math
+import time
+from collections import deque
+from enum import Enum
+from typing import Any, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(str, Enum):
+    """熔断器状态"""
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """滚动窗口错误率熔断器"""
+    
+    def __init__(
+        self,
+        name: str = "llm",
+        window_seconds: float = 30.0,
+        bucket_seconds: float = 1.0,
+        min_requests: int = 10,
+        error_rate_threshold: float = 0.5,
+        open_seconds: float = 30.0,
+        half_open_max_calls: int = 1,
+        half_open_successes: int = 2
+    ):
+        """初始化熔断器
+        
+        Args:
+            name: 名称（用于日志和统计）
+            window_seconds: 滚动窗口长度（秒）
+            bucket_seconds: 窗口内每个计数桶的长度（秒）
+            min_requests: 窗口内至少有这么多请求才计算错误率（避免少量失败误触发）
+            error_rate_threshold: 触发打开的错误率（0-1）
+            open_seconds: 打开后的冷却时间（秒），之后进入半开
+            half_open_max_calls: 半开状态下同时放行的探测请求数
+            half_open_successes: 半开状态下需要连续成功的探测次数
+        """
+        self.name = name
+        self.window_seconds = window_seconds
+        self.bucket_seconds = max(0.01, bucket_seconds)
+        self.min_requests = max(1, min_requests)
+        self.error_rate_threshold = error_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = max(1, half_open_max_calls)
+        self.half_open_successes = max(1, half_open_successes)
+        
+        self.state = CircuitState.CLOSED
+        # 计数桶：[桶起始时间, 成功数, 失败数]
+        self._buckets: Deque[List[float]] = deque()
+        self._opened_at = 0.0
+        self._half_open_in_flight = 0
+        self._half_open_succeeded = 0
+        
+        self._times_opened = 0
+        self._rejected = 0
+        self._last_failure: Optional[str] = None
+    
+    def _now(self) -> float:
+        return time.monotonic()
+    
+    def _current_bucket(self, now: float) -> List[float]:
+        """当前计数桶，同时丢弃窗口外的桶（内部方法）"""
+        start = math.floor(now / self.bucket_seconds) * self.bucket_seconds
+        while self._buckets and self._buckets[0][0] <= now - self.window_seconds:
+            self._buckets.popleft()
+        if not self._buckets or self._buckets[-1][0] != start:
+            self._buckets.append([start, 0, 0])
+        return self._buckets[-1]
+    
+    def _window_counts(self) -> tuple:
+        """窗口内的(成功数, 失败数)（内部方法）"""
+        self._current_bucket(self._now())
+        successes = sum(b[1] for b in self._buckets)
+        failures = sum(b[2] for b in self._buckets)
+        return int(successes), int(failures)
+    
+    def _transition(self, state: CircuitState) -> None:
+        """切换状态（内部方法）"""
+        if state == self.state:
+            return
+        logger.warning(f"熔断器[{self.name}]状态变更: {self.state.value} -> {state.value}")
+        self.state = state
+        if state == CircuitState.OPEN:
+            self._opened_at = self._now()
+            self._times_opened += 1
+        elif state == CircuitState.CLOSED:
+            self._buckets.clear()
+        self._half_open_in_flight = 0
+        self._half_open_succeeded = 0
+    
+    def _refresh_state(self) -> None:
+        """打开状态超过冷却时间后进入半开（内部方法）"""
+        if self.state == CircuitState.OPEN and self._now() - self._opened_at >= self.open_seconds:
+            self._transition(CircuitState.HALF_OPEN)
+    
+    @property
+    def is_open(self) -> bool:
+        """是否处于打开状态（冷却时间内，所有请求都会被拒绝）"""
+        self._refresh_state()
+        return self.state == CircuitState.OPEN
+    
+    def retry_after(self) -> float:
+        """距离进入半开状态的剩余秒数（未打开时为0）"""
+        if self.state != CircuitState.OPEN:
+            return 0.0
+        return max(0.0, self.open_seconds - (self._now() - self._opened_at))
+    
+    def allow_request(self) -> bool:
+        """判断是否放行一次调用
+        
+        放行后必须调用record_success或record_failure（半开状态下占用一个探测名额）
+        """
+        self._refresh_state()
+        if self.state == CircuitState.CLOSED:
+            return True
+        if self.state == CircuitState.HALF_OPEN and self._half_open_in_flight < self.half_open_max_calls:
+            self._half_open_in_flight += 1
+            return True
+        self._rejected += 1
+        return False
+    
+    def record_success(self) -> None:
+        """记录一次成功调用"""
+        if self.state == CircuitState.HALF_OPEN:
+            self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+            self._half_open_succeeded += 1
+            if self._half_open_succeeded >= self.half_open_successes:
+                self._transition(CircuitState.CLOSED)
+            return
+        self._current_bucket(self._now())[1] += 1
+    
+    def record_failure(self, error: Optional[BaseException] = None) -> None:
+        """记录一次失败调用（连接错误、超时、429、5xx）"""
+        if error is not None:
+            self._last_failure = f"{type(error).__name__}: {error}"[:200]
+        if self.state == CircuitState.HALF_OPEN:
+            self._transition(CircuitState.OPEN)
+            return
+        if self.state == CircuitState.OPEN:
+            return
+        
+        self._current_bucket(self._now())[2] += 1
+        successes, failures = self._window_counts()
+        total = successes + failures
+        if total >= self.min_requests and failures / total >= self.error_rate_threshold:
+            logger.error(
+                f"熔断器[{self.name}]打开: 最近{self.window_seconds:.0f}秒错误率{failures / total:.0%}"
+                f"（{failures}/{total}），{self.open_seconds:.0f}秒内快速失败"
+            )
+            self._transition(CircuitState.OPEN)
+    
+    def release(self) -> None:
+        """放行的调用被取消（如对冲落败），不计入成功或失败，归还半开探测名额"""
+        if self.state == CircuitState.HALF_OPEN:
+            self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+    
+    def reset(self) -> None:
+        """强制闭合并清空窗口"""
+        self._transition(CircuitState.CLOSED)
+        self._buckets.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取熔断器状态和统计"""
+        self._refresh_state()
+        successes, failures = self._window_counts()
+        total = successes + failures
+        return {
+            "name": self.name,
+            "state": self.state.value,
+            "window_requests": total,
+            "window_failures": failures,
+            "error_rate": f"{failures / total:.2%}" if total else "0.00%",
+            "retry_after_s": round(self.retry_after(), 2),
+            "times_opened": self._times_opened,
+            "rejected": self._rejected,
+            "last_failure": self._last_failure
+        }
+
+
+def create_circuit_breaker_from_settings() -> Optional[CircuitBreaker]:
+    """根据配置创建LLM熔断器
+    
+    LLM_CIRCUIT_BREAKER_ENABLED为False时返回None（不熔断）
+    """
+    from .config import settings
+    
+    if not settings.LLM_CIRCUIT_BREAKER_ENABLED:
+        return None
+    
+    return CircuitBreaker(
+        name="deepseek",
+        window_seconds=settings.LLM_CIRCUIT_WINDOW_SECONDS,
+        min_requests=settings.LLM_CIRCUIT_MIN_REQUESTS,
+        error_rate_threshold=settings.LLM_CIRCUIT_ERROR_RATE,
+        open_seconds=settings.LLM_CIRCUIT_OPEN_SECONDS,
+        half_open_max_calls=settings.LLM_CIRCUIT_HALF_OPEN_MAX_CALLS
+    )
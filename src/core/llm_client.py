@@ -3,22 +3,46 @@
 import json
 import hashlib
 import asyncio
-from typing import Dict, Any, Optional, List, AsyncGenerator
+import uuid
+import httpx
+from contextvars import ContextVar
+from typing import Dict, Any, Optional, List, AsyncGenerator, Callable
 from openai import AsyncOpenAI, APIError, APIConnectionError, RateLimitError, APITimeoutError
 from tenacity import (
     retry,
     stop_after_attempt,
-    wait_exponential,
+    wait_random_exponential,
     retry_if_exception_type,
     before_sleep_log
 )
 import logging
 from .config import settings
-from .llm_cache import LLMCache, create_memory_cache, create_redis_cache
+from .llm_cache import (
+    LLMCache,
+    cache_tag,
+    create_redis_cache,
+    create_cache_from_settings,
+    get_current_cache_tags
+)
+from .llm_single_flight import RedisSingleFlight, SingleFlightError, create_single_flight_from_settings
+from .llm_rate_limiter import LLMRateLimiter, LLMPriority, get_current_priority
+from .llm_tokens import TokenUsageTracker, estimate_tokens, get_current_agent
+from .llm_http import ConnectionMetrics, create_llm_http_client
+from .llm_hedging import RequestHedger, create_hedger_from_settings
+from .llm_circuit_breaker import CircuitBreaker, create_circuit_breaker_from_settings
+from .llm_json import IncrementalJSONParser, parse_json_response
+from .llm_packing import PackItem, PromptPacker, build_packed_prompt, compose_item_prompt, split_packed_response
+from .llm_prompts import PromptHistory, PromptTemplate, prompt_registry
 
 # 配置日志
 logger = logging.getLogger(__name__)
 
+# 默认系统消息
+DEFAULT_SYSTEM_MESSAGE = "你是一个专业的HR岗位分析专家。"
+
+# 是否把模板化提示词记入历史输入（generate_json_packed内部的打包和回退调用关闭，避免重复记录）
+_record_prompt_history: ContextVar[bool] = ContextVar("llm_record_prompt_history", default=True)
+
 
 class LLMException(Exception):
     """LLM调用异常基类"""
@@ -40,6 +64,14 @@ class LLMTimeoutError(LLMException):
     pass
 
 
+class LLMCircuitOpenError(LLMException):
+    """LLM熔断器打开（服务降级期间快速失败，不重试）"""
+    
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
 class DeepSeekR1Client:
     """DeepSeek-R1客户端封装
     
@@ -51,7 +83,14 @@ class DeepSeekR1Client:
     - 批量调用支持
     - 流式输出支持
     - 连接池优化
-    - 请求去重
+    - 请求去重（进程内 + 可选的跨进程single-flight）
+    - 客户端限流（RPM/TPM令牌桶 + AIMD自适应并发）
+    - 优先级调度（交互式/批量/后台）
+    - 流式JSON增量解析（必需字段就绪即提前结束，本地修复截断/代码块问题）
+    - 多条目提示词打包（批量解析/评估时合并多个短JD为一次调用）
+    - token估算与用量统计（调度前检查提示词预算，按Agent累计token和费用）
+    - 共享HTTP连接池（HTTP/2、连接数与并发上限一致、keep-alive，连接复用统计）
+    - 熔断器（错误率过高时快速失败，有缓存的请求返回过期结果）
     """
     
     def __init__(
@@ -63,7 +102,12 @@ class DeepSeekR1Client:
         timeout: float = 60.0,
         cache: Optional[LLMCache] = None,
         enable_cache: bool = True,
-        max_concurrent: int = 10
+        max_concurrent: int = 10,
+        single_flight: Optional[RedisSingleFlight] = None,
+        rate_limiter: Optional[LLMRateLimiter] = None,
+        http_client: Optional[httpx.AsyncClient] = None,
+        hedger: Optional[RequestHedger] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None
     ):
         """初始化DeepSeek-R1客户端
         
@@ -73,9 +117,16 @@ class DeepSeekR1Client:
             model: 模型名称，默认使用deepseek-reasoner
             max_retries: 最大重试次数
             timeout: 请求超时时间（秒）
-            cache: LLMCache实例，默认使用内存缓存
+            cache: LLMCache实例，默认按LLM_CACHE_BACKEND配置创建（由close()关闭）
             enable_cache: 是否启用缓存
             max_concurrent: 最大并发请求数
+            single_flight: 跨进程去重实例，默认按LLM_SINGLE_FLIGHT_ENABLED配置创建，
+                未启用时仅做进程内去重
+            rate_limiter: 限流器实例，默认按max_concurrent和LLM_RATE_LIMIT_*配置创建
+            http_client: 共享的httpx.AsyncClient，默认按max_concurrent和LLM_HTTP_*配置创建（由close()关闭）
+                （传入自定义实例时不采集连接复用统计，由调用方关闭）
+            hedger: 请求对冲器，默认按LLM_HEDGE_*配置创建，未启用时为None
+            circuit_breaker: 熔断器，默认按LLM_CIRCUIT_*配置创建，未启用时为None
         """
         self.api_key = api_key or settings.OPENAI_API_KEY
         self.base_url = base_url or settings.OPENAI_BASE_URL
@@ -85,26 +136,99 @@ class DeepSeekR1Client:
         self.enable_cache = enable_cache
         self.max_concurrent = max_concurrent
         
+        # 共享HTTP连接池：连接数与并发上限一致，空闲连接保持keep-alive，避免批量负载下反复握手
+        self.connection_metrics = ConnectionMetrics()
+        self._owns_http_client = http_client is None
+        self.http_client = http_client or create_llm_http_client(
+            max_connections=settings.LLM_HTTP_MAX_CONNECTIONS or max_concurrent,
+            keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY,
+            http2=settings.LLM_HTTP2,
+            timeout=self.timeout,
+            metrics=self.connection_metrics
+        )
+        
         # 初始化OpenAI客户端（DeepSeek兼容OpenAI API）
         self.client = AsyncOpenAI(
             api_key=self.api_key,
             base_url=self.base_url,
             timeout=self.timeout,
-            max_retries=0  # 我们自己处理重试
+            max_retries=0,  # 我们自己处理重试
+            http_client=self.http_client
+        )
+        
+        # 初始化缓存（默认按LLM_CACHE_BACKEND配置创建，内存缓存有上限，防止长时间运行时内存无限增长）
+        # 按配置创建的缓存由客户端关闭，调用方传入的缓存由调用方关闭
+        self._owns_cache = cache is None
+        self.cache = cache or create_cache_from_settings()
+        
+        # 并发控制和限流（429/超时时自动降低并发，成功时逐步恢复）
+        self.rate_limiter = rate_limiter or LLMRateLimiter(
+            max_concurrent=max_concurrent,
+            min_concurrent=settings.LLM_MIN_CONCURRENT,
+            requests_per_minute=settings.LLM_RATE_LIMIT_RPM,
+            tokens_per_minute=settings.LLM_RATE_LIMIT_TPM,
+            reserved_interactive=settings.LLM_INTERACTIVE_RESERVED
         )
         
-        # 初始化缓存（默认使用内存缓存）
-        self.cache = cache or create_memory_cache()
+        # 请求对冲（LLM_HEDGE_ENABLED为False时为None）：慢请求超过分位数延迟后发出重复请求，取先返回的结果
+        self.hedger = hedger or create_hedger_from_settings()
         
-        # 并发控制
-        self.semaphore = asyncio.Semaphore(max_concurrent)
+        # 熔断器（LLM_CIRCUIT_BREAKER_ENABLED为False时为None）：错误率过高时不再调用API
+        self.circuit_breaker = circuit_breaker or create_circuit_breaker_from_settings()
+        self._circuit_stats = {
+            "fast_failures": 0,
+            "stale_served": 0
+        }
         
         # 请求去重（防止相同请求并发执行）
         self._pending_requests: Dict[str, asyncio.Future] = {}
         self._request_lock = asyncio.Lock()
         
+        # 跨进程去重（Redis不可用时为None，仅使用进程内去重）
+        self.single_flight = single_flight or create_single_flight_from_settings()
+        
+        # 多条目打包（LLM_PACK_SIZE<=1时关闭）：合并并发到达的批量单条请求
+        self.packer = (
+            PromptPacker(self, settings.LLM_PACK_SIZE, settings.LLM_PACK_MAX_WAIT_MS / 1000)
+            if settings.LLM_PACK_SIZE > 1 else None
+        )
+        self._pack_stats = {
+            "packed_calls": 0,
+            "packed_items": 0,
+            "cache_hits": 0,
+            "fallbacks": 0
+        }
+        
+        # token用量统计（按Agent累计）
+        self.token_usage = TokenUsageTracker(
+            input_cost_per_million=settings.LLM_COST_PER_1M_INPUT_TOKENS,
+            output_cost_per_million=settings.LLM_COST_PER_1M_OUTPUT_TOKENS,
+            cached_input_cost_per_million=settings.LLM_COST_PER_1M_CACHED_INPUT_TOKENS
+        )
+        
+        # 提示词模板版本：按静态前缀识别模板（ID@版本写入缓存键），记录常见输入供新版本离线预热
+        self.prompt_registry = prompt_registry
+        self.prompt_history = PromptHistory(settings.LLM_PROMPT_HISTORY_MAX_ENTRIES)
+        
+        # JSON解析统计（本地修复 vs 重新请求）
+        self._json_stats = {
+            "parsed": 0,
+            "repairs": 0,
+            "reasks": 0,
+            "early_stops": 0,
+            "failures": 0
+        }
+        
         logger.info(f"DeepSeek-R1客户端初始化完成: model={self.model}, base_url={self.base_url}, cache={self.cache.backend.__class__.__name__}, max_concurrent={max_concurrent}")
     
+    async def close(self) -> None:
+        """关闭客户端自己创建的HTTP连接池和缓存（调用方传入的实例由调用方关闭）"""
+        if self._owns_http_client:
+            await self.http_client.aclose()
+            logger.info("LLM HTTP连接池已关闭")
+        if self._owns_cache:
+            await self.cache.close()
+    
     async def clear_cache(self):
         """清空缓存"""
         await self.cache.clear()
@@ -112,9 +236,11 @@ class DeepSeekR1Client:
     
     @retry(
         stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=2, max=10),
-        retry=retry_if_exception_type((APIConnectionError, APITimeoutError, RateLimitError)),
-        before_sleep=before_sleep_log(logger, logging.WARNING)
+        # 随机指数退避，避免大量请求在同一时刻重试
+        wait=wait_random_exponential(multiplier=1, min=2, max=10),
+        retry=retry_if_exception_type((LLMConnectionError, LLMTimeoutError, LLMRateLimitError)),
+        before_sleep=before_sleep_log(logger, logging.WARNING),
+        reraise=True
     )
     async def _call_api(
         self,
@@ -140,8 +266,13 @@ class DeepSeekR1Client:
             LLMConnectionError: 连接错误
             LLMRateLimitError: 速率限制错误
             LLMTimeoutError: 超时错误
+            LLMCircuitOpenError: 熔断器打开（不重试）
             LLMException: 其他错误
         """
+        breaker = self.circuit_breaker
+        if breaker is not None and not breaker.allow_request():
+            raise self._circuit_open_error()
+        
         try:
             response = await self.client.chat.completions.create(
                 model=model,
@@ -150,28 +281,72 @@ class DeepSeekR1Client:
                 max_tokens=max_tokens,
                 stream=stream
             )
+            if breaker is not None:
+                breaker.record_success()
             return response
             
         except APIConnectionError as e:
             logger.error(f"DeepSeek API连接错误: {e}")
+            if breaker is not None:
+                breaker.record_failure(e)
             raise LLMConnectionError(f"无法连接到DeepSeek API: {e}") from e
             
         except RateLimitError as e:
             logger.warning(f"DeepSeek API速率限制: {e}")
+            self.rate_limiter.record_overload()
+            if breaker is not None:
+                breaker.record_failure(e)
             raise LLMRateLimitError(f"API调用速率超限，请稍后重试: {e}") from e
             
         except APITimeoutError as e:
             logger.error(f"DeepSeek API超时: {e}")
+            self.rate_limiter.record_overload()
+            if breaker is not None:
+                breaker.record_failure(e)
             raise LLMTimeoutError(f"API调用超时: {e}") from e
             
         except APIError as e:
             logger.error(f"DeepSeek API错误: {e}")
+            if breaker is not None:
+                # 只有服务端错误（5xx）说明服务降级，请求本身的错误（4xx）不计入错误率
+                status_code = getattr(e, "status_code", None)
+                if status_code is not None and status_code >= 500:
+                    breaker.record_failure(e)
+                else:
+                    breaker.record_success()
             raise LLMException(f"API调用失败: {e}") from e
             
+        except asyncio.CancelledError:
+            # 被取消的调用（如对冲落败）不计入错误率
+            if breaker is not None:
+                breaker.release()
+            raise
+            
         except Exception as e:
             logger.error(f"DeepSeek调用未知错误: {e}")
+            if breaker is not None:
+                breaker.release()
             raise LLMException(f"LLM调用失败: {e}") from e
     
+    def _circuit_open_error(self) -> LLMCircuitOpenError:
+        """构建熔断异常（内部方法）"""
+        retry_after = self.circuit_breaker.retry_after()
+        return LLMCircuitOpenError(
+            f"LLM服务暂时不可用（熔断中），请{max(1, round(retry_after))}秒后重试",
+            retry_after=retry_after
+        )
+    
+    async def _serve_stale(self, cache_key: str, error: Optional[LLMCircuitOpenError] = None) -> str:
+        """熔断时返回过期缓存，没有时抛出熔断异常（内部方法）"""
+        if self.enable_cache:
+            stale_result = await self.cache.get_stale(cache_key)
+            if stale_result is not None:
+                self._circuit_stats["stale_served"] += 1
+                logger.warning(f"LLM熔断中，返回过期缓存结果: {cache_key[:8]}...")
+                return stale_result
+        self._circuit_stats["fast_failures"] += 1
+        raise error or self._circuit_open_error()
+    
     async def generate(
         self,
         prompt: str,
@@ -179,7 +354,11 @@ class DeepSeekR1Client:
         temperature: float = 0.7,
         max_tokens: int = 4000,
         system_message: Optional[str] = None,
-        cache_ttl: Optional[int] = None
+        cache_ttl: Optional[int] = None,
+        priority: Optional[LLMPriority] = None,
+        batch_id: Optional[str] = None,
+        similarity_text: Optional[str] = None,
+        cache_tags: Optional[List[str]] = None
     ) -> str:
         """生成文本响应（优化版：支持请求去重和并发控制）
         
@@ -190,6 +369,11 @@ class DeepSeekR1Client:
             max_tokens: 最大生成token数
             system_message: 系统消息，默认为HR专家角色
             cache_ttl: 缓存过期时间（秒），None使用默认值
+            priority: 调度优先级，None时使用当前调用链的优先级（llm_priority_scope）
+            batch_id: 批次ID，批量请求按批次公平调度
+            similarity_text: 提示词中的可变文本（如JD原文），缓存启用近似重复索引时，
+                精确未命中后按该文本查找近似重复的历史结果
+            cache_tags: 缓存条目的额外标签（调用链的llm_cache_tags_scope标签和所属Agent标签自动添加）
             
         Returns:
             生成的文本内容
@@ -198,23 +382,51 @@ class DeepSeekR1Client:
             LLMException: LLM调用失败
         """
         model = model or self.model
-        system_message = system_message or "你是一个专业的HR岗位分析专家。"
+        system_message = system_message or DEFAULT_SYSTEM_MESSAGE
         
-        # 生成缓存键
+        # 生成缓存键（包含提示词所属模板的ID和版本）
+        template = self._record_template(prompt, model, temperature, max_tokens, system_message)
         cache_key = LLMCache.generate_cache_key(
             prompt=prompt,
             model=model,
             temperature=temperature,
             max_tokens=max_tokens,
-            system_message=system_message
+            system_message=system_message,
+            template=_template_ref(template)
         )
         
+        # 近似重复匹配的命名空间（仅在提供了可变文本且启用了近似重复索引时使用）
+        similarity_namespace = None
+        if self.enable_cache and similarity_text and self.cache.near_duplicate is not None:
+            similarity_namespace = LLMCache.generate_similarity_namespace(
+                prompt=prompt,
+                similarity_text=similarity_text,
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                system_message=system_message,
+                template=_template_ref(template)
+            )
+        
         # 如果启用缓存，尝试从缓存获取
         if self.enable_cache:
             cached_result = await self.cache.get(cache_key)
             if cached_result:
                 logger.info(f"从缓存返回结果: {cache_key[:8]}...")
                 return cached_result
+            
+            if similarity_namespace is not None:
+                similar_result = await self.cache.get_similar(similarity_text, similarity_namespace)
+                if similar_result:
+                    return similar_result
+        
+        # 熔断中：不排队、不重试，直接返回过期缓存或快速失败
+        if self.circuit_breaker is not None and self.circuit_breaker.is_open:
+            return await self._serve_stale(cache_key)
+        
+        # 预估token数（提示词 + 最大输出），用于TPM预算
+        prompt_tokens = self._check_prompt_budget(prompt, system_message, max_tokens)
+        estimated_tokens = prompt_tokens + max_tokens
         
         # 请求去重：如果相同请求正在执行，等待其完成
         async with self._request_lock:
@@ -226,9 +438,9 @@ class DeepSeekR1Client:
             future = asyncio.Future()
             self._pending_requests[cache_key] = future
         
-        try:
-            # 并发控制
-            async with self.semaphore:
+        async def compute() -> str:
+            # 并发控制和限流
+            async with self.rate_limiter.slot(estimated_tokens, priority, batch_id):
                 # 构建消息
                 messages = [
                     {"role": "system", "content": system_message},
@@ -237,27 +449,68 @@ class DeepSeekR1Client:
                 
                 # 调用API
                 logger.info(f"调用DeepSeek-R1: model={model}, prompt_length={len(prompt)}")
-                response = await self._call_api(
-                    messages=messages,
-                    model=model,
-                    temperature=temperature,
-                    max_tokens=max_tokens,
-                    stream=False
-                )
                 
-                # 提取结果
-                result = response.choices[0].message.content
+                def call_api():
+                    return self._call_api(
+                        messages=messages,
+                        model=model,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        stream=False
+                    )
                 
-                # 保存到缓存
-                if self.enable_cache:
-                    await self.cache.set(cache_key, result, cache_ttl)
+                def record_discarded(discarded: Any) -> None:
+                    # 未被采用的对冲/主请求同样计费：已返回时按实际用量，被取消时按预估输入token记录
+                    if discarded is None:
+                        self.token_usage.record(prompt_tokens)
+                    else:
+                        self._record_usage(prompt_tokens, discarded, discarded.choices[0].message.content)
                 
+                if self.hedger is not None:
+                    # 对冲请求只使用空闲的并发许可和RPM/TPM令牌，不与排队中的请求争抢
+                    response = await self.hedger.run(
+                        call_api,
+                        acquire_extra=lambda: self.rate_limiter.try_acquire_extra(priority, estimated_tokens),
+                        release_extra=lambda: self.rate_limiter.release_extra(priority),
+                        estimated_tokens=estimated_tokens,
+                        on_discard=record_discarded
+                    )
+                else:
+                    response = await call_api()
+                
+                # 提取结果
+                result = response.choices[0].message.content
+                self.rate_limiter.record_success(estimated_tokens, _get_total_tokens(response))
+                self._record_usage(prompt_tokens, response, result)
                 logger.info(f"DeepSeek-R1响应成功: response_length={len(result)}")
+                return result
                 
-                # 设置Future结果
+        try:
+            try:
+                # 跨进程去重：相同请求在所有进程中只调用一次API
+                if self.single_flight is not None:
+                    try:
+                        result = await self.single_flight.run(cache_key, compute)
+                    except SingleFlightError as e:
+                        raise LLMException(f"LLM调用失败（共享请求）: {e}") from e
+                else:
+                    result = await compute()
+            except LLMCircuitOpenError as e:
+                # 排队或重试期间熔断器打开：返回过期缓存（不写回缓存）
+                result = await self._serve_stale(cache_key, e)
                 future.set_result(result)
-                
                 return result
+                
+            # 保存到缓存
+            if self.enable_cache:
+                await self.cache.set(cache_key, result, cache_ttl, tags=self._cache_tags(cache_tags, template))
+                if similarity_namespace is not None:
+                    self.cache.index_similar(cache_key, similarity_text, similarity_namespace)
+                
+            # 设置Future结果
+            future.set_result(result)
+                
+            return result
         except Exception as e:
             # 设置Future异常
             future.set_exception(e)
@@ -273,7 +526,12 @@ class DeepSeekR1Client:
         model: Optional[str] = None,
         temperature: float = 0.7,
         max_tokens: int = 4000,
-        system_message: Optional[str] = None
+        system_message: Optional[str] = None,
+        priority: Optional[LLMPriority] = None,
+        batch_id: Optional[str] = None,
+        similarity_text: Optional[str] = None,
+        pack: Optional[PackItem] = None,
+        cache_tags: Optional[List[str]] = None
     ) -> Dict[str, Any]:
         """生成JSON格式响应
         
@@ -283,6 +541,12 @@ class DeepSeekR1Client:
             temperature: 温度参数
             max_tokens: 最大生成token数
             system_message: 系统消息
+            priority: 调度优先级
+            batch_id: 批次ID
+            similarity_text: 用于近似重复缓存匹配的可变文本（见generate）
+            pack: 可打包的请求描述（prompt应等于pack.prompt）。启用打包且当前为非交互式
+                优先级时，与并发到达的同类请求合并为一次调用
+            cache_tags: 缓存条目的额外标签（见generate）
             
         Returns:
             解析后的JSON对象
@@ -291,32 +555,157 @@ class DeepSeekR1Client:
             LLMException: LLM调用失败
             ValueError: JSON解析失败
         """
+        if pack is not None and self.packer is not None:
+            effective_priority = LLMPriority(priority) if priority else get_current_priority()[0]
+            # 交互式请求不等待凑包
+            if effective_priority != LLMPriority.INTERACTIVE:
+                return await self.packer.submit(
+                    pack,
+                    priority=priority,
+                    batch_id=batch_id,
+                    model=model,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    system_message=system_message
+                )
+        
         response_text = await self.generate(
             prompt=prompt,
             model=model,
             temperature=temperature,
             max_tokens=max_tokens,
-            system_message=system_message
+            system_message=system_message,
+            priority=priority,
+            batch_id=batch_id,
+            similarity_text=similarity_text,
+            cache_tags=cache_tags
         )
         
-        # 尝试提取和解析JSON
+        # 提取和解析JSON（代码块、截断、尾逗号等问题在本地修复）
         try:
-            # 尝试从markdown代码块中提取
-            if "```json" in response_text:
-                json_str = response_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_text:
-                json_str = response_text.split("```")[1].split("```")[0].strip()
-            else:
-                json_str = response_text.strip()
-            
-            # 解析JSON
-            result = json.loads(json_str)
+            result = self._parse_json(response_text)
             logger.debug("JSON解析成功")
             return result
             
-        except json.JSONDecodeError as e:
+        except ValueError as e:
             logger.error(f"JSON解析失败: {e}, 原始响应: {response_text[:200]}...")
-            raise ValueError(f"无法解析JSON响应: {e}") from e
+            raise
+    
+    async def generate_json_stream(
+        self,
+        prompt: str,
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 4000,
+        system_message: Optional[str] = None,
+        required_keys: Optional[List[str]] = None,
+        max_reasks: int = 1,
+        cache_ttl: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """流式生成JSON格式响应（增量解析）
+        
+        基于generate_stream逐块解析：
+        - 顶层JSON闭合后立即停止读取（丢弃之后的说明文字）
+        - 指定required_keys时，这些字段全部完整输出后提前结束流，节省输出token
+        - 输出被截断或代码块未闭合时在本地修复，无法修复时才重新请求
+        
+        Args:
+            prompt: 用户提示词（应包含JSON格式要求）
+            model: 模型名称
+            temperature: 温度参数
+            max_tokens: 最大生成token数
+            system_message: 系统消息
+            required_keys: 必需字段，全部就绪后提前结束（结果只包含已完整输出的字段）
+            max_reasks: 本地无法修复时重新请求的最大次数
+            cache_ttl: 缓存过期时间（秒）
+            
+        Returns:
+            解析后的JSON对象
+            
+        Raises:
+            LLMException: LLM调用失败
+            ValueError: 重新请求后仍无法解析
+        """
+        model = model or self.model
+        system_message = system_message or DEFAULT_SYSTEM_MESSAGE
+        
+        # 与generate共用缓存键：完整结果可以被generate_json复用，反之亦然
+        template = self._record_template(prompt, model, temperature, max_tokens, system_message)
+        cache_key = LLMCache.generate_cache_key(
+            prompt=prompt,
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            system_message=system_message,
+            template=_template_ref(template)
+        )
+        
+        if self.enable_cache:
+            cached_result = await self.cache.get(cache_key)
+            if cached_result:
+                logger.info(f"从缓存返回结果: {cache_key[:8]}...")
+                return self._parse_json(cached_result)
+        
+        for attempt in range(max_reasks + 1):
+            parser = IncrementalJSONParser()
+            stream = self.generate_stream(
+                prompt=prompt,
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                system_message=system_message
+            )
+            try:
+                async for chunk in stream:
+                    if not parser.feed(chunk):
+                        continue
+                    if parser.complete:
+                        break
+                    if required_keys:
+                        partial = parser.partial()
+                        if partial is not None and all(k in partial for k in required_keys):
+                            # 必需字段已就绪：提前结束（不缓存不完整的结果）
+                            self._json_stats["early_stops"] += 1
+                            self._json_stats["parsed"] += 1
+                            logger.info(f"必需字段已就绪，提前结束流式输出: {required_keys}")
+                            return partial
+            finally:
+                await stream.aclose()
+            
+            try:
+                result, repaired = parser.result()
+            except ValueError as e:
+                if attempt < max_reasks:
+                    self._json_stats["reasks"] += 1
+                    logger.warning(f"JSON无法在本地修复，重新请求({attempt + 1}/{max_reasks}): {e}")
+                    continue
+                self._json_stats["failures"] += 1
+                logger.error(f"JSON解析失败: {e}, 原始响应: {parser.buffer[:200]}...")
+                raise
+            
+            self._json_stats["parsed"] += 1
+            if repaired:
+                self._json_stats["repairs"] += 1
+                logger.info("流式JSON输出已在本地修复")
+            
+            if self.enable_cache:
+                await self.cache.set(
+                    cache_key, json.dumps(result, ensure_ascii=False), cache_ttl, tags=self._cache_tags(template=template)
+                )
+            return result
+    
+    def _parse_json(self, text: str) -> Any:
+        """解析JSON响应并记录本地修复次数（内部方法）"""
+        try:
+            result, repaired = parse_json_response(text)
+        except ValueError:
+            self._json_stats["failures"] += 1
+            raise
+        self._json_stats["parsed"] += 1
+        if repaired:
+            self._json_stats["repairs"] += 1
+            logger.info("JSON响应已在本地修复")
+        return result
     
     async def generate_stream(
         self,
@@ -342,7 +731,7 @@ class DeepSeekR1Client:
             LLMException: LLM调用失败
         """
         model = model or self.model
-        system_message = system_message or "你是一个专业的HR岗位分析专家。"
+        system_message = system_message or DEFAULT_SYSTEM_MESSAGE
         
         # 构建消息
         messages = [
@@ -350,20 +739,35 @@ class DeepSeekR1Client:
             {"role": "user", "content": prompt}
         ]
         
-        # 调用API（流式）
-        logger.info(f"流式调用DeepSeek-R1: model={model}")
-        stream = await self._call_api(
-            messages=messages,
-            model=model,
-            temperature=temperature,
-            max_tokens=max_tokens,
-            stream=True
-        )
+        prompt_tokens = self._check_prompt_budget(prompt, system_message, max_tokens)
+        estimated_tokens = prompt_tokens + max_tokens
+        completion_parts: List[str] = []
         
-        # 逐块返回
-        async for chunk in stream:
-            if chunk.choices[0].delta.content:
-                yield chunk.choices[0].delta.content
+        # 流式调用同样占用并发许可，直到流结束或调用方提前关闭
+        async with self.rate_limiter.slot(estimated_tokens):
+            # 调用API（流式）
+            logger.info(f"流式调用DeepSeek-R1: model={model}")
+            stream = await self._call_api(
+                messages=messages,
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                stream=True
+            )
+            
+            # 逐块返回（调用方提前结束时关闭HTTP流，停止继续生成）
+            try:
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        completion_parts.append(chunk.choices[0].delta.content)
+                        yield chunk.choices[0].delta.content
+            finally:
+                close = getattr(stream, "close", None)
+                if close is not None:
+                    await close()
+                # 提前关闭的流同样计入已生成部分的用量
+                self.token_usage.record(prompt_tokens, completion_text="".join(completion_parts))
+            self.rate_limiter.record_success(estimated_tokens)
     
     async def batch_generate(
         self,
@@ -372,7 +776,9 @@ class DeepSeekR1Client:
         temperature: float = 0.7,
         max_tokens: int = 4000,
         system_message: Optional[str] = None,
-        max_concurrent: int = 5
+        max_concurrent: int = 5,
+        priority: Optional[LLMPriority] = LLMPriority.BATCH,
+        batch_id: Optional[str] = None
     ) -> List[str]:
         """批量生成文本响应
         
@@ -383,6 +789,8 @@ class DeepSeekR1Client:
             max_tokens: 最大生成token数
             system_message: 系统消息
             max_concurrent: 最大并发数
+            priority: 调度优先级，默认为批量
+            batch_id: 批次ID，默认为本次调用生成一个
             
         Returns:
             生成的文本列表（顺序与输入一致）
@@ -391,6 +799,14 @@ class DeepSeekR1Client:
             LLMException: LLM调用失败
         """
         logger.info(f"批量调用DeepSeek-R1: count={len(prompts)}, max_concurrent={max_concurrent}")
+        batch_id = batch_id or f"batch_{uuid.uuid4().hex[:8]}"
+        
+        # 一次批量读取缓存，只为未命中的提示词调用API
+        results: List[Any] = [None] * len(prompts)
+        cached = await self._probe_cache(prompts, model, temperature, max_tokens, system_message)
+        for i, cached_result in cached.items():
+            results[i] = cached_result
+        misses = [i for i in range(len(prompts)) if i not in cached]
         
         # 创建信号量控制并发
         semaphore = asyncio.Semaphore(max_concurrent)
@@ -402,12 +818,15 @@ class DeepSeekR1Client:
                     model=model,
                     temperature=temperature,
                     max_tokens=max_tokens,
-                    system_message=system_message
+                    system_message=system_message,
+                    priority=priority,
+                    batch_id=batch_id
                 )
         
         # 并发执行
-        tasks = [generate_with_semaphore(prompt) for prompt in prompts]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        tasks = [generate_with_semaphore(prompts[i]) for i in misses]
+        for i, result in zip(misses, await asyncio.gather(*tasks, return_exceptions=True)):
+            results[i] = result
         
         # 处理异常
         processed_results = []
@@ -418,7 +837,10 @@ class DeepSeekR1Client:
             else:
                 processed_results.append(result)
         
-        logger.info(f"批量调用完成: 成功={sum(1 for r in results if not isinstance(r, Exception))}/{len(prompts)}")
+        logger.info(
+            f"批量调用完成: 成功={sum(1 for r in results if not isinstance(r, Exception))}/{len(prompts)}, "
+            f"缓存命中={len(cached)}"
+        )
         return processed_results
     
     async def batch_generate_json(
@@ -428,22 +850,66 @@ class DeepSeekR1Client:
         temperature: float = 0.7,
         max_tokens: int = 4000,
         system_message: Optional[str] = None,
-        max_concurrent: int = 5
+        max_concurrent: int = 5,
+        priority: Optional[LLMPriority] = LLMPriority.BATCH,
+        batch_id: Optional[str] = None,
+        pack_instruction: Optional[str] = None,
+        pack_size: int = 1,
+        pack_item_label: str = "JD",
+        validator: Optional[Callable[[Dict[str, Any]], bool]] = None
     ) -> List[Dict[str, Any]]:
         """批量生成JSON格式响应
         
         Args:
-            prompts: 提示词列表
+            prompts: 提示词列表；打包模式下为各条目的数据（如JD文本）
             model: 模型名称
             temperature: 温度参数
-            max_tokens: 最大生成token数
+            max_tokens: 最大生成token数（打包模式下为单个条目的预算）
             system_message: 系统消息
             max_concurrent: 最大并发数
+            priority: 调度优先级，默认为批量
+            batch_id: 批次ID，默认为本次调用生成一个
+            pack_instruction: 共享指令，提供且pack_size>1时启用打包模式
+            pack_size: 每次调用打包的条目数
+            pack_item_label: 条目名称（如"岗位JD"）
+            validator: 单条结果校验函数，校验失败的条目回退为单独调用
             
         Returns:
-            解析后的JSON对象列表
+            解析后的JSON对象列表（顺序与输入一致，失败项为{"error": ...}）
         """
         logger.info(f"批量JSON调用DeepSeek-R1: count={len(prompts)}")
+        batch_id = batch_id or f"batch_{uuid.uuid4().hex[:8]}"
+        
+        if pack_instruction and pack_size > 1:
+            results = await self.generate_json_packed(
+                instruction=pack_instruction,
+                items=prompts,
+                item_label=pack_item_label,
+                validator=validator,
+                pack_size=pack_size,
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                system_message=system_message,
+                max_concurrent=max_concurrent,
+                priority=priority,
+                batch_id=batch_id
+            )
+            return [
+                {"error": str(r)} if isinstance(r, Exception) else r
+                for r in results
+            ]
+        
+        # 一次批量读取缓存，只为未命中（或缓存内容无法解析）的提示词调用API
+        results: List[Dict[str, Any]] = [None] * len(prompts)
+        cached = await self._probe_cache(prompts, model, temperature, max_tokens, system_message)
+        for i, cached_result in cached.items():
+            try:
+                results[i] = self._parse_json(cached_result)
+            except ValueError:
+                pass
+        misses = [i for i, result in enumerate(results) if result is None]
+        logger.info(f"批量JSON缓存命中: {len(prompts) - len(misses)}/{len(prompts)}")
         
         # 创建信号量控制并发
         semaphore = asyncio.Semaphore(max_concurrent)
@@ -456,23 +922,390 @@ class DeepSeekR1Client:
                         model=model,
                         temperature=temperature,
                         max_tokens=max_tokens,
-                        system_message=system_message
+                        system_message=system_message,
+                        priority=priority,
+                        batch_id=batch_id
                     )
                 except Exception as e:
                     logger.error(f"JSON生成失败: {e}")
                     return {"error": str(e)}
         
         # 并发执行
-        tasks = [generate_json_with_semaphore(prompt) for prompt in prompts]
-        results = await asyncio.gather(*tasks)
+        tasks = [generate_json_with_semaphore(prompts[i]) for i in misses]
+        for i, result in zip(misses, await asyncio.gather(*tasks)):
+            results[i] = result
+        
+        return results
+    
+    async def generate_json_packed(
+        self,
+        instruction: str,
+        items: List[str],
+        item_label: str = "JD",
+        validator: Optional[Callable[[Dict[str, Any]], bool]] = None,
+        pack_size: int = 5,
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 4000,
+        system_message: Optional[str] = None,
+        max_concurrent: int = 5,
+        priority: Optional[LLMPriority] = LLMPriority.BATCH,
+        batch_id: Optional[str] = None
+    ) -> List[Any]:
+        """打包生成JSON（多个短条目合并为一次调用）
+        
+        1. 按单条目提示词的缓存键逐个查缓存，只打包未命中的条目
+        2. 每pack_size个条目构建一个带ID的打包提示词，响应按ID拆分
+        3. 缺失、ID不匹配或校验失败的条目回退为单独调用
+        4. 打包得到的单条结果按单条目提示词写入缓存，与单独调用共用
+        
+        Args:
+            instruction: 共享指令（描述单个条目的处理要求和返回格式）
+            items: 条目数据列表
+            item_label: 条目名称
+            validator: 单条结果校验函数
+            pack_size: 每次调用打包的条目数
+            model: 模型名称
+            temperature: 温度参数
+            max_tokens: 单个条目的最大生成token数
+            system_message: 系统消息
+            max_concurrent: 打包调用的最大并发数
+            priority: 调度优先级
+            batch_id: 批次ID
+            
+        Returns:
+            结果列表（顺序与输入一致），失败项为异常对象
+        """
+        model = model or self.model
+        system_message = system_message or DEFAULT_SYSTEM_MESSAGE
+        item_prompts = [compose_item_prompt(instruction, item, item_label) for item in items]
+        # 所有条目共用指令，属于同一个模板
+        template = self.prompt_registry.match(instruction)
+        item_keys = [
+            LLMCache.generate_cache_key(
+                prompt=item_prompt,
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                system_message=system_message,
+                template=_template_ref(template)
+            )
+            for item_prompt in item_prompts
+        ]
+        if template is not None:
+            for item_prompt in item_prompts:
+                self.prompt_history.record(
+                    template, item_prompt,
+                    model=model, temperature=temperature, max_tokens=max_tokens, system_message=system_message
+                )
+        
+        def is_valid(result: Any) -> bool:
+            return isinstance(result, dict) and (validator is None or validator(result))
+        
+        tags = self._cache_tags(template=template)
+        results: List[Any] = [None] * len(items)
+        pending: List[int] = []
+        cached_results = await self.cache.get_many(item_keys) if self.enable_cache else {}
+        for i, cache_key in enumerate(item_keys):
+            cached = cached_results.get(cache_key)
+            if cached:
+                try:
+                    result = self._parse_json(cached)
+                except ValueError:
+                    result = None
+                if is_valid(result):
+                    results[i] = result
+                    self._pack_stats["cache_hits"] += 1
+                    continue
+            pending.append(i)
+        
+        packs = [pending[k:k + pack_size] for k in range(0, len(pending), pack_size)]
+        fallback: List[int] = []
+        semaphore = asyncio.Semaphore(max_concurrent)
+        
+        async def run_pack(indices: List[int]) -> None:
+            _record_prompt_history.set(False)  # 条目已记录，打包提示词不计入历史输入
+            if len(indices) == 1:
+                fallback.extend(indices)
+                return
+            
+            ids = [f"item_{i + 1}" for i in indices]
+            packed_prompt = build_packed_prompt(
+                instruction, [(item_id, items[i]) for item_id, i in zip(ids, indices)], item_label
+            )
+            async with semaphore:
+                try:
+                    data = await self.generate_json(
+                        prompt=packed_prompt,
+                        model=model,
+                        temperature=temperature,
+                        max_tokens=min(max_tokens * len(indices), settings.LLM_PACK_MAX_TOKENS),
+                        system_message=system_message,
+                        priority=priority,
+                        batch_id=batch_id
+                    )
+                except Exception as e:
+                    logger.warning(f"打包调用失败，{len(indices)}个条目回退为单独调用: {e}")
+                    fallback.extend(indices)
+                    return
+            
+            self._pack_stats["packed_calls"] += 1
+            mapping = split_packed_response(data, ids)
+            for item_id, i in zip(ids, indices):
+                result = mapping.get(item_id)
+                if not is_valid(result):
+                    fallback.append(i)
+                    continue
+                results[i] = result
+                self._pack_stats["packed_items"] += 1
+                if self.enable_cache:
+                    await self.cache.set(item_keys[i], json.dumps(result, ensure_ascii=False), tags=tags)
+        
+        await asyncio.gather(*[run_pack(indices) for indices in packs])
+        
+        if fallback:
+            self._pack_stats["fallbacks"] += len(fallback)
+            logger.info(f"打包结果中{len(fallback)}个条目回退为单独调用")
+            
+            async def run_single(i: int) -> None:
+                _record_prompt_history.set(False)
+                async with semaphore:
+                    try:
+                        results[i] = await self.generate_json(
+                            prompt=item_prompts[i],
+                            model=model,
+                            temperature=temperature,
+                            max_tokens=max_tokens,
+                            system_message=system_message,
+                            priority=priority,
+                            batch_id=batch_id
+                        )
+                    except Exception as e:
+                        logger.error(f"单独调用失败: {e}")
+                        results[i] = e
+            
+            await asyncio.gather(*[run_single(i) for i in sorted(fallback)])
         
         return results
     
+    def _cache_tags(
+        self,
+        extra: Optional[List[str]] = None,
+        template: Optional[PromptTemplate] = None
+    ) -> List[str]:
+        """当前调用链的缓存标签：所属Agent + 模板ID和版本 + llm_cache_tags_scope + 额外标签（内部方法）"""
+        agent = get_current_agent()
+        tags = [cache_tag("agent", agent)] if agent else []
+        if template is not None:
+            tags.append(cache_tag("template", template.template_id))
+            tags.append(cache_tag("template", template.ref))
+        tags.extend(get_current_cache_tags())
+        tags.extend(extra or ())
+        return list(dict.fromkeys(tags))
+    
+    def _record_template(
+        self,
+        prompt: str,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        system_message: str
+    ) -> Optional[PromptTemplate]:
+        """识别提示词所属的模板并记录到历史输入（内部方法）"""
+        template = self.prompt_registry.match(prompt)
+        if template is not None and _record_prompt_history.get():
+            self.prompt_history.record(
+                template, prompt,
+                model=model, temperature=temperature, max_tokens=max_tokens, system_message=system_message
+            )
+        return template
+    
+    def build_cache_key(
+        self,
+        prompt: str,
+        model: Optional[str] = None,
+        temperature: float = 0.7,
+        max_tokens: int = 4000,
+        system_message: Optional[str] = None
+    ) -> str:
+        """计算generate对该提示词和参数使用的缓存键（包含模板ID和版本）"""
+        return LLMCache.generate_cache_key(
+            prompt=prompt,
+            model=model or self.model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            system_message=system_message or DEFAULT_SYSTEM_MESSAGE,
+            template=_template_ref(self.prompt_registry.match(prompt))
+        )
+    
+    async def invalidate_cache_tag(self, tag: str) -> int:
+        """删除带有该标签的所有缓存结果（如修改解析提示词后失效agent:parser）
+        
+        Args:
+            tag: 标签，可用cache_tag("company", company_id)等构建
+        
+        Returns:
+            删除的缓存条目数
+        """
+        count = await self.cache.invalidate_tag(tag)
+        logger.info(f"LLM缓存按标签失效: {tag}, {count}个条目")
+        return count
+    
+    async def _probe_cache(
+        self,
+        prompts: List[str],
+        model: Optional[str],
+        temperature: float,
+        max_tokens: int,
+        system_message: Optional[str]
+    ) -> Dict[int, str]:
+        """一次批量读取多个提示词的缓存结果（内部方法）
+        
+        Returns:
+            {提示词序号: 缓存结果}，未启用缓存时为空
+        """
+        if not self.enable_cache or not prompts:
+            return {}
+        
+        model = model or self.model
+        system_message = system_message or DEFAULT_SYSTEM_MESSAGE
+        cache_keys = [
+            LLMCache.generate_cache_key(
+                prompt=prompt,
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                system_message=system_message,
+                template=_template_ref(self.prompt_registry.match(prompt))
+            )
+            for prompt in prompts
+        ]
+        cached = await self.cache.get_many(cache_keys)
+        return {i: cached[key] for i, key in enumerate(cache_keys) if cached.get(key)}
+    
+    def _check_prompt_budget(self, prompt: str, system_message: str, max_tokens: int) -> int:
+        """调度前估算提示词token数并检查预算（内部方法）
+        
+        超过LLM_PROMPT_TOKEN_BUDGET时记录告警；提示词加最大输出超过LLM_CONTEXT_WINDOW_TOKENS时
+        直接失败，避免一次必然被API拒绝的调用占用并发许可和重试
+        
+        Returns:
+            估算的提示词token数
+            
+        Raises:
+            LLMException: 超出模型上下文长度
+        """
+        prompt_tokens = estimate_tokens(system_message) + estimate_tokens(prompt)
+        budget = settings.LLM_PROMPT_TOKEN_BUDGET
+        if budget and prompt_tokens > budget:
+            self.token_usage.record_over_budget()
+            logger.warning(f"提示词超出预算: 估算{prompt_tokens} tokens > {budget}")
+        
+        context_window = settings.LLM_CONTEXT_WINDOW_TOKENS
+        if context_window and prompt_tokens + max_tokens > context_window:
+            raise LLMException(
+                f"提示词超出模型上下文长度: 估算{prompt_tokens} + max_tokens {max_tokens} > {context_window}"
+            )
+        return prompt_tokens
+    
+    def _record_usage(self, prompt_tokens: int, response: Any, result: str) -> None:
+        """记录一次调用的token用量（内部方法）"""
+        usage = getattr(response, "usage", None)
+        actual_prompt = getattr(usage, "prompt_tokens", None)
+        actual_completion = getattr(usage, "completion_tokens", None)
+        cached_tokens = _get_cached_tokens(usage)
+        self.token_usage.record(
+            prompt_tokens,
+            prompt_tokens=actual_prompt if isinstance(actual_prompt, int) else None,
+            completion_tokens=actual_completion if isinstance(actual_completion, int) else None,
+            completion_text=result or "",
+            cached_prompt_tokens=cached_tokens
+        )
+        if cached_tokens is not None:
+            logger.debug(f"服务端前缀缓存: 命中{cached_tokens}/{actual_prompt} 输入token")
+    
+    def get_packing_stats(self) -> Dict[str, Any]:
+        """获取打包统计（打包调用次数、打包完成的条目数、缓存命中、回退为单独调用的条目数）"""
+        return {
+            "enabled": self.packer is not None,
+            "pack_size": self.packer.pack_size if self.packer else 1,
+            **self._pack_stats
+        }
+    
     async def get_cache_stats(self) -> Dict[str, Any]:
         """获取缓存统计信息"""
         stats = await self.cache.get_stats()
         stats["enabled"] = self.enable_cache
+        stats["single_flight"] = (
+            self.single_flight.get_stats() if self.single_flight is not None
+            else {"mode": "local"}
+        )
         return stats
+    
+    def get_json_stats(self) -> Dict[str, Any]:
+        """获取JSON解析统计（本地修复次数 vs 重新请求次数）"""
+        parsed = self._json_stats["parsed"]
+        return {
+            **self._json_stats,
+            "repair_rate": f"{self._json_stats['repairs'] / parsed:.2%}" if parsed else "0.00%"
+        }
+    
+    def get_token_stats(self) -> Dict[str, Any]:
+        """获取token用量统计（总量、费用、超预算次数、按Agent的累计用量）"""
+        return self.token_usage.get_stats()
+    
+    def get_connection_stats(self) -> Dict[str, Any]:
+        """获取HTTP连接复用统计（新建连接数、复用连接数、连接池等待时间）"""
+        return self.connection_metrics.get_stats()
+    
+    def get_hedge_stats(self) -> Optional[Dict[str, Any]]:
+        """获取请求对冲统计（对冲次数、胜出/落败次数、当前对冲延迟），未启用时返回None"""
+        return self.hedger.get_stats() if self.hedger is not None else None
+    
+    def get_circuit_stats(self) -> Optional[Dict[str, Any]]:
+        """获取熔断器状态（状态、窗口错误率、快速失败和返回过期缓存次数），未启用时返回None"""
+        if self.circuit_breaker is None:
+            return None
+        return {**self.circuit_breaker.get_stats(), **self._circuit_stats}
+    
+    def get_rate_limit_stats(self) -> Dict[str, Any]:
+        """获取限流统计信息（当前并发上限、排队深度、RPM/TPM余量）"""
+        return self.rate_limiter.get_stats()
+    
+    def get_prompt_stats(self) -> Dict[str, Any]:
+        """获取提示词模板统计（已注册的模板版本、各版本的调用次数和历史输入数）"""
+        return {
+            "registered": self.prompt_registry.get_stats(),
+            "history": self.prompt_history.get_stats()
+        }
+
+
+def _get_cached_tokens(usage: Any) -> Optional[int]:
+    """从usage中读取服务端前缀缓存命中的输入token数
+    
+    DeepSeek返回prompt_cache_hit_tokens，OpenAI返回prompt_tokens_details.cached_tokens，都没有时返回None
+    """
+    hit_tokens = getattr(usage, "prompt_cache_hit_tokens", None)
+    if isinstance(hit_tokens, int):
+        return hit_tokens
+    details = getattr(usage, "prompt_tokens_details", None)
+    if isinstance(details, dict):
+        cached_tokens = details.get("cached_tokens")
+    else:
+        cached_tokens = getattr(details, "cached_tokens", None)
+    return cached_tokens if isinstance(cached_tokens, int) else None
+
+
+def _template_ref(template: Optional[PromptTemplate]) -> Optional[str]:
+    """模板引用"ID@版本"，提示词不属于任何已注册模板时为None"""
+    return template.ref if template is not None else None
+
+
+def _get_total_tokens(response: Any) -> Optional[int]:
+    """从API响应中读取实际消耗的token数"""
+    usage = getattr(response, "usage", None)
+    total_tokens = getattr(usage, "total_tokens", None)
+    return total_tokens if isinstance(total_tokens, int) else None
 
 
 # 全局DeepSeek-R1客户端实例
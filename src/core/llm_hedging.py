@@ -0,0 +1,215 @@
+"""LLM请求对冲（hedged requests）
+
+单次慢响应决定了接口的p99延迟。对冲策略：请求发出后等待一个按历史延迟分位数计算的时间，
+若仍未返回，则再发一个相同的请求，取先返回的结果并取消另一个。
+
+- 对冲延迟：最近N次调用延迟的第P百分位（不低于min_delay），样本不足时不对冲
+- 额外花费上限：对冲请求的预估token数不超过主请求预估token数的max_extra_ratio
+- 被取消或落败的请求同样计费，通过on_discard回调交给调用方记录用量
+- 统计：对冲次数、对冲胜出（对冲请求先返回）/落败（主请求先返回）、因预算或并发/限流跳过的次数
+"""
+
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class RequestHedger:
+    """请求对冲器"""
+    
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        min_delay: float = 0.5,
+        max_extra_ratio: float = 0.05,
+        min_samples: int = 20,
+        window: int = 500
+    ):
+        """初始化请求对冲器
+        
+        Args:
+            percentile: 触发对冲的延迟分位数（0-100）
+            min_delay: 最短对冲延迟（秒），避免延迟分布很窄时频繁对冲
+            max_extra_ratio: 对冲请求预估token数占主请求预估token数的上限（如0.05表示最多多花5%）
+            min_samples: 开始对冲前需要的最少延迟样本数
+            window: 参与分位数计算的最近延迟样本数
+        """
+        self.percentile = min(max(percentile, 0.0), 100.0)
+        self.min_delay = max(0.0, min_delay)
+        self.max_extra_ratio = max(0.0, max_extra_ratio)
+        self.min_samples = max(1, min_samples)
+        self._latencies: Deque[float] = deque(maxlen=max(window, self.min_samples))
+        
+        self._requests = 0
+        self._requested_tokens = 0
+        self._hedged = 0
+        self._hedged_tokens = 0
+        self._hedge_wins = 0
+        self._hedge_losses = 0
+        self._skipped_budget = 0
+        self._skipped_capacity = 0
+        self._hedge_failures = 0
+    
+    def record_latency(self, latency: float) -> None:
+        """记录一次调用的延迟（秒）"""
+        self._latencies.append(latency)
+    
+    def hedge_delay(self) -> Optional[float]:
+        """当前的对冲延迟（秒），样本不足时返回None"""
+        if len(self._latencies) < self.min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, max(0, math.ceil(len(ordered) * self.percentile / 100) - 1))
+        return max(self.min_delay, ordered[index])
+    
+    def _has_budget(self, estimated_tokens: int) -> bool:
+        """对冲后的额外token比例是否仍在上限内（内部方法）"""
+        return self._hedged_tokens + estimated_tokens <= self._requested_tokens * self.max_extra_ratio
+    
+    async def run(
+        self,
+        call: Callable[[], Awaitable[T]],
+        acquire_extra: Optional[Callable[[], bool]] = None,
+        release_extra: Optional[Callable[[], None]] = None,
+        estimated_tokens: int = 1,
+        on_discard: Optional[Callable[[Optional[T]], None]] = None
+    ) -> T:
+        """执行调用，超过对冲延迟仍未返回时发出对冲请求
+        
+        Args:
+            call: 发起一次调用的函数（主请求和对冲请求各调用一次）
+            acquire_extra: 非阻塞地为对冲请求获取额外资源（如并发许可、RPM/TPM令牌），返回False时不对冲
+            release_extra: 释放acquire_extra获取的资源
+            estimated_tokens: 单次调用的预估token数，用于额外花费上限（默认按请求数计算）
+            on_discard: 对冲后未被采用的请求的回调：已返回时传入其结果，被取消时传入None
+                （该请求已计费，调用方据此记录用量）；请求失败时不回调
+        
+        Returns:
+            先成功返回的结果；两个请求都失败时抛出主请求的异常
+        """
+        self._requests += 1
+        self._requested_tokens += estimated_tokens
+        delay = self.hedge_delay()
+        started = time.perf_counter()
+        primary = asyncio.ensure_future(call())
+        
+        if delay is None:
+            return await self._await_primary(primary, started)
+        
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+        except asyncio.CancelledError:
+            primary.cancel()
+            raise
+        if done:
+            return await self._await_primary(primary, started)
+        
+        if not self._has_budget(estimated_tokens):
+            self._skipped_budget += 1
+            return await self._await_primary(primary, started)
+        if acquire_extra is not None and not acquire_extra():
+            self._skipped_capacity += 1
+            return await self._await_primary(primary, started)
+        
+        self._hedged += 1
+        self._hedged_tokens += estimated_tokens
+        hedge_started = time.perf_counter()
+        hedge = asyncio.ensure_future(call())
+        logger.info(f"LLM请求超过对冲延迟{delay * 1000:.0f}ms，发出对冲请求")
+        
+        winner = None
+        try:
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in done if task.exception() is None), None)
+                if winner is None:
+                    continue
+                
+                if winner is hedge:
+                    self._hedge_wins += 1
+                    self.record_latency(time.perf_counter() - hedge_started)
+                    # 主请求被取消，已等待的时间作为其延迟的下限，避免分位数被低估
+                    self.record_latency(time.perf_counter() - started)
+                else:
+                    self._hedge_losses += 1
+                    self.record_latency(time.perf_counter() - started)
+                return winner.result()
+            
+            self._hedge_failures += 1
+            return primary.result()
+        finally:
+            for task in (primary, hedge):
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(primary, hedge, return_exceptions=True)
+            if release_extra is not None:
+                release_extra()
+            if winner is not None and on_discard is not None:
+                self._discard(hedge if winner is primary else primary, on_discard)
+    
+    @staticmethod
+    def _discard(task: "asyncio.Future[T]", on_discard: Callable[[Optional[T]], None]) -> None:
+        """把未被采用的请求交给调用方记录用量（内部方法）"""
+        if task.cancelled():
+            on_discard(None)
+        elif task.exception() is None:
+            on_discard(task.result())
+    
+    async def _await_primary(self, primary: "asyncio.Future[T]", started: float) -> T:
+        """等待主请求（未对冲）（内部方法）"""
+        try:
+            result = await primary
+        except asyncio.CancelledError:
+            primary.cancel()
+            raise
+        self.record_latency(time.perf_counter() - started)
+        return result
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        delay = self.hedge_delay()
+        decided = self._hedge_wins + self._hedge_losses
+        return {
+            "requests": self._requests,
+            "hedged": self._hedged,
+            "hedge_rate": f"{self._hedged / self._requests:.2%}" if self._requests else "0.00%",
+            "hedged_tokens": self._hedged_tokens,
+            "extra_token_ratio": (
+                f"{self._hedged_tokens / self._requested_tokens:.2%}" if self._requested_tokens else "0.00%"
+            ),
+            "max_extra_ratio": f"{self.max_extra_ratio:.2%}",
+            "hedge_wins": self._hedge_wins,
+            "hedge_losses": self._hedge_losses,
+            "win_rate": f"{self._hedge_wins / decided:.2%}" if decided else "0.00%",
+            "hedge_failures": self._hedge_failures,
+            "skipped_budget": self._skipped_budget,
+            "skipped_capacity": self._skipped_capacity,
+            "hedge_delay_ms": round(delay * 1000, 2) if delay is not None else None,
+            "samples": len(self._latencies)
+        }
+
+
+def create_hedger_from_settings() -> Optional[RequestHedger]:
+    """根据配置创建请求对冲器
+    
+    LLM_HEDGE_ENABLED为False时返回None（不对冲）
+    """
+    from .config import settings
+    
+    if not settings.LLM_HEDGE_ENABLED:
+        return None
+    
+    return RequestHedger(
+        percentile=settings.LLM_HEDGE_PERCENTILE,
+        min_delay=settings.LLM_HEDGE_MIN_DELAY_MS / 1000,
+        max_extra_ratio=settings.LLM_HEDGE_MAX_EXTRA_PERCENT / 100,
+        min_samples=settings.LLM_HEDGE_MIN_SAMPLES
+    )
@@ -0,0 +1,184 @@
+"""LLM HTTP连接池
+
+AsyncOpenAI默认为每个客户端创建一个使用默认参数的httpx连接池，批量负载下连接数不受控、
+空闲连接过早关闭，导致反复TCP/TLS握手。本模块提供：
+1. create_llm_http_client - 创建共享的httpx.AsyncClient（HTTP/2、连接池上限、keep-alive过期时间）
+2. ConnectionMetrics - 连接复用统计（新建连接数、复用连接数、连接池等待时间、握手耗时）
+3. InstrumentedTransport - 通过httpcore的trace扩展采集上述统计
+
+HTTP/2依赖h2包（pip install httpx[http2]），未安装时自动回退到HTTP/1.1 keep-alive。
+"""
+
+import logging
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class ConnectionMetrics:
+    """连接复用统计"""
+    
+    def __init__(self):
+        self.reset()
+    
+    def reset(self) -> None:
+        """清空统计"""
+        self.requests = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+        self.failed_requests = 0
+        self.total_pool_wait = 0.0
+        self.max_pool_wait = 0.0
+        self.total_connect_time = 0.0
+        self.http_versions: Dict[str, int] = {}
+    
+    def record(
+        self,
+        new_connection: bool,
+        pool_wait: float,
+        connect_time: float = 0.0
+    ) -> None:
+        """记录一次请求获取连接的情况
+        
+        Args:
+            new_connection: 是否新建了连接
+            pool_wait: 等待连接池分配连接的时间（秒，不含握手）
+            connect_time: 新建连接的TCP/TLS握手耗时（秒）
+        """
+        if new_connection:
+            self.new_connections += 1
+            self.total_connect_time += connect_time
+        else:
+            self.reused_connections += 1
+        self.total_pool_wait += pool_wait
+        self.max_pool_wait = max(self.max_pool_wait, pool_wait)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        acquired = self.new_connections + self.reused_connections
+        return {
+            "requests": self.requests,
+            "failed_requests": self.failed_requests,
+            "new_connections": self.new_connections,
+            "reused_connections": self.reused_connections,
+            "reuse_rate": f"{self.reused_connections / acquired:.2%}" if acquired else "0.00%",
+            "avg_pool_wait_ms": round(self.total_pool_wait / acquired * 1000, 2) if acquired else 0,
+            "max_pool_wait_ms": round(self.max_pool_wait * 1000, 2),
+            "avg_connect_time_ms": (
+                round(self.total_connect_time / self.new_connections * 1000, 2)
+                if self.new_connections else 0
+            ),
+            "http_versions": dict(self.http_versions)
+        }
+
+
+class _RequestTrace:
+    """单次请求的httpcore trace回调（内部使用）
+    
+    事件顺序：
+    - 新建连接：connection.connect_tcp.started -> ... -> http11/http2.send_request_headers.started
+    - 复用连接：直接 http11/http2.send_request_headers.started
+    """
+    
+    def __init__(self, metrics: ConnectionMetrics):
+        self.metrics = metrics
+        self.started_at = time.perf_counter()
+        self.connect_started: Optional[float] = None
+        self.connect_finished: Optional[float] = None
+        self.recorded = False
+    
+    async def __call__(self, event_name: str, info: Dict[str, Any]) -> None:
+        now = time.perf_counter()
+        if event_name == "connection.connect_tcp.started":
+            self.connect_started = now
+        elif event_name in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+            self.connect_finished = now
+        elif event_name.endswith(".send_request_headers.started") and not self.recorded:
+            # 重试（如HTTP/2连接被服务端关闭）时只记录第一次获取连接
+            self.recorded = True
+            if self.connect_started is not None:
+                self.metrics.record(
+                    new_connection=True,
+                    pool_wait=self.connect_started - self.started_at,
+                    connect_time=(self.connect_finished or now) - self.connect_started
+                )
+            else:
+                self.metrics.record(new_connection=False, pool_wait=now - self.started_at)
+
+
+class InstrumentedTransport(httpx.AsyncHTTPTransport):
+    """采集连接复用统计的httpx传输层"""
+    
+    def __init__(self, metrics: ConnectionMetrics, **kwargs):
+        """初始化传输层
+        
+        Args:
+            metrics: 统计对象
+            **kwargs: 传给httpx.AsyncHTTPTransport的参数（http2、limits等）
+        """
+        super().__init__(**kwargs)
+        self.metrics = metrics
+    
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        """发送请求，并通过trace扩展记录连接获取情况"""
+        self.metrics.requests += 1
+        request.extensions = {**request.extensions, "trace": _RequestTrace(self.metrics)}
+        try:
+            response = await super().handle_async_request(request)
+        except Exception:
+            self.metrics.failed_requests += 1
+            raise
+        version = response.extensions.get("http_version", b"").decode() or "unknown"
+        self.metrics.http_versions[version] = self.metrics.http_versions.get(version, 0) + 1
+        return response
+
+
+def create_llm_http_client(
+    max_connections: int,
+    keepalive_expiry: float = 30.0,
+    http2: bool = True,
+    timeout: float = 60.0,
+    metrics: Optional[ConnectionMetrics] = None
+) -> httpx.AsyncClient:
+    """创建LLM调用共享的httpx.AsyncClient
+    
+    Args:
+        max_connections: 最大连接数（与LLM并发上限一致，排队在限流器而不是连接池）
+        keepalive_expiry: 空闲连接保持时间（秒），批次之间的短暂空闲不会断开连接
+        http2: 是否启用HTTP/2（未安装h2时回退到HTTP/1.1）
+        timeout: 请求超时时间（秒）
+        metrics: 连接复用统计对象
+    
+    Returns:
+        httpx.AsyncClient实例
+    """
+    if http2 and not HTTP2_AVAILABLE:
+        logger.warning("未安装h2，LLM HTTP连接回退到HTTP/1.1（pip install httpx[http2]）")
+        http2 = False
+    
+    max_connections = max(1, max_connections)
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+        keepalive_expiry=keepalive_expiry
+    )
+    transport = InstrumentedTransport(
+        metrics or ConnectionMetrics(),
+        http2=http2,
+        limits=limits
+    )
+    
+    logger.info(
+        f"LLM HTTP连接池初始化: http2={http2}, max_connections={max_connections}, "
+        f"keepalive_expiry={keepalive_expiry}s"
+    )
+    return httpx.AsyncClient(transport=transport, timeout=timeout)
@@ -0,0 +1,235 @@
+"""LLM JSON响应解析与修复
+
+generate_json原先在拿到完整响应后按```切分再json.loads，任何格式问题（未闭合的代码块、
+输出被max_tokens截断、多余的尾逗号、JSON前后的说明文字）都会导致调用方重新生成。
+本模块提供：
+1. parse_json_response - 提取并解析JSON，失败时在本地修复常见问题（无需再次付费调用）
+2. IncrementalJSONParser - 流式增量解析，跟踪已完成的顶层字段，支持提前结束
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# 代码块起始标记（```json / ```JSON / ```）
+_FENCE_START = re.compile(r"```[a-zA-Z]*\s*")
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+# 截断修复时最多回退的次数
+_MAX_REPAIR_ATTEMPTS = 20
+
+
+def strip_code_fence(text: str) -> str:
+    """去除markdown代码块标记（兼容未闭合的代码块）"""
+    start = text.find("```")
+    if start == -1:
+        return text.strip()
+    body = text[_FENCE_START.match(text, start).end():]
+    end = body.find("```")
+    return (body if end == -1 else body[:end]).strip()
+
+
+class _ScanState:
+    """JSON文本扫描结果（内部使用）"""
+    
+    __slots__ = ("end", "stack", "in_string", "cut_points")
+    
+    def __init__(self, end: Optional[int], stack: List[str], in_string: bool, cut_points: List[int]):
+        self.end = end  # 顶层值结束的位置，未结束为None
+        self.stack = stack  # 未闭合的括号对应的闭合字符
+        self.in_string = in_string  # 是否停在字符串内部
+        self.cut_points = cut_points  # 可安全截断的位置（逗号之前、左括号之后）
+
+
+def _scan(text: str) -> _ScanState:
+    """扫描JSON文本的括号和字符串状态（内部方法）"""
+    stack: List[str] = []
+    cut_points: List[int] = []
+    in_string = False
+    escape = False
+    
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+            cut_points.append(i + 1)
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+            if not stack:
+                return _ScanState(i + 1, [], False, cut_points)
+        elif ch == ",":
+            cut_points.append(i)
+    
+    return _ScanState(None, stack, in_string, cut_points)
+
+
+def _close(text: str) -> str:
+    """补齐未闭合的字符串和括号，去除尾逗号（内部方法）"""
+    state = _scan(text)
+    closed = text.rstrip()
+    if state.in_string:
+        closed += '"'
+    closed += "".join(reversed(state.stack))
+    return _TRAILING_COMMA.sub(r"\1", closed)
+
+
+def _repair(body: str) -> Any:
+    """修复截断或格式错误的JSON（内部方法）
+    
+    依次尝试：截掉顶层值之后的多余文本 → 补齐括号 → 回退到上一个完整字段再补齐
+    """
+    state = _scan(body)
+    if state.end is not None:
+        return json.loads(_TRAILING_COMMA.sub(r"\1", body[:state.end]))
+    
+    candidates = [body] + [body[:p] for p in reversed(state.cut_points)]
+    last_error: Optional[json.JSONDecodeError] = None
+    for candidate in candidates[:_MAX_REPAIR_ATTEMPTS]:
+        try:
+            return json.loads(_close(candidate))
+        except json.JSONDecodeError as e:
+            last_error = e
+    raise last_error or json.JSONDecodeError("无法修复的JSON", body, 0)
+
+
+def parse_json_response(text: str) -> Tuple[Any, bool]:
+    """从LLM响应中提取并解析JSON
+    
+    Args:
+        text: LLM原始响应
+    
+    Returns:
+        (解析结果, 是否经过本地修复)
+    
+    Raises:
+        ValueError: 无法解析也无法修复
+    """
+    json_str = strip_code_fence(text)
+    try:
+        return json.loads(json_str), False
+    except json.JSONDecodeError as e:
+        original_error = e
+    
+    # 去掉JSON之前的说明文字
+    starts = [i for i in (json_str.find("{"), json_str.find("[")) if i != -1]
+    if not starts:
+        raise ValueError(f"无法解析JSON响应: {original_error}")
+    
+    try:
+        return _repair(json_str[min(starts):]), True
+    except json.JSONDecodeError:
+        raise ValueError(f"无法解析JSON响应: {original_error}") from original_error
+
+
+class IncrementalJSONParser:
+    """流式JSON增量解析器
+    
+    逐块喂入LLM输出，跟踪顶层对象中已完整输出的字段：
+    - complete: 顶层JSON值已闭合（之后的输出可以丢弃）
+    - partial(): 返回已完整输出的顶层字段组成的对象，用于判断必需字段是否已就绪
+    """
+    
+    def __init__(self):
+        self.buffer = ""
+        self._pos = 0
+        self._start: Optional[int] = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._end: Optional[int] = None
+        self._member_end: Optional[int] = None
+    
+    @property
+    def complete(self) -> bool:
+        """顶层JSON值是否已闭合"""
+        return self._end is not None
+    
+    def feed(self, chunk: str) -> bool:
+        """喂入一段输出
+        
+        Args:
+            chunk: 新的文本片段
+        
+        Returns:
+            是否有新的顶层字段完成（或整个JSON已闭合）
+        """
+        self.buffer += chunk
+        progressed = False
+        
+        while self._pos < len(self.buffer) and self._end is None:
+            i = self._pos
+            ch = self.buffer[i]
+            self._pos += 1
+            
+            if self._start is None:
+                if ch in "{[":
+                    self._start = i
+                    self._depth = 1
+                continue
+            
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._end = i + 1
+                    progressed = True
+            elif ch == "," and self._depth == 1:
+                self._member_end = i
+                progressed = True
+        
+        return progressed
+    
+    def partial(self) -> Optional[Dict[str, Any]]:
+        """已完整输出的顶层字段（顶层不是对象或尚无完整字段时返回None）"""
+        if self._start is None or self.buffer[self._start] != "{":
+            return None
+        if self._end is not None:
+            text = self.buffer[self._start:self._end]
+        elif self._member_end is not None:
+            text = self.buffer[self._start:self._member_end] + "}"
+        else:
+            return None
+        try:
+            result = json.loads(text)
+        except json.JSONDecodeError:
+            return None
+        return result if isinstance(result, dict) else None
+    
+    def result(self) -> Tuple[Any, bool]:
+        """解析当前全部输出（必要时本地修复）
+        
+        Returns:
+            (解析结果, 是否经过本地修复)
+        
+        Raises:
+            ValueError: 无法解析也无法修复
+        """
+        if self._end is not None:
+            try:
+                return json.loads(self.buffer[self._start:self._end]), False
+            except json.JSONDecodeError:
+                pass
+        return parse_json_response(self.buffer)
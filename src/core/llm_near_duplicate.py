@@ -0,0 +1,257 @@
+"""LLM近似重复缓存（基于规范化JD文本）
+
+LLMCache.generate_cache_key对完整提示词做MD5，同一份JD只要空白、项目符号或日期略有不同，
+重新上传时就无法命中缓存。本模块提供可选的规范化 + 近似重复查找层：
+1. normalize_jd_text - 规范化JD文本（空白、全角/半角标点、列表符号）
+2. MinHashLSHIndex - 基于MinHash + LSH分桶查找相似度超过阈值的历史提示词
+
+只对调用方指定的可变文本（如JD原文）做相似度匹配，提示词的其余部分（模板、模型参数）
+必须完全一致（通过命名空间区分），避免不同JD因共享长模板而被误判为重复。
+"""
+
+import hashlib
+import logging
+import random
+import re
+import unicodedata
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+# NFKC之后仍需统一的中文标点
+_PUNCTUATION_MAP = str.maketrans({
+    "。": ".",
+    "、": ",",
+    "“": '"',
+    "”": '"',
+    "‘": "'",
+    "’": "'",
+    "【": "[",
+    "】": "]",
+    "《": "<",
+    "》": ">",
+    "「": '"',
+    "」": '"',
+    "—": "-",
+    "–": "-",
+    "～": "~",
+    "·": " ",
+    "…": "...",
+})
+
+# 行首列表符号：项目符号、1. 1) 1、 (1) ① 一、 等
+_LIST_MARKER = re.compile(
+    r"^\s*(?:"
+    r"[-*•·●○■□◆◇▪►✓√>]+"
+    r"|\d{1,2}\s*[.)、．，,:：]"
+    r"|[(（]\s*\d{1,2}\s*[)）]"
+    r"|[①-⑳]"
+    r"|[一二三四五六七八九十]{1,3}\s*[、.．:：]"
+    r"|[(（]\s*[一二三四五六七八九十]{1,3}\s*[)）]"
+    r")\s*"
+)
+
+_WHITESPACE = re.compile(r"\s+")
+
+# 2^61 - 1（梅森素数），用于MinHash的通用哈希族
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+def normalize_jd_text(text: str) -> str:
+    """规范化JD文本
+    
+    - 去除行首列表符号（•、-、1.、(1)、①、一、等）
+    - 全角字符转半角（NFKC），统一中文标点
+    - 合并连续空白，去除空行，英文转小写
+    
+    Args:
+        text: 原始JD文本
+    
+    Returns:
+        规范化后的文本
+    """
+    lines = []
+    for line in text.splitlines():
+        # NFKC会把①转换为1，因此在转换前后各去除一次列表符号
+        line = _LIST_MARKER.sub("", line)
+        line = unicodedata.normalize("NFKC", line).translate(_PUNCTUATION_MAP)
+        line = _LIST_MARKER.sub("", line)
+        line = _WHITESPACE.sub(" ", line).strip()
+        if line:
+            lines.append(line.lower())
+    return "\n".join(lines)
+
+
+def _shingles(text: str, size: int) -> Set[str]:
+    """字符级n-gram（中文JD没有天然分词，按字符切分）（内部方法）"""
+    text = text.replace("\n", " ")
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def _hash_shingle(shingle: str) -> int:
+    """跨进程稳定的32位哈希（内部方法）"""
+    digest = hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest()
+    return int.from_bytes(digest, "big")
+
+
+class MinHashLSHIndex:
+    """MinHash + LSH近似重复索引
+    
+    特点：
+    - 签名长度 = bands × rows，LSH按band分桶，只对同桶候选计算估计相似度
+    - 按命名空间隔离（同一模板、同一模型参数的提示词才会互相匹配）
+    - 有界：超过max_entries时淘汰最早加入的条目
+    """
+    
+    def __init__(
+        self,
+        threshold: float = 0.9,
+        bands: int = 16,
+        rows: int = 4,
+        shingle_size: int = 3,
+        max_entries: int = 10000,
+        seed: int = 42
+    ):
+        """初始化近似重复索引
+        
+        Args:
+            threshold: 复用缓存所需的最低估计Jaccard相似度（0-1）
+            bands: LSH分桶数
+            rows: 每个band的签名行数
+            shingle_size: 字符n-gram长度
+            max_entries: 最大索引条目数
+            seed: 哈希函数随机种子（多进程必须一致）
+        """
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = rows
+        self.num_perm = bands * rows
+        self.shingle_size = shingle_size
+        self.max_entries = max_entries
+        
+        rng = random.Random(seed)
+        self._permutations = [
+            (rng.randint(1, _MERSENNE_PRIME - 1), rng.randint(0, _MERSENNE_PRIME - 1))
+            for _ in range(self.num_perm)
+        ]
+        
+        self._entries: "OrderedDict[str, Tuple[str, Tuple[int, ...]]]" = OrderedDict()
+        self._buckets: Dict[Tuple[str, int, Tuple[int, ...]], Set[str]] = {}
+        
+        self._lookups = 0
+        self._hits = 0
+        self._candidates = 0
+        self._evictions = 0
+        
+        logger.info(
+            f"近似重复索引初始化完成: threshold={threshold}, "
+            f"bands={bands}, rows={rows}, max_entries={max_entries}"
+        )
+    
+    def signature(self, text: str) -> Tuple[int, ...]:
+        """计算规范化文本的MinHash签名"""
+        hashes = [_hash_shingle(s) for s in _shingles(normalize_jd_text(text), self.shingle_size)]
+        if not hashes:
+            return tuple([_MERSENNE_PRIME] * self.num_perm)
+        return tuple(
+            min((a * h + b) % _MERSENNE_PRIME for h in hashes)
+            for a, b in self._permutations
+        )
+    
+    def _band_keys(self, namespace: str, signature: Tuple[int, ...]) -> List[Tuple[str, int, Tuple[int, ...]]]:
+        return [
+            (namespace, band, signature[band * self.rows:(band + 1) * self.rows])
+            for band in range(self.bands)
+        ]
+    
+    @staticmethod
+    def similarity(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+        """由签名估计Jaccard相似度"""
+        if not sig_a:
+            return 0.0
+        return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / len(sig_a)
+    
+    def add(self, key: str, text: str, namespace: str = "") -> None:
+        """加入索引
+        
+        Args:
+            key: 缓存键
+            text: 用于相似度匹配的文本（如JD原文）
+            namespace: 命名空间（提示词其余部分和模型参数的哈希）
+        """
+        self.remove(key)
+        
+        signature = self.signature(text)
+        self._entries[key] = (namespace, signature)
+        for band_key in self._band_keys(namespace, signature):
+            self._buckets.setdefault(band_key, set()).add(key)
+        
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self.remove(oldest)
+            self._evictions += 1
+    
+    def remove(self, key: str) -> None:
+        """从索引中移除"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        namespace, signature = entry
+        for band_key in self._band_keys(namespace, signature):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+    
+    def query(self, text: str, namespace: str = "") -> Optional[Tuple[str, float]]:
+        """查找最相似的已索引条目
+        
+        Args:
+            text: 用于相似度匹配的文本
+            namespace: 命名空间
+        
+        Returns:
+            (缓存键, 估计相似度)；没有达到阈值的条目时返回None
+        """
+        self._lookups += 1
+        signature = self.signature(text)
+        
+        candidates: Set[str] = set()
+        for band_key in self._band_keys(namespace, signature):
+            candidates.update(self._buckets.get(band_key, ()))
+        self._candidates += len(candidates)
+        
+        best: Optional[Tuple[str, float]] = None
+        for key in candidates:
+            score = self.similarity(signature, self._entries[key][1])
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (key, score)
+        
+        if best is not None:
+            self._hits += 1
+        return best
+    
+    def clear(self) -> None:
+        """清空索引"""
+        self._entries.clear()
+        self._buckets.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "lookups": self._lookups,
+            "matches": self._hits,
+            "avg_candidates": round(self._candidates / self._lookups, 2) if self._lookups else 0,
+            "evictions": self._evictions
+        }
@@ -0,0 +1,214 @@
+"""多条目提示词打包（Prompt Packing）
+
+批量解析/评估20个短JD时，每个请求都重复发送系统消息和完整指令，HTTP往返和重复提示词
+占据了大部分成本和延迟。本模块把N个短条目打包进一个结构化提示词：
+1. compose_item_prompt - 单条目提示词（指令在前、条目数据在后），也是单条回退调用和缓存键的依据
+2. build_packed_prompt - 打包提示词，每个条目带ID，要求返回带id字段的JSON数组
+3. split_packed_response - 按ID拆分打包响应
+4. PromptPacker - 把并发到达的单条请求在短时间窗口内合并为打包请求
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .llm_rate_limiter import LLMPriority, get_current_priority
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PackItem:
+    """可打包的单条目请求
+    
+    Attributes:
+        instruction: 共享指令（不含条目数据）
+        item: 条目数据（如JD文本）
+        item_label: 条目名称，用于提示词中的标注
+        validator: 校验单条结果的函数，打包结果校验失败时该条目回退为单独调用
+    """
+    instruction: str
+    item: str
+    item_label: str = "JD"
+    validator: Optional[Callable[[Dict[str, Any]], bool]] = None
+    
+    @property
+    def prompt(self) -> str:
+        """单独调用时使用的提示词"""
+        return compose_item_prompt(self.instruction, self.item, self.item_label)
+
+
+def compose_item_prompt(instruction: str, item: str, item_label: str = "JD") -> str:
+    """组合单条目提示词（指令在前，条目数据在后）"""
+    return f"{instruction}\n\n{item_label}:\n{item}\n"
+
+
+def build_packed_prompt(instruction: str, items: List[Tuple[str, str]], item_label: str = "JD") -> str:
+    """构建打包提示词
+    
+    Args:
+        instruction: 共享指令（描述单个条目的处理要求和返回格式）
+        items: (条目ID, 条目数据)列表
+        item_label: 条目名称
+    
+    Returns:
+        打包后的提示词
+    """
+    sections = "\n\n".join(f"【ID: {item_id}】\n{text}" for item_id, text in items)
+    return f"""{instruction}
+
+以下共有{len(items)}个{item_label}，每个以【ID: xxx】开头。
+请对每个{item_label}分别按上述要求处理，返回一个JSON数组：
+- 数组中每个元素是上述格式的JSON对象，并额外包含"id"字段（与输入的ID一致）
+- 元素顺序与输入一致，不要合并或遗漏任何一个{item_label}
+
+{sections}
+"""
+
+
+def split_packed_response(data: Any, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """按ID拆分打包响应
+    
+    兼容JSON数组、{"results": [...]}包装、以ID为键的对象三种形式；
+    缺失或ID不匹配的条目不会出现在结果中（由调用方回退为单独调用）。
+    
+    Args:
+        data: 解析后的打包响应
+        ids: 输入的条目ID列表
+    
+    Returns:
+        {条目ID: 条目结果（不含id字段）}
+    """
+    wanted = set(ids)
+    
+    if isinstance(data, dict):
+        for key in ("results", "items", "data"):
+            if isinstance(data.get(key), list):
+                data = data[key]
+                break
+        else:
+            return {k: v for k, v in data.items() if k in wanted and isinstance(v, dict)}
+    
+    mapping: Dict[str, Dict[str, Any]] = {}
+    if isinstance(data, list):
+        for obj in data:
+            if not isinstance(obj, dict):
+                continue
+            item_id = str(obj.get("id", ""))
+            if item_id in wanted and item_id not in mapping:
+                mapping[item_id] = {k: v for k, v in obj.items() if k != "id"}
+    return mapping
+
+
+class _PendingPack:
+    """等待合并的请求组（内部使用）"""
+    
+    def __init__(
+        self,
+        pack: PackItem,
+        params: Dict[str, Any],
+        priority: Optional[LLMPriority],
+        batch_id: Optional[str]
+    ):
+        scope_priority, scope_batch_id = get_current_priority()
+        self.instruction = pack.instruction
+        self.item_label = pack.item_label
+        self.validator = pack.validator
+        self.params = params
+        self.priority = LLMPriority(priority) if priority else scope_priority
+        self.batch_id = batch_id or scope_batch_id
+        self.items: List[str] = []
+        self.futures: List[asyncio.Future] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class PromptPacker:
+    """合并并发到达的单条请求
+    
+    指令、条目名称、校验函数和模型参数都相同的请求，在max_wait窗口内或凑满pack_size后
+    作为一次打包调用发出。单独调用方（如ParserAgent._parse_jd_with_llm）无需感知打包。
+    """
+    
+    def __init__(self, client, pack_size: int = 5, max_wait: float = 0.05):
+        """初始化请求合并器
+        
+        Args:
+            client: DeepSeekR1Client实例
+            pack_size: 每次打包的最大条目数
+            max_wait: 等待凑包的最长时间（秒）
+        """
+        self.client = client
+        self.pack_size = pack_size
+        self.max_wait = max_wait
+        self._groups: Dict[Tuple, _PendingPack] = {}
+        self._tasks: set = set()
+    
+    async def submit(
+        self,
+        pack: PackItem,
+        priority: Optional[LLMPriority] = None,
+        batch_id: Optional[str] = None,
+        **params
+    ) -> Dict[str, Any]:
+        """提交单条请求，等待打包调用的结果
+        
+        Args:
+            pack: 可打包的单条目请求
+            priority: 调度优先级，None时使用当前调用链的优先级（以组内第一个请求为准）
+            batch_id: 批次ID
+            **params: 模型参数（model、temperature、max_tokens、system_message）
+        
+        Returns:
+            该条目的JSON结果
+        """
+        key = (pack.instruction, pack.item_label, pack.validator, tuple(sorted(params.items())))
+        group = self._groups.get(key)
+        if group is None:
+            group = self._groups[key] = _PendingPack(pack, params, priority, batch_id)
+            group.timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush, key)
+        
+        future = asyncio.get_running_loop().create_future()
+        group.items.append(pack.item)
+        group.futures.append(future)
+        
+        if len(group.items) >= self.pack_size:
+            self._flush(key)
+        
+        return await future
+    
+    def _flush(self, key: Tuple) -> None:
+        """发出一组请求（内部方法）"""
+        group = self._groups.pop(key, None)
+        if group is None:
+            return
+        if group.timer is not None:
+            group.timer.cancel()
+        logger.debug(f"发出打包请求: items={len(group.items)}, label={group.item_label}")
+        task = asyncio.create_task(self._dispatch(group))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _dispatch(self, group: _PendingPack) -> None:
+        """执行打包调用并分发结果（内部方法）"""
+        try:
+            results = await self.client.generate_json_packed(
+                instruction=group.instruction,
+                items=group.items,
+                item_label=group.item_label,
+                validator=group.validator,
+                pack_size=self.pack_size,
+                priority=group.priority,
+                batch_id=group.batch_id,
+                **group.params
+            )
+        except Exception as e:
+            results = [e] * len(group.futures)
+        
+        for future, result in zip(group.futures, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
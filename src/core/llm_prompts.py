@@ -0,0 +1,294 @@
+"""提示词构建（面向服务端前缀缓存）
+
+DeepSeek等服务端会缓存请求的公共前缀（系统消息 + 提示词开头），命中部分按更低价格计费、首token更快。
+前缀从第一个不同的字符起就无法命中，因此提示词统一按"静态在前、可变在后"的顺序组织：
+1. 系统消息（所有调用共用，由客户端放在最前）
+2. 任务指令、返回格式（JSON示例）、注意事项（同一类任务的所有调用共用）
+3. 数据段（按稳定程度排列：分类树等很少变化的数据在前，岗位信息、候选人回答等每次不同的数据在最后）
+
+模板版本：
+各Agent的模板带有稳定ID和版本号，注册到prompt_registry。客户端按静态前缀识别提示词所属的模板，
+把"ID@版本"写入缓存键和缓存标签，并记录常见输入（PromptHistory），新版本上线前可用
+CacheWarmer.warm_template_version把历史输入按新版本重新渲染、离线预热缓存。
+"""
+
+import hashlib
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .llm_packing import PackItem
+
+logger = logging.getLogger(__name__)
+
+# 数据段：(名称, 内容)，内容为空时省略
+PromptSection = Tuple[str, str]
+
+
+def data_section(label: str, content: str) -> str:
+    """格式化一个数据段（与compose_item_prompt的条目格式一致）"""
+    return f"{label}:\n{content}"
+
+
+def build_prompt(prefix: str, *sections: PromptSection) -> str:
+    """组合提示词：静态前缀在前，数据段按传入顺序追加在后
+    
+    Args:
+        prefix: 静态前缀（指令、返回格式、注意事项）
+        *sections: 数据段，越稳定的数据越靠前
+    
+    Returns:
+        提示词字符串
+    """
+    parts = [prefix.strip()] + [data_section(label, content) for label, content in sections if content]
+    return "\n\n".join(parts) + "\n"
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """提示词模板：静态部分在前，可变数据在后
+    
+    Attributes:
+        instruction: 任务指令（不含任何可变数据）
+        schema: 返回格式（JSON示例）
+        notes: 注意事项
+        template_id: 稳定的模板ID（如"parser.parse"），为空时不参与版本管理
+        version: 模板版本，修改指令、返回格式或注意事项时递增
+    """
+    instruction: str
+    schema: str = ""
+    notes: str = ""
+    template_id: str = ""
+    version: str = "1"
+    
+    @property
+    def ref(self) -> Optional[str]:
+        """模板引用"ID@版本"（写入缓存键和标签），未设置ID时为None"""
+        if not self.template_id:
+            return None
+        return f"{self.template_id}@{self.version}"
+    
+    @property
+    def prefix(self) -> str:
+        """静态前缀（同一模板的所有调用完全相同，可被服务端缓存）"""
+        parts = [self.instruction.strip()]
+        if self.schema:
+            parts.append(f"返回JSON格式：\n{self.schema.strip()}")
+        if self.notes:
+            parts.append(self.notes.strip())
+        return "\n\n".join(parts)
+    
+    def render(self, *sections: PromptSection) -> str:
+        """渲染提示词
+        
+        Args:
+            *sections: 数据段（名称, 内容），越稳定的数据越靠前
+        
+        Returns:
+            提示词字符串
+        """
+        return build_prompt(self.prefix, *sections)
+    
+    def pack_item(
+        self,
+        item: str,
+        item_label: str,
+        validator: Optional[Callable[[Dict[str, Any]], bool]] = None,
+        context: Tuple[PromptSection, ...] = ()
+    ) -> PackItem:
+        """构建可打包的单条目请求（条目数据在最后）
+        
+        Args:
+            item: 条目数据（如JD文本）
+            item_label: 条目名称
+            validator: 校验单条结果的函数
+            context: 条目之前的共享数据段（如自定义字段），打包时多个条目共用
+        
+        Returns:
+            PackItem实例，其prompt与render(*context, (item_label, item))一致
+        """
+        return PackItem(
+            instruction=build_prompt(self.prefix, *context).rstrip("\n"),
+            item=item,
+            item_label=item_label,
+            validator=validator
+        )
+    
+    def rebase(self, prompt: str, source: "PromptTemplate") -> Optional[str]:
+        """把source模板渲染的提示词改为由本模板渲染（数据段不变）
+        
+        Args:
+            prompt: source.render(...)的结果
+            source: 渲染该提示词的模板（通常是同一模板的旧版本）
+        
+        Returns:
+            新提示词，prompt不是由source渲染时返回None
+        """
+        old_prefix = source.prefix.strip()
+        if not prompt.startswith(old_prefix):
+            return None
+        return self.prefix.strip() + prompt[len(old_prefix):]
+
+
+class PromptRegistry:
+    """提示词模板注册表（按ID和版本）"""
+    
+    def __init__(self):
+        self._templates: Dict[str, Dict[str, PromptTemplate]] = {}
+    
+    def register(self, template: PromptTemplate) -> PromptTemplate:
+        """注册模板（同一ID的最后注册的版本为当前版本）
+        
+        Args:
+            template: 带template_id的模板
+        
+        Returns:
+            传入的模板（便于在定义常量时直接注册）
+        
+        Raises:
+            ValueError: 未设置template_id，或同一ID和版本已注册了不同的内容
+        """
+        if not template.template_id:
+            raise ValueError("注册的模板必须设置template_id")
+        versions = self._templates.setdefault(template.template_id, {})
+        existing = versions.get(template.version)
+        if existing is not None and existing != template:
+            raise ValueError(f"模板{template.ref}已注册了不同的内容，修改模板时请递增版本号")
+        versions.pop(template.version, None)
+        versions[template.version] = template
+        logger.debug(f"注册提示词模板: {template.ref}")
+        return template
+    
+    def get(self, template_id: str, version: Optional[str] = None) -> Optional[PromptTemplate]:
+        """获取模板
+        
+        Args:
+            template_id: 模板ID
+            version: 版本，None时返回当前版本
+        
+        Returns:
+            模板，不存在时为None
+        """
+        versions = self._templates.get(template_id)
+        if not versions:
+            return None
+        if version is None:
+            return next(reversed(versions.values()))
+        return versions.get(version)
+    
+    def versions(self, template_id: str) -> List[str]:
+        """模板的所有已注册版本（按注册顺序）"""
+        return list(self._templates.get(template_id, {}))
+    
+    def match(self, prompt: str) -> Optional[PromptTemplate]:
+        """按静态前缀识别提示词所属的模板
+        
+        前缀最长的模板优先；多个版本前缀相同时取最后注册的版本。
+        
+        Args:
+            prompt: 提示词
+        
+        Returns:
+            模板，未匹配时为None
+        """
+        best: Optional[PromptTemplate] = None
+        best_length = -1
+        for versions in self._templates.values():
+            for template in versions.values():
+                prefix = template.prefix.strip()
+                if len(prefix) >= best_length and prompt.startswith(prefix):
+                    best, best_length = template, len(prefix)
+        return best
+    
+    def get_stats(self) -> Dict[str, List[str]]:
+        """各模板的已注册版本"""
+        return {template_id: list(versions) for template_id, versions in self._templates.items()}
+
+
+# 全局模板注册表（各Agent在定义模板常量时注册）
+prompt_registry = PromptRegistry()
+
+
+@dataclass
+class PromptHistoryEntry:
+    """一条历史输入（同一提示词和模型参数的调用合并计数）
+    
+    Attributes:
+        template_id: 模板ID
+        version: 渲染该提示词的模板版本
+        prompt: 提示词
+        params: 模型参数（model、temperature、max_tokens、system_message）
+        count: 调用次数
+    """
+    template_id: str
+    version: str
+    prompt: str
+    params: Dict[str, Any]
+    count: int = 0
+
+
+class PromptHistory:
+    """模板化提示词的历史输入（每个模板保留调用次数最多的条目）"""
+    
+    def __init__(self, max_entries_per_template: int = 500):
+        """初始化历史输入记录
+        
+        Args:
+            max_entries_per_template: 每个模板最多保留的不同输入数，超出时淘汰调用次数最少的条目
+        """
+        self.max_entries_per_template = max(1, max_entries_per_template)
+        self._entries: Dict[str, Dict[str, PromptHistoryEntry]] = {}
+        self._evicted = 0
+    
+    def record(self, template: PromptTemplate, prompt: str, **params) -> None:
+        """记录一次模板化调用
+        
+        Args:
+            template: 渲染该提示词的模板
+            prompt: 提示词
+            **params: 模型参数
+        """
+        entries = self._entries.setdefault(template.template_id, {})
+        digest = hashlib.md5(
+            "\x00".join([template.version, prompt, repr(sorted(params.items()))]).encode('utf-8')
+        ).hexdigest()
+        entry = entries.get(digest)
+        if entry is None:
+            if len(entries) >= self.max_entries_per_template:
+                least = min(entries, key=lambda k: entries[k].count)
+                del entries[least]
+                self._evicted += 1
+            entry = entries[digest] = PromptHistoryEntry(template.template_id, template.version, prompt, dict(params))
+        entry.count += 1
+    
+    def top(self, template_id: str, n: int, exclude_version: Optional[str] = None) -> List[PromptHistoryEntry]:
+        """调用次数最多的n条历史输入
+        
+        Args:
+            template_id: 模板ID
+            n: 条目数
+            exclude_version: 排除该版本渲染的条目（如预热的目标版本）
+        
+        Returns:
+            按调用次数降序排列的条目
+        """
+        entries = [
+            entry for entry in self._entries.get(template_id, {}).values()
+            if entry.version != exclude_version
+        ]
+        entries.sort(key=lambda entry: entry.count, reverse=True)
+        return entries[:n]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """各模板的历史输入数和按版本的调用次数"""
+        templates = {}
+        for template_id, entries in self._entries.items():
+            calls: Dict[str, int] = {}
+            for entry in entries.values():
+                calls[entry.version] = calls.get(entry.version, 0) + entry.count
+            templates[template_id] = {"inputs": len(entries), "calls_by_version": calls}
+        return {
+            "max_entries_per_template": self.max_entries_per_template,
+            "evicted": self._evicted,
+            "templates": templates
+        }
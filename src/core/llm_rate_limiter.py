@@ -0,0 +1,491 @@
+"""LLM客户端限流模块
+
+固定的asyncio.Semaphore加上tenacity重试，在批量负载下容易出现同步重试风暴和长尾延迟。
+本模块提供客户端侧的限流：
+1. 令牌桶（TokenBucket）- 每分钟请求数（RPM）和每分钟token数（TPM）预算
+2. 自适应并发（AdaptiveConcurrencyLimiter）- AIMD：成功时加性增加，429/超时时乘性减少
+3. 优先级调度（LLMPriority）- 交互式请求享有预留并发，批量请求按batch_id公平调度
+4. 组合限流器（LLMRateLimiter）- 供DeepSeekR1Client在调度请求前获取许可
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque, OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from enum import Enum
+from typing import Optional, Dict, Any, AsyncIterator, Iterator, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """令牌桶
+    
+    按每分钟预算匀速补充令牌，等待者按先来先服务顺序获取
+    """
+    
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        """初始化令牌桶
+        
+        Args:
+            per_minute: 每分钟补充的令牌数
+            capacity: 桶容量（允许的突发量），默认等于每分钟预算
+        """
+        self.per_minute = per_minute
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+        self._waiting = 0
+        self._total_wait_time = 0.0
+    
+    def _refill(self) -> None:
+        """按经过的时间补充令牌（内部方法）"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+    
+    async def acquire(self, amount: float = 1.0) -> float:
+        """获取令牌，不足时等待
+        
+        超过桶容量的请求在桶满时放行（记为负债），避免永久阻塞
+        
+        Args:
+            amount: 需要的令牌数
+        
+        Returns:
+            等待时间（秒）
+        """
+        start = time.monotonic()
+        self._waiting += 1
+        try:
+            async with self._lock:
+                while True:
+                    self._refill()
+                    needed = min(amount, self.capacity)
+                    if self.tokens >= needed:
+                        self.tokens -= amount
+                        break
+                    await asyncio.sleep((needed - self.tokens) / self.rate)
+        finally:
+            self._waiting -= 1
+        
+        waited = time.monotonic() - start
+        self._total_wait_time += waited
+        return waited
+    
+    def try_acquire(self, amount: float = 1.0) -> bool:
+        """非阻塞地获取令牌（有等待者或令牌不足时返回False）"""
+        if self._waiting:
+            return False
+        self._refill()
+        if self.tokens < min(amount, self.capacity):
+            return False
+        self.tokens -= amount
+        return True
+    
+    def adjust(self, delta: float) -> None:
+        """按实际用量修正（正数表示多消耗，负数表示退还）"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - delta)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        self._refill()
+        return {
+            "per_minute": self.per_minute,
+            "available": round(self.tokens, 2),
+            "waiting": self._waiting,
+            "total_wait_time_s": round(self._total_wait_time, 3)
+        }
+
+
+class LLMPriority(str, Enum):
+    """LLM调用优先级"""
+    INTERACTIVE = "interactive"  # 交互式请求（如UI发起的JD解析），享有预留并发
+    BATCH = "batch"  # 批量任务，按batch_id公平调度
+    BACKGROUND = "background"  # 后台任务（预热等），仅在无其他等待者时调度
+
+
+# 当前调用链的优先级和批次ID（由API路由、Agent设置，DeepSeekR1Client读取）
+_current_priority: ContextVar[Optional[LLMPriority]] = ContextVar("llm_priority", default=None)
+_current_batch_id: ContextVar[Optional[str]] = ContextVar("llm_batch_id", default=None)
+
+
+@contextmanager
+def llm_priority_scope(
+    priority: Union[LLMPriority, str],
+    batch_id: Optional[str] = None
+) -> Iterator[None]:
+    """在当前调用链中设置LLM调用优先级
+    
+    用法：
+        with llm_priority_scope(LLMPriority.BATCH, batch_id=batch_id):
+            await mcp_client.analyze_jd(jd_text)
+    
+    Args:
+        priority: 优先级
+        batch_id: 批次ID（批量任务按批次公平调度）
+    """
+    priority_token = _current_priority.set(LLMPriority(priority))
+    batch_token = _current_batch_id.set(batch_id)
+    try:
+        yield
+    finally:
+        _current_batch_id.reset(batch_token)
+        _current_priority.reset(priority_token)
+
+
+def get_current_priority() -> Tuple[LLMPriority, Optional[str]]:
+    """获取当前调用链的优先级和批次ID（未设置时视为交互式）"""
+    return _current_priority.get() or LLMPriority.INTERACTIVE, _current_batch_id.get()
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD自适应并发限制器（支持优先级调度）
+    
+    - 成功：limit += increase / limit（每轮约增加increase）
+    - 429/超时：limit *= backoff（冷却时间内只减少一次，避免一波失败把并发压到最低）
+    - 调度顺序：交互式 > 批量 > 后台
+    - 交互式请求享有预留并发，批量/后台请求最多占用 limit - reserved_interactive
+    - 批量请求按batch_id轮转调度，避免一个大批次独占并发
+    """
+    
+    def __init__(
+        self,
+        initial_limit: int = 5,
+        min_limit: int = 1,
+        max_limit: Optional[int] = None,
+        increase: float = 1.0,
+        backoff: float = 0.5,
+        cooldown: float = 5.0,
+        reserved_interactive: int = 0
+    ):
+        """初始化自适应并发限制器
+        
+        Args:
+            initial_limit: 初始并发数
+            min_limit: 最小并发数
+            max_limit: 最大并发数，默认等于初始并发数
+            increase: 加性增加步长
+            backoff: 乘性减少系数
+            cooldown: 两次减少之间的最短间隔（秒）
+            reserved_interactive: 为交互式请求预留的并发数
+        """
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(max_limit or initial_limit, self.min_limit)
+        self.limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self.increase = increase
+        self.backoff = backoff
+        self.cooldown = cooldown
+        self.reserved_interactive = max(0, reserved_interactive)
+        
+        self.in_flight = 0
+        self._in_flight_by_priority: Dict[LLMPriority, int] = {p: 0 for p in LLMPriority}
+        self._interactive_waiters: deque = deque()
+        self._batch_waiters: "OrderedDict[str, deque]" = OrderedDict()
+        self._background_waiters: deque = deque()
+        self._last_decrease = 0.0
+        self._decreases = 0
+    
+    @property
+    def current_limit(self) -> int:
+        """当前生效的并发上限"""
+        return max(self.min_limit, int(self.limit))
+    
+    @property
+    def shared_limit(self) -> int:
+        """批量/后台请求可占用的并发上限（至少为1）"""
+        return max(1, self.current_limit - self.reserved_interactive)
+    
+    @property
+    def queue_depth(self) -> int:
+        """等待许可的请求数"""
+        return sum(self._queue_depths().values())
+    
+    def _queue_depths(self) -> Dict[str, int]:
+        """各优先级的排队数（内部方法）"""
+        def pending(waiters) -> int:
+            return sum(1 for waiter, _ in waiters if not waiter.done())
+        
+        return {
+            LLMPriority.INTERACTIVE.value: pending(self._interactive_waiters),
+            LLMPriority.BATCH.value: sum(pending(q) for q in self._batch_waiters.values()),
+            LLMPriority.BACKGROUND.value: pending(self._background_waiters)
+        }
+    
+    def _has_waiters(self) -> bool:
+        return bool(self._interactive_waiters or self._batch_waiters or self._background_waiters)
+    
+    def _can_admit(self, priority: LLMPriority) -> bool:
+        """判断当前是否可以放行该优先级的请求（内部方法）"""
+        if self.in_flight >= self.current_limit:
+            return False
+        if priority == LLMPriority.INTERACTIVE:
+            return True
+        shared_in_flight = self.in_flight - self._in_flight_by_priority[LLMPriority.INTERACTIVE]
+        return shared_in_flight < self.shared_limit
+    
+    def _admit(self, priority: LLMPriority) -> None:
+        self.in_flight += 1
+        self._in_flight_by_priority[priority] += 1
+    
+    async def acquire(
+        self,
+        priority: LLMPriority = LLMPriority.INTERACTIVE,
+        batch_id: Optional[str] = None
+    ) -> None:
+        """获取并发许可
+        
+        Args:
+            priority: 优先级
+            batch_id: 批次ID（仅批量请求使用，用于公平调度）
+        """
+        if not self._has_waiters() and self._can_admit(priority):
+            self._admit(priority)
+            return
+        
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (waiter, priority)
+        if priority == LLMPriority.INTERACTIVE:
+            queue = self._interactive_waiters
+        elif priority == LLMPriority.BATCH:
+            queue = self._batch_waiters.setdefault(batch_id or "", deque())
+        else:
+            queue = self._background_waiters
+        queue.append(entry)
+        
+        # 有等待者时也尝试调度一次（例如交互式请求可以越过排队中的批量请求）
+        self._wake_waiters()
+        
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # 已被授予许可但调用方被取消，归还许可
+                self.release(priority)
+            else:
+                try:
+                    queue.remove(entry)
+                except ValueError:
+                    pass
+                self._drop_empty_batches()
+            raise
+    
+    def try_acquire(self, priority: LLMPriority = LLMPriority.INTERACTIVE) -> bool:
+        """非阻塞地获取并发许可（有请求排队或已达上限时返回False）"""
+        if self._has_waiters() or not self._can_admit(priority):
+            return False
+        self._admit(priority)
+        return True
+    
+    def release(self, priority: LLMPriority = LLMPriority.INTERACTIVE) -> None:
+        """释放并发许可"""
+        self.in_flight = max(0, self.in_flight - 1)
+        self._in_flight_by_priority[priority] = max(0, self._in_flight_by_priority[priority] - 1)
+        self._wake_waiters()
+    
+    def _drop_empty_batches(self) -> None:
+        for batch_id in [b for b, q in self._batch_waiters.items() if not q]:
+            del self._batch_waiters[batch_id]
+    
+    def _pop_next(self) -> Optional[Tuple[asyncio.Future, LLMPriority]]:
+        """按优先级和公平调度取出下一个可放行的等待者（内部方法）"""
+        while self._interactive_waiters and self._can_admit(LLMPriority.INTERACTIVE):
+            entry = self._interactive_waiters.popleft()
+            if not entry[0].done():
+                return entry
+        
+        while self._batch_waiters and self._can_admit(LLMPriority.BATCH):
+            # 取队首批次的第一个请求，然后把该批次移到队尾（轮转）
+            batch_id, queue = next(iter(self._batch_waiters.items()))
+            entry = queue.popleft()
+            if queue:
+                self._batch_waiters.move_to_end(batch_id)
+            else:
+                del self._batch_waiters[batch_id]
+            if not entry[0].done():
+                return entry
+        
+        # 后台请求仅在没有批量请求等待时调度
+        while (
+            not self._batch_waiters
+            and self._background_waiters
+            and self._can_admit(LLMPriority.BACKGROUND)
+        ):
+            entry = self._background_waiters.popleft()
+            if not entry[0].done():
+                return entry
+        
+        return None
+    
+    def _wake_waiters(self) -> None:
+        """在容量允许时唤醒等待者（内部方法）"""
+        while True:
+            entry = self._pop_next()
+            if entry is None:
+                return
+            waiter, priority = entry
+            self._admit(priority)
+            waiter.set_result(None)
+    
+    def on_success(self) -> None:
+        """请求成功：加性增加"""
+        if self.limit < self.max_limit:
+            self.limit = min(self.max_limit, self.limit + self.increase / self.limit)
+            self._wake_waiters()
+    
+    def on_overload(self) -> None:
+        """收到429或超时：乘性减少"""
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        previous = self.current_limit
+        self.limit = max(float(self.min_limit), self.limit * self.backoff)
+        self._decreases += 1
+        logger.warning(f"LLM并发上限下调: {previous} -> {self.current_limit}")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        return {
+            "limit": self.current_limit,
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "reserved_interactive": self.reserved_interactive,
+            "in_flight": self.in_flight,
+            "in_flight_by_priority": {p.value: n for p, n in self._in_flight_by_priority.items()},
+            "queue_depth": self.queue_depth,
+            "queue_depth_by_priority": self._queue_depths(),
+            "active_batches": len(self._batch_waiters),
+            "decreases": self._decreases
+        }
+
+
+class LLMRateLimiter:
+    """LLM组合限流器
+    
+    调度顺序：并发许可 -> RPM令牌 -> TPM令牌
+    """
+    
+    def __init__(
+        self,
+        max_concurrent: int = 5,
+        min_concurrent: int = 1,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        reserved_interactive: int = 0
+    ):
+        """初始化组合限流器
+        
+        Args:
+            max_concurrent: 最大并发数（AIMD的上限和初始值）
+            min_concurrent: 最小并发数（AIMD的下限）
+            requests_per_minute: 每分钟请求数预算，None或0表示不限制
+            tokens_per_minute: 每分钟token数预算，None或0表示不限制
+            reserved_interactive: 为交互式请求预留的并发数
+        """
+        self.concurrency = AdaptiveConcurrencyLimiter(
+            initial_limit=max_concurrent,
+            min_limit=min_concurrent,
+            max_limit=max_concurrent,
+            reserved_interactive=reserved_interactive
+        )
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        
+        self._total_requests = 0
+        self._overloads = 0
+        
+        logger.info(
+            f"LLM限流器初始化完成: max_concurrent={max_concurrent}, "
+            f"reserved_interactive={reserved_interactive}, "
+            f"rpm={requests_per_minute or '不限'}, tpm={tokens_per_minute or '不限'}"
+        )
+    
+    @asynccontextmanager
+    async def slot(
+        self,
+        estimated_tokens: int = 0,
+        priority: Optional[Union[LLMPriority, str]] = None,
+        batch_id: Optional[str] = None
+    ) -> AsyncIterator[None]:
+        """获取一次调用的许可（异步上下文管理器）
+        
+        Args:
+            estimated_tokens: 预估token数（提示词+最大输出），用于TPM预算
+            priority: 优先级，None时使用当前调用链的优先级（llm_priority_scope）
+            batch_id: 批次ID，None时使用当前调用链的批次ID
+        """
+        scope_priority, scope_batch_id = get_current_priority()
+        priority = LLMPriority(priority) if priority else scope_priority
+        batch_id = batch_id or scope_batch_id
+        
+        await self.concurrency.acquire(priority, batch_id)
+        try:
+            if self.request_bucket:
+                await self.request_bucket.acquire(1)
+            if self.token_bucket and estimated_tokens:
+                await self.token_bucket.acquire(estimated_tokens)
+            self._total_requests += 1
+            yield
+        finally:
+            self.concurrency.release(priority)
+    
+    def try_acquire_extra(
+        self,
+        priority: Optional[Union[LLMPriority, str]] = None,
+        estimated_tokens: int = 0
+    ) -> bool:
+        """非阻塞地获取一个额外的并发许可及RPM/TPM令牌（用于对冲请求，不占用排队请求的机会）
+        
+        Args:
+            priority: 优先级，None时使用当前调用链的优先级
+            estimated_tokens: 预估token数，用于TPM预算
+        
+        Returns:
+            是否获取成功，成功后需调用release_extra释放并发许可（令牌不退还）
+        """
+        priority = LLMPriority(priority) if priority else get_current_priority()[0]
+        if not self.concurrency.try_acquire(priority):
+            return False
+        if self.request_bucket and not self.request_bucket.try_acquire(1):
+            self.concurrency.release(priority)
+            return False
+        if self.token_bucket and estimated_tokens and not self.token_bucket.try_acquire(estimated_tokens):
+            if self.request_bucket:
+                self.request_bucket.adjust(-1)
+            self.concurrency.release(priority)
+            return False
+        self._total_requests += 1
+        return True
+    
+    def release_extra(self, priority: Optional[Union[LLMPriority, str]] = None) -> None:
+        """释放try_acquire_extra获取的并发许可"""
+        priority = LLMPriority(priority) if priority else get_current_priority()[0]
+        self.concurrency.release(priority)
+    
+    def record_success(self, estimated_tokens: int = 0, actual_tokens: Optional[int] = None) -> None:
+        """记录成功调用，并按实际token用量修正TPM预算"""
+        self.concurrency.on_success()
+        if self.token_bucket and actual_tokens is not None:
+            self.token_bucket.adjust(actual_tokens - estimated_tokens)
+    
+    def record_overload(self) -> None:
+        """记录429/超时"""
+        self._overloads += 1
+        self.concurrency.on_overload()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        return {
+            "concurrency": self.concurrency.get_stats(),
+            "requests_per_minute": self.request_bucket.get_stats() if self.request_bucket else None,
+            "tokens_per_minute": self.token_bucket.get_stats() if self.token_bucket else None,
+            "queue_depth": self.concurrency.queue_depth,
+            "total_requests": self._total_requests,
+            "overloads": self._overloads
+        }
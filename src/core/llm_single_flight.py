@@ -0,0 +1,275 @@
+"""跨进程LLM请求去重（Single-Flight）
+
+DeepSeekR1Client内部的_pending_requests只能在单个进程、单个事件循环内去重。
+多个uvicorn worker和Agents容器同时处理相同JD时，仍会产生多次付费调用。
+
+本模块基于Redis租约实现分布式single-flight：
+- 以LLMCache.generate_cache_key生成的哈希为键，SET NX PX获取租约
+- 获得租约的进程（leader）先读结果键，已有成功结果时直接复用，否则调用API，
+  并将结果写入结果键、通过pub/sub广播
+- 其他进程（waiter）订阅结果通道等待，租约过期仍无结果时重新竞争租约
+- Redis不可用时回退为本地计算（仍保留进程内去重）
+"""
+
+import json
+import logging
+import uuid
+from typing import Optional, Dict, Any, Callable, Awaitable
+
+logger = logging.getLogger(__name__)
+
+
+# 仅当锁仍由自己持有时才删除（避免误删其他进程重新获得的租约）
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+else
+    return 0
+end
+"""
+
+
+class SingleFlightError(Exception):
+    """leader进程计算失败时，waiter收到的异常"""
+    pass
+
+
+class RedisSingleFlight:
+    """基于Redis租约的跨进程single-flight
+    
+    特点：
+    - 同一缓存键在所有进程中同时只有一个付费调用
+    - waiter通过pub/sub等待结果，并在订阅后检查结果键，避免错过广播
+    - leader崩溃时租约自动过期，waiter重新竞争
+    - Redis异常时回退到本地计算
+    """
+    
+    def __init__(
+        self,
+        redis_client,
+        key_prefix: str = "llm_sf:",
+        lease_ttl: float = 120.0,
+        result_ttl: int = 60,
+        poll_interval: float = 1.0,
+        max_attempts: int = 3
+    ):
+        """初始化跨进程single-flight
+        
+        Args:
+            redis_client: Redis异步客户端
+            key_prefix: 键前缀
+            lease_ttl: 租约时长（秒），应大于单次LLM调用（含重试）的最长耗时
+            result_ttl: 结果键保留时间（秒），供晚到的waiter读取
+            poll_interval: waiter检查租约状态的间隔（秒）
+            max_attempts: 租约过期无结果时，waiter重新竞争的最大次数
+        """
+        self.redis = redis_client
+        self.key_prefix = key_prefix
+        self.lease_ttl = lease_ttl
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        
+        self._leader_calls = 0
+        self._result_hits = 0
+        self._waiter_hits = 0
+        self._waiter_errors = 0
+        self._lease_takeovers = 0
+        self._fallbacks = 0
+        
+        logger.info(f"跨进程single-flight初始化完成: prefix={key_prefix}, lease_ttl={lease_ttl}s")
+    
+    def _lock_key(self, key: str) -> str:
+        return f"{self.key_prefix}lock:{key}"
+    
+    def _result_key(self, key: str) -> str:
+        return f"{self.key_prefix}result:{key}"
+    
+    def _channel(self, key: str) -> str:
+        return f"{self.key_prefix}channel:{key}"
+    
+    @staticmethod
+    def _decode(data) -> Dict[str, Any]:
+        """解析结果载荷（内部方法）"""
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        return json.loads(data)
+    
+    def _unwrap(self, payload: Dict[str, Any]) -> str:
+        """从结果载荷中取出值，leader失败时抛出异常（内部方法）"""
+        if payload.get("ok"):
+            self._waiter_hits += 1
+            return payload["value"]
+        self._waiter_errors += 1
+        raise SingleFlightError(payload.get("error") or "leader请求失败")
+    
+    async def run(self, key: str, compute_fn: Callable[[], Awaitable[str]]) -> str:
+        """执行single-flight调用
+        
+        Args:
+            key: 缓存键（LLMCache.generate_cache_key的结果）
+            compute_fn: 实际的计算函数（async callable），仅在leader进程中执行
+        
+        Returns:
+            计算结果
+        
+        Raises:
+            SingleFlightError: leader进程计算失败
+        """
+        for attempt in range(self.max_attempts):
+            token = uuid.uuid4().hex
+            try:
+                acquired = await self.redis.set(
+                    self._lock_key(key), token,
+                    px=int(self.lease_ttl * 1000), nx=True
+                )
+            except Exception as e:
+                logger.warning(f"获取single-flight租约失败，回退为本地计算: {e}")
+                self._fallbacks += 1
+                return await compute_fn()
+            
+            if acquired:
+                if attempt > 0:
+                    self._lease_takeovers += 1
+                return await self._run_as_leader(key, token, compute_fn)
+            
+            try:
+                payload = await self._wait_for_result(key)
+            except Exception as e:
+                logger.warning(f"等待single-flight结果失败，回退为本地计算: {e}")
+                self._fallbacks += 1
+                return await compute_fn()
+            
+            if payload is not None:
+                return self._unwrap(payload)
+            
+            logger.info(f"single-flight租约过期且无结果，重新竞争: {key[:8]}...")
+        
+        # 多次竞争仍未拿到结果，直接本地计算
+        self._fallbacks += 1
+        return await compute_fn()
+    
+    async def _run_as_leader(
+        self,
+        key: str,
+        token: str,
+        compute_fn: Callable[[], Awaitable[str]]
+    ) -> str:
+        """以leader身份计算并广播结果（内部方法）
+        
+        上一轮leader刚释放租约时，其成功结果仍在结果键中，直接复用而不再付费调用；
+        仅清除失败结果。取消等BaseException同样广播失败并释放租约，避免waiter等到租约过期
+        """
+        try:
+            stored = await self.redis.get(self._result_key(key))
+            if stored:
+                payload = self._decode(stored)
+                if payload.get("ok"):
+                    await self._release(key, token)
+                    self._result_hits += 1
+                    return payload["value"]
+                # 清除上一轮的失败结果，避免本轮waiter读到
+                await self.redis.delete(self._result_key(key))
+        except Exception as e:
+            logger.warning(f"读取single-flight旧结果失败: {e}")
+        
+        self._leader_calls += 1
+        try:
+            try:
+                result = await compute_fn()
+            except BaseException as e:
+                await self._publish(key, {"ok": False, "error": str(e) or type(e).__name__})
+                raise
+            await self._publish(key, {"ok": True, "value": result})
+            return result
+        finally:
+            await self._release(key, token)
+    
+    async def _publish(self, key: str, payload: Dict[str, Any]) -> None:
+        """写入结果键并广播（内部方法）
+        
+        失败结果同样写入结果键，使错过广播的waiter不会重复发起付费调用
+        """
+        data = json.dumps(payload, ensure_ascii=False)
+        try:
+            await self.redis.set(self._result_key(key), data, ex=self.result_ttl)
+            await self.redis.publish(self._channel(key), data)
+        except Exception as e:
+            logger.error(f"single-flight结果广播失败: {e}")
+    
+    async def _release(self, key: str, token: str) -> None:
+        """释放租约（内部方法）"""
+        try:
+            await self.redis.eval(_RELEASE_SCRIPT, 1, self._lock_key(key), token)
+        except Exception as e:
+            logger.warning(f"single-flight租约释放失败（将自动过期）: {e}")
+    
+    async def _wait_for_result(self, key: str) -> Optional[Dict[str, Any]]:
+        """以waiter身份等待结果（内部方法）
+        
+        Returns:
+            结果载荷；租约过期仍无结果时返回None
+        """
+        pubsub = self.redis.pubsub()
+        try:
+            await pubsub.subscribe(self._channel(key))
+            
+            while True:
+                # 订阅之后再读结果键，避免leader在订阅前完成导致错过广播
+                stored = await self.redis.get(self._result_key(key))
+                if stored:
+                    return self._decode(stored)
+                
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True,
+                    timeout=self.poll_interval
+                )
+                if message and message.get("type") == "message":
+                    return self._decode(message["data"])
+                
+                if not await self.redis.exists(self._lock_key(key)):
+                    # 租约已释放/过期：最后再读一次结果键
+                    stored = await self.redis.get(self._result_key(key))
+                    return self._decode(stored) if stored else None
+        finally:
+            try:
+                await pubsub.unsubscribe(self._channel(key))
+                await pubsub.close()
+            except Exception:
+                pass
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        return {
+            "mode": "redis",
+            "leader_calls": self._leader_calls,
+            "result_hits": self._result_hits,
+            "waiter_hits": self._waiter_hits,
+            "waiter_errors": self._waiter_errors,
+            "lease_takeovers": self._lease_takeovers,
+            "fallbacks": self._fallbacks
+        }
+
+
+def create_single_flight_from_settings() -> Optional[RedisSingleFlight]:
+    """根据配置创建跨进程single-flight
+    
+    LLM_SINGLE_FLIGHT_ENABLED为False时返回None（仅使用进程内去重）
+    """
+    from .config import settings
+    
+    if not settings.LLM_SINGLE_FLIGHT_ENABLED:
+        return None
+    
+    import redis.asyncio as redis
+    
+    redis_client = redis.Redis(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        db=settings.REDIS_DB,
+        decode_responses=True
+    )
+    return RedisSingleFlight(
+        redis_client,
+        lease_ttl=settings.LLM_SINGLE_FLIGHT_LEASE_TTL
+    )
@@ -0,0 +1,317 @@
+"""LLM token估算、提示词预算与用量统计
+
+DeepSeekR1Client原先不知道一次调用要消耗多少token：MercerIPEModel、MatcherAgent等把
+json.dumps(jd_data, indent=2)整块塞进提示词，缩进空白和raw_text原文占用了大量输入token，
+偶尔还会超出上下文长度。本模块提供：
+1. estimate_tokens - 本地近似分词估算（无需加载tokenizer）
+2. compact_json / render_for_prompt - 紧凑序列化，并按token预算截断低价值字段
+3. TokenUsageTracker - 按Agent累计调用次数、输入/输出token、服务端缓存命中的输入token和费用
+4. llm_agent_scope - 标记调用链所属的Agent，用于按Agent统计
+"""
+
+import json
+import logging
+import math
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# 中日韩文字和全角标点（DeepSeek文档：1个中文字符约0.6 token，1个英文字符约0.3 token）
+_CJK_PATTERN = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]")
+_CJK_TOKENS_PER_CHAR = 0.6
+_OTHER_TOKENS_PER_CHAR = 0.3
+
+# 默认的低价值字段（超出预算时优先截断）
+LOW_VALUE_KEYS = ("raw_text", "analysis", "description")
+
+# 截断标记
+TRUNCATION_MARK = "…（已截断）"
+
+# 字符串截断的最小保留长度，短于该长度的字段不再继续截断
+_MIN_TRUNCATE_CHARS = 50
+
+_current_agent: ContextVar[Optional[str]] = ContextVar("llm_agent", default=None)
+
+
+def estimate_tokens(text: str) -> int:
+    """本地估算文本token数
+    
+    按DeepSeek公布的换算比例：中文字符约0.6 token，英文、数字、标点和空白约0.3 token
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    return math.ceil(cjk * _CJK_TOKENS_PER_CHAR + (len(text) - cjk) * _OTHER_TOKENS_PER_CHAR)
+
+
+def compact_json(data: Any) -> str:
+    """紧凑JSON序列化（无缩进、无多余空白）"""
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def _drop_empty(data: Any) -> Any:
+    """去除值为空的字段（内部方法）"""
+    if isinstance(data, dict):
+        return {
+            k: _drop_empty(v) for k, v in data.items()
+            if v is not None and v != "" and v != [] and v != {}
+        }
+    if isinstance(data, list):
+        return [_drop_empty(v) for v in data]
+    return data
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """按token数截断字符串（内部方法）"""
+    if max_tokens <= 0:
+        return ""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    # 按平均每字符token数估算保留长度
+    ratio = estimate_tokens(text) / len(text)
+    keep = max(0, int(max_tokens / ratio) - len(TRUNCATION_MARK))
+    return text[:keep] + TRUNCATION_MARK
+
+
+def _longest_string(data: Any, path: tuple = ()) -> Optional[tuple]:
+    """查找最长的字符串字段，返回(长度, 路径)（内部方法）"""
+    best = None
+    if isinstance(data, str):
+        return (len(data), path)
+    if isinstance(data, dict):
+        children = data.items()
+    elif isinstance(data, list):
+        children = enumerate(data)
+    else:
+        return None
+    for key, value in children:
+        found = _longest_string(value, path + (key,))
+        if found and (best is None or found[0] > best[0]):
+            best = found
+    return best
+
+
+def _set_path(data: Any, path: tuple, value: Any) -> None:
+    """按路径设置字段值（内部方法）"""
+    for key in path[:-1]:
+        data = data[key]
+    data[path[-1]] = value
+
+
+def render_for_prompt(
+    data: Any,
+    max_tokens: int,
+    low_value_keys: Sequence[str] = LOW_VALUE_KEYS
+) -> str:
+    """把结构化数据渲染为提示词片段，并控制在token预算内
+    
+    依次尝试：
+    1. 去除空字段，紧凑序列化（去掉indent缩进空白）
+    2. 按顺序截断顶层低价值字段（如raw_text），预算不足时整个去除
+    3. 反复对半截断最长的字符串字段
+    
+    Args:
+        data: 待渲染的数据（通常是jd_data）
+        max_tokens: token预算，<=0表示不限制（仍会紧凑序列化）
+        low_value_keys: 超出预算时优先截断的顶层字段
+    
+    Returns:
+        JSON字符串
+    """
+    data = _drop_empty(data)
+    text = compact_json(data)
+    if max_tokens <= 0 or estimate_tokens(text) <= max_tokens:
+        return text
+    
+    original_tokens = estimate_tokens(text)
+    
+    if isinstance(data, dict):
+        for key in low_value_keys:
+            value = data.get(key)
+            if not isinstance(value, str):
+                continue
+            overflow = estimate_tokens(text) - max_tokens
+            remaining = estimate_tokens(value) - overflow
+            if remaining >= _MIN_TRUNCATE_CHARS * _OTHER_TOKENS_PER_CHAR:
+                data[key] = _truncate(value, remaining)
+            else:
+                data.pop(key)
+            text = compact_json(data)
+            if estimate_tokens(text) <= max_tokens:
+                break
+    
+    while estimate_tokens(text) > max_tokens:
+        found = _longest_string(data)
+        if found is None or found[0] <= _MIN_TRUNCATE_CHARS or not found[1]:
+            break
+        length, path = found
+        value = data
+        for key in path:
+            value = value[key]
+        _set_path(data, path, value[:length // 2] + TRUNCATION_MARK)
+        text = compact_json(data)
+    
+    logger.debug(f"提示词数据已压缩: {original_tokens} -> {estimate_tokens(text)} tokens (预算{max_tokens})")
+    return text
+
+
+@contextmanager
+def llm_agent_scope(agent: str) -> Iterator[None]:
+    """标记当前调用链所属的Agent，链内的LLM调用计入该Agent的用量
+    
+    Args:
+        agent: Agent名称（通常为agent_type）
+    """
+    token = _current_agent.set(agent)
+    try:
+        yield
+    finally:
+        _current_agent.reset(token)
+
+
+def get_current_agent() -> Optional[str]:
+    """获取当前调用链所属的Agent"""
+    return _current_agent.get()
+
+
+class TokenUsageTracker:
+    """按Agent累计token用量和费用
+    
+    实际用量优先取API响应中的usage字段，缺失时使用本地估算值；
+    服务端前缀缓存命中的输入token按缓存价格计费，并统计缓存命中率
+    """
+    
+    DEFAULT_AGENT = "default"
+    
+    def __init__(
+        self,
+        input_cost_per_million: float = 0.0,
+        output_cost_per_million: float = 0.0,
+        cached_input_cost_per_million: Optional[float] = None
+    ):
+        """初始化用量统计
+        
+        Args:
+            input_cost_per_million: 每百万输入token费用（未命中缓存）
+            output_cost_per_million: 每百万输出token费用
+            cached_input_cost_per_million: 每百万缓存命中输入token费用，默认与未命中相同
+        """
+        self.input_cost_per_million = input_cost_per_million
+        self.output_cost_per_million = output_cost_per_million
+        self.cached_input_cost_per_million = (
+            input_cost_per_million if cached_input_cost_per_million is None else cached_input_cost_per_million
+        )
+        self._agents: Dict[str, Dict[str, Any]] = {}
+        self._over_budget = 0
+        self._estimation_error = 0
+        self._measured_calls = 0
+        self._cache_reported_prompt_tokens = 0
+    
+    def _bucket(self, agent: Optional[str]) -> Dict[str, Any]:
+        """获取Agent的统计条目（内部方法）"""
+        agent = agent or get_current_agent() or self.DEFAULT_AGENT
+        if agent not in self._agents:
+            self._agents[agent] = {
+                "calls": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "estimated_prompt_tokens": 0,
+                "cached_prompt_tokens": 0,
+                "cost": 0.0
+            }
+        return self._agents[agent]
+    
+    def record(
+        self,
+        estimated_prompt_tokens: int,
+        prompt_tokens: Optional[int] = None,
+        completion_tokens: Optional[int] = None,
+        completion_text: str = "",
+        agent: Optional[str] = None,
+        cached_prompt_tokens: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """记录一次调用的用量
+        
+        Args:
+            estimated_prompt_tokens: 本地估算的输入token数
+            prompt_tokens: API返回的实际输入token数
+            completion_tokens: API返回的实际输出token数
+            completion_text: 输出文本（API未返回用量时用于估算）
+            agent: Agent名称，None时使用当前调用链的Agent
+            cached_prompt_tokens: API返回的服务端缓存命中的输入token数（未返回时为None）
+        
+        Returns:
+            本次调用的用量
+        """
+        if prompt_tokens is None:
+            prompt_tokens = estimated_prompt_tokens
+        else:
+            self._estimation_error += abs(prompt_tokens - estimated_prompt_tokens)
+            self._measured_calls += 1
+        if completion_tokens is None:
+            completion_tokens = estimate_tokens(completion_text)
+        cached = min(cached_prompt_tokens or 0, prompt_tokens)
+        if cached_prompt_tokens is not None:
+            self._cache_reported_prompt_tokens += prompt_tokens
+        cost = (
+            (prompt_tokens - cached) * self.input_cost_per_million
+            + cached * self.cached_input_cost_per_million
+            + completion_tokens * self.output_cost_per_million
+        ) / 1_000_000
+        
+        bucket = self._bucket(agent)
+        bucket["calls"] += 1
+        bucket["prompt_tokens"] += prompt_tokens
+        bucket["completion_tokens"] += completion_tokens
+        bucket["estimated_prompt_tokens"] += estimated_prompt_tokens
+        bucket["cached_prompt_tokens"] += cached
+        bucket["cost"] += cost
+        
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cached_prompt_tokens": cached,
+            "cost": cost
+        }
+    
+    def record_over_budget(self) -> None:
+        """记录一次超出提示词预算的调用"""
+        self._over_budget += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息（按Agent汇总）"""
+        calls = sum(b["calls"] for b in self._agents.values())
+        prompt_tokens = sum(b["prompt_tokens"] for b in self._agents.values())
+        completion_tokens = sum(b["completion_tokens"] for b in self._agents.values())
+        cached_prompt_tokens = sum(b["cached_prompt_tokens"] for b in self._agents.values())
+        return {
+            "calls": calls,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "cached_prompt_tokens": cached_prompt_tokens,
+            # 命中率只统计返回了缓存用量的调用
+            "prompt_cache_hit_rate": (
+                f"{cached_prompt_tokens / self._cache_reported_prompt_tokens:.2%}"
+                if self._cache_reported_prompt_tokens else "0.00%"
+            ),
+            "cost": round(sum(b["cost"] for b in self._agents.values()), 6),
+            "over_budget": self._over_budget,
+            "avg_estimation_error": (
+                round(self._estimation_error / self._measured_calls, 2) if self._measured_calls else 0
+            ),
+            "agents": {
+                name: {**b, "cost": round(b["cost"], 6)} for name, b in self._agents.items()
+            }
+        }
+    
+    def reset(self) -> None:
+        """清空统计"""
+        self._agents.clear()
+        self._over_budget = 0
+        self._estimation_error = 0
+        self._measured_calls = 0
+        self._cache_reported_prompt_tokens = 0
@@ -16,6 +16,9 @@ from collections import defaultdict
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 
+from .llm_prompts import PromptTemplate
+from .llm_rate_limiter import LLMPriority
+
 logger = logging.getLogger(__name__)
 
 T = TypeVar('T')
@@ -417,6 +420,68 @@ class CacheWarmer:
                 logger.error(f"缓存预热失败: {cache_key[:8]}..., {e}")
         
         logger.info("缓存预热完成")
+    
+    async def warm_template_version(
+        self,
+        llm_client,
+        template: PromptTemplate,
+        top_n: int = 100,
+        max_concurrent: int = 2,
+        ttl: Optional[int] = None
+    ) -> Dict[str, int]:
+        """按新版本提示词模板离线预热缓存
+        
+        取llm_client.prompt_history中该模板调用次数最多的top_n条历史输入（由其他版本渲染），
+        换成新版本的静态前缀后以后台优先级调用LLM，结果按新版本的缓存键写入缓存。
+        新版本上线后，常见输入直接命中缓存。
+        
+        Args:
+            llm_client: DeepSeekR1Client实例（cache应与本预热器的缓存相同）
+            template: 新版本模板（未注册时自动注册）
+            top_n: 预热的历史输入数
+            max_concurrent: 预热调用的最大并发数
+            ttl: 缓存过期时间
+        
+        Returns:
+            统计：candidates（历史输入数）、warmed（新写入）、skipped（已缓存）、
+            unmatched（旧版本未注册或提示词不是由旧版本渲染）、failed（调用失败）
+        """
+        registry = llm_client.prompt_registry
+        if registry.get(template.template_id, template.version) is None:
+            registry.register(template)
+        
+        entries = llm_client.prompt_history.top(template.template_id, top_n, exclude_version=template.version)
+        stats = {"candidates": len(entries), "warmed": 0, "skipped": 0, "unmatched": 0, "failed": 0}
+        logger.info(f"开始模板版本预热: {template.ref}, {len(entries)}条历史输入")
+        semaphore = asyncio.Semaphore(max_concurrent)
+        
+        async def warm(entry) -> None:
+            source = registry.get(entry.template_id, entry.version)
+            prompt = template.rebase(entry.prompt, source) if source is not None else None
+            if prompt is None:
+                stats["unmatched"] += 1
+                return
+            
+            if await self.cache.exists(llm_client.build_cache_key(prompt, **entry.params)):
+                stats["skipped"] += 1
+                return
+            
+            async with semaphore:
+                try:
+                    await llm_client.generate(
+                        prompt,
+                        cache_ttl=ttl,
+                        priority=LLMPriority.BACKGROUND,
+                        **entry.params
+                    )
+                    stats["warmed"] += 1
+                except Exception as e:
+                    stats["failed"] += 1
+                    logger.error(f"模板版本预热失败: {template.ref}, {e}")
+        
+        await asyncio.gather(*[warm(entry) for entry in entries])
+        logger.info(f"模板版本预热完成: {template.ref}, {stats}")
+        return stats
 
 
 class LLMCallOptimizer:
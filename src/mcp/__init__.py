@@ -2,7 +2,7 @@
 
 from .message import MCPMessage, MessageType
 from .context import MCPContext
-from .server import MCPServer, create_mcp_server
+from .server import MCPServer, create_mcp_server, create_mcp_server_from_settings
 from .agent import MCPAgent, create_agent
 
 __all__ = [
@@ -11,6 +11,7 @@ __all__ = [
     "MCPContext",
     "MCPServer",
     "create_mcp_server",
+    "create_mcp_server_from_settings",
     "MCPAgent",
     "create_agent"
 ]
@@ -2,13 +2,17 @@
 
 import asyncio
 import logging
-from typing import Dict, Any, Optional, Callable, List
+from contextlib import nullcontext
+from typing import Dict, Any, Optional, Callable, Iterable, List, Union
 from datetime import datetime
 import uuid
 
 from .message import MCPMessage, MessageType, create_request_message, create_notification_message
 from .context import MCPContext
 from .server import MCPServer
+from .worker_pool import AgentWorkerPool
+from ..core.llm_rate_limiter import llm_priority_scope
+from ..core.llm_tokens import llm_agent_scope
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +25,7 @@ class MCPAgent:
     - Agent注册和消息订阅
     - 消息处理器注册机制
     - 请求-响应模式
+    - 有界工作池并发处理消息（按动作限流、可按到达顺序处理）
     - 上下文管理
     - 工具注册
     """
@@ -30,7 +35,10 @@ class MCPAgent:
         agent_id: str,
         agent_type: str,
         mcp_server: MCPServer,
-        metadata: Optional[Dict[str, Any]] = None
+        metadata: Optional[Dict[str, Any]] = None,
+        max_in_flight: Optional[int] = None,
+        action_limits: Optional[Dict[str, int]] = None,
+        ordered_actions: Optional[Iterable[str]] = None
     ):
         """
         初始化Agent
@@ -40,6 +48,9 @@ class MCPAgent:
             agent_type: Agent类型（如：parser, evaluator, optimizer等）
             mcp_server: MCP服务器实例
             metadata: Agent元数据（可选）
+            max_in_flight: 同时处理的消息数上限（None时使用MCP_AGENT_MAX_IN_FLIGHT配置）
+            action_limits: 按动作的并发上限（可选），如{"evaluate_quality": 2}
+            ordered_actions: 按到达顺序逐条处理的动作（可选）
         """
         self.agent_id = agent_id
         self.agent_type = agent_type
@@ -62,6 +73,16 @@ class MCPAgent:
         # 订阅的通道
         self._subscribed_channels: List[str] = []
         
+        # 消息处理工作池：监听循环把消息交给工作池后继续取下一条，名额用完时等待
+        if max_in_flight is None:
+            from ..core.config import settings
+            max_in_flight = settings.MCP_AGENT_MAX_IN_FLIGHT
+        self.worker_pool = AgentWorkerPool(
+            max_in_flight=max_in_flight,
+            action_limits=action_limits,
+            ordered_actions=ordered_actions
+        )
+        
         logger.info(
             f"Agent initialized: {agent_id} (type: {agent_type})"
         )
@@ -108,6 +129,9 @@ class MCPAgent:
                 pass
             self._listener_task = None
         
+        # 取消处理中的消息（Streams传输下未确认的消息由其他副本认领）
+        await self.worker_pool.shutdown()
+        
         # 取消订阅
         await self._unsubscribe_from_messages()
         
@@ -126,6 +150,14 @@ class MCPAgent:
     
     async def _subscribe_to_messages(self) -> None:
         """订阅消息通道（内部方法）"""
+        transport = getattr(self.mcp_server, "transport", None)
+        if transport is not None:
+            # Streams传输按Agent类型加入消费者组（同ID的多个副本分担消息），进程内传输登记队列
+            await transport.subscribe(self.agent_id, self.agent_type)
+            self._subscribed_channels.append(transport.stream_for(self.agent_id))
+            logger.debug(f"Agent {self.agent_id} subscribed to {transport.stream_for(self.agent_id)}")
+            return
+        
         # 订阅Agent专属通道
         agent_channel = f"mcp:agent:{self.agent_id}"
         await self.mcp_server.subscribe_to_channel(agent_channel)
@@ -136,12 +168,29 @@ class MCPAgent:
         await self.mcp_server.subscribe_to_channel(broadcast_channel)
         self._subscribed_channels.append(broadcast_channel)
         
+        # 服务器读取的消息按通道分发到本Agent的收件箱
+        dispatcher = getattr(self.mcp_server, "dispatcher", None)
+        if dispatcher is not None:
+            dispatcher.register(self.agent_id, self._subscribed_channels)
+        
         logger.debug(f"Agent {self.agent_id} subscribed to channels")
     
     async def _unsubscribe_from_messages(self) -> None:
         """取消订阅消息通道（内部方法）"""
+        transport = getattr(self.mcp_server, "transport", None)
+        if transport is not None:
+            await transport.unsubscribe(self.agent_id)
+            self._subscribed_channels.clear()
+            return
+        
+        dispatcher = getattr(self.mcp_server, "dispatcher", None)
+        if dispatcher is not None:
+            dispatcher.unregister(self.agent_id)
+        
+        # 广播通道由服务器监听，保留订阅
         for channel in self._subscribed_channels:
-            await self.mcp_server.unsubscribe_from_channel(channel)
+            if channel != "mcp:broadcast":
+                await self.mcp_server.unsubscribe_from_channel(channel)
         
         self._subscribed_channels.clear()
         
@@ -149,19 +198,28 @@ class MCPAgent:
     
     async def _listen_to_messages(self) -> None:
         """监听消息（内部方法）"""
-        if not self.mcp_server.pubsub:
+        transport = getattr(self.mcp_server, "transport", None)
+        if transport is not None:
+            logger.info(f"Agent {self.agent_id} started consuming {self.mcp_server.transport_name} transport")
+            try:
+                await transport.consume(self.agent_id, self._handle_message)
+            except asyncio.CancelledError:
+                logger.info(f"Agent {self.agent_id} transport consumer cancelled")
+                raise
+            except Exception as e:
+                logger.error(f"Agent {self.agent_id} error in transport consumer: {e}")
+            return
+        
+        dispatcher = getattr(self.mcp_server, "dispatcher", None)
+        if not self.mcp_server.pubsub or dispatcher is None:
             logger.warning(f"Agent {self.agent_id}: PubSub not initialized, skipping message listener")
             return
         
         logger.info(f"Agent {self.agent_id} started listening to messages")
         
         try:
-            async for message in self.mcp_server.pubsub.listen():
-                if not self.is_running:
-                    break
-                
-                if message["type"] == "message":
-                    await self._handle_message(message["data"])
+            # 服务器的监听任务唯一读取PubSub连接，这里只处理分发到本Agent收件箱的消息
+            await dispatcher.consume(self.agent_id, self._handle_message)
         
         except asyncio.CancelledError:
             logger.info(f"Agent {self.agent_id} message listener cancelled")
@@ -170,15 +228,23 @@ class MCPAgent:
         except Exception as e:
             logger.error(f"Agent {self.agent_id} error in message listener: {e}")
     
-    async def _handle_message(self, message_data: str) -> None:
+    async def _handle_message(self, message_data: Union[str, MCPMessage]) -> Optional[asyncio.Task]:
         """
-        处理接收到的消息（内部方法）
+        接收消息并交给工作池处理（内部方法）
+        
+        响应直接完成等待中的请求；其他消息在工作池有名额时提交后立即返回，名额用完时等待（背压）。
         
         Args:
-            message_data: 消息JSON字符串
+            message_data: 编码后的消息（Redis传输，见codec模块）或消息对象（进程内传输，按引用传递）
+        
+        Returns:
+            处理任务（完成时该消息处理完毕，Streams传输在此之后确认），未提交处理时为None
         """
         try:
-            message = MCPMessage.from_json(message_data)
+            if isinstance(message_data, MCPMessage):
+                message = message_data
+            else:
+                message = MCPMessage.decode(message_data)
             
             # 忽略自己发送的消息
             if message.sender == self.agent_id:
@@ -187,25 +253,45 @@ class MCPAgent:
             # 如果是响应消息，处理待处理的响应
             if message.is_response() and message.correlation_id:
                 await self._handle_response(message)
-                return
+                return None
             
             # 调用注册的消息处理器
             handler = self.message_handlers.get(message.action)
             if handler:
-                try:
-                    await handler(message)
-                except Exception as e:
-                    logger.error(
-                        f"Agent {self.agent_id} error handling message "
-                        f"{message.message_id} (action: {message.action}): {e}"
-                    )
-            else:
-                logger.debug(
-                    f"Agent {self.agent_id} no handler for action: {message.action}"
+                return await self.worker_pool.submit(
+                    message.action, lambda: self._run_handler(handler, message)
                 )
+            logger.debug(
+                f"Agent {self.agent_id} no handler for action: {message.action}"
+            )
         
         except Exception as e:
             logger.error(f"Agent {self.agent_id} error processing message: {e}")
+        return None
+    
+    async def _run_handler(self, handler: Callable[[MCPMessage], Any], message: MCPMessage) -> None:
+        """
+        在工作池中执行消息处理器，异常记录日志后继续抛出，由工作池计为失败（内部方法）
+        
+        Args:
+            handler: 消息处理器
+            message: 消息
+        """
+        try:
+            # 按消息元数据中的优先级调度处理器内的LLM调用，token用量计入本Agent
+            priority = message.metadata.get("llm_priority")
+            priority_scope = (
+                llm_priority_scope(priority, batch_id=message.metadata.get("batch_id"))
+                if priority else nullcontext()
+            )
+            with llm_agent_scope(self.agent_type), priority_scope:
+                await handler(message)
+        except Exception as e:
+            logger.error(
+                f"Agent {self.agent_id} error handling message "
+                f"{message.message_id} (action: {message.action}): {e}"
+            )
+            raise
     
     async def _handle_response(self, message: MCPMessage) -> None:
         """
@@ -273,7 +359,8 @@ class MCPAgent:
         action: str,
         payload: Dict[str, Any],
         context_id: Optional[str] = None,
-        timeout: float = 30.0
+        timeout: float = 30.0,
+        metadata: Optional[Dict[str, Any]] = None
     ) -> MCPMessage:
         """
         发送请求并等待响应
@@ -284,6 +371,7 @@ class MCPAgent:
             payload: 请求数据
             context_id: 上下文ID（可选）
             timeout: 超时时间（秒）
+            metadata: 消息元数据（可选），如llm_priority、batch_id
             
         Returns:
             响应消息
@@ -297,7 +385,8 @@ class MCPAgent:
             receiver=receiver,
             action=action,
             payload=payload,
-            context_id=context_id
+            context_id=context_id,
+            metadata=metadata
         )
         
         # 创建响应Future
@@ -509,7 +598,8 @@ class MCPAgent:
             "is_running": self.is_running,
             "registered_actions": self.get_registered_actions(),
             "registered_tools": [tool.__name__ for tool in self.tools],
-            "pending_responses": len(self._pending_responses)
+            "pending_responses": len(self._pending_responses),
+            "in_flight": self.worker_pool.in_flight
         }
     
     async def health_check(self) -> Dict[str, Any]:
@@ -517,7 +607,7 @@ class MCPAgent:
         健康检查
         
         Returns:
-            健康状态信息
+            健康状态信息（worker_pool包含处理中数量和各动作的处理耗时直方图）
         """
         is_registered = await self.mcp_server.is_agent_registered(self.agent_id)
         
@@ -528,6 +618,8 @@ class MCPAgent:
             "is_registered": is_registered,
             "subscribed_channels": len(self._subscribed_channels),
             "pending_responses": len(self._pending_responses),
+            "in_flight": self.worker_pool.in_flight,
+            "worker_pool": self.worker_pool.get_stats(),
             "status": "healthy" if (self.is_running and is_registered) else "unhealthy"
         }
     
@@ -8,7 +8,7 @@ import uuid
 from typing import Dict, Any, Optional
 from datetime import datetime
 
-from .server import MCPServer
+from .server import MCPServer, create_mcp_server_from_settings
 from .message import MCPMessage
 from .context import create_context
 from ..models.schemas import (
@@ -35,7 +35,7 @@ class MCPClient:
         """确保 MCP Server 已初始化"""
         if not self._initialized:
             if not self.mcp_server:
-                self.mcp_server = MCPServer()
+                self.mcp_server = create_mcp_server_from_settings()
             
             # 启动必要的 Agents
             await self._start_agents()
@@ -0,0 +1,176 @@
+"""MCP消息和上下文的编码层
+
+MCPMessage.to_json/from_json使用pydantic的JSON序列化，解码完整JD、批量结果这类大负载时开销明显。编码层：
+1. 可插拔编码：json（pydantic，旧版格式）、orjson、msgpack（需要安装对应的包，未安装时不可用）
+2. 非json编码的数据带版本和编码头"MCP/1 <编码>\\n"，没有头的数据按旧版JSON解码，
+   新版Agent能读取旧版Agent发出的所有数据
+3. 旧版Agent只能读取JSON：发送方按接收方登记的编码（register_agent写入的codecs）选择编码，
+   未登记编码的接收方、广播和共享上下文仍使用JSON，直到所有Agent升级后关闭协商
+4. Redis连接使用decode_responses=True（字符串），msgpack的二进制结果以base64文本传输
+"""
+
+import base64
+import logging
+from decimal import Decimal
+from typing import Any, Dict, FrozenSet, Type, TypeVar
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+# 编码格式版本：头格式或字段语义不兼容地变化时递增
+CODEC_VERSION = 1
+HEADER_PREFIX = "MCP/"
+LEGACY_CODEC = "json"
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+class CodecError(ValueError):
+    """数据无法解码（版本过新或编码不可用）"""
+    pass
+
+
+def _orjson_default(value: Any) -> Any:
+    """orjson不支持的类型，按pydantic JSON的输出转换（负载中的pydantic模型、Decimal、bytes等）（内部方法）"""
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value).decode("utf-8")
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class JSONCodec:
+    """pydantic JSON编码（旧版格式，不带头）"""
+    name = "json"
+    
+    def encode(self, model: BaseModel) -> str:
+        return model.model_dump_json()
+    
+    def decode(self, cls: Type[ModelT], body: str) -> ModelT:
+        if ORJSON_AVAILABLE:
+            # 旧版数据也用orjson解析再校验，比model_validate_json快数倍
+            return cls.model_validate(orjson.loads(body))
+        return cls.model_validate_json(body)
+
+
+class OrjsonCodec:
+    """orjson编码（直接序列化模型字段，输出与pydantic JSON相同）"""
+    name = "orjson"
+    
+    def encode(self, model: BaseModel) -> str:
+        try:
+            data = orjson.dumps(model.__dict__, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # 负载中有其他pydantic能序列化而orjson不支持的类型（如timedelta）：先转换为JSON兼容的数据
+            data = orjson.dumps(model.model_dump(mode="json"))
+        return data.decode("utf-8")
+    
+    def decode(self, cls: Type[ModelT], body: str) -> ModelT:
+        return cls.model_validate(orjson.loads(body))
+
+
+class MsgpackCodec:
+    """msgpack编码（base64文本传输）"""
+    name = "msgpack"
+    
+    def encode(self, model: BaseModel) -> str:
+        return base64.b64encode(msgpack.packb(model.model_dump(mode="json"))).decode("ascii")
+    
+    def decode(self, cls: Type[ModelT], body: str) -> ModelT:
+        return cls.model_validate(msgpack.unpackb(base64.b64decode(body)))
+
+
+_CODECS: Dict[str, Any] = {"json": JSONCodec()}
+if ORJSON_AVAILABLE:
+    _CODECS["orjson"] = OrjsonCodec()
+if MSGPACK_AVAILABLE:
+    _CODECS["msgpack"] = MsgpackCodec()
+
+KNOWN_CODECS = ("json", "orjson", "msgpack")
+
+
+def available_codecs() -> FrozenSet[str]:
+    """本进程可编解码的编码名称"""
+    return frozenset(_CODECS)
+
+
+def resolve_codec(name: str) -> str:
+    """
+    检查编码名称，依赖未安装时回退到json
+    
+    Args:
+        name: 编码名称
+    
+    Returns:
+        可用的编码名称
+    
+    Raises:
+        ValueError: 未知编码
+    """
+    if name not in KNOWN_CODECS:
+        raise ValueError(f"Unknown MCP codec: {name}")
+    if name not in _CODECS:
+        logger.warning(f"MCP codec {name} is not installed, falling back to json")
+        return LEGACY_CODEC
+    return name
+
+
+def encode_model(model: BaseModel, codec: str = LEGACY_CODEC) -> str:
+    """
+    编码消息或上下文
+    
+    Args:
+        model: MCPMessage或MCPContext
+        codec: 编码名称（json输出旧版格式，其他编码带版本头）
+    
+    Returns:
+        编码后的字符串
+    """
+    if codec == LEGACY_CODEC:
+        return _CODECS[LEGACY_CODEC].encode(model)
+    return f"{HEADER_PREFIX}{CODEC_VERSION} {codec}\n{_CODECS[codec].encode(model)}"
+
+
+def decode_model(cls: Type[ModelT], data: Any) -> ModelT:
+    """
+    解码消息或上下文（自动识别旧版JSON和带头的数据）
+    
+    Args:
+        cls: 目标模型类
+        data: 编码后的字符串或字节
+    
+    Returns:
+        模型实例
+    
+    Raises:
+        CodecError: 版本高于本进程支持的版本，或编码不可用
+    """
+    if isinstance(data, (bytes, bytearray)):
+        data = data.decode("utf-8")
+    if not data.startswith(HEADER_PREFIX):
+        return _CODECS[LEGACY_CODEC].decode(cls, data)
+    
+    header, _, body = data.partition("\n")
+    version, _, codec = header[len(HEADER_PREFIX):].partition(" ")
+    if not version.isdigit() or int(version) > CODEC_VERSION:
+        raise CodecError(f"Unsupported MCP codec version: {header}")
+    if codec not in _CODECS:
+        raise CodecError(f"MCP codec not available: {codec}")
+    return _CODECS[codec].decode(cls, body)
@@ -1,11 +1,13 @@
 """MCP上下文协议 - 共享上下文定义"""
 
 from pydantic import BaseModel, Field
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Union
 from datetime import datetime
 import uuid
 import json
 
+from .codec import decode_model, encode_model
+
 
 class MCPContext(BaseModel):
     """
@@ -61,6 +63,15 @@ class MCPContext(BaseModel):
         """从JSON字符串反序列化"""
         return cls.model_validate_json(json_str)
     
+    def encode(self, codec: str = "json") -> str:
+        """按指定编码序列化（json为旧版格式，其他编码带版本头，见codec模块）"""
+        return encode_model(self, codec)
+    
+    @classmethod
+    def decode(cls, data: Union[str, bytes]) -> 'MCPContext':
+        """反序列化任意编码的数据（旧版JSON或带版本头的数据）"""
+        return decode_model(cls, data)
+    
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典"""
         return self.model_dump()
@@ -0,0 +1,189 @@
+"""MCP Pub/Sub消息分发器
+
+Pub/Sub传输下所有Agent共用MCPServer的一个PubSub连接：原先每个Agent各自迭代同一个pubsub.listen()，
+多个协程争抢一个异步迭代器，拿到消息的Agent还要自己解码再判断是否发给自己。分发器：
+1. 由服务器的监听任务唯一读取PubSub连接，每条消息只解码一次
+2. 按通道路由到订阅了该通道的Agent（mcp:agent:{ID}只到该Agent，广播到除发送方外的所有Agent）
+3. 每个Agent一个有界收件箱，由一个协程按到达顺序交给Agent（并发由Agent的工作池控制）；收件箱满时丢弃新消息并计数，
+   一个慢Agent不会阻塞其他Agent的消息（Pub/Sub本身就是至多一次投递，需要持久化时使用streams传输）
+4. 响应不进收件箱，直接交给Agent完成等待中的请求：处理器内部等待send_request时不会死锁
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set
+
+from .message import MCPMessage
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _AgentInbox:
+    """单个Agent的收件箱（内部使用）"""
+    agent_id: str
+    queue: asyncio.Queue
+    handler: Optional[Callable[[MCPMessage], Awaitable[Any]]] = None
+    in_flight: int = 0
+    high_water: int = 0
+    stats: Dict[str, int] = field(default_factory=lambda: {
+        "delivered": 0,
+        "processed": 0,
+        "responses": 0,
+        "dropped": 0
+    })
+
+
+class PubSubDispatcher:
+    """按通道把Pub/Sub消息分发到各Agent有界收件箱的分发器"""
+    
+    def __init__(
+        self,
+        inbox_size: int = 1000,
+        agent_limits: Optional[Dict[str, Dict[str, int]]] = None
+    ):
+        """初始化分发器
+        
+        Args:
+            inbox_size: 每个Agent收件箱的最大长度
+            agent_limits: 按Agent ID覆盖的限制，如{"evaluator": {"inbox_size": 5000}}
+        
+        每个Agent同时处理的消息数由Agent的工作池（max_in_flight）控制，分发器不再单独设置
+        """
+        self.inbox_size = max(1, inbox_size)
+        self.agent_limits = agent_limits or {}
+        
+        self._inboxes: Dict[str, _AgentInbox] = {}
+        # 通道 -> 订阅该通道的Agent ID
+        self._routes: Dict[str, Set[str]] = {}
+        
+        self._received = 0
+        self._decode_errors = 0
+        self._unrouted = 0
+    
+    def register(self, agent_id: str, channels: Iterable[str]) -> None:
+        """
+        登记Agent及其订阅的通道（重复登记时更新通道，保留收件箱中的消息）
+        
+        Args:
+            agent_id: Agent ID
+            channels: Agent订阅的通道
+        """
+        if agent_id not in self._inboxes:
+            limits = self.agent_limits.get(agent_id, {})
+            self._inboxes[agent_id] = _AgentInbox(
+                agent_id=agent_id,
+                queue=asyncio.Queue(maxsize=max(1, limits.get("inbox_size", self.inbox_size)))
+            )
+        self._unroute(agent_id)
+        for channel in channels:
+            self._routes.setdefault(channel, set()).add(agent_id)
+    
+    def unregister(self, agent_id: str) -> None:
+        """注销Agent（收件箱中未处理的消息随之丢弃）"""
+        self._unroute(agent_id)
+        self._inboxes.pop(agent_id, None)
+    
+    def _unroute(self, agent_id: str) -> None:
+        """从所有通道移除Agent（内部方法）"""
+        for channel in list(self._routes):
+            self._routes[channel].discard(agent_id)
+            if not self._routes[channel]:
+                del self._routes[channel]
+    
+    async def dispatch(self, channel: str, data: str) -> Optional[MCPMessage]:
+        """
+        解码一条Pub/Sub消息并投递到目标Agent的收件箱
+        
+        Args:
+            channel: 消息所在通道
+            data: 编码后的消息（旧版JSON或带版本头的数据）
+        
+        Returns:
+            解码后的消息（解码失败时为None），供服务器级处理器使用
+        """
+        self._received += 1
+        try:
+            message = MCPMessage.decode(data)
+        except Exception as e:
+            self._decode_errors += 1
+            logger.error(f"Failed to decode message on {channel}: {e}")
+            return None
+        
+        targets = [
+            agent_id for agent_id in self._routes.get(channel, ())
+            if agent_id != message.sender
+        ]
+        if not targets:
+            self._unrouted += 1
+            return message
+        
+        for agent_id in targets:
+            inbox = self._inboxes[agent_id]
+            if message.is_response() and inbox.handler is not None:
+                # 响应只完成等待中的Future，直接处理
+                inbox.stats["responses"] += 1
+                await inbox.handler(message)
+                continue
+            try:
+                inbox.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                inbox.stats["dropped"] += 1
+                logger.warning(
+                    f"Inbox of agent {agent_id} is full ({inbox.queue.maxsize}), "
+                    f"message dropped: {message.message_id} (action: {message.action})"
+                )
+                continue
+            inbox.stats["delivered"] += 1
+            inbox.high_water = max(inbox.high_water, inbox.queue.qsize())
+        return message
+    
+    async def consume(self, agent_id: str, handler: Callable[[MCPMessage], Awaitable[Any]]) -> None:
+        """
+        按到达顺序把Agent收件箱中的消息交给handler，直到任务被取消
+        
+        handler（Agent._handle_message）把请求交给工作池后即返回，名额用完时等待
+        
+        Args:
+            agent_id: 已登记的Agent ID
+            handler: 消息处理函数（接收解码后的MCPMessage）
+        """
+        inbox = self._inboxes[agent_id]
+        inbox.handler = handler
+        try:
+            await self._work(inbox)
+        finally:
+            inbox.handler = None
+    
+    async def _work(self, inbox: _AgentInbox) -> None:
+        """收件箱工作协程（内部方法）"""
+        while True:
+            message = await inbox.queue.get()
+            inbox.in_flight += 1
+            try:
+                await inbox.handler(message)
+            finally:
+                inbox.in_flight -= 1
+                inbox.stats["processed"] += 1
+                inbox.queue.task_done()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取分发统计（各Agent收件箱深度、历史最大深度、处理中数量和丢弃数）"""
+        inboxes = {}
+        for agent_id, inbox in self._inboxes.items():
+            stats: Dict[str, Any] = {
+                "depth": inbox.queue.qsize(),
+                "high_water": inbox.high_water,
+                "capacity": inbox.queue.maxsize,
+                "in_flight": inbox.in_flight
+            }
+            stats.update(inbox.stats)
+            inboxes[agent_id] = stats
+        return {
+            "transport": "pubsub",
+            "received": self._received,
+            "decode_errors": self._decode_errors,
+            "unrouted": self._unrouted,
+            "inboxes": inboxes
+        }
@@ -0,0 +1,242 @@
+"""MCP消息总线的进程内传输（单节点部署）
+
+所有Agent运行在同一进程时，经Redis转发的每条消息都要做一次JSON编码、一次网络往返和一次JSON解码，
+大负载（JD全文、评估结果）的序列化开销在总线延迟中占主要部分。进程内传输：
+1. 每个Agent ID一个asyncio队列，MCPMessage对象按引用传递，不做JSON编码和解码
+2. 响应投递到请求方的回复队列，与请求队列分开消费（处理器等待send_request时响应仍能送达）
+3. 广播把同一个对象放入每个Agent的广播队列
+4. Agent启动前（或重启期间）发给它的消息在队列中等待，启动后送达
+
+只适用于所有Agent共用一个MCPServer的单进程部署，每个Agent ID只能有一个实例；
+多进程或多副本部署使用Redis Streams传输。
+
+消息按引用传递：处理器不应修改收到的payload和metadata（发送方仍持有同一对象）。
+上下文存储在进程内（InMemoryContextStore），保存和读取时复制，与Redis存储的隔离语义一致。
+"""
+
+import asyncio
+import fnmatch
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .context import MCPContext
+from .message import MCPMessage, MessageType
+
+logger = logging.getLogger(__name__)
+
+QUEUE_PREFIX = "memory:"
+
+
+@dataclass
+class _MemorySubscription:
+    """单个Agent的订阅状态（内部使用）"""
+    agent_id: str
+    group: str
+    inbox: asyncio.Queue
+    replies: asyncio.Queue = field(default_factory=asyncio.Queue)
+    broadcasts: asyncio.Queue = field(default_factory=asyncio.Queue)
+    stats: Dict[str, int] = field(default_factory=lambda: {
+        "delivered": 0,
+        "replies": 0,
+        "broadcasts": 0
+    })
+
+
+class InMemoryTransport:
+    """基于asyncio队列的进程内MCP消息传输（零序列化）"""
+    
+    def __init__(self, max_queue_size: int = 0):
+        """初始化进程内传输
+        
+        Args:
+            max_queue_size: 每个Agent请求队列的最大长度（0表示不限制），队列满时发送方等待
+        """
+        self.max_queue_size = max(0, max_queue_size)
+        
+        # Agent ID -> 请求队列（取消订阅后保留，重启后继续处理）
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._subscriptions: Dict[str, _MemorySubscription] = {}
+        self._sent = 0
+        self._dropped = 0
+    
+    @staticmethod
+    def stream_for(agent_id: str) -> str:
+        """Agent的点对点消息队列名称"""
+        return f"{QUEUE_PREFIX}{agent_id}"
+    
+    def _queue_for(self, agent_id: str) -> asyncio.Queue:
+        """获取（必要时创建）Agent的请求队列（内部方法）"""
+        queue = self._queues.get(agent_id)
+        if queue is None:
+            queue = self._queues[agent_id] = asyncio.Queue(maxsize=self.max_queue_size)
+        return queue
+    
+    async def send(self, message: MCPMessage, codec: Optional[str] = None) -> str:
+        """发送消息（按引用投递，不编码）
+        
+        请求和点对点通知进入接收者的请求队列（max_queue_size限制时队列满则等待），
+        响应进入请求方的回复队列，广播进入除发送方外每个Agent的广播队列。
+        
+        Args:
+            message: MCP消息
+            codec: 忽略（与Redis传输的接口一致，进程内不编码）
+        
+        Returns:
+            消息ID
+        """
+        self._sent += 1
+        
+        if message.receiver is None:
+            for subscription in self._subscriptions.values():
+                # 发送方会忽略自己的消息，不必投递
+                if subscription.agent_id != message.sender:
+                    subscription.broadcasts.put_nowait(message)
+            return message.message_id
+        
+        if message.message_type == MessageType.RESPONSE:
+            subscription = self._subscriptions.get(message.receiver)
+            if subscription is not None:
+                subscription.replies.put_nowait(message)
+            else:
+                # 请求方已停止，没有人在等待这个响应
+                self._dropped += 1
+                logger.debug(f"Response receiver {message.receiver} not subscribed, dropped: {message.message_id}")
+            return message.message_id
+        
+        await self._queue_for(message.receiver).put(message)
+        return message.message_id
+    
+    async def subscribe(self, agent_id: str, agent_type: str) -> None:
+        """
+        登记Agent，之后发给它的请求（包括启动前已排队的）由consume处理
+        
+        Args:
+            agent_id: Agent ID
+            agent_type: Agent类型
+        
+        Raises:
+            ValueError: 同一Agent ID已经订阅
+        """
+        if agent_id in self._subscriptions:
+            raise ValueError(f"Agent {agent_id} is already subscribed to the memory transport")
+        self._subscriptions[agent_id] = _MemorySubscription(
+            agent_id=agent_id,
+            group=agent_type,
+            inbox=self._queue_for(agent_id)
+        )
+        logger.info(f"Memory transport subscription: {agent_id} (type={agent_type})")
+    
+    async def unsubscribe(self, agent_id: str) -> None:
+        """取消订阅（请求队列保留，未处理的消息在Agent重启后继续处理）"""
+        self._subscriptions.pop(agent_id, None)
+    
+    async def consume(self, agent_id: str, handler: Callable[[MCPMessage], Awaitable[Any]]) -> None:
+        """
+        持续消费Agent的消息，直到任务被取消
+        
+        Args:
+            agent_id: 已订阅的Agent ID
+            handler: 消息处理函数（接收MCPMessage对象）
+        """
+        subscription = self._subscriptions[agent_id]
+        await asyncio.gather(
+            self._consume_queue(subscription, subscription.inbox, "delivered", handler),
+            self._consume_queue(subscription, subscription.replies, "replies", handler),
+            self._consume_queue(subscription, subscription.broadcasts, "broadcasts", handler)
+        )
+    
+    async def _consume_queue(
+        self,
+        subscription: _MemorySubscription,
+        queue: asyncio.Queue,
+        counter: str,
+        handler: Callable[[MCPMessage], Awaitable[Any]]
+    ) -> None:
+        """逐条处理一个队列（内部方法）"""
+        while True:
+            message = await queue.get()
+            try:
+                subscription.stats[counter] += 1
+                await handler(message)
+            finally:
+                queue.task_done()
+    
+    async def get_stats(self) -> Dict[str, Any]:
+        """获取传输统计（各Agent的投递数和队列深度）"""
+        subscriptions = {}
+        for agent_id, subscription in self._subscriptions.items():
+            stats: Dict[str, Any] = {"group": subscription.group}
+            stats.update(subscription.stats)
+            stats["queue_depth"] = subscription.inbox.qsize()
+            subscriptions[agent_id] = stats
+        return {
+            "transport": "memory",
+            "max_queue_size": self.max_queue_size,
+            "sent": self._sent,
+            "dropped": self._dropped,
+            # 没有订阅者的队列（Agent未启动时发给它的消息）
+            "queued": {
+                agent_id: queue.qsize() for agent_id, queue in self._queues.items()
+                if agent_id not in self._subscriptions and queue.qsize()
+            },
+            "subscriptions": subscriptions
+        }
+
+
+class InMemoryContextStore:
+    """进程内上下文存储（内部使用）
+    
+    保存和读取时深拷贝：调用方修改读到的上下文后必须update_context才会生效，与Redis存储一致。
+    """
+    
+    def __init__(self):
+        # 上下文ID -> (上下文, 过期时间戳)
+        self._contexts: Dict[str, Tuple[MCPContext, float]] = {}
+    
+    def save(self, context: MCPContext, ttl: int) -> None:
+        """保存上下文
+        
+        Args:
+            context: 上下文对象
+            ttl: 过期时间（秒）
+        """
+        self._contexts[context.context_id] = (context.model_copy(deep=True), time.time() + ttl)
+    
+    def get(self, context_id: str) -> Optional[MCPContext]:
+        """读取上下文（已过期时删除并返回None）"""
+        item = self._contexts.get(context_id)
+        if item is None:
+            return None
+        context, expires_at = item
+        if time.time() >= expires_at:
+            del self._contexts[context_id]
+            return None
+        return context.model_copy(deep=True)
+    
+    def delete(self, context_id: str) -> None:
+        """删除上下文"""
+        self._contexts.pop(context_id, None)
+    
+    def keys(self, pattern: str = "*") -> List[str]:
+        """列出匹配的上下文ID（与Redis SCAN一样使用glob模式）"""
+        now = time.time()
+        return [
+            context_id for context_id, (_, expires_at) in self._contexts.items()
+            if expires_at > now and fnmatch.fnmatchcase(context_id, pattern)
+        ]
+    
+    def cleanup(self) -> int:
+        """删除已过期的上下文，返回删除数量"""
+        now = time.time()
+        expired = [
+            context_id for context_id, (context, expires_at) in self._contexts.items()
+            if expires_at <= now or context.is_expired()
+        ]
+        for context_id in expired:
+            del self._contexts[context_id]
+        return len(expired)
+    
+    def __len__(self) -> int:
+        return len(self.keys())
@@ -3,14 +3,19 @@
 import asyncio
 import json
 import logging
-from typing import Dict, Optional, Callable, Any, Set
+import time
+from typing import Dict, Optional, Callable, Any, Set, Union
 from datetime import datetime
 
 import redis.asyncio as redis
 from redis.asyncio.client import PubSub
 
 from .message import MCPMessage, MessageType
+from .codec import LEGACY_CODEC, available_codecs, resolve_codec
 from .context import MCPContext
+from .dispatcher import PubSubDispatcher
+from .memory import InMemoryContextStore, InMemoryTransport
+from .streams import RedisStreamsTransport
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +26,11 @@ class MCPServer:
     
     基于Redis实现消息发布订阅和上下文存储，
     提供Agent注册、消息路由和上下文管理功能
+    
+    消息传输：
+    - pubsub（默认）：Redis发布订阅，只投递给在线的订阅者；服务器读取连接并解码一次，分发到各Agent收件箱
+    - streams：Redis Streams消费者组，消息持久化、确认和认领，同一Agent可运行多个副本
+    - memory：进程内asyncio队列，消息按引用传递不做序列化，不需要Redis（单进程部署）
     """
     
     def __init__(
@@ -28,7 +38,13 @@ class MCPServer:
         redis_host: str = "localhost",
         redis_port: int = 6379,
         redis_db: int = 0,
-        redis_password: Optional[str] = None
+        redis_password: Optional[str] = None,
+        transport: str = "pubsub",
+        stream_options: Optional[Dict[str, Any]] = None,
+        memory_options: Optional[Dict[str, Any]] = None,
+        dispatcher_options: Optional[Dict[str, Any]] = None,
+        codec: str = LEGACY_CODEC,
+        codec_negotiation: bool = True
     ):
         """
         初始化MCP服务器
@@ -38,15 +54,44 @@ class MCPServer:
             redis_port: Redis端口
             redis_db: Redis数据库编号
             redis_password: Redis密码（可选）
+            transport: 消息传输（pubsub、streams或memory）
+            stream_options: RedisStreamsTransport的参数（max_len、claim_idle_ms、max_deliveries等）
+            memory_options: InMemoryTransport的参数（max_queue_size）
+            dispatcher_options: PubSubDispatcher的参数（inbox_size、agent_limits）
+            codec: 发送消息和保存上下文的编码（json、orjson或msgpack，json为旧版格式）
+            codec_negotiation: 是否按接收方登记的编码协商（为True时，未登记编码的接收方、广播和上下文使用json；
+                所有Agent升级后设为False，全部使用codec）
         """
+        if transport not in ("pubsub", "streams", "memory"):
+            raise ValueError(f"Unknown MCP transport: {transport}")
+        
         self.redis_host = redis_host
         self.redis_port = redis_port
         self.redis_db = redis_db
         self.redis_password = redis_password
+        self.transport_name = transport
+        self.stream_options = stream_options or {}
+        self.memory_options = memory_options or {}
+        self.codec = resolve_codec(codec)
+        self.codec_negotiation = codec_negotiation
+        
+        # 接收方Agent ID -> (登记的编码, 缓存过期时间)
+        self._peer_codecs: Dict[str, tuple] = {}
         
         self.redis_client: Optional[redis.Redis] = None
         self.pubsub: Optional[PubSub] = None
         
+        # Streams或进程内传输（连接后创建；pubsub模式下为None）
+        self.transport: Optional[Any] = None
+        
+        # 进程内上下文存储（memory模式下代替Redis）
+        self.context_store: Optional[InMemoryContextStore] = None
+        
+        # Pub/Sub消息分发器（其他传输下为None）
+        self.dispatcher: Optional[PubSubDispatcher] = (
+            PubSubDispatcher(**(dispatcher_options or {})) if transport == "pubsub" else None
+        )
+        
         # Agent注册表
         self.agents: Dict[str, Dict[str, Any]] = {}
         
@@ -62,7 +107,14 @@ class MCPServer:
         )
     
     async def connect(self) -> None:
-        """连接到Redis服务器"""
+        """连接到Redis服务器（memory模式下只创建进程内传输和上下文存储）"""
+        if self.transport_name == "memory":
+            if self.transport is None:
+                self.transport = InMemoryTransport(**self.memory_options)
+                self.context_store = InMemoryContextStore()
+            logger.info("Using in-process transport (no Redis)")
+            return
+        
         try:
             self.redis_client = await redis.Redis(
                 host=self.redis_host,
@@ -76,7 +128,10 @@ class MCPServer:
             # 测试连接
             await self.redis_client.ping()
             
-            logger.info("Successfully connected to Redis")
+            if self.transport_name == "streams":
+                self.transport = RedisStreamsTransport(self.redis_client, **self.stream_options)
+            
+            logger.info(f"Successfully connected to Redis (transport: {self.transport_name})")
             
         except Exception as e:
             logger.error(f"Failed to connect to Redis: {e}")
@@ -91,6 +146,8 @@ class MCPServer:
         if self.redis_client:
             await self.redis_client.close()
             self.redis_client = None
+        self.transport = None
+        self.context_store = None
         
         logger.info("Disconnected from Redis")
     
@@ -100,13 +157,14 @@ class MCPServer:
             logger.warning("MCP Server is already running")
             return
         
-        if not self.redis_client:
+        if not self.redis_client and self.transport is None:
             await self.connect()
         
         self.is_running = True
         
-        # 启动消息监听器
-        self._listener_task = asyncio.create_task(self._listen_to_messages())
+        # 启动消息监听器（Streams模式下由各Agent消费自己的流）
+        if self.transport is None:
+            self._listener_task = asyncio.create_task(self._listen_to_messages())
         
         logger.info("MCP Server started")
     
@@ -163,7 +221,9 @@ class MCPServer:
                     mapping={
                         "agent_type": agent_type,
                         "metadata": json.dumps(metadata or {}),
-                        "registered_at": str(agent_info["registered_at"])
+                        "registered_at": str(agent_info["registered_at"]),
+                        # 本进程可解码的编码，供发送方协商
+                        "codecs": ",".join(sorted(available_codecs()))
                     }
                 )
             except Exception as e:
@@ -232,6 +292,39 @@ class MCPServer:
         
         return False
     
+    async def _codec_for(self, receiver: Optional[str]) -> str:
+        """
+        选择发给接收方的编码（内部方法）
+        
+        接收方在注册信息中登记了该编码时使用self.codec，否则使用旧版JSON；
+        登记信息缓存60秒，读取失败按未登记处理。
+        
+        Args:
+            receiver: 接收者Agent ID（None表示广播）
+        
+        Returns:
+            编码名称
+        """
+        if self.codec == LEGACY_CODEC or not self.codec_negotiation:
+            return self.codec
+        if receiver is None:
+            # 广播的接收方可能包含旧版Agent
+            return LEGACY_CODEC
+        if receiver in self.agents:
+            return self.codec
+        
+        cached = self._peer_codecs.get(receiver)
+        if cached is None or cached[1] <= time.monotonic():
+            codecs: frozenset = frozenset()
+            if self.redis_client:
+                try:
+                    value = await self.redis_client.hget(f"mcp:agent:{receiver}:info", "codecs")
+                    codecs = frozenset((value or "").split(","))
+                except Exception as e:
+                    logger.debug(f"Failed to read codecs of agent {receiver}: {e}")
+            cached = self._peer_codecs[receiver] = (codecs, time.monotonic() + 60)
+        return self.codec if self.codec in cached[0] else LEGACY_CODEC
+    
     async def send_message(self, message: MCPMessage) -> None:
         """
         发送消息
@@ -239,6 +332,15 @@ class MCPServer:
         Args:
             message: MCP消息对象
         """
+        if self.transport is not None:
+            await self.transport.send(message, codec=await self._codec_for(message.receiver))
+            logger.debug(
+                f"Message sent: {message.message_id} "
+                f"from {message.sender} to {message.receiver or 'broadcast'} "
+                f"(action: {message.action}, transport: {self.transport_name})"
+            )
+            return
+        
         if not self.redis_client:
             raise RuntimeError("MCP Server is not connected to Redis")
         
@@ -251,8 +353,8 @@ class MCPServer:
             channel = "mcp:broadcast"
         
         # 发布消息
-        message_json = message.to_json()
-        await self.redis_client.publish(channel, message_json)
+        message_data = message.encode(await self._codec_for(message.receiver))
+        await self.redis_client.publish(channel, message_data)
         
         logger.debug(
             f"Message sent: {message.message_id} "
@@ -300,7 +402,10 @@ class MCPServer:
                     break
                 
                 if message["type"] == "message":
-                    await self._handle_message(message["data"])
+                    # 只解码一次，按通道分发到各Agent收件箱
+                    decoded = await self.dispatcher.dispatch(message["channel"], message["data"])
+                    if decoded is not None and self.message_handlers:
+                        await self._handle_message(decoded)
         
         except asyncio.CancelledError:
             logger.info("Message listener cancelled")
@@ -309,15 +414,18 @@ class MCPServer:
         except Exception as e:
             logger.error(f"Error in message listener: {e}")
     
-    async def _handle_message(self, message_data: str) -> None:
+    async def _handle_message(self, message_data: Union[str, MCPMessage]) -> None:
         """
         处理接收到的消息（内部方法）
         
         Args:
-            message_data: 消息JSON字符串
+            message_data: 消息JSON字符串或已解码的消息
         """
         try:
-            message = MCPMessage.from_json(message_data)
+            if isinstance(message_data, MCPMessage):
+                message = message_data
+            else:
+                message = MCPMessage.decode(message_data)
             
             # 调用注册的消息处理器
             handler = self.message_handlers.get(message.action)
@@ -357,29 +465,29 @@ class MCPServer:
     
     async def save_context(self, context: MCPContext) -> None:
         """
-        保存上下文到Redis
+        保存上下文到Redis（memory模式下保存在进程内）
         
         Args:
             context: MCP上下文对象
         """
-        if not self.redis_client:
+        if not self.redis_client and self.context_store is None:
             raise RuntimeError("MCP Server is not connected to Redis")
         
-        context_key = f"mcp:context:{context.context_id}"
-        context_json = context.to_json()
-        
-        # 保存上下文，设置过期时间
+        # 过期时间，默认1小时
+        ttl = 3600
         if context.expires_at:
             ttl = int(context.expires_at - datetime.now().timestamp())
-            if ttl > 0:
-                await self.redis_client.setex(context_key, ttl, context_json)
-            else:
+            if ttl <= 0:
                 # 已过期，不保存
                 logger.warning(f"Context {context.context_id} is already expired")
                 return
+        
+        if self.context_store is not None:
+            self.context_store.save(context, ttl)
         else:
-            # 默认1小时过期
-            await self.redis_client.setex(context_key, 3600, context_json)
+            # 上下文可能被任意Agent读取：协商期间使用旧版JSON
+            codec = LEGACY_CODEC if self.codec_negotiation else self.codec
+            await self.redis_client.setex(f"mcp:context:{context.context_id}", ttl, context.encode(codec))
         
         logger.debug(f"Context saved: {context.context_id}")
     
@@ -393,6 +501,9 @@ class MCPServer:
         Returns:
             上下文对象，如果不存在则返回None
         """
+        if self.context_store is not None:
+            return self.context_store.get(context_id)
+        
         if not self.redis_client:
             raise RuntimeError("MCP Server is not connected to Redis")
         
@@ -400,7 +511,7 @@ class MCPServer:
         context_json = await self.redis_client.get(context_key)
         
         if context_json:
-            context = MCPContext.from_json(context_json)
+            context = MCPContext.decode(context_json)
             logger.debug(f"Context retrieved: {context_id}")
             return context
         
@@ -429,11 +540,12 @@ class MCPServer:
         Args:
             context_id: 上下文ID
         """
-        if not self.redis_client:
+        if self.context_store is not None:
+            self.context_store.delete(context_id)
+        elif not self.redis_client:
             raise RuntimeError("MCP Server is not connected to Redis")
-        
-        context_key = f"mcp:context:{context_id}"
-        await self.redis_client.delete(context_key)
+        else:
+            await self.redis_client.delete(f"mcp:context:{context_id}")
         
         logger.debug(f"Context deleted: {context_id}")
     
@@ -447,6 +559,9 @@ class MCPServer:
         Returns:
             上下文ID列表
         """
+        if self.context_store is not None:
+            return self.context_store.keys(pattern)
+        
         if not self.redis_client:
             raise RuntimeError("MCP Server is not connected to Redis")
         
@@ -465,6 +580,12 @@ class MCPServer:
         Returns:
             清理的上下文数量
         """
+        if self.context_store is not None:
+            cleaned_count = self.context_store.cleanup()
+            if cleaned_count > 0:
+                logger.info(f"Cleaned {cleaned_count} expired contexts")
+            return cleaned_count
+        
         if not self.redis_client:
             raise RuntimeError("MCP Server is not connected to Redis")
         
@@ -474,7 +595,7 @@ class MCPServer:
             context_json = await self.redis_client.get(key)
             if context_json:
                 try:
-                    context = MCPContext.from_json(context_json)
+                    context = MCPContext.decode(context_json)
                     if context.is_expired():
                         await self.redis_client.delete(key)
                         cleaned_count += 1
@@ -497,6 +618,16 @@ class MCPServer:
             健康状态信息
         """
         try:
+            if self.context_store is not None:
+                return {
+                    "status": "healthy" if self.is_running else "unhealthy",
+                    "redis_connected": False,
+                    "is_running": self.is_running,
+                    "transport": self.transport_name,
+                    "registered_agents": len(self.agents),
+                    "active_contexts": len(self.context_store)
+                }
+            
             if not self.redis_client:
                 return {
                     "status": "unhealthy",
@@ -519,6 +650,7 @@ class MCPServer:
                 "status": "healthy",
                 "redis_connected": True,
                 "is_running": self.is_running,
+                "transport": self.transport_name,
                 "registered_agents": agent_count,
                 "active_contexts": context_count
             }
@@ -539,6 +671,15 @@ class MCPServer:
         Returns:
             统计信息
         """
+        if self.context_store is not None:
+            return {
+                "registered_agents": len(self.agents),
+                "agent_ids": list(self.agents),
+                "active_contexts": len(self.context_store),
+                "is_running": self.is_running,
+                "transport": await self.transport.get_stats()
+            }
+        
         if not self.redis_client:
             return {"error": "Not connected to Redis"}
         
@@ -559,7 +700,12 @@ class MCPServer:
                 "registered_agents": len(agents),
                 "agent_ids": list(agents),
                 "active_contexts": len(contexts),
-                "is_running": self.is_running
+                "is_running": self.is_running,
+                "codec": {"codec": self.codec, "negotiation": self.codec_negotiation},
+                "transport": (
+                    await self.transport.get_stats() if self.transport is not None
+                    else self.dispatcher.get_stats()
+                )
             }
         
         except Exception as e:
@@ -574,7 +720,13 @@ async def create_mcp_server(
     redis_port: int = 6379,
     redis_db: int = 0,
     redis_password: Optional[str] = None,
-    auto_start: bool = True
+    auto_start: bool = True,
+    transport: str = "pubsub",
+    stream_options: Optional[Dict[str, Any]] = None,
+    memory_options: Optional[Dict[str, Any]] = None,
+    dispatcher_options: Optional[Dict[str, Any]] = None,
+    codec: str = LEGACY_CODEC,
+    codec_negotiation: bool = True
 ) -> MCPServer:
     """
     创建并启动MCP服务器的便捷函数
@@ -585,6 +737,12 @@ async def create_mcp_server(
         redis_db: Redis数据库编号
         redis_password: Redis密码（可选）
         auto_start: 是否自动启动服务器
+        transport: 消息传输（pubsub、streams或memory）
+        stream_options: RedisStreamsTransport的参数
+        memory_options: InMemoryTransport的参数
+        dispatcher_options: PubSubDispatcher的参数
+        codec: 消息和上下文的编码（json、orjson或msgpack）
+        codec_negotiation: 是否按接收方登记的编码协商
         
     Returns:
         MCP服务器实例
@@ -593,10 +751,41 @@ async def create_mcp_server(
         redis_host=redis_host,
         redis_port=redis_port,
         redis_db=redis_db,
-        redis_password=redis_password
+        redis_password=redis_password,
+        transport=transport,
+        stream_options=stream_options,
+        memory_options=memory_options,
+        dispatcher_options=dispatcher_options,
+        codec=codec,
+        codec_negotiation=codec_negotiation
     )
     
     if auto_start:
         await server.start()
     
     return server
+
+
+def create_mcp_server_from_settings() -> MCPServer:
+    """
+    根据配置创建MCP服务器（未连接）
+    
+    MCP_TRANSPORT选择消息传输：pubsub（默认）、streams或memory
+    """
+    from ..core.config import settings
+    
+    return MCPServer(
+        redis_host=settings.REDIS_HOST,
+        redis_port=settings.REDIS_PORT,
+        redis_db=settings.REDIS_DB,
+        transport=settings.MCP_TRANSPORT,
+        stream_options={
+            "max_len": settings.MCP_STREAM_MAX_LEN,
+            "claim_idle_ms": settings.MCP_STREAM_CLAIM_IDLE_MS,
+            "max_deliveries": settings.MCP_STREAM_MAX_DELIVERIES
+        },
+        memory_options={"max_queue_size": settings.MCP_MEMORY_QUEUE_SIZE},
+        dispatcher_options={"inbox_size": settings.MCP_AGENT_INBOX_SIZE},
+        codec=settings.MCP_CODEC,
+        codec_negotiation=settings.MCP_CODEC_NEGOTIATION
+    )
@@ -0,0 +1,401 @@
+"""MCP消息总线的Redis Streams传输
+
+Pub/Sub只投递给当前在线的订阅者：Agent重启期间发给它的消息会丢失，同一个Agent ID也只能有一个进程消费
+（多个进程订阅同一通道时每条消息会被重复处理）。Streams传输：
+1. 点对点消息写入mcp:stream:{接收者ID}，按Agent类型建立消费者组，同一Agent的N个副本各自作为消费者，
+   每条消息只投递给其中一个副本（负载均衡）
+2. 处理完成后XACK；消费者崩溃时未确认的消息留在待处理列表（PEL），空闲超过claim_idle_ms后由其他副本认领，
+   投递次数超过max_deliveries的消息转入死信流，避免反复导致崩溃
+3. 响应写入请求方副本自己的回复流（请求元数据中的reply_to），不会被同ID的其他副本取走
+4. 广播写入mcp:stream:broadcast，每个副本独立读取（不确认）
+5. 所有流按max_len近似截断（XADD MAXLEN ~），回复流设置过期时间，读取回复流的副本定期续期
+6. Redis连接错误按指数退避重试；消费者组丢失（NOGROUP，如回复流过期）时重新创建
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from redis.exceptions import RedisError
+
+from .message import MCPMessage, MessageType
+
+logger = logging.getLogger(__name__)
+
+STREAM_PREFIX = "mcp:stream:"
+BROADCAST_STREAM = f"{STREAM_PREFIX}broadcast"
+DEAD_LETTER_STREAM = f"{STREAM_PREFIX}dead"
+
+# 流条目：(流名称, 条目ID, 字段)
+StreamEntry = Tuple[str, str, Optional[Dict[str, str]]]
+
+# 可重试的错误（连接断开、超时、服务端错误），其他异常视为程序错误，结束消费
+TRANSIENT_ERRORS = (RedisError, OSError, asyncio.TimeoutError)
+
+
+@dataclass
+class _StreamSubscription:
+    """单个Agent副本的订阅状态（内部使用）"""
+    agent_id: str
+    group: str
+    consumer: str
+    stream: str
+    reply_stream: str
+    broadcast_last_id: str
+    stats: Dict[str, int] = field(default_factory=lambda: {
+        "delivered": 0,
+        "acked": 0,
+        "reclaimed": 0,
+        "dead_lettered": 0,
+        "broadcasts": 0,
+        "errors": 0
+    })
+
+
+class RedisStreamsTransport:
+    """基于Redis Streams和消费者组的MCP消息传输"""
+    
+    def __init__(
+        self,
+        redis_client,
+        max_len: int = 10000,
+        block_ms: int = 1000,
+        batch_size: int = 10,
+        claim_idle_ms: int = 60000,
+        max_deliveries: int = 5,
+        reply_ttl: int = 3600,
+        retry_backoff: float = 0.5,
+        max_retry_backoff: float = 30.0
+    ):
+        """初始化Streams传输
+        
+        Args:
+            redis_client: redis.asyncio.Redis实例（decode_responses=True）
+            max_len: 每个流保留的最大条目数（近似截断）
+            block_ms: 阻塞读取的最长等待时间（毫秒），也是停止时的最长响应时间
+            batch_size: 每次读取的最大条目数
+            claim_idle_ms: 待处理消息空闲超过该时间（毫秒）后由其他副本认领
+            max_deliveries: 最大投递次数，超过后转入死信流
+            reply_ttl: 回复流的过期时间（秒），副本退出后自动清理（运行中的副本每reply_ttl/2续期一次）
+            retry_backoff: Redis错误后首次重试的等待时间（秒），之后每次加倍
+            max_retry_backoff: 重试等待时间上限（秒）
+        """
+        self.redis = redis_client
+        self.max_len = max_len
+        self.block_ms = block_ms
+        self.batch_size = batch_size
+        self.claim_idle_ms = claim_idle_ms
+        self.max_deliveries = max(1, max_deliveries)
+        self.reply_ttl = reply_ttl
+        self.retry_backoff = retry_backoff
+        self.max_retry_backoff = max_retry_backoff
+        
+        self._subscriptions: Dict[str, _StreamSubscription] = {}
+        self._sent = 0
+        self._ack_tasks: Set[asyncio.Task] = set()
+    
+    @staticmethod
+    def stream_for(agent_id: str) -> str:
+        """Agent的点对点消息流"""
+        return f"{STREAM_PREFIX}{agent_id}"
+    
+    async def send(self, message: MCPMessage, codec: str = "json") -> str:
+        """发送消息
+        
+        本进程内已订阅的Agent发出的请求会带上reply_to（该副本的回复流），
+        响应优先写入请求中的reply_to。
+        
+        Args:
+            message: MCP消息
+            codec: 消息编码（见codec模块）
+        
+        Returns:
+            条目ID
+        """
+        reply_to = message.metadata.get("reply_to")
+        if message.receiver is None:
+            stream = BROADCAST_STREAM
+        elif message.message_type == MessageType.RESPONSE and reply_to:
+            stream = reply_to
+        else:
+            stream = self.stream_for(message.receiver)
+        
+        if message.message_type == MessageType.REQUEST:
+            subscription = self._subscriptions.get(message.sender)
+            if subscription is not None:
+                # 覆盖而不是保留：处理器转发的请求可能带着上游请求的reply_to
+                message.metadata = {**message.metadata, "reply_to": subscription.reply_stream}
+        
+        entry_id = await self.redis.xadd(
+            stream, {"data": message.encode(codec)}, maxlen=self.max_len, approximate=True
+        )
+        if stream == reply_to:
+            await self.redis.expire(stream, self.reply_ttl)
+        self._sent += 1
+        return entry_id
+    
+    async def subscribe(self, agent_id: str, agent_type: str) -> None:
+        """为Agent副本创建消费者组并登记订阅
+        
+        消费者组从流的开头（ID 0）创建：Agent首次启动前发给它的消息也会被投递，
+        已存在的组保留原有进度（重启期间的消息不会丢失）。
+        
+        Args:
+            agent_id: Agent ID（点对点消息的接收地址，多个副本相同）
+            agent_type: Agent类型（消费者组名称）
+        """
+        consumer = f"{agent_id}:{uuid.uuid4().hex[:12]}"
+        subscription = _StreamSubscription(
+            agent_id=agent_id,
+            group=agent_type,
+            consumer=consumer,
+            stream=self.stream_for(agent_id),
+            reply_stream=f"{STREAM_PREFIX}reply:{consumer}",
+            broadcast_last_id=f"{int(time.time() * 1000)}-0"
+        )
+        await self._ensure_group(subscription.stream, subscription.group)
+        await self._ensure_group(subscription.reply_stream, subscription.group)
+        await self.redis.expire(subscription.reply_stream, self.reply_ttl)
+        self._subscriptions[agent_id] = subscription
+        logger.info(f"Streams订阅: {agent_id} (group={agent_type}, consumer={consumer})")
+    
+    async def unsubscribe(self, agent_id: str) -> None:
+        """取消订阅（消费者保留在组内，未确认的消息由其他副本认领）"""
+        subscription = self._subscriptions.pop(agent_id, None)
+        if subscription is not None:
+            try:
+                await self.redis.delete(subscription.reply_stream)
+            except Exception as e:
+                logger.warning(f"删除回复流失败: {subscription.reply_stream}, {e}")
+    
+    async def _ensure_group(self, stream: str, group: str) -> None:
+        """创建消费者组（已存在时忽略）（内部方法）"""
+        try:
+            await self.redis.xgroup_create(stream, group, id="0", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+    
+    async def consume(self, agent_id: str, handler: Callable[[str], Awaitable[Any]]) -> None:
+        """持续消费Agent的消息，直到任务被取消
+        
+        Args:
+            agent_id: 已订阅的Agent ID
+            handler: 消息处理函数（接收编码后的消息），返回后确认该消息；
+                返回任务时（Agent交给了工作池）在任务完成后确认
+        """
+        subscription = self._subscriptions[agent_id]
+        # 回复单独读取：处理器等待send_request的响应时，回复仍能及时送达
+        tasks = [
+            asyncio.create_task(self._consume_group(subscription, subscription.stream, handler, reclaim=True)),
+            asyncio.create_task(self._consume_group(subscription, subscription.reply_stream, handler)),
+            asyncio.create_task(self._consume_broadcast(subscription, handler))
+        ]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                task.result()
+        finally:
+            # 任一读取协程异常退出或consume被取消时，停止其余读取协程
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def _retry_wait(
+        self,
+        subscription: _StreamSubscription,
+        stream: str,
+        error: Exception,
+        delay: float
+    ) -> float:
+        """记录Redis错误并退避等待，返回下次的等待时间（内部方法）"""
+        subscription.stats["errors"] += 1
+        logger.warning(f"读取{stream}失败，{delay:.1f}秒后重试: {error}")
+        await asyncio.sleep(delay)
+        return min(delay * 2, self.max_retry_backoff)
+    
+    async def _consume_group(
+        self,
+        subscription: _StreamSubscription,
+        stream: str,
+        handler: Callable[[str], Awaitable[Any]],
+        reclaim: bool = False
+    ) -> None:
+        """以消费者组读取一个流，可定期认领其他副本遗留的消息（内部方法）
+        
+        回复流只在写入响应时续期：不发请求的副本（如解析、评估Agent）由读取循环续期，避免回复流连同消费者组过期。
+        """
+        is_reply = stream == subscription.reply_stream
+        last_reclaim = 0.0
+        last_refresh = time.monotonic()
+        delay = self.retry_backoff
+        while True:
+            try:
+                if is_reply and time.monotonic() - last_refresh >= self.reply_ttl / 2:
+                    await self.redis.expire(stream, self.reply_ttl)
+                    last_refresh = time.monotonic()
+                
+                if reclaim and time.monotonic() - last_reclaim >= self.claim_idle_ms / 1000:
+                    last_reclaim = time.monotonic()
+                    for entry in await self.reclaim(subscription):
+                        await self._process(subscription, entry, handler)
+                
+                response = await self.redis.xreadgroup(
+                    subscription.group,
+                    subscription.consumer,
+                    {stream: ">"},
+                    count=self.batch_size,
+                    block=self.block_ms
+                )
+                for entry_stream, entries in response or []:
+                    for entry_id, fields in entries:
+                        await self._process(subscription, (entry_stream, entry_id, fields), handler)
+                delay = self.retry_backoff
+            except TRANSIENT_ERRORS as e:
+                if "NOGROUP" in str(e):
+                    # 流或消费者组已被删除（如回复流过期）：重新创建后继续读取
+                    logger.warning(f"消费者组不存在，重新创建: {stream} (group={subscription.group})")
+                    try:
+                        await self._ensure_group(stream, subscription.group)
+                        if is_reply:
+                            await self.redis.expire(stream, self.reply_ttl)
+                            last_refresh = time.monotonic()
+                        continue
+                    except TRANSIENT_ERRORS as create_error:
+                        e = create_error
+                delay = await self._retry_wait(subscription, stream, e, delay)
+    
+    async def _process(
+        self,
+        subscription: _StreamSubscription,
+        entry: StreamEntry,
+        handler: Callable[[str], Awaitable[Any]]
+    ) -> None:
+        """处理并确认一个条目（内部方法）"""
+        stream, entry_id, fields = entry
+        subscription.stats["delivered"] += 1
+        if fields and "data" in fields:
+            # 处理器内部已捕获异常；处理期间进程崩溃时条目保持未确认，由其他副本认领
+            completion = await handler(fields["data"])
+            if asyncio.isfuture(completion):
+                completion.add_done_callback(
+                    lambda task: self._ack_when_done(task, subscription, stream, entry_id)
+                )
+                return
+        await self._ack(subscription, stream, entry_id)
+    
+    async def _ack(self, subscription: _StreamSubscription, stream: str, entry_id: str) -> None:
+        """确认一个条目（内部方法）"""
+        await self.redis.xack(stream, subscription.group, entry_id)
+        subscription.stats["acked"] += 1
+    
+    def _ack_when_done(
+        self,
+        task: asyncio.Future,
+        subscription: _StreamSubscription,
+        stream: str,
+        entry_id: str
+    ) -> None:
+        """工作池中的处理完成后确认，被取消（Agent停止）的不确认，留给其他副本认领（内部方法）"""
+        if task.cancelled():
+            return
+        ack_task = asyncio.ensure_future(self._ack(subscription, stream, entry_id))
+        self._ack_tasks.add(ack_task)
+        ack_task.add_done_callback(self._ack_tasks.discard)
+    
+    async def reclaim(self, subscription: _StreamSubscription) -> List[StreamEntry]:
+        """认领其他消费者空闲过久的待处理消息
+        
+        投递次数达到max_deliveries的消息转入死信流并确认，其余返回给调用方处理。
+        
+        Args:
+            subscription: 订阅状态
+        
+        Returns:
+            认领到的条目
+        """
+        stream, group = subscription.stream, subscription.group
+        pending = await self.redis.xpending_range(
+            stream, group, min="-", max="+", count=self.batch_size, idle=self.claim_idle_ms
+        )
+        deliveries = {
+            item["message_id"]: item["times_delivered"]
+            for item in pending
+            if item["consumer"] != subscription.consumer
+        }
+        if not deliveries:
+            return []
+        
+        claimed = await self.redis.xclaim(
+            stream, group, subscription.consumer, self.claim_idle_ms, list(deliveries)
+        )
+        entries: List[StreamEntry] = []
+        for entry_id, fields in claimed:
+            if not fields:
+                # 条目已被截断：只能确认
+                await self.redis.xack(stream, group, entry_id)
+                continue
+            if deliveries.get(entry_id, 0) >= self.max_deliveries:
+                await self.redis.xadd(
+                    DEAD_LETTER_STREAM,
+                    {"data": fields.get("data", ""), "stream": stream, "entry_id": entry_id, "group": group},
+                    maxlen=self.max_len,
+                    approximate=True
+                )
+                await self.redis.xack(stream, group, entry_id)
+                subscription.stats["dead_lettered"] += 1
+                logger.error(f"消息投递{deliveries[entry_id]}次仍未确认，转入死信流: {stream} {entry_id}")
+                continue
+            entries.append((stream, entry_id, fields))
+        
+        if entries:
+            subscription.stats["reclaimed"] += len(entries)
+            logger.warning(f"{subscription.consumer}认领了{len(entries)}条其他副本未确认的消息: {stream}")
+        return entries
+    
+    async def _consume_broadcast(
+        self,
+        subscription: _StreamSubscription,
+        handler: Callable[[str], Awaitable[Any]]
+    ) -> None:
+        """读取广播（每个副本都收到，不确认）（内部方法）"""
+        delay = self.retry_backoff
+        while True:
+            try:
+                response = await self.redis.xread(
+                    {BROADCAST_STREAM: subscription.broadcast_last_id},
+                    count=self.batch_size,
+                    block=self.block_ms
+                )
+                for _, entries in response or []:
+                    for entry_id, fields in entries:
+                        subscription.broadcast_last_id = entry_id
+                        subscription.stats["broadcasts"] += 1
+                        if fields and "data" in fields:
+                            await handler(fields["data"])
+                delay = self.retry_backoff
+            except TRANSIENT_ERRORS as e:
+                delay = await self._retry_wait(subscription, BROADCAST_STREAM, e, delay)
+    
+    async def get_stats(self) -> Dict[str, Any]:
+        """获取传输统计（各订阅的投递、确认、认领、死信数和流的长度、待处理数）"""
+        subscriptions = {}
+        for agent_id, subscription in self._subscriptions.items():
+            stats: Dict[str, Any] = {"consumer": subscription.consumer, "group": subscription.group}
+            stats.update(subscription.stats)
+            try:
+                stats["stream_length"] = await self.redis.xlen(subscription.stream)
+                summary = await self.redis.xpending(subscription.stream, subscription.group)
+                stats["pending"] = summary.get("pending", 0) if isinstance(summary, dict) else 0
+            except Exception as e:
+                stats["error"] = str(e)
+            subscriptions[agent_id] = stats
+        return {
+            "transport": "streams",
+            "max_len": self.max_len,
+            "sent": self._sent,
+            "subscriptions": subscriptions
+        }
@@ -0,0 +1,195 @@
+"""MCP Agent的消息处理工作池
+
+MCPAgent原先在消息监听循环里逐条await处理器：EvaluatorAgent一次30秒的LLM调用会卡住排在它后面的所有请求。
+工作池让一个Agent同时处理多条消息：
+1. max_in_flight限制同时处理（含等待动作名额）的消息数，名额用完时submit等待，
+   监听循环随之停止取消息，压力回传给传输层（收件箱、队列或Redis流）
+2. action_limits按动作限制并发，如LLM密集的evaluate限制为2，轻量查询不受影响
+3. ordered_actions中的动作并发为1，按到达顺序逐条处理（名额按先到先得分配）
+4. 按动作统计处理中数量、完成/失败数和处理耗时直方图
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# 处理耗时直方图的桶上界（毫秒）
+LATENCY_BUCKETS_MS = (10, 50, 100, 500, 1000, 5000, 10000, 30000, 60000)
+
+
+class LatencyHistogram:
+    """固定桶的耗时直方图（内部使用）"""
+    
+    def __init__(self, buckets_ms: Iterable[float] = LATENCY_BUCKETS_MS):
+        self.bounds = tuple(sorted(buckets_ms))
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+    
+    def observe(self, latency_ms: float) -> None:
+        """记录一次耗时"""
+        index = len(self.bounds)
+        for i, bound in enumerate(self.bounds):
+            if latency_ms <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.total_ms += latency_ms
+        self.max_ms = max(self.max_ms, latency_ms)
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """按桶估算分位数（返回所在桶的上界，超出最大桶时返回最大值）"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return float(self.bounds[i]) if i < len(self.bounds) else round(self.max_ms, 2)
+        return round(self.max_ms, 2)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """直方图统计（各桶为非累计计数，键为桶上界毫秒，+Inf为超出部分）"""
+        buckets = {str(bound): n for bound, n in zip(self.bounds, self.counts)}
+        buckets["+Inf"] = self.counts[-1]
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 2) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 2),
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "buckets": buckets
+        }
+
+
+class AgentWorkerPool:
+    """有界的Agent消息处理工作池"""
+    
+    def __init__(
+        self,
+        max_in_flight: int = 1,
+        action_limits: Optional[Dict[str, int]] = None,
+        ordered_actions: Optional[Iterable[str]] = None
+    ):
+        """初始化工作池
+        
+        Args:
+            max_in_flight: 同时接收的消息数上限（1表示逐条处理，与不使用工作池时相同）
+            action_limits: 按动作的并发上限，如{"evaluate_quality": 2}
+            ordered_actions: 需要按到达顺序逐条处理的动作（并发上限固定为1）
+        """
+        self.max_in_flight = max(1, max_in_flight)
+        self.ordered_actions: Set[str] = set(ordered_actions or ())
+        self.action_limits = {action: max(1, limit) for action, limit in (action_limits or {}).items()}
+        for action in self.ordered_actions:
+            self.action_limits[action] = 1
+        
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._action_slots: Dict[str, asyncio.Semaphore] = {
+            action: asyncio.Semaphore(limit) for action, limit in self.action_limits.items()
+        }
+        self._tasks: Set[asyncio.Task] = set()
+        
+        self._accepted = 0
+        self._running: Dict[str, int] = {}
+        self._waiting: Dict[str, int] = {}
+        self._completed: Dict[str, int] = {}
+        self._failed: Dict[str, int] = {}
+        self._latency: Dict[str, LatencyHistogram] = {}
+    
+    @property
+    def in_flight(self) -> int:
+        """已接收但未完成的消息数（处理中和等待动作名额的）"""
+        return len(self._tasks)
+    
+    async def submit(self, action: str, run: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        """
+        接收一条消息的处理，名额用完时等待（背压）
+        
+        Args:
+            action: 消息动作（按动作限流、排序和统计）
+            run: 返回处理协程的函数（抛出异常时计为失败）
+        
+        Returns:
+            处理任务（完成时表示该消息已处理完）
+        """
+        await self._slots.acquire()
+        self._accepted += 1
+        self._waiting[action] = self._waiting.get(action, 0) + 1
+        task = asyncio.create_task(self._run(action, run))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+    
+    async def _run(self, action: str, run: Callable[[], Awaitable[Any]]) -> None:
+        """等待动作名额后执行处理（内部方法）"""
+        action_slot = self._action_slots.get(action)
+        running = False
+        try:
+            if action_slot is not None:
+                # Semaphore按等待顺序分配名额：任务按接收顺序创建，有序动作按到达顺序执行
+                await action_slot.acquire()
+            self._waiting[action] -= 1
+            self._running[action] = self._running.get(action, 0) + 1
+            running = True
+            
+            started = time.perf_counter()
+            try:
+                await run()
+                self._completed[action] = self._completed.get(action, 0) + 1
+            except Exception as e:
+                # 调用方已记录错误日志，这里只计数
+                self._failed[action] = self._failed.get(action, 0) + 1
+                logger.debug(f"Worker for action {action} failed: {e}")
+            finally:
+                self._latency.setdefault(action, LatencyHistogram()).observe(
+                    (time.perf_counter() - started) * 1000
+                )
+        finally:
+            if running:
+                self._running[action] -= 1
+                if action_slot is not None:
+                    action_slot.release()
+            else:
+                self._waiting[action] -= 1
+            self._slots.release()
+    
+    async def shutdown(self) -> None:
+        """取消所有未完成的处理并等待退出"""
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        # 尚未开始运行就被取消的任务不会归还名额：重建名额和计数，停止后可重新使用
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._action_slots = {action: asyncio.Semaphore(limit) for action, limit in self.action_limits.items()}
+        self._running.clear()
+        self._waiting.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取工作池统计（总处理中数量和各动作的处理中、等待、完成、失败数及耗时直方图）"""
+        actions = {}
+        for action in set(self._waiting) | set(self._latency):
+            actions[action] = {
+                "in_flight": self._running.get(action, 0),
+                "waiting": self._waiting.get(action, 0),
+                "completed": self._completed.get(action, 0),
+                "failed": self._failed.get(action, 0),
+                "limit": self.action_limits.get(action),
+                "ordered": action in self.ordered_actions,
+                "latency": self._latency[action].get_stats() if action in self._latency else None
+            }
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "available": self.max_in_flight - self.in_flight,
+            "accepted": self._accepted,
+            "actions": actions
+        }
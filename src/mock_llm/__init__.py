@@ -0,0 +1,15 @@
+"""OpenAI兼容的模拟LLM服务（负载测试用）"""
+
+from .responses import build_response, build_json_response, classify_prompt
+from .server import MockLLMConfig, MockLLMStats, PrefixCacheSimulator, create_mock_llm_app, sample_latency
+
+__all__ = [
+    "build_response",
+    "build_json_response",
+    "classify_prompt",
+    "MockLLMConfig",
+    "MockLLMStats",
+    "PrefixCacheSimulator",
+    "create_mock_llm_app",
+    "sample_latency"
+]
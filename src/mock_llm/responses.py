@@ -0,0 +1,234 @@
+"""模拟LLM响应生成
+
+每个Agent的提示词都在"返回JSON格式"之后给出了示例JSON，示例本身就是合法的结构。
+本模块按提示词识别调用方（解析/分类/评估/匹配/问卷/优化/打包），以示例JSON为骨架，
+用基于提示词哈希的确定性随机数填充评分等数值，保证：
+1. 返回的JSON满足调用方的结构要求（字段、类型、维度名称与提示词一致）
+2. 相同提示词总是得到相同响应（可重复的负载测试）
+3. 不同提示词的评分有差异（避免所有结果完全相同）
+"""
+
+import hashlib
+import json
+import random
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.core.llm_json import parse_json_response
+
+# 提示词类型识别（按顺序匹配）
+PROMPT_KINDS: List[Tuple[str, str]] = [
+    ("classifier", "岗位分类专家"),
+    ("parser", "请解析以下岗位JD"),
+    ("evaluator", "评估以下岗位JD的质量"),
+    ("evaluator", "美世国际职位评估法"),
+    ("evaluator", "因素比较法"),
+    ("tag_analysis", "分类标签对岗位评估的影响"),
+    ("integration", "整合以下三个维度"),
+    ("matcher", "候选人与岗位的匹配度"),
+    ("questionnaire", "生成评估问卷"),
+    ("optimizer", "提供优化建议"),
+]
+
+_PACKED_SECTION = re.compile(r"【ID: ([^】]+)】\n(.*?)(?=\n\n【ID: |\Z)", re.S)
+_JSON_MARKERS = ("返回JSON格式", "以JSON格式返回", "JSON格式", "JSON")
+_COMMENT = re.compile(r"\s*(?://|#)[^\"\n]*$", re.M)
+_ELLIPSIS = re.compile(r",\s*\.\.\.")
+_CATEGORY_LINE = re.compile(r"^(\s*)(一级|二级|三级): (.+?) \(ID: ([^)]+)\)\s*$", re.M)
+
+# 解析JD时识别的技能关键词
+_SKILL_PATTERN = re.compile(
+    r"(?<![A-Za-z])(Python|Java|Go|C\+\+|JavaScript|TypeScript|SQL|MySQL|PostgreSQL|Redis|Kafka|Docker|"
+    r"Kubernetes|Linux|Django|FastAPI|Flask|Spring|React|Vue|Excel|SAP|AWS)(?![A-Za-z])",
+    re.I
+)
+# compose_item_prompt使用的条目名称（指令在前、"名称:"之后为条目数据）
+_ITEM_SECTION = re.compile(r"\n\n(?:岗位JD|岗位信息|JD):\n(.*)\Z", re.S)
+_LIST_MARKER = re.compile(r"^\s*(?:\d+[.、)]|[•·\-*]|（\d+）|\(\d+\))\s*")
+
+QUESTION_TYPES = ["single_choice", "multiple_choice", "scale", "open_ended"]
+
+
+def classify_prompt(prompt: str) -> str:
+    """识别提示词类型
+    
+    Returns:
+        packed / classifier / parser / evaluator / tag_analysis / integration /
+        matcher / questionnaire / optimizer / json / text
+    """
+    if "【ID: " in prompt and "返回一个JSON数组" in prompt:
+        return "packed"
+    for kind, marker in PROMPT_KINDS:
+        if marker in prompt:
+            return kind
+    return "json" if "JSON" in prompt else "text"
+
+
+def _rng(prompt: str, seed: int) -> random.Random:
+    """基于提示词哈希的确定性随机数（内部方法）"""
+    digest = hashlib.sha256(f"{seed}:{prompt}".encode("utf-8")).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+
+def extract_example_json(prompt: str) -> Optional[Any]:
+    """提取提示词中"返回JSON格式"之后的示例JSON（去除注释和省略号）"""
+    start = -1
+    for marker in _JSON_MARKERS:
+        index = prompt.rfind(marker)
+        if index != -1:
+            start = index
+            break
+    if start == -1:
+        return None
+    
+    brace = prompt.find("{", start)
+    if brace == -1:
+        return None
+    body = _ELLIPSIS.sub("", _COMMENT.sub("", prompt[brace:]))
+    try:
+        return parse_json_response(body)[0]
+    except ValueError:
+        return None
+
+
+def _fill(value: Any, rng: random.Random, key: str = "", in_scores: bool = False) -> Any:
+    """以示例为骨架填充数值（内部方法）"""
+    if isinstance(value, dict):
+        scores = in_scores or key.endswith("scores")
+        return {k: _fill(v, rng, k, scores) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_fill(v, rng, key, in_scores) for v in value]
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        if in_scores or "score" in key:
+            return rng.randint(60, 95)
+        if key == "value_adjustment":
+            return rng.randint(-5, 10)
+        if isinstance(value, float) and 0 <= value <= 1 and key != "weight":
+            return round(rng.uniform(0.3, 0.95), 2)
+    return value
+
+
+def _with_overall(result: Dict[str, Any]) -> Dict[str, Any]:
+    """总分取各维度得分的平均值（内部方法）"""
+    scores = result.get("dimension_scores")
+    if isinstance(scores, dict) and scores and "overall_score" in result:
+        result["overall_score"] = round(sum(scores.values()) / len(scores))
+    return result
+
+
+def _item_text(prompt: str) -> str:
+    """提取提示词末尾的条目数据（指令在前、数据在后的提示词）（内部方法）"""
+    match = _ITEM_SECTION.search(prompt)
+    return (match.group(1) if match else prompt).strip()
+
+
+def _parse_jd(prompt: str) -> Dict[str, Any]:
+    """模拟JD解析：从JD文本中提取标题、职责、技能和资格（内部方法）"""
+    text = _item_text(prompt)
+    lines = [_LIST_MARKER.sub("", line).strip() for line in text.splitlines()]
+    lines = [line for line in lines if line]
+    
+    skills: List[str] = []
+    for match in _SKILL_PATTERN.finditer(text):
+        if match.group(1).lower() not in (s.lower() for s in skills):
+            skills.append(match.group(1))
+    
+    return {
+        "job_title": (lines[0] if lines else "未知职位")[:30],
+        "department": "",
+        "location": "",
+        "responsibilities": [line for line in lines if "负责" in line][:8] or lines[1:3],
+        "required_skills": skills[:8] or ["沟通能力"],
+        "preferred_skills": [],
+        "qualifications": [
+            line for line in lines if re.search(r"学历|经验|本科|硕士|专业", line)
+        ][:5],
+        "custom_fields": {}
+    }
+
+
+def _classify(prompt: str, rng: random.Random) -> Dict[str, Any]:
+    """模拟职位分类：从分类树中选择一条完整路径（内部方法）"""
+    chains: List[Dict[str, Optional[str]]] = []
+    current: Dict[str, Optional[str]] = {}
+    for _, level, _, category_id in _CATEGORY_LINE.findall(prompt):
+        if level == "一级":
+            current = {"level1_id": category_id, "level2_id": None, "level3_id": None}
+            chains.append(dict(current))
+        elif level == "二级" and current:
+            current = {**current, "level2_id": category_id, "level3_id": None}
+            chains.append(dict(current))
+        elif level == "三级" and current.get("level2_id"):
+            chains.append({**current, "level3_id": category_id})
+    
+    complete = [c for c in chains if c["level3_id"]] or chains
+    chosen = rng.choice(complete) if complete else {"level1_id": None, "level2_id": None, "level3_id": None}
+    return {**chosen, "reasoning": "模拟分类：根据职位名称和技能选择"}
+
+
+def _questionnaire(example: Dict[str, Any]) -> Dict[str, Any]:
+    """模拟问卷：按示例题目扩展为10道不同题型的问题（内部方法）"""
+    template = (example.get("questions") or [{}])[0]
+    questions = []
+    for i in range(10):
+        question_type = QUESTION_TYPES[i % len(QUESTION_TYPES)]
+        options = {
+            "single_choice": ["1年以下", "1-3年", "3-5年", "5年以上"],
+            "multiple_choice": ["Python", "SQL", "数据分析", "项目管理"],
+            "scale": ["1", "2", "3", "4", "5"],
+            "open_ended": []
+        }[question_type]
+        questions.append({
+            **template,
+            "id": f"q{i + 1}",
+            "question_text": f"{template.get('question_text', '问题内容')}（{i + 1}）",
+            "question_type": question_type,
+            "options": options,
+            "weight": 1.0
+        })
+    return {**example, "questions": questions}
+
+
+def build_json_response(prompt: str, seed: int = 0) -> Any:
+    """按提示词生成结构合法的JSON响应"""
+    kind = classify_prompt(prompt)
+    rng = _rng(prompt, seed)
+    
+    if kind == "packed":
+        instruction, _, sections = prompt.partition("\n\n以下共有")
+        label_match = re.search(r"个(.+?)，每个以【ID", sections)
+        label = label_match.group(1) if label_match else "JD"
+        return [
+            {"id": item_id, **build_json_response(f"{instruction}\n\n{label}:\n{item}\n", seed)}
+            for item_id, item in _PACKED_SECTION.findall(sections)
+        ]
+    if kind == "parser":
+        return _parse_jd(prompt)
+    if kind == "classifier":
+        return _classify(prompt, rng)
+    
+    example = extract_example_json(prompt)
+    if not isinstance(example, dict):
+        return {"result": "模拟响应"}
+    result = _with_overall(_fill(example, rng))
+    if kind == "questionnaire":
+        result = _questionnaire(result)
+    return result
+
+
+def build_response(prompt: str, seed: int = 0) -> Tuple[str, str]:
+    """生成模拟响应
+    
+    Args:
+        prompt: 用户提示词（最后一条user消息）
+        seed: 随机种子（同一种子下相同提示词响应相同）
+    
+    Returns:
+        (提示词类型, 响应文本)
+    """
+    kind = classify_prompt(prompt)
+    if kind == "text":
+        return kind, f"这是模拟LLM的回复（{len(prompt)}字提示词）。"
+    return kind, json.dumps(build_json_response(prompt, seed), ensure_ascii=False)
@@ -0,0 +1,394 @@
+"""OpenAI兼容的模拟LLM服务
+
+实现chat.completions接口（含SSE流式输出），用于在不消耗DeepSeek额度的情况下做性能和负载测试：
+1. 按提示词类型返回结构合法的JSON（见responses模块）
+2. 可配置的延迟分布（固定/均匀/正态/对数正态）以及按输出token计的生成耗时
+3. 429和超时注入，以及可选的服务端并发上限（超出时返回429）
+4. 按estimate_tokens统计的token用量，通过/mock/stats查看
+5. 模拟服务端前缀缓存：与历史请求相同的前缀按64字符的块计入prompt_cache_hit_tokens（DeepSeek格式）
+
+接入方式只需设置 OPENAI_BASE_URL=http://127.0.0.1:<port>/v1
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import random
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import asdict, dataclass, fields
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from src.core.llm_tokens import estimate_tokens
+from .responses import build_response
+
+logger = logging.getLogger(__name__)
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal")
+
+
+@dataclass
+class MockLLMConfig:
+    """模拟服务配置
+    
+    Attributes:
+        latency_ms: 首token前的基础延迟（毫秒），作为各分布的均值
+        latency_distribution: 延迟分布（fixed/uniform/normal/lognormal）
+        latency_jitter_ms: 延迟抖动（uniform为半宽，normal为标准差，lognormal为近似标准差）
+        ms_per_token: 每个输出token的生成耗时（毫秒）
+        rate_limit_rate: 随机返回429的概率（0-1）
+        timeout_rate: 随机挂起请求的概率（0-1），用于触发客户端超时
+        hang_seconds: 挂起请求的时长（秒），应大于客户端超时时间
+        max_concurrency: 服务端并发上限，超出时返回429（0表示不限制）
+        retry_after: 429响应的Retry-After头（秒）
+        seed: 随机种子（延迟、故障注入和响应内容）
+        model: 返回的模型名称
+        prefix_cache: 是否模拟服务端前缀缓存
+    """
+    latency_ms: float = 200.0
+    latency_distribution: str = "lognormal"
+    latency_jitter_ms: float = 100.0
+    ms_per_token: float = 0.0
+    rate_limit_rate: float = 0.0
+    timeout_rate: float = 0.0
+    hang_seconds: float = 120.0
+    max_concurrency: int = 0
+    retry_after: int = 1
+    seed: int = 0
+    model: str = "mock-llm"
+    prefix_cache: bool = True
+    
+    def __post_init__(self):
+        if self.latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(
+                f"不支持的延迟分布: {self.latency_distribution}，可选: {', '.join(LATENCY_DISTRIBUTIONS)}"
+            )
+    
+    def update(self, values: Dict[str, Any]) -> None:
+        """更新配置（忽略未知字段）"""
+        known = {f.name for f in fields(self)}
+        for key, value in values.items():
+            if key in known:
+                setattr(self, key, value)
+        self.__post_init__()
+
+
+class MockLLMStats:
+    """模拟服务统计：请求数、token用量、注入的故障和延迟分位数"""
+    
+    def __init__(self, max_samples: int = 10000):
+        self.max_samples = max_samples
+        self.reset()
+    
+    def reset(self) -> None:
+        """清空统计"""
+        self.requests = 0
+        self.stream_requests = 0
+        self.requests_by_kind: Dict[str, int] = {}
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cached_prompt_tokens = 0
+        self.rate_limited = 0
+        self.concurrency_rejected = 0
+        self.timeouts = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.latencies: Deque[float] = deque(maxlen=self.max_samples)
+    
+    def record(
+        self,
+        kind: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        latency: float,
+        cached_prompt_tokens: int = 0
+    ) -> None:
+        """记录一次成功响应"""
+        self.requests_by_kind[kind] = self.requests_by_kind.get(kind, 0) + 1
+        self.prompt_tokens += prompt_tokens
+        self.cached_prompt_tokens += cached_prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.latencies.append(latency)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        latencies = sorted(self.latencies)
+        
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0
+            index = min(len(latencies) - 1, max(0, math.ceil(len(latencies) * p) - 1))
+            return round(latencies[index] * 1000, 2)
+        
+        return {
+            "requests": self.requests,
+            "stream_requests": self.stream_requests,
+            "requests_by_kind": dict(self.requests_by_kind),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+            "cached_prompt_tokens": self.cached_prompt_tokens,
+            "prompt_cache_hit_rate": (
+                f"{self.cached_prompt_tokens / self.prompt_tokens:.2%}" if self.prompt_tokens else "0.00%"
+            ),
+            "rate_limited": self.rate_limited,
+            "concurrency_rejected": self.concurrency_rejected,
+            "timeouts": self.timeouts,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "latency_ms": {
+                "p50": percentile(0.50),
+                "p95": percentile(0.95),
+                "p99": percentile(0.99),
+                "max": round(latencies[-1] * 1000, 2) if latencies else 0
+            }
+        }
+
+
+class PrefixCacheSimulator:
+    """模拟服务端前缀缓存
+    
+    按固定长度的块对请求文本做累积哈希，与历史请求相同的连续前缀块视为缓存命中；
+    前缀从第一个不同的块起全部未命中，与服务端的行为一致。
+    """
+    
+    def __init__(self, block_chars: int = 64, max_entries: int = 100000):
+        self.block_chars = block_chars
+        self.max_entries = max_entries
+        self._prefixes: "OrderedDict[bytes, None]" = OrderedDict()
+    
+    def lookup(self, text: str) -> int:
+        """返回命中缓存的前缀长度（字符数），并把本次请求的前缀加入缓存"""
+        digest = hashlib.sha1()
+        hit = 0
+        missed = False
+        for end in range(self.block_chars, len(text) + 1, self.block_chars):
+            digest.update(text[end - self.block_chars:end].encode("utf-8"))
+            key = digest.digest()
+            if not missed and key in self._prefixes:
+                hit = end
+                self._prefixes.move_to_end(key)
+            else:
+                missed = True
+                self._prefixes[key] = None
+        
+        while len(self._prefixes) > self.max_entries:
+            self._prefixes.popitem(last=False)
+        return hit
+    
+    def clear(self) -> None:
+        """清空缓存"""
+        self._prefixes.clear()
+
+
+def sample_latency(config: MockLLMConfig, rng: random.Random) -> float:
+    """按配置的分布采样首token延迟（秒）"""
+    mean = max(0.0, config.latency_ms)
+    jitter = max(0.0, config.latency_jitter_ms)
+    distribution = config.latency_distribution
+    
+    if distribution == "fixed" or jitter == 0 or mean == 0:
+        value = mean
+    elif distribution == "uniform":
+        value = rng.uniform(mean - jitter, mean + jitter)
+    elif distribution == "normal":
+        value = rng.gauss(mean, jitter)
+    else:
+        # 对数正态：均值和标准差换算为底层正态分布的参数，产生长尾
+        sigma2 = math.log(1 + (jitter / mean) ** 2)
+        value = rng.lognormvariate(math.log(mean) - sigma2 / 2, math.sqrt(sigma2))
+    return max(0.0, value) / 1000
+
+
+def _message_text(content: Any) -> str:
+    """提取消息内容文本（兼容字符串和分段内容）（内部方法）"""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return ""
+
+
+def _error_response(status: int, message: str, error_type: str, headers: Optional[Dict[str, str]] = None) -> JSONResponse:
+    """OpenAI格式的错误响应（内部方法）"""
+    return JSONResponse(
+        status_code=status,
+        content={"error": {"message": message, "type": error_type, "param": None, "code": error_type}},
+        headers=headers
+    )
+
+
+def _split_chunks(text: str, size: int = 8) -> List[str]:
+    """把响应文本切分为流式输出的小块（内部方法）"""
+    return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+
+def create_mock_llm_app(config: Optional[MockLLMConfig] = None) -> FastAPI:
+    """创建模拟LLM服务
+    
+    Args:
+        config: 模拟服务配置，默认使用MockLLMConfig()
+    
+    Returns:
+        FastAPI应用，app.state.config和app.state.stats可在运行时读写
+    """
+    app = FastAPI(title="Mock LLM", description="OpenAI兼容的模拟LLM服务")
+    app.state.config = config or MockLLMConfig()
+    app.state.stats = MockLLMStats()
+    app.state.prefix_cache = PrefixCacheSimulator()
+    app.state.rng = random.Random(app.state.config.seed)
+    
+    @app.post("/v1/chat/completions")
+    async def chat_completions(body: dict):
+        config: MockLLMConfig = app.state.config
+        stats: MockLLMStats = app.state.stats
+        rng: random.Random = app.state.rng
+        stats.requests += 1
+        
+        if config.max_concurrency and stats.in_flight >= config.max_concurrency:
+            stats.concurrency_rejected += 1
+            return _error_response(
+                429, "模拟服务并发超限", "rate_limit_exceeded",
+                headers={"Retry-After": str(config.retry_after)}
+            )
+        if rng.random() < config.rate_limit_rate:
+            stats.rate_limited += 1
+            return _error_response(
+                429, "模拟速率限制", "rate_limit_exceeded",
+                headers={"Retry-After": str(config.retry_after)}
+            )
+        
+        messages = body.get("messages") or []
+        prompt = next(
+            (_message_text(m.get("content")) for m in reversed(messages) if m.get("role") == "user"),
+            ""
+        )
+        kind, text = build_response(prompt, config.seed)
+        prompt_text = "".join(f"<{m.get('role')}>{_message_text(m.get('content'))}" for m in messages)
+        prompt_tokens = sum(estimate_tokens(_message_text(m.get("content"))) for m in messages)
+        completion_tokens = estimate_tokens(text)
+        cached_tokens = 0
+        if config.prefix_cache:
+            cached_chars = app.state.prefix_cache.lookup(prompt_text)
+            cached_tokens = min(prompt_tokens, estimate_tokens(prompt_text[:cached_chars]))
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_cache_hit_tokens": cached_tokens,
+            "prompt_cache_miss_tokens": prompt_tokens - cached_tokens
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        model = body.get("model") or config.model
+        first_token_delay = sample_latency(config, rng)
+        hang = rng.random() < config.timeout_rate
+        started = time.perf_counter()
+        
+        stats.in_flight += 1
+        stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+        
+        if hang:
+            # 挂起直到客户端超时断开；客户端超时更长时返回504
+            stats.timeouts += 1
+            try:
+                await asyncio.sleep(config.hang_seconds)
+            finally:
+                stats.in_flight -= 1
+            return _error_response(504, "模拟上游超时", "timeout")
+        
+        if not body.get("stream"):
+            try:
+                await asyncio.sleep(first_token_delay + completion_tokens * config.ms_per_token / 1000)
+            finally:
+                stats.in_flight -= 1
+            stats.record(kind, prompt_tokens, completion_tokens, time.perf_counter() - started, cached_tokens)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": "stop"
+                }],
+                "usage": usage
+            }
+        
+        stats.stream_requests += 1
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+        
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+        
+        async def event_stream() -> AsyncIterator[str]:
+            try:
+                await asyncio.sleep(first_token_delay)
+                yield chunk({"role": "assistant", "content": ""})
+                for part in _split_chunks(text):
+                    await asyncio.sleep(estimate_tokens(part) * config.ms_per_token / 1000)
+                    yield chunk({"content": part})
+                yield chunk({}, "stop")
+                if include_usage:
+                    payload = {
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": created,
+                        "model": model,
+                        "choices": [],
+                        "usage": usage
+                    }
+                    yield f"data: {json.dumps(payload)}\n\n"
+                yield "data: [DONE]\n\n"
+                stats.record(kind, prompt_tokens, completion_tokens, time.perf_counter() - started, cached_tokens)
+            finally:
+                stats.in_flight -= 1
+        
+        return StreamingResponse(event_stream(), media_type="text/event-stream")
+    
+    @app.get("/v1/models")
+    async def list_models():
+        return {
+            "object": "list",
+            "data": [{"id": app.state.config.model, "object": "model", "created": 0, "owned_by": "mock"}]
+        }
+    
+    @app.get("/mock/stats")
+    async def get_stats():
+        return app.state.stats.get_stats()
+    
+    @app.post("/mock/reset")
+    async def reset_stats():
+        app.state.stats.reset()
+        app.state.prefix_cache.clear()
+        app.state.rng = random.Random(app.state.config.seed)
+        return {"status": "ok"}
+    
+    @app.get("/mock/config")
+    async def get_config():
+        return asdict(app.state.config)
+    
+    @app.post("/mock/config")
+    async def update_config(values: dict):
+        try:
+            app.state.config.update(values)
+        except ValueError as e:
+            return _error_response(400, str(e), "invalid_request_error")
+        logger.info(f"模拟LLM服务配置已更新: {values}")
+        return asdict(app.state.config)
+    
+    return app
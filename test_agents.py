@@ -41,7 +41,7 @@ class MockLLMClient:
         """设置特定key的响应"""
         self.responses[key] = response
     
-    async def generate_json(self, prompt: str, temperature: float = 0.7, max_tokens: int = 2000) -> dict:
+    async def generate_json(self, prompt: str, temperature: float = 0.7, max_tokens: int = 2000, **kwargs) -> dict:
         """模拟JSON生成"""
         self.call_count += 1
         self.last_prompt = prompt
@@ -16,7 +16,7 @@ async def test_comprehensive_evaluator():
     
     # 创建模拟的LLM客户端
     class MockLLMClient:
-        async def generate_json(self, prompt, temperature=0.3):
+        async def generate_json(self, prompt, temperature=0.3, **kwargs):
             """模拟LLM响应"""
             if "分析以下分类标签" in prompt:
                 # 标签分析响应
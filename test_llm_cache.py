@@ -1,11 +1,18 @@
 """测试LLM缓存机制"""
 
 import asyncio
+import json
 import pytest
 from src.core.llm_cache import (
     LLMCache,
     MemoryCache,
+    LRUMemoryCache,
+    RedisCache,
+    TieredCache,
+    SQLiteCache,
     create_memory_cache,
+    llm_cache_tags_scope,
+    get_current_cache_tags,
     CacheBackend
 )
 
@@ -159,6 +166,609 @@ class TestMemoryCache:
         assert "50.00%" in stats["hit_rate"]
 
 
+class TestLRUMemoryCache:
+    """测试有界内存缓存"""
+    
+    def test_create_memory_cache_selects_backend(self):
+        """测试工厂函数根据上限选择后端"""
+        assert isinstance(create_memory_cache().backend, MemoryCache)
+        assert isinstance(create_memory_cache(max_entries=10).backend, LRUMemoryCache)
+    
+    @pytest.mark.asyncio
+    async def test_lru_eviction_by_entries(self):
+        """测试超过条目数上限时淘汰最久未使用的条目"""
+        cache = create_memory_cache(max_entries=2)
+        
+        await cache.set("key1", "value1")
+        await cache.set("key2", "value2")
+        await cache.get("key1")  # key1变为最近使用
+        await cache.set("key3", "value3")
+        
+        assert await cache.get("key2") is None, "最久未使用的条目应被淘汰"
+        assert await cache.get("key1") == "value1"
+        assert await cache.get("key3") == "value3"
+        
+        stats = await cache.get_stats()
+        assert stats["backend"] == "lru_memory"
+        assert stats["size"] == 2
+        assert stats["evictions"] == 1
+    
+    @pytest.mark.asyncio
+    async def test_lru_eviction_by_bytes(self):
+        """测试超过字节数上限时淘汰"""
+        backend = LRUMemoryCache(max_entries=None, max_bytes=100)
+        
+        await backend.set("a", "x" * 40)
+        await backend.set("b", "y" * 40)
+        await backend.set("c", "z" * 40)
+        
+        stats = await backend.get_stats()
+        assert stats["bytes"] <= 100
+        assert stats["evictions"] == 1
+        assert await backend.get("a") is None
+    
+    @pytest.mark.asyncio
+    async def test_oversized_value_rejected(self):
+        """测试单个条目超过字节上限时被拒绝"""
+        backend = LRUMemoryCache(max_entries=None, max_bytes=10)
+        
+        await backend.set("small", "v")
+        await backend.set("large", "x" * 100)
+        
+        assert await backend.get("large") is None
+        assert await backend.get("small") == "v", "过大的条目不应导致已有条目被淘汰"
+        assert (await backend.get_stats())["rejections"] == 1
+    
+    @pytest.mark.asyncio
+    async def test_ttl_expiration(self, monkeypatch):
+        """测试TTL过期"""
+        import src.core.llm_cache as llm_cache_module
+        
+        now = [1000.0]
+        monkeypatch.setattr(llm_cache_module.time, "monotonic", lambda: now[0])
+        
+        backend = LRUMemoryCache(max_entries=10, default_ttl=60)
+        await backend.set("default_ttl", "v1")
+        await backend.set("short_ttl", "v2", ttl=5)
+        
+        now[0] += 10
+        assert await backend.get("short_ttl") is None, "超过TTL的条目应过期"
+        assert await backend.get("default_ttl") == "v1"
+        
+        now[0] += 60
+        assert await backend.exists("default_ttl") is False
+        
+        stats = await backend.get_stats()
+        assert stats["expirations"] == 2
+        assert stats["size"] == 0
+        assert stats["bytes"] == 0
+
+
+class FakeRedis:
+    """最小化的异步Redis替身（仅实现缓存用到的命令）"""
+    
+    def __init__(self):
+        self.store = {}
+        self.published = []
+        self.round_trips = 0
+    
+    async def get(self, key):
+        self.round_trips += 1
+        return self.store.get(key)
+    
+    async def mget(self, keys):
+        self.round_trips += 1
+        return [self.store.get(key) for key in keys]
+    
+    async def set(self, key, value, ex=None):
+        self.round_trips += 1
+        self.store[key] = value
+    
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+    
+    async def delete(self, *keys):
+        return sum(1 for key in keys if self.store.pop(key, None) is not None)
+    
+    async def zadd(self, key, mapping):
+        self.store.setdefault(key, {}).update(mapping)
+    
+    async def zremrangebyscore(self, key, min_score, max_score):
+        members = self.store.get(key, {})
+        expired = [m for m, score in members.items() if score <= max_score]
+        for member in expired:
+            del members[member]
+        return len(expired)
+    
+    async def zrange(self, key, start, end):
+        members = self.store.get(key, {})
+        return [m.encode('utf-8') for m, _ in sorted(members.items(), key=lambda item: item[1])]
+    
+    async def exists(self, key):
+        return 1 if key in self.store else 0
+    
+    async def scan(self, cursor, match=None, count=None):
+        prefix = match.rstrip("*") if match else ""
+        return 0, [k for k in self.store if k.startswith(prefix)]
+    
+    async def info(self):
+        return {"redis_version": "fake", "used_memory_human": "0B"}
+    
+    async def publish(self, channel, message):
+        self.published.append((channel, message))
+        return 0
+
+
+class FakePipeline:
+    """FakeRedis的pipeline替身（缓存命令，execute时一次往返）"""
+    
+    def __init__(self, redis_client):
+        self.redis = redis_client
+        self.commands = []
+    
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+        return queue
+    
+    async def execute(self):
+        round_trips = self.redis.round_trips
+        results = [await getattr(self.redis, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+        self.redis.round_trips = round_trips + 1
+        return results
+
+
+class TestBatchOperations:
+    """测试批量读写"""
+    
+    @pytest.mark.asyncio
+    async def test_redis_get_many_and_set_many_single_round_trip(self):
+        """测试Redis批量读写各只需一次往返，压缩值可正常读取"""
+        redis_client = FakeRedis()
+        cache = RedisCache(redis_client, compression="zlib", compression_threshold=16)
+        
+        await cache.set_many({"a": "值A" * 20, "b": "值B"})
+        assert redis_client.round_trips == 1
+        assert redis_client.store["llm_cache:a"].startswith(b"\x00LC1")
+        
+        results = await cache.get_many(["a", "b", "missing"])
+        assert redis_client.round_trips == 2
+        assert results == {"a": "值A" * 20, "b": "值B"}
+        assert await cache.get_many([]) == {}
+    
+    @pytest.mark.asyncio
+    async def test_tiered_get_many_reads_l2_once(self):
+        """测试两级缓存批量读取：L1命中的键不访问Redis，其余键一次读取并提升到L1"""
+        redis_client = FakeRedis()
+        tiered = TieredCache(LRUMemoryCache(max_entries=10), RedisCache(redis_client), l1_ttl=60)
+        await tiered.l1.set("l1_key", "l1_value")
+        redis_client.store["llm_cache:l2_key"] = b"l2_value"
+        
+        results = await tiered.get_many(["l1_key", "l2_key", "missing"])
+        assert results == {"l1_key": "l1_value", "l2_key": "l2_value"}
+        assert redis_client.round_trips == 1
+        assert await tiered.l1.get("l2_key") == "l2_value"
+        
+        stats = await tiered.get_stats()
+        assert stats["l1_hits"] == 1 and stats["l2_hits"] == 1 and stats["misses"] == 1
+        await tiered.close()
+    
+    @pytest.mark.asyncio
+    async def test_llm_cache_batch_defaults(self):
+        """测试默认实现逐个读写，并同步写入过期副本"""
+        cache = LLMCache(LRUMemoryCache(), stale=LRUMemoryCache())
+        await cache.set_many({"k1": "v1", "k2": "v2"}, ttl=60)
+        
+        assert await cache.get_many(["k1", "k2", "k3", "k1"]) == {"k1": "v1", "k2": "v2"}
+        await cache.backend.clear()
+        assert await cache.get_stale("k2") == "v2"
+
+
+class TestRedisCacheCompression:
+    """测试Redis缓存压缩"""
+    
+    LARGE_VALUE = json.dumps(
+        {"job_title": "高级Python后端工程师", "responsibilities": ["负责核心服务的设计与开发"] * 50},
+        ensure_ascii=False
+    )
+    
+    @pytest.mark.asyncio
+    async def test_large_values_compressed_small_values_plain(self):
+        """测试超过阈值的值压缩后带信封存储，小值保持纯文本"""
+        redis_client = FakeRedis()
+        cache = RedisCache(redis_client, compression="zlib", compression_threshold=256)
+        
+        await cache.set("large", self.LARGE_VALUE)
+        await cache.set("small", "短结果")
+        
+        stored = redis_client.store["llm_cache:large"]
+        assert isinstance(stored, bytes) and stored.startswith(b"\x00LC1z")
+        assert len(stored) < len(self.LARGE_VALUE.encode("utf-8")) / 3
+        assert redis_client.store["llm_cache:small"] == "短结果"
+        
+        assert await cache.get("large") == self.LARGE_VALUE
+        assert await cache.get("small") == "短结果"
+    
+    @pytest.mark.asyncio
+    async def test_legacy_entries_readable(self):
+        """测试旧版本写入的未压缩条目（bytes或str）仍可读取"""
+        redis_client = FakeRedis()
+        redis_client.store["llm_cache:old_bytes"] = self.LARGE_VALUE.encode("utf-8")
+        redis_client.store["llm_cache:old_str"] = "旧结果"
+        cache = RedisCache(redis_client)
+        
+        assert await cache.get("old_bytes") == self.LARGE_VALUE
+        assert await cache.get("old_str") == "旧结果"
+    
+    @pytest.mark.asyncio
+    async def test_compression_stats(self):
+        """测试统计压缩比和节省的字节数，损坏的条目按未命中处理"""
+        redis_client = FakeRedis()
+        cache = RedisCache(redis_client, compression="zlib", compression_threshold=256)
+        await cache.set("large", self.LARGE_VALUE)
+        await cache.set("small", "短结果")
+        redis_client.store["llm_cache:broken"] = b"\x00LC1zbroken"
+        assert await cache.get("broken") is None
+        
+        stats = (await cache.get_stats())["compression"]
+        original = len(self.LARGE_VALUE.encode("utf-8"))
+        assert stats["compressed_writes"] == 1
+        assert stats["uncompressed_writes"] == 1
+        assert stats["original_bytes"] == original
+        assert stats["bytes_saved"] == original - len(redis_client.store["llm_cache:large"])
+        assert stats["compression_ratio"].endswith("%")
+        assert stats["decode_errors"] == 1
+    
+    def test_compression_disabled_and_fallback(self):
+        """测试可关闭压缩；auto在未安装zstandard时使用zlib"""
+        from src.core.llm_cache import ZSTD_AVAILABLE
+        
+        assert RedisCache(FakeRedis(), compression=None)._encode(self.LARGE_VALUE) == self.LARGE_VALUE
+        assert RedisCache(FakeRedis()).compression == ("zstd" if ZSTD_AVAILABLE else "zlib")
+        with pytest.raises(ValueError):
+            RedisCache(FakeRedis(), compression="lz4")
+        
+        decoding_client = FakeRedis()
+        decoding_client.connection_pool = type("Pool", (), {"connection_kwargs": {"decode_responses": True}})()
+        assert RedisCache(decoding_client).compression is None
+
+
+class TestTieredCache:
+    """测试两级缓存"""
+    
+    def _make_tiered(self, redis_client):
+        return TieredCache(
+            LRUMemoryCache(max_entries=10),
+            RedisCache(redis_client),
+            l1_ttl=60
+        )
+    
+    @pytest.mark.asyncio
+    async def test_l2_hit_promoted_to_l1(self):
+        """测试L2命中后提升到L1"""
+        redis_client = FakeRedis()
+        tiered = self._make_tiered(redis_client)
+        
+        # 模拟另一个进程写入的L2数据
+        redis_client.store["llm_cache:shared"] = "from_l2"
+        
+        assert await tiered.get("shared") == "from_l2"
+        assert await tiered.get("shared") == "from_l2"
+        assert await tiered.get("missing") is None
+        
+        stats = await tiered.get_stats()
+        assert stats["backend"] == "tiered"
+        assert stats["l2_hits"] == 1
+        assert stats["l1_hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["promotions"] == 1
+        assert stats["l2_hit_rate"] == "50.00%"
+        await tiered.close()
+    
+    @pytest.mark.asyncio
+    async def test_delete_broadcasts_invalidation(self):
+        """测试删除时广播失效，其他实例清理L1"""
+        redis_client = FakeRedis()
+        worker_a = self._make_tiered(redis_client)
+        worker_b = self._make_tiered(redis_client)
+        
+        await worker_a.set("key", "value")
+        assert await worker_b.get("key") == "value"  # 提升到worker_b的L1
+        
+        await worker_a.delete("key")
+        channel, event = redis_client.published[-1]
+        assert channel == "llm_cache:invalidate"
+        
+        # 投递广播给两个实例：发送者忽略自身广播，接收者清理L1
+        await worker_a._apply_invalidation(event)
+        await worker_b._apply_invalidation(event)
+        
+        assert await worker_b.l1.exists("key") is False
+        assert (await worker_b.get_stats())["invalidations_received"] == 1
+        assert (await worker_a.get_stats())["invalidations_received"] == 0
+        await worker_a.close()
+        await worker_b.close()
+
+
+    @pytest.mark.asyncio
+    async def test_settings_select_tiered_and_client_closes_it(self, monkeypatch):
+        """测试LLM_CACHE_BACKEND=tiered创建两级缓存，客户端关闭时停止失效监听并关闭独占的Redis客户端"""
+        from src.core.config import settings
+        from src.core.llm_cache import create_cache_from_settings
+        from src.core.llm_client import DeepSeekR1Client
+        
+        monkeypatch.setattr(settings, "LLM_CACHE_BACKEND", "tiered")
+        monkeypatch.setattr(settings, "LLM_CACHE_L1_MAX_ENTRIES", 16)
+        client = DeepSeekR1Client(enable_cache=True)
+        backend = client.cache.backend
+        assert isinstance(backend, TieredCache)
+        assert backend.l1.max_entries == 16
+        
+        closed = []
+        
+        async def aclose():
+            closed.append(True)
+        
+        monkeypatch.setattr(backend.l2.redis, "aclose", aclose)
+        backend._listener_task = asyncio.create_task(asyncio.sleep(60))
+        await client.close()
+        assert backend._listener_task is None
+        assert closed == [True]
+        
+        monkeypatch.setattr(settings, "LLM_CACHE_BACKEND", "redis")
+        cache = create_cache_from_settings()
+        assert isinstance(cache.backend, RedisCache)
+        await cache.close()
+        
+        monkeypatch.setattr(settings, "LLM_CACHE_BACKEND", "memcached")
+        with pytest.raises(ValueError):
+            create_cache_from_settings()
+
+
+class TestSQLiteCache:
+    """测试SQLite磁盘缓存"""
+    
+    @pytest.mark.asyncio
+    async def test_survives_restart(self, tmp_path):
+        """测试重新打开数据库后缓存仍然有效"""
+        db_path = str(tmp_path / "llm_cache.db")
+        
+        cache = SQLiteCache(db_path)
+        await cache.set("key", "持久化的值")
+        await cache.close()
+        
+        reopened = SQLiteCache(db_path)
+        assert await reopened.get("key") == "持久化的值"
+        assert await reopened.exists("key") is True
+        await reopened.close()
+    
+    @pytest.mark.asyncio
+    async def test_ttl_and_limits(self, tmp_path, monkeypatch):
+        """测试TTL过期和条目数上限"""
+        import src.core.llm_cache as llm_cache_module
+        
+        now = [1000.0]
+        monkeypatch.setattr(llm_cache_module.time, "time", lambda: now[0])
+        
+        cache = SQLiteCache(str(tmp_path / "llm_cache.db"), max_entries=2)
+        await cache.set("short", "v1", ttl=5)
+        now[0] += 1
+        await cache.set("long", "v2")
+        now[0] += 1
+        await cache.get("short")  # short变为最近访问
+        now[0] += 1
+        await cache.set("third", "v3")
+        
+        assert await cache.get("long") is None, "最久未访问的条目应被淘汰"
+        
+        now[0] += 10
+        assert await cache.get("short") is None, "超过TTL的条目应过期"
+        assert await cache.get("third") == "v3"
+        
+        stats = await cache.get_stats()
+        assert stats["backend"] == "sqlite"
+        assert stats["evictions"] == 1
+        assert stats["expirations"] == 1
+        assert stats["size"] == 1
+        await cache.close()
+    
+    @pytest.mark.asyncio
+    async def test_running_totals_and_batched_access(self, tmp_path):
+        """测试条目数/字节数在内存中累计（不再每次写入扫描全表），命中时的访问时间批量写回"""
+        db_path = str(tmp_path / "llm_cache.db")
+        cache = SQLiteCache(db_path, max_entries=3, compact_interval=0, access_flush_interval=3600)
+        await cache.set("a", "1")
+        await cache.set("b", "22")
+        await cache.set("a", "333")  # 覆盖：条目数不变，字节数按差值调整
+        await cache.set("c", "4")
+        await cache.delete("c")
+        
+        db = await cache._get_db()
+        statements = []
+        await db._execute(db._conn.set_trace_callback, statements.append)
+        assert await cache.get("a") == "333"
+        await cache.set("d", "5")
+        await db._execute(db._conn.set_trace_callback, None)
+        
+        assert any(sql.startswith("INSERT") for sql in statements)
+        assert not any(sql.startswith("UPDATE") for sql in statements), "命中时不应立即写回访问时间"
+        assert not any("COUNT(*)" in sql for sql in statements), "写入时不应统计全表"
+        assert cache._count == 3 and cache._bytes == len("a333b22d5")
+        
+        await cache.set("e", "6")  # 淘汰前写回访问时间：a刚被访问，淘汰b
+        assert await cache.get("b") is None
+        assert await cache.get("a") == "333"
+        
+        stats = await cache.get_stats()
+        await cache.close()
+        reopened = SQLiteCache(db_path)
+        assert (await reopened.get_stats())["size"] == stats["size"] == 3
+        assert (await reopened.get_stats())["bytes"] == stats["bytes"]
+        await reopened.close()
+    
+    @pytest.mark.asyncio
+    async def test_export_import(self, tmp_path):
+        """测试在两个缓存之间导出/导入"""
+        source = SQLiteCache(str(tmp_path / "source.db"))
+        await source.set("key1", "value1")
+        await source.set("key2", "value2", ttl=3600)
+        
+        export_path = str(tmp_path / "export.jsonl")
+        assert await source.export_entries(export_path) == 2
+        
+        target = SQLiteCache(str(tmp_path / "target.db"))
+        await target.set("key1", "existing")
+        assert await target.import_entries(export_path) == 1
+        assert await target.get("key1") == "existing", "默认不覆盖已存在的键"
+        assert await target.get("key2") == "value2"
+        
+        await target.import_entries(export_path, overwrite=True)
+        assert await target.get("key1") == "value1"
+        
+        await source.close()
+        await target.close()
+
+
+class TestCacheTags:
+    """测试标签与按标签失效"""
+    
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("backend_factory", [MemoryCache, LRUMemoryCache])
+    async def test_memory_invalidate_tag(self, backend_factory):
+        """测试内存缓存只删除带有该标签的条目"""
+        cache = LLMCache(backend_factory())
+        await cache.set("a", "A", tags=["agent:parser", "company:c1"])
+        await cache.set("b", "B", tags=["agent:parser", "company:c2"])
+        await cache.set("c", "C")
+        
+        assert await cache.invalidate_tag("company:c1") == 1
+        assert await cache.get("a") is None
+        assert await cache.get("b") == "B"
+        assert await cache.invalidate_tag("agent:parser") == 1
+        assert await cache.get("c") == "C"
+        assert await cache.invalidate_tag("missing") == 0
+    
+    @pytest.mark.asyncio
+    async def test_lru_eviction_cleans_tag_index(self):
+        """测试淘汰的条目从标签索引中移除，重新写入的键不继承旧标签"""
+        backend = LRUMemoryCache(max_entries=2)
+        cache = LLMCache(backend)
+        for i in range(5):
+            await cache.set(f"k{i}", f"v{i}", tags=["t1", f"own:{i}"])
+        
+        stats = await backend.get_stats()
+        assert stats["tagged_keys"] == 2
+        assert stats["tags"] == 3
+        
+        await cache.set("k0", "new")  # 淘汰k3
+        assert await cache.invalidate_tag("t1") == 1
+        assert await cache.get("k0") == "new"
+        assert (await backend.get_stats())["tagged_keys"] == 0
+    
+    @pytest.mark.asyncio
+    async def test_sqlite_eviction_and_expiry_clean_tags(self, tmp_path, monkeypatch):
+        """测试SQLite淘汰和过期的条目同时删除标签，不等到compact"""
+        import src.core.llm_cache as llm_cache_module
+        
+        now = [1000.0]
+        monkeypatch.setattr(llm_cache_module.time, "time", lambda: now[0])
+        
+        cache = SQLiteCache(str(tmp_path / "llm_cache.db"), max_entries=2, compact_interval=0)
+        for i in range(5):
+            now[0] += 1
+            await cache.set(f"k{i}", f"v{i}", ttl=60 if i == 4 else None)
+            await cache.add_tags(f"k{i}", ["t1"])
+        assert (await cache.get_stats())["tagged_keys"] == 2
+        
+        now[0] += 61
+        assert await cache.get("k4") is None
+        assert (await cache.get_stats())["tagged_keys"] == 1
+        
+        await cache.set("k0", "new")
+        assert await cache.invalidate_tag("t1") == 1
+        assert await cache.get("k0") == "new"
+        await cache.close()
+    
+    @pytest.mark.asyncio
+    async def test_sqlite_invalidate_tag(self, tmp_path):
+        """测试SQLite按标签删除条目，重开数据库后标签仍然有效"""
+        db_path = str(tmp_path / "llm_cache.db")
+        cache = SQLiteCache(db_path)
+        await cache.set("a", "A")
+        await cache.add_tags("a", ["category_tree:c1"])
+        await cache.set("b", "B")
+        await cache.close()
+        
+        reopened = SQLiteCache(db_path)
+        assert await reopened.invalidate_tag("category_tree:c1") == 1
+        assert await reopened.get("a") is None
+        assert await reopened.get("b") == "B"
+        assert (await reopened.get_stats())["tags"] == 0
+        await reopened.close()
+    
+    @pytest.mark.asyncio
+    async def test_redis_tag_set_invalidation(self):
+        """测试Redis标签集合记录完整键，失效时删除条目和标签集合"""
+        redis_client = FakeRedis()
+        cache = LLMCache(RedisCache(redis_client))
+        await cache.set("a", "A", tags=["agent:parser"])
+        await cache.set("b", "B", tags=["agent:matcher"])
+        assert "llm_cache:a" in redis_client.store["llm_cache:tag:agent:parser"]
+        
+        assert await cache.invalidate_tag("agent:parser") == 1
+        assert "llm_cache:a" not in redis_client.store
+        assert "llm_cache:tag:agent:parser" not in redis_client.store
+        assert await cache.get("b") == "B"
+    
+    @pytest.mark.asyncio
+    async def test_tiered_invalidate_tag_broadcasts_keys(self):
+        """测试两级缓存按标签失效时广播键列表，其他实例清理L1"""
+        redis_client = FakeRedis()
+        worker_a = TieredCache(LRUMemoryCache(max_entries=10), RedisCache(redis_client), l1_ttl=60)
+        worker_b = TieredCache(LRUMemoryCache(max_entries=10), RedisCache(redis_client), l1_ttl=60)
+        
+        await LLMCache(worker_a).set("key", "value", tags=["company:c1"])
+        assert await worker_b.get("key") == "value"
+        
+        assert await worker_a.invalidate_tag("company:c1") == 1
+        assert await worker_a.l1.exists("key") is False
+        _, event = redis_client.published[-1]
+        assert json.loads(event)["keys"] == ["key"]
+        
+        await worker_b._apply_invalidation(event)
+        assert await worker_b.get("key") is None
+        await worker_a.close()
+        await worker_b.close()
+    
+    @pytest.mark.asyncio
+    async def test_llm_client_tags_from_scope(self):
+        """测试客户端写缓存时带上Agent标签和作用域标签，并可按标签失效"""
+        from src.core.llm_client import DeepSeekR1Client
+        from src.core.llm_tokens import llm_agent_scope
+        from unittest.mock import AsyncMock, MagicMock
+        
+        cache = LLMCache(LRUMemoryCache())
+        client = DeepSeekR1Client(enable_cache=True, cache=cache)
+        mock_response = MagicMock()
+        mock_response.choices = [MagicMock()]
+        mock_response.choices[0].message.content = '{"ok": true}'
+        client._call_api = AsyncMock(return_value=mock_response)
+        
+        with llm_agent_scope("parser"), llm_cache_tags_scope("company:c1"):
+            with llm_cache_tags_scope("category_tree:c1"):
+                assert get_current_cache_tags() == ("company:c1", "category_tree:c1")
+                await client.generate_json("分类请求")
+            await client.generate("解析请求")
+        await client.generate("其他请求")
+        
+        assert await client.invalidate_cache_tag("category_tree:c1") == 1
+        assert await client.invalidate_cache_tag("agent:parser") == 1
+        assert client._call_api.call_count == 3
+        await client.generate("其他请求")
+        assert client._call_api.call_count == 3
+
+
 class TestLLMCacheIntegration:
     """测试LLM缓存集成"""
     
@@ -215,6 +825,74 @@ class TestLLMCacheIntegration:
         
         assert retrieved == large_value, "应能正确缓存和检索大值"
         assert len(retrieved) == 1024 * 1024
+    
+    @pytest.mark.asyncio
+    async def test_get_or_compute_serves_stale_and_refreshes_once(self):
+        """测试条目过期后立即返回旧值，并发请求只触发一次后台刷新"""
+        cache = LLMCache(LRUMemoryCache(default_ttl=60), stale=LRUMemoryCache(), max_stale=600)
+        await cache.set("hot_key", "old_value")
+        await cache.backend.clear()  # 模拟主缓存条目过期
+        
+        calls = 0
+        release = asyncio.Event()
+        
+        async def compute_fn():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return "new_value"
+        
+        results = await asyncio.gather(*[cache.get_or_compute("hot_key", compute_fn) for _ in range(5)])
+        assert results == ["old_value"] * 5, "过期条目应立即返回旧值"
+        
+        release.set()
+        await cache.wait_for_refreshes()
+        assert calls == 1, "同一个键只应有一个后台刷新任务"
+        assert await cache.get("hot_key") == "new_value"
+        
+        stats = (await cache.get_stats())["stale_while_revalidate"]
+        assert stats["stale_serves"] == 5
+        assert stats["refreshes"] == 1
+        assert stats["refreshing"] == 0
+    
+    @pytest.mark.asyncio
+    async def test_get_or_compute_respects_max_stale(self, monkeypatch):
+        """测试过期超过max_stale的旧值不再返回，改为同步计算"""
+        import time
+        
+        cache = LLMCache(LRUMemoryCache(default_ttl=60), stale=LRUMemoryCache(), max_stale=600)
+        await cache.set("old_key", "old_value")
+        await cache.backend.clear()
+        
+        async def compute_fn():
+            return "new_value"
+        
+        now = time.time()
+        monkeypatch.setattr(time, "time", lambda: now + 60 + 601)
+        assert await cache.get_or_compute("old_key", compute_fn) == "new_value"
+        
+        stats = (await cache.get_stats())["stale_while_revalidate"]
+        assert stats["too_stale"] == 1
+        assert stats["stale_serves"] == 0
+    
+    @pytest.mark.asyncio
+    async def test_failed_refresh_keeps_stale_value(self):
+        """测试后台刷新失败时保留旧值，下次请求重新刷新"""
+        cache = LLMCache(LRUMemoryCache(default_ttl=60), stale=LRUMemoryCache(), max_stale=600)
+        await cache.set("key", "old_value")
+        await cache.backend.clear()
+        
+        async def failing_compute():
+            raise RuntimeError("LLM不可用")
+        
+        assert await cache.get_or_compute("key", failing_compute) == "old_value"
+        await cache.wait_for_refreshes()
+        assert await cache.get_or_compute("key", failing_compute) == "old_value"
+        await cache.wait_for_refreshes()
+        
+        stats = (await cache.get_stats())["stale_while_revalidate"]
+        assert stats["refresh_failures"] == 2
+        assert stats["refreshes"] == 0
 
 
 class TestCacheWithLLMClient:
@@ -251,6 +929,30 @@ class TestCacheWithLLMClient:
         result3 = await client.generate("不同的提示词")
         assert result3 == "测试响应"
         assert client._call_api.call_count == 2, "不同提示词应调用API"
+    
+    @pytest.mark.asyncio
+    async def test_batch_generate_probes_cache_once(self):
+        """测试批量调用先一次批量读取缓存，只为未命中的提示词调用API"""
+        from src.core.llm_client import DeepSeekR1Client
+        from unittest.mock import AsyncMock, MagicMock
+        
+        redis_client = FakeRedis()
+        client = DeepSeekR1Client(enable_cache=True, cache=LLMCache(RedisCache(redis_client)))
+        mock_response = MagicMock()
+        mock_response.choices = [MagicMock()]
+        mock_response.choices[0].message.content = '{"score": 1}'
+        client._call_api = AsyncMock(return_value=mock_response)
+        
+        prompts = [f"提示词{i}" for i in range(10)]
+        await client.batch_generate(prompts[:4])
+        assert client._call_api.call_count == 4
+        
+        redis_client.round_trips = 0
+        results = await client.batch_generate_json(prompts)
+        assert results == [{"score": 1}] * 10
+        assert client._call_api.call_count == 10, "只有6个未命中的提示词调用API"
+        # 1次批量读取 + 每个未命中的提示词1次读取和1次写入
+        assert redis_client.round_trips == 1 + 6 * 2
 
 
 def test_cache_key_format():
@@ -0,0 +1,191 @@
+"""测试LLM熔断器（滚动窗口错误率、半开探测、快速失败和过期缓存降级）"""
+
+import httpx
+import pytest
+from types import SimpleNamespace
+from tenacity import wait_none
+
+from src.core.llm_circuit_breaker import CircuitBreaker, CircuitState
+from src.core.llm_cache import LLMCache, LRUMemoryCache, create_memory_cache
+from src.core.llm_client import DeepSeekR1Client, LLMCircuitOpenError
+
+
+class FakeClock:
+    """可手动推进的时钟"""
+    
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_breaker(**kwargs) -> CircuitBreaker:
+    clock = FakeClock()
+    options = dict(window_seconds=10, min_requests=4, error_rate_threshold=0.5, open_seconds=5, half_open_successes=1)
+    options.update(kwargs)
+    breaker = CircuitBreaker(**options)
+    breaker._now = clock
+    breaker.clock = clock
+    return breaker
+
+
+def test_opens_on_error_rate_after_min_requests():
+    """测试请求数不足时不熔断，错误率达到阈值后打开并拒绝请求"""
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record_failure(RuntimeError("boom"))
+    assert breaker.state == CircuitState.CLOSED
+    
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitState.OPEN
+    assert not breaker.allow_request()
+    
+    stats = breaker.get_stats()
+    assert stats["state"] == "open"
+    assert stats["times_opened"] == 1
+    assert stats["rejected"] == 1
+    assert stats["retry_after_s"] == 5
+    assert "boom" in stats["last_failure"]
+
+
+def test_old_failures_leave_window():
+    """测试窗口外的失败不再计入错误率"""
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record_failure()
+    breaker.clock.now += 11
+    
+    for _ in range(3):
+        breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitState.CLOSED
+    assert breaker.get_stats()["window_requests"] == 4
+
+
+def test_half_open_probe_closes_or_reopens():
+    """测试冷却后进入半开，只放行限定数量的探测请求，失败重新打开、成功闭合"""
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record_failure()
+    breaker.clock.now += 5
+    
+    assert breaker.allow_request()
+    assert breaker.state == CircuitState.HALF_OPEN
+    assert not breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitState.OPEN
+    assert breaker.get_stats()["times_opened"] == 2
+    
+    breaker.clock.now += 5
+    assert breaker.allow_request()
+    breaker.release()  # 被取消的探测归还名额
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CircuitState.CLOSED
+    assert breaker.get_stats()["window_requests"] == 0
+
+
+@pytest.mark.asyncio
+async def test_stale_copy_outlives_primary_cache():
+    """测试主缓存删除条目后仍可读到过期副本"""
+    cache = LLMCache(LRUMemoryCache(max_entries=1), stale=LRUMemoryCache(max_entries=10))
+    await cache.set("a", "result-a")
+    await cache.set("b", "result-b")  # 主缓存淘汰a
+    
+    assert await cache.get("a") is None
+    assert await cache.get_stale("a") == "result-a"
+    assert await cache.get_stale("missing") is None
+    assert (await cache.get_stats())["stale_copies"] == {"size": 2, "served": 1}
+
+
+def make_client(breaker: CircuitBreaker, cache: LLMCache, app=None) -> DeepSeekR1Client:
+    http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app)) if app is not None else None
+    return DeepSeekR1Client(
+        api_key="test",
+        base_url="http://mock/v1",
+        cache=cache,
+        circuit_breaker=breaker,
+        http_client=http_client
+    )
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_serves_stale_or_fails_fast():
+    """测试熔断时有过期缓存的请求返回过期结果，其余请求不调用API直接失败"""
+    breaker = make_breaker()
+    cache = create_memory_cache()
+    cache.stale = LRUMemoryCache(max_entries=10)
+    client = make_client(breaker, cache)
+    
+    calls = []
+    
+    async def fake_create(**kwargs):
+        calls.append(kwargs)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="fresh"))], usage=None)
+    
+    client.client.chat.completions.create = fake_create
+    try:
+        assert await client.generate("旧请求") == "fresh"
+        await cache.backend.clear()  # 主缓存过期
+        
+        for _ in range(4):
+            breaker.record_failure()
+        assert breaker.is_open
+        
+        assert await client.generate("旧请求") == "fresh"
+        with pytest.raises(LLMCircuitOpenError) as exc_info:
+            await client.generate("新请求")
+        assert exc_info.value.retry_after > 0
+    finally:
+        await client.close()
+    
+    assert len(calls) == 1
+    stats = client.get_circuit_stats()
+    assert stats["state"] == "open"
+    assert stats["stale_served"] == 1
+    assert stats["fast_failures"] == 1
+    assert client.rate_limiter.concurrency.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_server_errors_trip_circuit_without_retry_storm(monkeypatch):
+    """测试连续429触发熔断，熔断后剩余的重试不再调用API"""
+    from src.mock_llm import MockLLMConfig, create_mock_llm_app
+    
+    app = create_mock_llm_app(MockLLMConfig(latency_ms=0, latency_distribution="fixed", rate_limit_rate=1.0, retry_after=0))
+    breaker = make_breaker(min_requests=2)
+    client = make_client(breaker, create_memory_cache(), app=app)
+    monkeypatch.setattr(DeepSeekR1Client._call_api.retry, "wait", wait_none())
+    
+    try:
+        with pytest.raises(LLMCircuitOpenError):
+            await client.generate("请求")
+    finally:
+        await client.close()
+    
+    # 第1、2次尝试失败后熔断，第3次尝试不再发出请求
+    assert app.state.stats.get_stats()["requests"] == 2
+    assert client.get_circuit_stats()["state"] == "open"
+
+
+@pytest.mark.asyncio
+async def test_health_reports_circuit_state(monkeypatch):
+    """测试/health返回熔断器状态，打开时为degraded"""
+    from src.api import app
+    from src.core import llm_client
+    
+    breaker = make_breaker()
+    monkeypatch.setattr(llm_client.deepseek_client, "circuit_breaker", breaker)
+    
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        data = (await client.get("/health")).json()
+        assert data["status"] == "healthy"
+        assert data["llm_circuit"]["state"] == "closed"
+        
+        for _ in range(4):
+            breaker.record_failure()
+        data = (await client.get("/health")).json()
+        assert data["status"] == "degraded"
+        assert data["llm_circuit"]["state"] == "open"
@@ -0,0 +1,255 @@
+"""测试LLM请求对冲"""
+
+import asyncio
+import pytest
+from types import SimpleNamespace
+
+from src.core.llm_hedging import RequestHedger
+
+
+def make_call(delays, results=None, cancelled=None):
+    """按顺序返回不同延迟的调用函数，记录被取消的调用序号"""
+    state = {"index": 0}
+    
+    def call():
+        index = state["index"]
+        state["index"] += 1
+        
+        async def run():
+            try:
+                await asyncio.sleep(delays[index])
+            except asyncio.CancelledError:
+                if cancelled is not None:
+                    cancelled.append(index)
+                raise
+            result = (results or {}).get(index, f"result-{index}")
+            if isinstance(result, Exception):
+                raise result
+            return result
+        
+        return run()
+    
+    call.state = state
+    return call
+
+
+def warmed_hedger(latency: float = 0.01, tokens_per_request: int = 1, **kwargs) -> RequestHedger:
+    """已有足够延迟样本的对冲器（历史请求每个按tokens_per_request个预估token计）"""
+    hedger = RequestHedger(min_samples=5, min_delay=0.0, **kwargs)
+    for _ in range(5):
+        hedger.record_latency(latency)
+    hedger._requests = 100  # 预算按100个历史请求计算
+    hedger._requested_tokens = 100 * tokens_per_request
+    return hedger
+
+
+def test_hedge_delay_percentile():
+    """测试对冲延迟取历史延迟分位数，且不低于最短延迟"""
+    hedger = RequestHedger(percentile=90, min_delay=0.05, min_samples=10)
+    assert hedger.hedge_delay() is None
+    
+    for i in range(1, 11):
+        hedger.record_latency(i / 100)
+    assert hedger.hedge_delay() == pytest.approx(0.09)
+    
+    hedger.min_delay = 0.5
+    assert hedger.hedge_delay() == 0.5
+
+
+@pytest.mark.asyncio
+async def test_no_hedge_before_warmup():
+    """测试样本不足时不发出对冲请求"""
+    hedger = RequestHedger(min_samples=5)
+    call = make_call([0.05])
+    
+    assert await hedger.run(call) == "result-0"
+    assert call.state["index"] == 1
+    assert hedger.get_stats()["hedged"] == 0
+    assert hedger.get_stats()["samples"] == 1
+
+
+@pytest.mark.asyncio
+async def test_hedge_wins_and_cancels_primary():
+    """测试主请求过慢时对冲请求胜出，主请求被取消"""
+    hedger = warmed_hedger(max_extra_ratio=0.05)
+    cancelled = []
+    call = make_call([1.0, 0.01], cancelled=cancelled)
+    
+    assert await hedger.run(call) == "result-1"
+    assert cancelled == [0]
+    
+    stats = hedger.get_stats()
+    assert stats["hedged"] == 1
+    assert stats["hedge_wins"] == 1
+    assert stats["hedge_losses"] == 0
+
+
+@pytest.mark.asyncio
+async def test_primary_wins_and_cancels_hedge():
+    """测试对冲请求发出后主请求先返回，对冲请求被取消"""
+    hedger = warmed_hedger()
+    cancelled = []
+    call = make_call([0.05, 1.0], cancelled=cancelled)
+    
+    assert await hedger.run(call) == "result-0"
+    assert cancelled == [1]
+    assert hedger.get_stats()["hedge_losses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_request_falls_back_to_other():
+    """测试先返回的请求失败时等待另一个请求"""
+    hedger = warmed_hedger()
+    call = make_call([0.03, 0.01], results={1: RuntimeError("hedge failed")})
+    assert await hedger.run(call) == "result-0"
+    assert hedger.get_stats()["hedge_losses"] == 1
+    
+    call = make_call([0.2, 0.01], results={0: RuntimeError("a"), 1: RuntimeError("b")})
+    with pytest.raises(RuntimeError, match="a"):
+        await hedger.run(call)
+    assert hedger.get_stats()["hedge_failures"] == 1
+
+
+@pytest.mark.asyncio
+async def test_extra_spend_is_capped():
+    """测试对冲请求数不超过请求总数的上限比例"""
+    hedger = RequestHedger(percentile=0, min_samples=1, min_delay=0.0, max_extra_ratio=0.1)
+    hedger.record_latency(0.001)
+    
+    for _ in range(30):
+        await hedger.run(make_call([0.02, 0.02]))
+    
+    stats = hedger.get_stats()
+    assert stats["requests"] == 30
+    assert stats["hedged"] == 3
+    assert stats["skipped_budget"] == 27
+    assert stats["hedged"] <= stats["requests"] * 0.1
+
+
+@pytest.mark.asyncio
+async def test_extra_spend_is_capped_by_tokens():
+    """测试额外花费上限按预估token数计算：大请求不能借小请求攒下的预算对冲"""
+    hedger = warmed_hedger(tokens_per_request=100, max_extra_ratio=0.1, percentile=50)  # 预算约1000 token
+    
+    await hedger.run(make_call([0.05, 0.01]), estimated_tokens=2000)
+    assert hedger.get_stats()["skipped_budget"] == 1
+    
+    await hedger.run(make_call([0.05, 0.01]), estimated_tokens=500)
+    stats = hedger.get_stats()
+    assert stats["hedged"] == 1
+    assert stats["hedged_tokens"] == 500
+
+
+@pytest.mark.asyncio
+async def test_discarded_request_is_reported():
+    """测试被取消的请求以None回调，两个都返回时未采用的结果也回调"""
+    hedger = warmed_hedger()
+    discarded = []
+    
+    assert await hedger.run(make_call([1.0, 0.01]), on_discard=discarded.append) == "result-1"
+    assert discarded == [None]
+    
+    discarded.clear()
+    hedger = warmed_hedger()
+    call = make_call([0.2, 0.01], results={1: RuntimeError("hedge failed")})
+    assert await hedger.run(call, on_discard=discarded.append) == "result-0"
+    assert discarded == [], "失败的请求不计费，不回调"
+
+
+@pytest.mark.asyncio
+async def test_hedge_skipped_without_capacity():
+    """测试没有空闲并发许可时不发出对冲请求"""
+    hedger = warmed_hedger()
+    released = []
+    call = make_call([0.05, 0.01])
+    
+    result = await hedger.run(call, acquire_extra=lambda: False, release_extra=lambda: released.append(1))
+    assert result == "result-0"
+    assert call.state["index"] == 1
+    assert released == []
+    assert hedger.get_stats()["skipped_capacity"] == 1
+
+
+@pytest.mark.asyncio
+async def test_client_generate_hedges_slow_call():
+    """测试DeepSeekR1Client.generate对慢请求发出对冲并释放额外并发许可"""
+    from src.core.llm_client import DeepSeekR1Client
+    from src.core.llm_cache import create_memory_cache
+    
+    hedger = warmed_hedger(tokens_per_request=10000)
+    client = DeepSeekR1Client(
+        api_key="test",
+        cache=create_memory_cache(),
+        enable_cache=False,
+        max_concurrent=3,
+        hedger=hedger
+    )
+    delays = iter([1.0, 0.01])
+    calls = []
+    
+    async def fake_call_api(**kwargs):
+        calls.append(kwargs)
+        await asyncio.sleep(next(delays))
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=f"response-{len(calls)}"))],
+            usage=None
+        )
+    
+    client._call_api = fake_call_api
+    try:
+        assert await client.generate("慢请求") == "response-2"
+    finally:
+        await client.close()
+    
+    assert len(calls) == 2
+    assert client.get_hedge_stats()["hedge_wins"] == 1
+    assert client.rate_limiter.concurrency.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_client_hedge_respects_rpm_and_records_discarded_usage():
+    """测试对冲请求受RPM预算约束，且被取消的请求计入token用量"""
+    from src.core.llm_client import DeepSeekR1Client
+    from src.core.llm_cache import create_memory_cache
+    from src.core.llm_rate_limiter import LLMRateLimiter
+    
+    def make_client(requests_per_minute):
+        client = DeepSeekR1Client(
+            api_key="test",
+            cache=create_memory_cache(),
+            enable_cache=False,
+            rate_limiter=LLMRateLimiter(max_concurrent=3, requests_per_minute=requests_per_minute),
+            hedger=warmed_hedger(tokens_per_request=10000)
+        )
+        delays = iter([0.2, 0.01])
+        
+        async def fake_call_api(**kwargs):
+            await asyncio.sleep(next(delays))
+            return SimpleNamespace(
+                choices=[SimpleNamespace(message=SimpleNamespace(content="response"))],
+                usage=None
+            )
+        
+        client._call_api = fake_call_api
+        return client
+    
+    # RPM令牌只够主请求：不对冲
+    limited = make_client(requests_per_minute=1)
+    try:
+        assert await limited.generate("慢请求") == "response"
+    finally:
+        await limited.close()
+    assert limited.get_hedge_stats()["hedged"] == 0
+    assert limited.get_hedge_stats()["skipped_capacity"] == 1
+    assert limited.rate_limiter.concurrency.in_flight == 0
+    
+    # RPM充足：对冲胜出，被取消的主请求按预估输入token计入用量
+    client = make_client(requests_per_minute=100)
+    try:
+        assert await client.generate("慢请求") == "response"
+    finally:
+        await client.close()
+    assert client.get_hedge_stats()["hedge_wins"] == 1
+    usage = client.get_token_stats()
+    assert usage["calls"] == 2
+    assert usage["prompt_tokens"] > 0
@@ -0,0 +1,155 @@
+"""测试LLM HTTP连接池和连接复用统计"""
+
+import asyncio
+import json
+import pytest
+
+from src.core.llm_http import ConnectionMetrics, create_llm_http_client
+
+
+COMPLETION = {
+    "id": "chatcmpl-test",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "deepseek-chat",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 10, "completion_tokens": 1, "total_tokens": 11}
+}
+
+
+async def start_keepalive_server(delay: float = 0.0):
+    """启动支持keep-alive的最小HTTP/1.1服务，返回(server, base_url, 连接计数)"""
+    connections = []
+    
+    async def handle(reader, writer):
+        connections.append(writer)
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.decode().split("\r\n"):
+                    if line.lower().startswith("content-length:"):
+                        length = int(line.split(":", 1)[1])
+                if length:
+                    await reader.readexactly(length)
+                await asyncio.sleep(delay)
+                body = json.dumps(COMPLETION).encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+    
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    return server, f"http://127.0.0.1:{port}", connections
+
+
+def test_metrics_aggregation():
+    """测试统计汇总"""
+    metrics = ConnectionMetrics()
+    metrics.record(new_connection=True, pool_wait=0.0, connect_time=0.02)
+    metrics.record(new_connection=False, pool_wait=0.004)
+    metrics.record(new_connection=False, pool_wait=0.002)
+    
+    stats = metrics.get_stats()
+    assert stats["new_connections"] == 1
+    assert stats["reused_connections"] == 2
+    assert stats["reuse_rate"] == "66.67%"
+    assert stats["avg_pool_wait_ms"] == 2.0
+    assert stats["max_pool_wait_ms"] == 4.0
+    assert stats["avg_connect_time_ms"] == 20.0
+
+
+@pytest.mark.asyncio
+async def test_sequential_requests_reuse_connection():
+    """测试顺序请求复用同一个keep-alive连接"""
+    server, base_url, connections = await start_keepalive_server()
+    metrics = ConnectionMetrics()
+    http_client = create_llm_http_client(max_connections=2, metrics=metrics)
+    
+    try:
+        for _ in range(5):
+            response = await http_client.post(f"{base_url}/v1/chat/completions", json={})
+            assert response.status_code == 200
+    finally:
+        await http_client.aclose()
+        server.close()
+    
+    stats = metrics.get_stats()
+    assert len(connections) == 1
+    assert stats["requests"] == 5
+    assert stats["new_connections"] == 1
+    assert stats["reused_connections"] == 4
+    assert stats["http_versions"] == {"HTTP/1.1": 5}
+
+
+@pytest.mark.asyncio
+async def test_pool_limit_bounds_connections():
+    """测试连接数不超过上限，超出的请求在连接池等待"""
+    server, base_url, connections = await start_keepalive_server(delay=0.05)
+    metrics = ConnectionMetrics()
+    http_client = create_llm_http_client(max_connections=2, metrics=metrics)
+    
+    try:
+        await asyncio.gather(*[
+            http_client.post(f"{base_url}/v1/chat/completions", json={}) for _ in range(6)
+        ])
+    finally:
+        await http_client.aclose()
+        server.close()
+    
+    stats = metrics.get_stats()
+    assert len(connections) == 2
+    assert stats["new_connections"] == 2
+    assert stats["reused_connections"] == 4
+    assert stats["max_pool_wait_ms"] >= 40
+
+
+@pytest.mark.asyncio
+async def test_client_uses_shared_pool():
+    """测试DeepSeekR1Client通过共享连接池调用API并暴露统计"""
+    from src.core.llm_client import DeepSeekR1Client
+    from src.core.llm_cache import create_memory_cache
+    
+    server, base_url, connections = await start_keepalive_server()
+    client = DeepSeekR1Client(
+        api_key="test",
+        base_url=f"{base_url}/v1",
+        cache=create_memory_cache(),
+        enable_cache=False,
+        max_concurrent=3
+    )
+    
+    try:
+        assert await client.generate("第一次") == "ok"
+        assert await client.generate("第二次") == "ok"
+    finally:
+        await client.close()
+        server.close()
+    
+    stats = client.get_connection_stats()
+    assert stats["requests"] == 2
+    assert stats["new_connections"] == 1
+    assert stats["reused_connections"] == 1
+    assert client.http_client.is_closed
+
+
+@pytest.mark.asyncio
+async def test_client_does_not_close_injected_pool():
+    """测试调用方传入的http_client不由DeepSeekR1Client.close()关闭"""
+    import httpx
+    from src.core.llm_client import DeepSeekR1Client
+    from src.core.llm_cache import create_memory_cache
+    
+    http_client = httpx.AsyncClient()
+    client = DeepSeekR1Client(api_key="test", cache=create_memory_cache(), http_client=http_client)
+    try:
+        await client.close()
+        assert not http_client.is_closed
+    finally:
+        await http_client.aclose()
@@ -0,0 +1,175 @@
+"""测试LLM JSON解析修复与流式增量解析"""
+
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+from src.core.llm_json import IncrementalJSONParser, parse_json_response, strip_code_fence
+
+
+class FakeStream:
+    """模拟OpenAI流式响应"""
+    
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.consumed = 0
+        self.closed = False
+    
+    def __aiter__(self):
+        return self
+    
+    async def __anext__(self):
+        if self.consumed >= len(self.chunks):
+            raise StopAsyncIteration
+        content = self.chunks[self.consumed]
+        self.consumed += 1
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+    
+    async def close(self):
+        self.closed = True
+
+
+def split_chunks(text, size=5):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class TestParseJsonResponse:
+    """测试JSON提取和本地修复"""
+    
+    def test_fenced_json_not_counted_as_repair(self):
+        """测试正常的代码块不算修复"""
+        assert parse_json_response('```json\n{"a": 1}\n```') == ({"a": 1}, False)
+        assert parse_json_response('{"a": 1}') == ({"a": 1}, False)
+    
+    def test_unclosed_fence_and_truncation(self):
+        """测试未闭合代码块和截断的输出"""
+        result, repaired = parse_json_response('```json\n{"title": "工程师", "skills": ["Python", "Go')
+        
+        assert repaired
+        assert result == {"title": "工程师", "skills": ["Python", "Go"]}
+    
+    def test_dangling_key_and_partial_literal(self):
+        """测试截断在字段名或字面量中间时回退到上一个完整字段"""
+        assert parse_json_response('{"a": 1, "b"')[0] == {"a": 1}
+        assert parse_json_response('{"a": 1, "b": tru')[0] == {"a": 1}
+    
+    def test_prose_and_trailing_comma(self):
+        """测试JSON前后的说明文字和尾逗号"""
+        result, repaired = parse_json_response('结果如下：{"a": [1, 2,], "b": 2,} 以上。')
+        
+        assert repaired
+        assert result == {"a": [1, 2], "b": 2}
+    
+    def test_unrecoverable(self):
+        """测试无法修复时抛出ValueError"""
+        with pytest.raises(ValueError):
+            parse_json_response("抱歉，我无法完成该任务。")
+    
+    def test_strip_code_fence(self):
+        """测试代码块标记去除"""
+        assert strip_code_fence("```\n[1]\n```") == "[1]"
+        assert strip_code_fence("  [1]  ") == "[1]"
+
+
+class TestIncrementalJSONParser:
+    """测试增量解析"""
+    
+    def test_tracks_completed_members(self):
+        """测试逐字符喂入时跟踪已完成的顶层字段"""
+        parser = IncrementalJSONParser()
+        snapshots = []
+        for ch in '```json\n{"a": "x,y", "b": {"c": [1, 2]}, "d": 3}\n```说明':
+            if parser.feed(ch):
+                snapshots.append(parser.partial())
+        
+        assert snapshots == [
+            {"a": "x,y"},
+            {"a": "x,y", "b": {"c": [1, 2]}},
+            {"a": "x,y", "b": {"c": [1, 2]}, "d": 3}
+        ]
+        assert parser.complete
+        assert parser.result() == ({"a": "x,y", "b": {"c": [1, 2]}, "d": 3}, False)
+    
+    def test_escaped_quotes(self):
+        """测试字符串中的转义引号和括号不影响解析"""
+        parser = IncrementalJSONParser()
+        parser.feed('{"a": "say \\"}\\"", "b": 1}')
+        
+        assert parser.complete
+        assert parser.result()[0] == {"a": 'say "}"', "b": 1}
+
+
+def make_client():
+    from src.core.llm_client import DeepSeekR1Client
+    from src.core.llm_cache import create_memory_cache
+    
+    return DeepSeekR1Client(cache=create_memory_cache())
+
+
+@pytest.mark.asyncio
+async def test_stream_stops_early_when_required_keys_ready():
+    """测试必需字段就绪后提前结束流"""
+    client = make_client()
+    text = '{"job_title": "工程师", "required_skills": ["Python"], "analysis": "' + "很长的分析" * 50 + '"}'
+    stream = FakeStream(split_chunks(text))
+    client._call_api = AsyncMock(return_value=stream)
+    
+    result = await client.generate_json_stream(
+        "解析JD", required_keys=["job_title", "required_skills"]
+    )
+    
+    assert result == {"job_title": "工程师", "required_skills": ["Python"]}
+    assert stream.closed
+    assert stream.consumed < len(stream.chunks) / 2
+    assert client.get_json_stats()["early_stops"] == 1
+    assert client.rate_limiter.concurrency.in_flight == 0, "提前结束后应释放并发许可"
+    assert (await client.cache.get_stats())["size"] == 0, "不完整的结果不应缓存"
+
+
+@pytest.mark.asyncio
+async def test_stream_repairs_truncated_output_and_caches():
+    """测试截断输出在本地修复，并与generate_json共用缓存"""
+    client = make_client()
+    stream = FakeStream(split_chunks('```json\n{"overall_score": 80, "issues": ["缺少薪资'))
+    client._call_api = AsyncMock(return_value=stream)
+    
+    result = await client.generate_json_stream("评估JD", temperature=0.3)
+    
+    assert result == {"overall_score": 80, "issues": ["缺少薪资"]}
+    stats = client.get_json_stats()
+    assert stats["repairs"] == 1
+    assert stats["reasks"] == 0
+    
+    # 相同参数的非流式调用直接命中缓存
+    assert await client.generate_json("评估JD", temperature=0.3) == result
+    assert client._call_api.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_reasks_when_unrecoverable():
+    """测试本地无法修复时重新请求"""
+    client = make_client()
+    client._call_api = AsyncMock(side_effect=[
+        FakeStream(["抱歉，", "我无法回答。"]),
+        FakeStream(split_chunks('{"overall_score": 75}'))
+    ])
+    
+    result = await client.generate_json_stream("评估JD", max_reasks=1)
+    
+    assert result == {"overall_score": 75}
+    stats = client.get_json_stats()
+    assert stats["reasks"] == 1
+    assert stats["repairs"] == 0
+
+
+@pytest.mark.asyncio
+async def test_generate_json_repairs_locally():
+    """测试非流式generate_json同样在本地修复"""
+    client = make_client()
+    mock_response = MagicMock()
+    mock_response.choices = [MagicMock()]
+    mock_response.choices[0].message.content = '```json\n{"a": 1, "b": [1, 2'
+    client._call_api = AsyncMock(return_value=mock_response)
+    
+    assert await client.generate_json("测试") == {"a": 1, "b": [1, 2]}
+    assert client.get_json_stats()["repairs"] == 1
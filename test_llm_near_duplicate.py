@@ -0,0 +1,191 @@
+"""测试近似重复LLM缓存（规范化JD文本 + MinHash LSH）"""
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from src.core.llm_cache import LLMCache, MemoryCache
+from src.core.llm_near_duplicate import MinHashLSHIndex, normalize_jd_text
+
+
+JD_TEXT = """高级Python开发工程师
+
+岗位职责：
+1. 负责公司核心业务系统的后端开发与维护，保障系统稳定运行；
+2. 参与系统架构设计，编写技术文档，推动代码质量持续改进；
+3. 与产品、测试团队紧密协作，按时交付高质量的功能迭代。
+
+任职要求：
+- 本科及以上学历，计算机相关专业，5年以上Python开发经验；
+- 熟悉FastAPI、Django等Web框架，熟悉MySQL、Redis；
+- 具备良好的沟通能力和团队合作精神。
+
+发布日期：2024年3月1日
+"""
+
+# 同一份JD：全角标点、不同的列表符号和空白、发布日期变化
+JD_TEXT_REUPLOADED = """高级Python开发工程师
+岗位职责：
+• 负责公司核心业务系统的后端开发与维护，保障系统稳定运行；
+•   参与系统架构设计，编写技术文档，推动代码质量持续改进；
+• 与产品、测试团队紧密协作，按时交付高质量的功能迭代。
+任职要求：
+（1）本科及以上学历，计算机相关专业，５年以上Python开发经验；
+（2）熟悉ＦａｓｔＡＰＩ、Django等Web框架，熟悉MySQL、Redis；
+（3）具备良好的沟通能力和团队合作精神。
+发布日期：2024年4月15日
+"""
+
+OTHER_JD_TEXT = """财务经理
+
+岗位职责：
+1. 负责公司财务核算、报表编制和税务申报工作；
+2. 建立健全财务管理制度，控制成本费用；
+3. 配合外部审计，完成年度审计工作。
+
+任职要求：
+- 财务、会计相关专业本科以上学历，持有中级会计师证书；
+- 8年以上财务工作经验，3年以上团队管理经验。
+"""
+
+
+class TestNormalization:
+    """测试JD文本规范化"""
+    
+    def test_list_markers_and_whitespace(self):
+        """测试去除列表符号、合并空白"""
+        text = "  1. 负责  后端开发\n\n• 编写文档\n（2）代码评审\n①  单元测试\n二、  上线发布"
+        assert normalize_jd_text(text) == "负责 后端开发\n编写文档\n代码评审\n单元测试\n上线发布"
+    
+    def test_full_width_to_half_width(self):
+        """测试全角字符和中文标点统一"""
+        assert normalize_jd_text("ＦａｓｔＡＰＩ，Ｒｅｄｉｓ。") == "fastapi,redis."
+    
+    def test_numbers_in_content_are_kept(self):
+        """测试正文中的数字不会被当作列表符号去除"""
+        assert normalize_jd_text("5年以上经验") == "5年以上经验"
+
+
+class TestMinHashLSHIndex:
+    """测试MinHash LSH索引"""
+    
+    def test_reuploaded_jd_matches(self):
+        """测试重新上传（格式变化、日期变化）的JD可以匹配"""
+        index = MinHashLSHIndex(threshold=0.8)
+        index.add("key_1", JD_TEXT)
+        
+        match = index.query(JD_TEXT_REUPLOADED)
+        
+        assert match is not None
+        assert match[0] == "key_1"
+        assert match[1] >= 0.8
+    
+    def test_identical_after_normalization(self):
+        """测试规范化后相同的文本相似度为1"""
+        index = MinHashLSHIndex()
+        index.add("key_1", "1. 负责后端开发\n2. 编写文档")
+        
+        assert index.query("• 负责后端开发\n• 编写文档") == ("key_1", 1.0)
+    
+    def test_different_jd_does_not_match(self):
+        """测试不同JD不会匹配"""
+        index = MinHashLSHIndex(threshold=0.8)
+        index.add("key_1", JD_TEXT)
+        
+        assert index.query(OTHER_JD_TEXT) is None
+        assert index.get_stats()["matches"] == 0
+    
+    def test_namespace_isolation(self):
+        """测试不同命名空间（模板/参数不同）互不匹配"""
+        index = MinHashLSHIndex()
+        index.add("key_1", JD_TEXT, namespace="parse")
+        
+        assert index.query(JD_TEXT, namespace="evaluate") is None
+        assert index.query(JD_TEXT, namespace="parse") == ("key_1", 1.0)
+    
+    def test_bounded_entries(self):
+        """测试超过上限时淘汰最早的条目"""
+        index = MinHashLSHIndex(max_entries=2)
+        index.add("a", "第一份JD内容")
+        index.add("b", "第二份JD内容")
+        index.add("c", "第三份JD内容")
+        
+        assert len(index) == 2
+        assert index.query("第一份JD内容") is None
+        assert index.get_stats()["evictions"] == 1
+    
+    def test_remove_clears_buckets(self):
+        """测试移除条目后同时清理分桶"""
+        index = MinHashLSHIndex()
+        index.add("a", JD_TEXT)
+        index.remove("a")
+        
+        assert len(index) == 0
+        assert not index._buckets
+
+
+@pytest.mark.asyncio
+async def test_llm_cache_similar_lookup_and_stale_cleanup():
+    """测试LLMCache近似重复查找，缓存条目失效时清理索引"""
+    cache = LLMCache(MemoryCache(), near_duplicate=MinHashLSHIndex(threshold=0.8))
+    namespace = LLMCache.generate_similarity_namespace(
+        prompt=f"解析：{JD_TEXT}", similarity_text=JD_TEXT,
+        model="deepseek-chat", temperature=0.3, max_tokens=2000
+    )
+    
+    await cache.set("key_1", "解析结果")
+    cache.index_similar("key_1", JD_TEXT, namespace)
+    
+    assert await cache.get_similar(JD_TEXT_REUPLOADED, namespace) == "解析结果"
+    
+    await cache.backend.delete("key_1")
+    assert await cache.get_similar(JD_TEXT_REUPLOADED, namespace) is None
+    
+    stats = await cache.get_stats()
+    assert stats["near_duplicate_hits"] == 1
+    assert stats["near_duplicate"]["stale"] == 1
+    assert stats["near_duplicate"]["entries"] == 0
+
+
+def test_similarity_namespace_ignores_variable_text():
+    """测试命名空间只与模板和参数有关"""
+    params = dict(model="deepseek-chat", temperature=0.3, max_tokens=2000)
+    
+    ns_1 = LLMCache.generate_similarity_namespace(f"解析：{JD_TEXT}", JD_TEXT, **params)
+    ns_2 = LLMCache.generate_similarity_namespace(
+        f"解析：{JD_TEXT_REUPLOADED}", JD_TEXT_REUPLOADED, **params
+    )
+    ns_3 = LLMCache.generate_similarity_namespace(f"评估：{JD_TEXT}", JD_TEXT, **params)
+    
+    assert ns_1 == ns_2
+    assert ns_1 != ns_3
+
+
+@pytest.mark.asyncio
+async def test_client_reuses_near_duplicate_result():
+    """测试客户端对近似重复JD复用缓存结果"""
+    from src.core.llm_client import DeepSeekR1Client
+    
+    client = DeepSeekR1Client(
+        cache=LLMCache(MemoryCache(), near_duplicate=MinHashLSHIndex(threshold=0.8))
+    )
+    
+    mock_response = MagicMock()
+    mock_response.choices = [MagicMock()]
+    mock_response.choices[0].message.content = '{"job_title": "高级Python开发工程师"}'
+    client._call_api = AsyncMock(return_value=mock_response)
+    
+    first = await client.generate_json(f"请解析JD：\n{JD_TEXT}", similarity_text=JD_TEXT)
+    second = await client.generate_json(
+        f"请解析JD：\n{JD_TEXT_REUPLOADED}", similarity_text=JD_TEXT_REUPLOADED
+    )
+    third = await client.generate_json(
+        f"请解析JD：\n{OTHER_JD_TEXT}", similarity_text=OTHER_JD_TEXT
+    )
+    
+    assert first == second
+    assert third == first  # mock返回相同内容，但应调用了API
+    assert client._call_api.call_count == 2
+    
+    stats = await client.get_cache_stats()
+    assert stats["near_duplicate_hits"] == 1
+    assert stats["near_duplicate"]["lookups"] == 3
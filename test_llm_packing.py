@@ -0,0 +1,200 @@
+"""测试多条目提示词打包"""
+
+import asyncio
+import json
+import re
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from src.core.llm_packing import (
+    PackItem,
+    PromptPacker,
+    build_packed_prompt,
+    compose_item_prompt,
+    split_packed_response
+)
+from src.core.llm_rate_limiter import LLMPriority, llm_priority_scope
+
+
+INSTRUCTION = "请解析以下岗位JD，返回JSON：{\"job_title\": \"职位名称\"}"
+
+
+def make_response(content):
+    response = MagicMock()
+    response.choices = [MagicMock()]
+    response.choices[0].message.content = content
+    return response
+
+
+def fake_llm(drop_ids=()):
+    """按提示词返回打包（JSON数组）或单条响应，drop_ids中的条目在打包响应中缺失"""
+    async def call_api(messages, **kwargs):
+        prompt = messages[-1]["content"]
+        sections = re.findall(r"【ID: (item_\d+)】\n(.+)", prompt)
+        if sections:
+            return make_response(json.dumps([
+                {"id": item_id, "job_title": text.strip()}
+                for item_id, text in sections if item_id not in drop_ids
+            ], ensure_ascii=False))
+        text = prompt.split("岗位JD:\n", 1)[1].strip()
+        return make_response(json.dumps({"job_title": text}, ensure_ascii=False))
+    return AsyncMock(side_effect=call_api)
+
+
+def make_client():
+    from src.core.llm_client import DeepSeekR1Client
+    from src.core.llm_cache import create_memory_cache
+    
+    client = DeepSeekR1Client(cache=create_memory_cache())
+    client._call_api = fake_llm()
+    return client
+
+
+class TestPackingHelpers:
+    """测试打包提示词构建和响应拆分"""
+    
+    def test_packed_prompt_contains_ids_and_items(self):
+        """测试打包提示词包含指令、条目ID和条目数据"""
+        prompt = build_packed_prompt(INSTRUCTION, [("item_1", "JD一"), ("item_2", "JD二")], "岗位JD")
+        
+        assert prompt.startswith(INSTRUCTION)
+        assert "以下共有2个岗位JD" in prompt
+        assert prompt.index("【ID: item_1】\nJD一") < prompt.index("【ID: item_2】\nJD二")
+    
+    def test_item_prompt_puts_data_last(self):
+        """测试单条目提示词指令在前、数据在后"""
+        assert compose_item_prompt("指令", "数据", "岗位JD") == "指令\n\n岗位JD:\n数据\n"
+    
+    def test_split_array_and_wrapped_forms(self):
+        """测试拆分JSON数组、results包装和以ID为键的对象"""
+        ids = ["item_1", "item_2"]
+        expected = {"item_1": {"a": 1}, "item_2": {"a": 2}}
+        
+        assert split_packed_response([{"id": "item_2", "a": 2}, {"id": "item_1", "a": 1}], ids) == expected
+        assert split_packed_response({"results": [{"id": "item_1", "a": 1}, {"id": "item_2", "a": 2}]}, ids) == expected
+        assert split_packed_response({"item_1": {"a": 1}, "item_2": {"a": 2}}, ids) == expected
+    
+    def test_split_ignores_unknown_and_duplicate_ids(self):
+        """测试忽略未知ID和重复ID"""
+        data = [{"id": "item_1", "a": 1}, {"id": "item_1", "a": 9}, {"id": "item_9", "a": 3}, "bad"]
+        
+        assert split_packed_response(data, ["item_1", "item_2"]) == {"item_1": {"a": 1}}
+
+
+@pytest.mark.asyncio
+async def test_batch_generate_json_packs_and_falls_back():
+    """测试打包模式：一次调用处理多个条目，缺失的条目回退为单独调用"""
+    client = make_client()
+    client._call_api = fake_llm(drop_ids=("item_3",))
+    jds = [f"JD{i}" for i in range(5)]
+    
+    results = await client.batch_generate_json(
+        jds,
+        pack_instruction=INSTRUCTION,
+        pack_size=5,
+        pack_item_label="岗位JD",
+        validator=lambda r: bool(r.get("job_title"))
+    )
+    
+    assert results == [{"job_title": jd} for jd in jds]
+    assert client._call_api.call_count == 2, "1次打包调用 + 1次回退调用"
+    
+    stats = client.get_packing_stats()
+    assert stats["packed_calls"] == 1
+    assert stats["packed_items"] == 4
+    assert stats["fallbacks"] == 1
+
+
+@pytest.mark.asyncio
+async def test_packed_results_are_cached_per_item():
+    """测试打包结果按单条目提示词缓存，单独调用可直接命中"""
+    client = make_client()
+    
+    await client.generate_json_packed(INSTRUCTION, ["JD_A", "JD_B"], item_label="岗位JD", temperature=0.3)
+    assert client._call_api.call_count == 1
+    
+    single = await client.generate_json(compose_item_prompt(INSTRUCTION, "JD_B", "岗位JD"), temperature=0.3)
+    assert single == {"job_title": "JD_B"}
+    assert client._call_api.call_count == 1
+    
+    # 再次打包时全部命中缓存
+    await client.generate_json_packed(INSTRUCTION, ["JD_A", "JD_B"], item_label="岗位JD", temperature=0.3)
+    assert client._call_api.call_count == 1
+    assert client.get_packing_stats()["cache_hits"] == 2
+
+
+@pytest.mark.asyncio
+async def test_packed_call_failure_falls_back_to_single_calls():
+    """测试打包调用失败时全部回退为单独调用"""
+    client = make_client()
+    single = fake_llm()
+    
+    async def call_api(messages, **kwargs):
+        if "【ID:" in messages[-1]["content"]:
+            return make_response("抱歉，无法处理。")
+        return await single(messages=messages, **kwargs)
+    
+    client._call_api = AsyncMock(side_effect=call_api)
+    
+    results = await client.generate_json_packed(INSTRUCTION, ["JD_A", "JD_B"], item_label="岗位JD")
+    
+    assert results == [{"job_title": "JD_A"}, {"job_title": "JD_B"}]
+    assert client.get_packing_stats()["fallbacks"] == 2
+
+
+@pytest.mark.asyncio
+async def test_packer_coalesces_concurrent_batch_requests():
+    """测试批量优先级下并发的单条请求被合并为一次调用"""
+    client = make_client()
+    client.packer = PromptPacker(client, pack_size=3, max_wait=0.05)
+    
+    async def parse(jd):
+        pack = PackItem(INSTRUCTION, jd, "岗位JD")
+        return await client.generate_json(pack.prompt, temperature=0.3, pack=pack)
+    
+    with llm_priority_scope(LLMPriority.BATCH, batch_id="batch_1"):
+        results = await asyncio.gather(*[parse(f"JD{i}") for i in range(4)])
+    
+    assert results == [{"job_title": f"JD{i}"} for i in range(4)]
+    # 前3个凑满立即发出，第4个等待窗口结束后单独发出
+    assert client._call_api.call_count == 2
+    assert client.get_packing_stats()["packed_items"] == 3
+
+
+@pytest.mark.asyncio
+async def test_interactive_requests_are_not_packed():
+    """测试交互式请求不等待凑包"""
+    client = make_client()
+    client.packer = PromptPacker(client, pack_size=3, max_wait=10)
+    
+    pack = PackItem(INSTRUCTION, "JD_A", "岗位JD")
+    result = await asyncio.wait_for(client.generate_json(pack.prompt, pack=pack), timeout=1)
+    
+    assert result == {"job_title": "JD_A"}
+    assert client.get_packing_stats()["packed_calls"] == 0
+
+
+@pytest.mark.asyncio
+async def test_standard_evaluation_model_uses_packing():
+    """测试StandardEvaluationModel批量评估时打包"""
+    from src.agents.evaluator_agent import StandardEvaluationModel
+    
+    client = make_client()
+    client.packer = PromptPacker(client, pack_size=2, max_wait=0.05)
+    scores = {"dimension_scores": {"完整性": 80, "清晰度": 70, "专业性": 90}, "overall_score": 80}
+    
+    async def call_api(messages, **kwargs):
+        ids = re.findall(r"【ID: (item_\d+)】", messages[-1]["content"])
+        return make_response(json.dumps([{"id": item_id, **scores} for item_id in ids], ensure_ascii=False))
+    
+    client._call_api = AsyncMock(side_effect=call_api)
+    model = StandardEvaluationModel()
+    
+    with llm_priority_scope(LLMPriority.BATCH):
+        results = await asyncio.gather(
+            model.evaluate({"job_title": "后端工程师"}, client),
+            model.evaluate({"job_title": "财务经理"}, client)
+        )
+    
+    assert client._call_api.call_count == 1
+    assert all(r["weighted_score"] == pytest.approx(80.0) for r in results)
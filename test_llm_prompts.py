@@ -0,0 +1,255 @@
+"""测试提示词构建（静态前缀在前、可变数据在后）和服务端缓存命中统计"""
+
+import os
+import pytest
+import httpx
+from types import SimpleNamespace
+from unittest.mock import Mock, AsyncMock
+
+from src.core.llm_prompts import PromptHistory, PromptRegistry, PromptTemplate, build_prompt, prompt_registry
+from src.core.llm_packing import compose_item_prompt
+from src.agents.evaluator_agent import (
+    StandardEvaluationModel,
+    MercerIPEModel,
+    FactorComparisonModel,
+    TAG_ANALYSIS_TEMPLATE,
+    INTEGRATION_TEMPLATE
+)
+from src.agents.parser_agent import ParserAgent, PARSE_TEMPLATE, CLASSIFICATION_TEMPLATE
+from src.agents.matcher_agent import MATCH_TEMPLATE
+from src.agents.optimizer_agent import OPTIMIZE_TEMPLATE
+from src.agents.questionnaire_agent import QUESTIONNAIRE_TEMPLATE
+
+
+JD_A = {"job_title": "Python后端工程师", "required_skills": ["Python", "Django"]}
+JD_B = {"job_title": "数据分析师", "required_skills": ["SQL", "Excel"]}
+
+
+def common_prefix_length(a: str, b: str) -> int:
+    return len(os.path.commonprefix([a, b]))
+
+
+def test_template_renders_static_prefix_first():
+    """测试静态指令和返回格式在前，数据段按顺序在后"""
+    template = PromptTemplate(instruction="请评估以下岗位。", schema='{"score": 80}', notes="注意：只返回JSON")
+    prompt = template.render(("分类树", "技术类"), ("岗位信息", "Python工程师"), ("空数据段", ""))
+    
+    assert prompt.startswith(template.prefix)
+    assert template.prefix == '请评估以下岗位。\n\n返回JSON格式：\n{"score": 80}\n\n注意：只返回JSON'
+    assert prompt.index("分类树") < prompt.index("岗位信息")
+    assert prompt.endswith("岗位信息:\nPython工程师\n")
+    assert "空数据段" not in prompt
+
+
+def test_pack_item_matches_render():
+    """测试可打包请求的单条提示词与render一致，条目数据在最后"""
+    template = PromptTemplate(instruction="请解析以下岗位JD。", schema='{"job_title": ""}')
+    context = (("自定义字段", '{"team_size": "团队规模"}'),)
+    pack = template.pack_item("招聘Python工程师", "岗位JD", context=context)
+    
+    assert pack.prompt == template.render(*context, ("岗位JD", "招聘Python工程师"))
+    assert pack.prompt == compose_item_prompt(pack.instruction, "招聘Python工程师", "岗位JD")
+    assert build_prompt("指令") == "指令\n"
+
+
+@pytest.mark.parametrize("template", [
+    StandardEvaluationModel.TEMPLATE,
+    MercerIPEModel.TEMPLATE,
+    FactorComparisonModel.TEMPLATE,
+    TAG_ANALYSIS_TEMPLATE,
+    INTEGRATION_TEMPLATE,
+    PARSE_TEMPLATE,
+    CLASSIFICATION_TEMPLATE,
+    MATCH_TEMPLATE
+])
+def test_agent_templates_contain_no_placeholders(template):
+    """测试Agent模板的静态前缀不含未渲染的占位符，且包含返回格式"""
+    assert "返回JSON格式" in template.prefix
+    assert "{{" not in template.prefix
+    assert "jd_data" not in template.prefix
+
+
+@pytest.mark.asyncio
+async def test_agent_prompts_share_prefix_across_jds():
+    """测试不同岗位的评估、解析和分类提示词共享完整的静态前缀"""
+    captured = []
+    
+    class CaptureClient:
+        async def generate_json(self, prompt, **kwargs):
+            captured.append(prompt)
+            return {"dimension_scores": {}, "overall_score": 0}
+    
+    model = MercerIPEModel()
+    model.dimensions = []
+    await model.evaluate(JD_A, CaptureClient())
+    await model.evaluate(JD_B, CaptureClient())
+    assert common_prefix_length(*captured) >= len(MercerIPEModel.TEMPLATE.prefix)
+    assert captured[0].rstrip().endswith("}")  # 岗位信息在最后
+    
+    server = Mock()
+    server.register_agent = AsyncMock()
+    parser = ParserAgent(mcp_server=server, llm_client=CaptureClient())
+    custom_fields = {"team_size": "团队规模"}
+    prompt_a = parser._build_parse_prompt("招聘Python工程师", custom_fields)
+    prompt_b = parser._build_parse_prompt("招聘数据分析师", custom_fields)
+    assert prompt_a.endswith("岗位JD:\n招聘Python工程师\n")
+    assert common_prefix_length(prompt_a, prompt_b) > prompt_a.index("team_size")
+    
+    categories = [
+        {"id": "tech", "name": "技术类", "level": 1, "parent_id": None},
+        {"id": "dev", "name": "研发", "level": 2, "parent_id": "tech"},
+        {"id": "backend", "name": "后端", "level": 3, "parent_id": "dev"}
+    ]
+    classify_a = parser._build_classification_prompt(JD_A, categories, {})
+    classify_b = parser._build_classification_prompt(JD_B, categories, {})
+    assert common_prefix_length(classify_a, classify_b) > classify_a.index("三级: 后端")
+    assert classify_a.rstrip().endswith("必备技能: Python, Django")
+
+
+def test_cached_tokens_from_usage():
+    """测试读取DeepSeek和OpenAI两种格式的缓存命中token数"""
+    from src.core.llm_client import _get_cached_tokens
+    
+    assert _get_cached_tokens(SimpleNamespace(prompt_cache_hit_tokens=120, prompt_tokens=200)) == 120
+    assert _get_cached_tokens(SimpleNamespace(prompt_tokens_details=SimpleNamespace(cached_tokens=64))) == 64
+    assert _get_cached_tokens(SimpleNamespace(prompt_tokens_details={"cached_tokens": 32})) == 32
+    assert _get_cached_tokens(SimpleNamespace(prompt_tokens=200)) is None
+    assert _get_cached_tokens(None) is None
+
+
+@pytest.mark.asyncio
+async def test_prefix_cache_hits_recorded_per_call():
+    """测试同一模板的第二次调用命中服务端前缀缓存，并计入token统计"""
+    from src.core.llm_cache import create_memory_cache
+    from src.core.llm_client import DeepSeekR1Client
+    from src.mock_llm import MockLLMConfig, create_mock_llm_app
+    
+    app = create_mock_llm_app(MockLLMConfig(latency_ms=0, latency_distribution="fixed"))
+    client = DeepSeekR1Client(
+        api_key="test",
+        base_url="http://mock/v1",
+        cache=create_memory_cache(),
+        enable_cache=False,
+        http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=app))
+    )
+    
+    try:
+        await MercerIPEModel().evaluate(JD_A, client)
+        first = client.get_token_stats()
+        assert first["cached_prompt_tokens"] == 0
+        
+        await MercerIPEModel().evaluate(JD_B, client)
+        second = client.get_token_stats()
+    finally:
+        await client.close()
+        await client.http_client.aclose()
+    
+    cached = second["cached_prompt_tokens"]
+    assert cached > 0
+    # 命中部分至少覆盖系统消息和模板的静态前缀（按64字符的块对齐）
+    assert cached >= second["prompt_tokens"] - first["prompt_tokens"] - 40
+    assert second["prompt_cache_hit_rate"] != "0.00%"
+    assert app.state.stats.get_stats()["cached_prompt_tokens"] == cached
+
+
+V1 = PromptTemplate(instruction="请评估以下岗位。", schema='{"score": 80}', template_id="test.evaluate", version="1")
+V2 = PromptTemplate(instruction="请严格评估以下岗位。", schema='{"score": 80}', template_id="test.evaluate", version="2")
+
+
+def test_registry_versions_and_prefix_match():
+    """测试按ID和版本注册模板，按静态前缀识别提示词所属的版本"""
+    registry = PromptRegistry()
+    registry.register(V1)
+    registry.register(V1)  # 相同内容重复注册无影响
+    registry.register(V2)
+    
+    assert registry.versions("test.evaluate") == ["1", "2"]
+    assert registry.get("test.evaluate") is V2
+    assert registry.get("test.evaluate", "1") is V1
+    assert registry.match(V1.render(("岗位信息", "A"))) is V1
+    assert registry.match(V2.render(("岗位信息", "A"))) is V2
+    assert registry.match("其他提示词") is None
+    
+    with pytest.raises(ValueError):
+        registry.register(PromptTemplate(instruction="改了内容", template_id="test.evaluate", version="1"))
+    with pytest.raises(ValueError):
+        registry.register(PromptTemplate(instruction="没有ID"))
+
+
+def test_agent_templates_registered():
+    """测试Agent模板都已注册，ID唯一"""
+    templates = [
+        PARSE_TEMPLATE, CLASSIFICATION_TEMPLATE, MATCH_TEMPLATE, MercerIPEModel.TEMPLATE, INTEGRATION_TEMPLATE,
+        OPTIMIZE_TEMPLATE, QUESTIONNAIRE_TEMPLATE
+    ]
+    assert len({template.template_id for template in templates}) == len(templates)
+    for template in templates:
+        assert prompt_registry.get(template.template_id, template.version) is template
+    assert PARSE_TEMPLATE.ref == "parser.parse@1"
+
+
+def test_rebase_and_history_top():
+    """测试历史输入按调用次数排序，并可按新版本重新渲染"""
+    prompt_a = V1.render(("岗位信息", "A"))
+    prompt_b = V1.render(("岗位信息", "B"))
+    assert V2.rebase(prompt_a, V1) == V2.render(("岗位信息", "A"))
+    assert V2.rebase("其他提示词", V1) is None
+    
+    history = PromptHistory(max_entries_per_template=2)
+    history.record(V1, prompt_a, temperature=0.3)
+    history.record(V1, prompt_b, temperature=0.3)
+    history.record(V1, prompt_b, temperature=0.3)
+    history.record(V1, V1.render(("岗位信息", "C")), temperature=0.3)  # 淘汰调用次数最少的A
+    
+    top = history.top("test.evaluate", 5)
+    assert [entry.prompt for entry in top] == [prompt_b, V1.render(("岗位信息", "C"))]
+    assert top[0].count == 2 and top[0].params == {"temperature": 0.3}
+    assert history.top("test.evaluate", 5, exclude_version="1") == []
+    assert history.get_stats()["templates"]["test.evaluate"]["calls_by_version"] == {"1": 3}
+
+
+def test_template_version_changes_cache_key():
+    """测试模板版本写入缓存键，未使用模板的提示词缓存键不变"""
+    from src.core.llm_cache import LLMCache
+    
+    params = dict(prompt="提示词", model="m", temperature=0.3, max_tokens=100)
+    assert LLMCache.generate_cache_key(**params) == LLMCache.generate_cache_key(**params, template=None)
+    assert LLMCache.generate_cache_key(**params, template="t@1") != LLMCache.generate_cache_key(**params, template="t@2")
+
+
+@pytest.mark.asyncio
+async def test_warm_template_version_from_history():
+    """测试按历史输入离线预热新版本：常见输入按新版本缓存，上线后直接命中"""
+    from src.core.llm_cache import LLMCache, LRUMemoryCache
+    from src.core.llm_client import DeepSeekR1Client
+    from src.core.performance import CacheWarmer
+    
+    cache = LLMCache(LRUMemoryCache())
+    client = DeepSeekR1Client(enable_cache=True, cache=cache)
+    client.prompt_registry = PromptRegistry()
+    client.prompt_registry.register(V1)
+    client._call_api = AsyncMock(return_value=SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content='{"score": 80}'))], usage=None
+    ))
+    
+    for jd in ["A", "A", "A", "B", "B", "C"]:
+        await client.generate_json(V1.render(("岗位信息", jd)), temperature=0.3)
+    assert client._call_api.call_count == 3
+    v1_key = client.build_cache_key(V1.render(("岗位信息", "A")), temperature=0.3)
+    assert v1_key != client.build_cache_key(V1.render(("岗位信息", "A")), temperature=0.4)
+    
+    stats = await CacheWarmer(cache).warm_template_version(client, V2, top_n=2)
+    assert stats == {"candidates": 2, "warmed": 2, "skipped": 0, "unmatched": 0, "failed": 0}
+    assert client._call_api.call_count == 5
+    assert client.prompt_registry.get("test.evaluate") is V2
+    
+    # 新版本上线：预热过的常见输入命中缓存，且与旧版本的缓存键不同
+    await client.generate_json(V2.render(("岗位信息", "A")), temperature=0.3)
+    assert client._call_api.call_count == 5
+    assert client.build_cache_key(V2.render(("岗位信息", "A")), temperature=0.3) != v1_key
+    
+    assert await CacheWarmer(cache).warm_template_version(client, V2, top_n=2) == {
+        "candidates": 2, "warmed": 0, "skipped": 2, "unmatched": 0, "failed": 0
+    }
+    assert await client.invalidate_cache_tag("template:test.evaluate@1") == 3
+    assert client.get_prompt_stats()["history"]["templates"]["test.evaluate"]["calls_by_version"] == {"1": 6, "2": 3}
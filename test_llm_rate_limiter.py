@@ -0,0 +1,240 @@
+"""测试LLM客户端限流（令牌桶 + AIMD自适应并发）"""
+
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from src.core.llm_rate_limiter import (
+    TokenBucket,
+    AdaptiveConcurrencyLimiter,
+    LLMRateLimiter,
+    LLMPriority,
+    llm_priority_scope,
+    get_current_priority
+)
+from src.core.llm_tokens import estimate_tokens
+
+
+class TestTokenBucket:
+    """测试令牌桶"""
+    
+    @pytest.mark.asyncio
+    async def test_burst_then_wait(self):
+        """测试突发额度用完后按速率等待"""
+        bucket = TokenBucket(per_minute=600, capacity=2)  # 每秒10个令牌
+        
+        assert await bucket.acquire() < 0.01
+        assert await bucket.acquire() < 0.01
+        waited = await bucket.acquire()
+        
+        assert 0.05 <= waited < 0.5, "令牌不足时应等待补充"
+    
+    @pytest.mark.asyncio
+    async def test_oversized_request_not_blocked_forever(self):
+        """测试超过容量的请求在桶满时放行"""
+        bucket = TokenBucket(per_minute=6000, capacity=10)
+        
+        await asyncio.wait_for(bucket.acquire(50), timeout=1.0)
+        assert bucket.tokens < 0, "超额部分记为负债"
+    
+    def test_adjust_refunds_unused_tokens(self):
+        """测试按实际用量退还令牌"""
+        bucket = TokenBucket(per_minute=1000)
+        bucket.tokens = 100
+        bucket.adjust(-50)
+        
+        assert bucket.tokens >= 150
+
+
+class TestAdaptiveConcurrency:
+    """测试AIMD自适应并发"""
+    
+    def test_overload_decreases_and_success_recovers(self):
+        """测试429时乘性减少，成功时加性恢复"""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=8, min_limit=1, cooldown=0)
+        
+        limiter.on_overload()
+        assert limiter.current_limit == 4
+        limiter.on_overload()
+        assert limiter.current_limit == 2
+        
+        for _ in range(40):
+            limiter.on_success()
+        assert limiter.current_limit == 8, "成功后应逐步恢复到上限"
+    
+    def test_cooldown_limits_decreases(self):
+        """测试冷却时间内只减少一次"""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=8, cooldown=60)
+        
+        for _ in range(5):
+            limiter.on_overload()
+        
+        assert limiter.current_limit == 4
+        assert limiter.get_stats()["decreases"] == 1
+    
+    @pytest.mark.asyncio
+    async def test_queue_depth_and_fifo(self):
+        """测试超过并发上限时排队"""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1)
+        order = []
+        
+        await limiter.acquire()
+        
+        async def worker(i):
+            await limiter.acquire()
+            order.append(i)
+            limiter.release()
+        
+        tasks = [asyncio.create_task(worker(i)) for i in range(3)]
+        await asyncio.sleep(0)
+        assert limiter.queue_depth == 3
+        
+        limiter.release()
+        await asyncio.gather(*tasks)
+        
+        assert order == [0, 1, 2]
+        assert limiter.in_flight == 0
+
+
+class TestPriorityScheduling:
+    """测试优先级调度"""
+    
+    @pytest.mark.asyncio
+    async def test_interactive_overtakes_queued_batch(self):
+        """测试交互式请求越过排队中的批量请求"""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1)
+        order = []
+        
+        await limiter.acquire(LLMPriority.BATCH, "b1")
+        
+        async def worker(name, priority, batch_id=None):
+            await limiter.acquire(priority, batch_id)
+            order.append(name)
+            limiter.release(priority)
+        
+        tasks = [
+            asyncio.create_task(worker("batch", LLMPriority.BATCH, "b1")),
+            asyncio.create_task(worker("background", LLMPriority.BACKGROUND)),
+            asyncio.create_task(worker("interactive", LLMPriority.INTERACTIVE))
+        ]
+        await asyncio.sleep(0)
+        assert limiter.get_stats()["queue_depth_by_priority"] == {
+            "interactive": 1, "batch": 1, "background": 1
+        }
+        
+        limiter.release(LLMPriority.BATCH)
+        await asyncio.gather(*tasks)
+        
+        assert order == ["interactive", "batch", "background"]
+    
+    @pytest.mark.asyncio
+    async def test_reserved_capacity_for_interactive(self):
+        """测试批量请求无法占用预留给交互式请求的并发"""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=3, reserved_interactive=1)
+        
+        await limiter.acquire(LLMPriority.BATCH, "b1")
+        await limiter.acquire(LLMPriority.BATCH, "b1")
+        
+        blocked = asyncio.create_task(limiter.acquire(LLMPriority.BATCH, "b1"))
+        await asyncio.sleep(0)
+        assert not blocked.done(), "批量请求不应占用预留并发"
+        
+        await asyncio.wait_for(limiter.acquire(LLMPriority.INTERACTIVE), timeout=0.5)
+        assert limiter.in_flight == 3
+        
+        limiter.release(LLMPriority.BATCH)
+        await asyncio.wait_for(blocked, timeout=0.5)
+    
+    @pytest.mark.asyncio
+    async def test_round_robin_across_batches(self):
+        """测试多个批次轮转调度，大批次不会独占并发"""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1)
+        order = []
+        
+        await limiter.acquire(LLMPriority.BATCH, "big")
+        
+        async def worker(batch_id):
+            await limiter.acquire(LLMPriority.BATCH, batch_id)
+            order.append(batch_id)
+            limiter.release(LLMPriority.BATCH)
+        
+        tasks = [asyncio.create_task(worker("big")) for _ in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(worker("small")))
+        await asyncio.sleep(0)
+        assert limiter.get_stats()["active_batches"] == 2
+        
+        limiter.release(LLMPriority.BATCH)
+        await asyncio.gather(*tasks)
+        
+        assert order.index("small") == 1, "小批次应在大批次的第二个请求前得到调度"
+    
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_is_removed(self):
+        """测试取消的等待者不会占用许可"""
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1)
+        await limiter.acquire()
+        
+        waiter = asyncio.create_task(limiter.acquire(LLMPriority.BATCH, "b1"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        
+        limiter.release()
+        assert limiter.in_flight == 0
+        assert limiter.queue_depth == 0
+    
+    @pytest.mark.asyncio
+    async def test_priority_scope_applies_to_slot(self):
+        """测试调用链优先级作用于限流许可"""
+        rate_limiter = LLMRateLimiter(max_concurrent=2)
+        
+        assert get_current_priority() == (LLMPriority.INTERACTIVE, None)
+        with llm_priority_scope("batch", batch_id="batch_1"):
+            assert get_current_priority() == (LLMPriority.BATCH, "batch_1")
+            async with rate_limiter.slot():
+                stats = rate_limiter.get_stats()["concurrency"]
+                assert stats["in_flight_by_priority"]["batch"] == 1
+        
+        assert get_current_priority() == (LLMPriority.INTERACTIVE, None)
+        assert rate_limiter.get_stats()["concurrency"]["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_client_records_overload_and_exposes_stats():
+    """测试客户端在429时降低并发并暴露限流统计"""
+    from openai import RateLimitError
+    from src.core.llm_client import DeepSeekR1Client, LLMRateLimitError
+    from src.core.llm_cache import create_memory_cache
+    
+    client = DeepSeekR1Client(
+        cache=create_memory_cache(),
+        rate_limiter=LLMRateLimiter(max_concurrent=4, tokens_per_minute=100000)
+    )
+    client.rate_limiter.concurrency.cooldown = 0
+    
+    error = RateLimitError("rate limited", response=MagicMock(status_code=429), body=None)
+    client.client.chat.completions.create = AsyncMock(side_effect=error)
+    
+    with pytest.raises(LLMRateLimitError):
+        await client._call_api.retry_with(stop=lambda state: True)(
+            client,
+            messages=[],
+            model="deepseek-chat",
+            temperature=0.7,
+            max_tokens=100
+        )
+    
+    stats = client.get_rate_limit_stats()
+    assert stats["overloads"] == 1
+    assert stats["concurrency"]["limit"] == 2
+    assert stats["queue_depth"] == 0
+    assert stats["tokens_per_minute"]["per_minute"] == 100000
+
+
+def test_estimate_tokens():
+    """测试token估算（中文约0.6 token/字符，其他约0.3 token/字符）"""
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("岗位职责") == 3
+    assert estimate_tokens("Python developer") == 5
@@ -0,0 +1,234 @@
+"""测试跨进程LLM请求去重（Single-Flight）"""
+
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from src.core.llm_single_flight import RedisSingleFlight, SingleFlightError
+
+
+class FakePubSub:
+    """最小化的异步PubSub替身"""
+    
+    def __init__(self, broker):
+        self.broker = broker
+        self.queue = asyncio.Queue()
+        self.channels = set()
+    
+    async def subscribe(self, channel):
+        self.channels.add(channel)
+        self.broker.subscribers.append(self)
+    
+    async def unsubscribe(self, channel):
+        self.channels.discard(channel)
+    
+    async def close(self):
+        if self in self.broker.subscribers:
+            self.broker.subscribers.remove(self)
+    
+    async def get_message(self, ignore_subscribe_messages=False, timeout=0.0):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class FakeRedis:
+    """最小化的异步Redis替身（多个进程共享同一实例）"""
+    
+    def __init__(self):
+        self.store = {}
+        self.subscribers = []
+    
+    async def set(self, key, value, ex=None, px=None, nx=False):
+        if nx and key in self.store:
+            return None
+        self.store[key] = value
+        return True
+    
+    async def get(self, key):
+        return self.store.get(key)
+    
+    async def exists(self, key):
+        return 1 if key in self.store else 0
+    
+    async def delete(self, *keys):
+        for key in keys:
+            self.store.pop(key, None)
+    
+    async def eval(self, script, numkeys, key, token):
+        if self.store.get(key) == token:
+            del self.store[key]
+            return 1
+        return 0
+    
+    async def publish(self, channel, message):
+        for subscriber in list(self.subscribers):
+            if channel in subscriber.channels:
+                subscriber.queue.put_nowait({"type": "message", "data": message})
+    
+    def pubsub(self):
+        return FakePubSub(self)
+
+
+@pytest.mark.asyncio
+async def test_single_call_across_processes():
+    """测试多个进程的相同请求只执行一次计算"""
+    redis_client = FakeRedis()
+    workers = [RedisSingleFlight(redis_client, poll_interval=0.05) for _ in range(4)]
+    
+    calls = 0
+    
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.1)
+        return "解析结果"
+    
+    results = await asyncio.gather(*[w.run("same_key", compute) for w in workers])
+    
+    assert results == ["解析结果"] * 4
+    assert calls == 1, "相同请求应只调用一次API"
+    assert sum(w.get_stats()["leader_calls"] for w in workers) == 1
+    assert sum(w.get_stats()["waiter_hits"] for w in workers) == 3
+    assert not any(k.startswith("llm_sf:lock:") for k in redis_client.store), "租约应被释放"
+
+
+@pytest.mark.asyncio
+async def test_leader_error_propagates_to_waiters():
+    """测试leader失败时waiter收到异常"""
+    redis_client = FakeRedis()
+    leader = RedisSingleFlight(redis_client, poll_interval=0.05)
+    waiter = RedisSingleFlight(redis_client, poll_interval=0.05)
+    
+    async def failing():
+        await asyncio.sleep(0.1)
+        raise RuntimeError("rate limited")
+    
+    results = await asyncio.gather(
+        leader.run("key", failing),
+        waiter.run("key", failing),
+        return_exceptions=True
+    )
+    
+    assert isinstance(results[0], RuntimeError)
+    assert isinstance(results[1], SingleFlightError)
+
+
+@pytest.mark.asyncio
+async def test_expired_lease_is_taken_over():
+    """测试leader崩溃（租约过期无结果）后waiter接管"""
+    redis_client = FakeRedis()
+    redis_client.store["llm_sf:lock:key"] = "crashed_leader"
+    worker = RedisSingleFlight(redis_client, poll_interval=0.05)
+    
+    async def expire_lease():
+        await asyncio.sleep(0.1)
+        del redis_client.store["llm_sf:lock:key"]
+    
+    async def compute():
+        return "新结果"
+    
+    expiry = asyncio.create_task(expire_lease())
+    result = await worker.run("key", compute)
+    await expiry
+    
+    assert result == "新结果"
+    assert worker.get_stats()["lease_takeovers"] == 1
+
+
+@pytest.mark.asyncio
+async def test_redis_unavailable_falls_back_to_local():
+    """测试Redis不可用时回退为本地计算"""
+    redis_client = MagicMock()
+    redis_client.set = AsyncMock(side_effect=ConnectionError("redis down"))
+    worker = RedisSingleFlight(redis_client)
+    
+    async def compute():
+        return "本地结果"
+    
+    assert await worker.run("key", compute) == "本地结果"
+    assert worker.get_stats()["fallbacks"] == 1
+
+
+@pytest.mark.asyncio
+async def test_llm_client_uses_single_flight():
+    """测试LLM客户端通过single-flight共享结果"""
+    from src.core.llm_client import DeepSeekR1Client
+    from src.core.llm_cache import create_memory_cache
+    
+    redis_client = FakeRedis()
+    
+    mock_response = MagicMock()
+    mock_response.choices = [MagicMock()]
+    mock_response.choices[0].message.content = "测试响应"
+    
+    async def slow_call(**kwargs):
+        await asyncio.sleep(0.1)
+        return mock_response
+    
+    clients = []
+    for _ in range(2):
+        client = DeepSeekR1Client(
+            cache=create_memory_cache(),
+            single_flight=RedisSingleFlight(redis_client, poll_interval=0.05)
+        )
+        client._call_api = AsyncMock(side_effect=slow_call)
+        clients.append(client)
+    
+    results = await asyncio.gather(*[c.generate("相同的JD") for c in clients])
+    
+    assert results == ["测试响应", "测试响应"]
+    assert sum(c._call_api.call_count for c in clients) == 1
+    
+    stats = await clients[0].get_cache_stats()
+    assert stats["single_flight"]["mode"] == "redis"
+
+
+@pytest.mark.asyncio
+async def test_late_worker_reuses_previous_result():
+    """测试租约释放后晚到的进程复用上一轮的成功结果，不再重复付费调用"""
+    redis_client = FakeRedis()
+    first = RedisSingleFlight(redis_client, poll_interval=0.05)
+    late = RedisSingleFlight(redis_client, poll_interval=0.05)
+    
+    calls = 0
+    
+    async def compute():
+        nonlocal calls
+        calls += 1
+        return "解析结果"
+    
+    assert await first.run("key", compute) == "解析结果"
+    assert await late.run("key", compute) == "解析结果"
+    
+    assert calls == 1
+    assert late.get_stats()["leader_calls"] == 0
+    assert late.get_stats()["result_hits"] == 1
+    assert "llm_sf:lock:key" not in redis_client.store
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_releases_lease_and_notifies_waiters():
+    """测试leader被取消时释放租约并广播失败，waiter无需等到租约过期"""
+    redis_client = FakeRedis()
+    leader = RedisSingleFlight(redis_client, poll_interval=0.05)
+    waiter = RedisSingleFlight(redis_client, poll_interval=0.05, lease_ttl=60)
+    started = asyncio.Event()
+    
+    async def slow():
+        started.set()
+        await asyncio.sleep(10)
+        return "不会返回"
+    
+    leader_task = asyncio.create_task(leader.run("key", slow))
+    await started.wait()
+    waiter_task = asyncio.create_task(waiter.run("key", slow))
+    await asyncio.sleep(0.05)
+    leader_task.cancel()
+    
+    with pytest.raises(asyncio.CancelledError):
+        await leader_task
+    with pytest.raises(SingleFlightError):
+        await asyncio.wait_for(waiter_task, timeout=1)
+    assert "llm_sf:lock:key" not in redis_client.store
@@ -0,0 +1,198 @@
+"""测试token估算、提示词预算与用量统计"""
+
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from src.core.llm_tokens import (
+    TokenUsageTracker,
+    compact_json,
+    estimate_tokens,
+    llm_agent_scope,
+    render_for_prompt
+)
+
+
+JD_DATA = {
+    "job_title": "高级Python开发工程师",
+    "department": "技术部",
+    "responsibilities": ["负责后端系统开发", "参与架构设计"],
+    "required_skills": ["Python", "FastAPI", "Redis"],
+    "preferred_skills": [],
+    "salary_range": None,
+    "raw_text": "高级Python开发工程师\n" + "岗位职责：负责公司核心业务系统的后端开发与维护。" * 400
+}
+
+
+class TestEstimateTokens:
+    """测试本地token估算"""
+    
+    def test_mixed_text(self):
+        """测试中英文混合文本"""
+        assert estimate_tokens("熟悉Python") == 3  # 2*0.6 + 6*0.3
+        assert estimate_tokens("，。") == 2  # 全角标点按中文计
+    
+    def test_compact_json_saves_tokens(self):
+        """测试紧凑序列化比indent=2节省token"""
+        pretty = json.dumps(JD_DATA, ensure_ascii=False, indent=2)
+        assert estimate_tokens(compact_json(JD_DATA)) < estimate_tokens(pretty)
+
+
+class TestRenderForPrompt:
+    """测试按预算渲染提示词数据"""
+    
+    def test_within_budget_only_compacts(self):
+        """测试未超预算时只去除空字段和缩进"""
+        data = {"job_title": "工程师", "skills": [], "salary": None}
+        assert render_for_prompt(data, 1000) == '{"job_title":"工程师"}'
+    
+    def test_truncates_raw_text_first(self):
+        """测试超出预算时优先截断raw_text，保留结构化字段"""
+        text = render_for_prompt(JD_DATA, 500)
+        result = json.loads(text)
+        
+        assert estimate_tokens(text) <= 500
+        assert result["responsibilities"] == JD_DATA["responsibilities"]
+        assert result["required_skills"] == JD_DATA["required_skills"]
+        assert result["raw_text"].endswith("（已截断）")
+        assert "preferred_skills" not in result
+    
+    def test_drops_raw_text_when_no_room(self):
+        """测试预算不足以保留raw_text时整个去除"""
+        data = {"job_title": "工程师", "raw_text": "岗位描述" * 100}
+        result = json.loads(render_for_prompt(data, 12))
+        
+        assert result == {"job_title": "工程师"}
+    
+    def test_halves_longest_field_as_last_resort(self):
+        """测试低价值字段处理后仍超预算时截断最长的字符串字段"""
+        data = {"job_title": "工程师", "responsibilities": ["负责后端开发" * 100, "编写文档"]}
+        text = render_for_prompt(data, 150)
+        result = json.loads(text)
+        
+        assert estimate_tokens(text) <= 150
+        assert result["responsibilities"][1] == "编写文档"
+        assert result["responsibilities"][0].endswith("（已截断）")
+    
+    def test_does_not_mutate_input(self):
+        """测试不修改传入的数据"""
+        original = json.dumps(JD_DATA, ensure_ascii=False)
+        render_for_prompt(JD_DATA, 100)
+        assert json.dumps(JD_DATA, ensure_ascii=False) == original
+
+
+class TestTokenUsageTracker:
+    """测试按Agent累计用量"""
+    
+    def test_per_agent_counters_and_cost(self):
+        """测试按调用链Agent统计token和费用"""
+        tracker = TokenUsageTracker(input_cost_per_million=2.0, output_cost_per_million=8.0)
+        
+        with llm_agent_scope("parser"):
+            tracker.record(100, prompt_tokens=120, completion_tokens=50)
+            tracker.record(80, completion_text="岗位职责")
+        tracker.record(10, agent="matcher", prompt_tokens=10, completion_tokens=10)
+        
+        stats = tracker.get_stats()
+        assert stats["agents"]["parser"]["calls"] == 2
+        assert stats["agents"]["parser"]["prompt_tokens"] == 200
+        assert stats["agents"]["parser"]["completion_tokens"] == 53
+        assert stats["agents"]["matcher"]["prompt_tokens"] == 10
+        assert stats["total_tokens"] == 273
+        assert stats["cost"] == pytest.approx((210 * 2.0 + 63 * 8.0) / 1_000_000)
+        assert stats["avg_estimation_error"] == 10  # (20 + 0) / 2次有实际用量的调用
+    
+    def test_cached_prompt_tokens_and_hit_rate(self):
+        """测试服务端缓存命中的输入token按缓存价格计费，命中率只统计返回了缓存用量的调用"""
+        tracker = TokenUsageTracker(
+            input_cost_per_million=2.0,
+            output_cost_per_million=8.0,
+            cached_input_cost_per_million=0.5
+        )
+        
+        usage = tracker.record(100, prompt_tokens=1000, completion_tokens=100, cached_prompt_tokens=768)
+        tracker.record(100, prompt_tokens=1000, completion_tokens=100, cached_prompt_tokens=0)
+        tracker.record(100, prompt_tokens=1000, completion_tokens=100)  # 未返回缓存用量
+        
+        assert usage["cached_prompt_tokens"] == 768
+        assert usage["cost"] == pytest.approx((232 * 2.0 + 768 * 0.5 + 100 * 8.0) / 1_000_000)
+        
+        stats = tracker.get_stats()
+        assert stats["cached_prompt_tokens"] == 768
+        assert stats["prompt_cache_hit_rate"] == "38.40%"
+
+
+def make_response(content, prompt_tokens=None, completion_tokens=None):
+    response = MagicMock()
+    response.choices = [MagicMock()]
+    response.choices[0].message.content = content
+    response.usage.prompt_tokens = prompt_tokens
+    response.usage.completion_tokens = completion_tokens
+    response.usage.total_tokens = None
+    return response
+
+
+def make_client():
+    from src.core.llm_client import DeepSeekR1Client
+    from src.core.llm_cache import create_memory_cache
+    
+    return DeepSeekR1Client(cache=create_memory_cache())
+
+
+@pytest.mark.asyncio
+async def test_client_records_usage_per_agent():
+    """测试客户端按Agent记录实际用量，缓存命中不计入"""
+    client = make_client()
+    client._call_api = AsyncMock(return_value=make_response('{"a": 1}', 300, 20))
+    
+    with llm_agent_scope("evaluator"):
+        await client.generate_json("评估岗位")
+        await client.generate_json("评估岗位")  # 命中缓存
+    
+    stats = client.get_token_stats()
+    assert stats["agents"]["evaluator"] == {
+        "calls": 1,
+        "prompt_tokens": 300,
+        "completion_tokens": 20,
+        "estimated_prompt_tokens": estimate_tokens("你是一个专业的HR岗位分析专家。") + estimate_tokens("评估岗位"),
+        "cached_prompt_tokens": 0,
+        "cost": pytest.approx((300 * 2.0 + 20 * 8.0) / 1_000_000)
+    }
+
+
+@pytest.mark.asyncio
+async def test_client_rejects_prompt_over_context_window(monkeypatch):
+    """测试超出上下文长度的提示词在调度前失败，超预算的提示词计数"""
+    from src.core.config import settings
+    from src.core.llm_client import LLMException
+    
+    monkeypatch.setattr(settings, "LLM_PROMPT_TOKEN_BUDGET", 100)
+    monkeypatch.setattr(settings, "LLM_CONTEXT_WINDOW_TOKENS", 1000)
+    client = make_client()
+    client._call_api = AsyncMock(return_value=make_response("ok"))
+    
+    await client.generate("岗位" * 100, max_tokens=100)
+    assert client.get_token_stats()["over_budget"] == 1
+    
+    with pytest.raises(LLMException):
+        await client.generate("岗位" * 1000, max_tokens=100)
+    assert client._call_api.call_count == 1
+    assert not client._pending_requests
+    assert client.rate_limiter.concurrency.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_mercer_model_prompt_is_compacted():
+    """测试MercerIPEModel提示词不再包含缩进JSON和完整raw_text"""
+    from src.agents.evaluator_agent import MercerIPEModel
+    
+    client = make_client()
+    scores = {"影响力": 80, "沟通": 80, "创新": 80, "知识技能": 80}
+    client._call_api = AsyncMock(return_value=make_response(json.dumps({"dimension_scores": scores})))
+    
+    await MercerIPEModel().evaluate(JD_DATA, client)
+    
+    prompt = client._call_api.call_args.kwargs["messages"][-1]["content"]
+    assert '\n  "job_title"' not in prompt
+    assert '"required_skills":["Python","FastAPI","Redis"]' in prompt
+    assert len(prompt) < len(JD_DATA["raw_text"])
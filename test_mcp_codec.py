@@ -0,0 +1,154 @@
+"""测试MCP消息编码层（可插拔编码、版本头和新旧Agent混合部署时的编码协商）"""
+
+import json
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+
+from src.mcp import codec as codec_module
+from src.mcp.agent import MCPAgent
+from src.mcp.codec import CodecError, available_codecs, resolve_codec
+from src.mcp.context import MCPContext, create_context
+from src.mcp.message import MCPMessage, create_notification_message, create_request_message
+from src.mcp.server import MCPServer
+from src.mcp.streams import RedisStreamsTransport
+from test_mcp_streams import FakeStreamsRedis, wait_until
+
+
+class FakeCodecRedis(FakeStreamsRedis):
+    """在FakeStreamsRedis上补充Agent注册信息和上下文的读写"""
+    
+    def __init__(self):
+        super().__init__()
+        self.hashes = {}
+        self.values = {}
+    
+    async def hset(self, name, mapping=None):
+        self.hashes.setdefault(name, {}).update(mapping or {})
+        return 1
+    
+    async def hget(self, name, key):
+        return self.hashes.get(name, {}).get(key)
+    
+    async def setex(self, name, ttl, value):
+        self.values[name] = value
+    
+    async def get(self, name):
+        return self.values.get(name)
+
+
+def make_server(redis_client, **options) -> MCPServer:
+    """创建已"连接"到FakeCodecRedis的Streams模式服务器"""
+    server = MCPServer(transport="streams", **options)
+    server.redis_client = redis_client
+    server.transport = RedisStreamsTransport(redis_client, block_ms=5)
+    return server
+
+
+def jd_message() -> MCPMessage:
+    return create_request_message(
+        "coordinator", "parser", "parse_jd",
+        {
+            "jd_text": "负责核心系统的设计与开发。" * 200,
+            "parsed": {"skills": ["Python", "Redis"], "scores": {"tech": 8.5}, "remote": None}
+        },
+        context_id="ctx-1",
+        metadata={"priority": 5}
+    )
+
+
+def latest_data(redis_client, stream):
+    return redis_client.streams[stream][-1][1]["data"]
+
+
+def test_codecs_roundtrip_with_header():
+    """测试每种可用编码往返一致，json为旧版格式，其他编码带版本和编码头"""
+    message = jd_message()
+    context = create_context("task-1", "jd_analysis", {"jd": {"title": "工程师"}})
+    
+    assert {"json", "orjson"} <= available_codecs()
+    for name in available_codecs():
+        encoded = message.encode(name)
+        if name == "json":
+            assert encoded == message.to_json()
+        else:
+            assert encoded.startswith(f"MCP/1 {name}\n")
+        assert MCPMessage.decode(encoded) == message
+        assert MCPMessage.decode(encoded.encode("utf-8")) == message
+        assert MCPContext.decode(context.encode(name)) == context
+
+
+def test_orjson_matches_pydantic_for_non_json_types():
+    """测试负载中有Decimal、bytes等orjson不直接支持的类型时，orjson编码与pydantic JSON一致"""
+    message = create_request_message(
+        "coordinator", "evaluator", "evaluate",
+        {"salary": Decimal("30000.50"), "raw": b"JD", "deadline": timedelta(days=7), "skills": ("Python",)}
+    )
+    body = message.encode("orjson").partition("\n")[2]
+    assert json.loads(body) == json.loads(message.to_json())
+    assert MCPMessage.decode(message.encode("orjson")).payload["salary"] == "30000.50"
+
+
+def test_legacy_data_and_unsupported_frames(monkeypatch):
+    """测试旧版JSON可直接解码，版本过新或编码不可用时报错，未安装的编码回退到json"""
+    message = jd_message()
+    assert MCPMessage.decode(message.to_json()) == message
+    
+    with pytest.raises(CodecError):
+        MCPMessage.decode("MCP/2 orjson\n{}")
+    with pytest.raises(CodecError):
+        MCPMessage.decode("MCP/1 bson\n{}")
+    with pytest.raises(ValueError):
+        resolve_codec("bson")
+    
+    monkeypatch.delitem(codec_module._CODECS, "orjson")
+    assert resolve_codec("orjson") == "json"
+    with pytest.raises(CodecError):
+        MCPMessage.decode("MCP/1 orjson\n" + message.to_json())
+
+
+@pytest.mark.asyncio
+async def test_negotiation_with_legacy_agents():
+    """测试协商：登记了编码的Agent收到orjson，旧版Agent、广播和上下文仍为JSON"""
+    redis_client = FakeCodecRedis()
+    received = []
+    parser = MCPAgent("parser", "parser", make_server(redis_client))
+    
+    async def handle(message):
+        received.append(message)
+    
+    parser.register_handler("parse_jd", handle)
+    await parser.start()
+    # 旧版Agent注册时没有codecs字段
+    await redis_client.hset("mcp:agent:legacy:info", mapping={"agent_type": "legacy"})
+    
+    sender = make_server(redis_client, codec="orjson")
+    try:
+        message = jd_message()
+        await sender.send_message(message)
+        assert latest_data(redis_client, "mcp:stream:parser").startswith("MCP/1 orjson\n")
+        await wait_until(lambda: received)
+        assert received[0] == message
+        
+        await sender.send_message(create_request_message("coordinator", "legacy", "ping", {"n": 1}))
+        legacy_data = latest_data(redis_client, "mcp:stream:legacy")
+        assert MCPMessage.from_json(legacy_data).payload == {"n": 1}
+        
+        await sender.send_message(create_notification_message("coordinator", "shutdown", {}))
+        assert not latest_data(redis_client, "mcp:stream:broadcast").startswith("MCP/")
+        
+        context = create_context("task-1", shared_data={"jd": "x"})
+        await sender.save_context(context)
+        assert MCPContext.from_json(redis_client.values[f"mcp:context:{context.context_id}"]) == context
+    finally:
+        await parser.stop()
+    
+    # 所有Agent升级后关闭协商
+    upgraded = make_server(redis_client, codec="orjson", codec_negotiation=False)
+    await upgraded.send_message(create_request_message("coordinator", "legacy", "ping", {"n": 2}))
+    assert latest_data(redis_client, "mcp:stream:legacy").startswith("MCP/1 orjson\n")
+    context = create_context("task-2", shared_data={"jd": "y"})
+    await upgraded.save_context(context)
+    assert redis_client.values[f"mcp:context:{context.context_id}"].startswith("MCP/1 orjson\n")
+    assert await upgraded.get_context(context.context_id) == context
@@ -0,0 +1,188 @@
+"""测试Pub/Sub消息分发器（只读取和解码一次、按通道路由、有界收件箱和并发限制）"""
+
+import asyncio
+import time
+import pytest
+
+from src.mcp.agent import MCPAgent
+from src.mcp.dispatcher import PubSubDispatcher
+from src.mcp.message import MCPMessage, create_request_message
+from src.mcp.server import MCPServer
+
+
+class FakePubSub:
+    """最小化的PubSub替身：listen()只能被一个协程迭代"""
+    
+    def __init__(self):
+        self.channels = set()
+        self.queue = asyncio.Queue()
+        self.listeners = 0
+    
+    async def subscribe(self, *channels):
+        self.channels.update(channels)
+    
+    async def unsubscribe(self, *channels):
+        self.channels.difference_update(channels)
+    
+    async def listen(self):
+        self.listeners += 1
+        assert self.listeners == 1, "PubSub连接被多个协程同时读取"
+        try:
+            while True:
+                yield await self.queue.get()
+        finally:
+            self.listeners -= 1
+    
+    async def close(self):
+        pass
+
+
+class FakePubSubRedis:
+    """只实现发布和Agent注册用到的命令"""
+    
+    def __init__(self):
+        self.pubsub_connection = FakePubSub()
+    
+    def pubsub(self):
+        return self.pubsub_connection
+    
+    async def publish(self, channel, data):
+        if channel in self.pubsub_connection.channels:
+            self.pubsub_connection.queue.put_nowait({"type": "message", "channel": channel, "data": data})
+    
+    async def sadd(self, *args):
+        return 1
+    
+    async def srem(self, *args):
+        return 1
+    
+    async def hset(self, *args, **kwargs):
+        return 1
+    
+    async def delete(self, *args):
+        return 1
+    
+    async def close(self):
+        pass
+
+
+def make_server(**dispatcher_options) -> MCPServer:
+    server = MCPServer(dispatcher_options=dispatcher_options)
+    server.redis_client = FakePubSubRedis()
+    return server
+
+
+async def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "等待超时"
+        await asyncio.sleep(0.005)
+
+
+@pytest.mark.asyncio
+async def test_each_message_decoded_once_and_routed_by_channel(monkeypatch):
+    """测试多个Agent时每条消息只解码一次，点对点消息只到接收者，广播不回到发送方"""
+    decoded = []
+    decode = MCPMessage.decode.__func__
+    
+    def counting_decode(cls, data):
+        decoded.append(data)
+        return decode(cls, data)
+    
+    monkeypatch.setattr(MCPMessage, "decode", classmethod(counting_decode))
+    
+    server = make_server()
+    await server.start()
+    received = []
+    agents = []
+    for agent_id in ("parser", "evaluator", "report", "coordinator"):
+        agent = MCPAgent(agent_id, agent_id, server)
+        
+        async def handle(message, agent_id=agent_id):
+            received.append((agent_id, message.action))
+        
+        agent.register_handler("parse_jd", handle)
+        agent.register_handler("refresh", handle)
+        agents.append(agent)
+        await agent.start()
+    try:
+        await server.send_message(create_request_message("api", "parser", "parse_jd", {}))
+        await agents[3].send_notification("refresh", {})
+        await wait_until(lambda: len(received) == 4)
+        stats = server.dispatcher.get_stats()
+    finally:
+        for agent in agents:
+            await agent.stop()
+        await server.stop()
+    
+    assert len(decoded) == 2
+    assert sorted(received) == [
+        ("evaluator", "refresh"), ("parser", "parse_jd"), ("parser", "refresh"), ("report", "refresh")
+    ]
+    assert stats["received"] == 2
+    assert stats["inboxes"]["parser"]["processed"] == 2
+    assert stats["inboxes"]["coordinator"]["delivered"] == 0
+
+
+@pytest.mark.asyncio
+async def test_bounded_inbox_drops_and_reports_depth():
+    """测试收件箱满时丢弃新消息并计数，慢Agent不影响其他Agent"""
+    dispatcher = PubSubDispatcher(inbox_size=2)
+    dispatcher.register("slow", ["mcp:agent:slow"])
+    dispatcher.register("fast", ["mcp:agent:fast"])
+    
+    for n in range(3):
+        await dispatcher.dispatch("mcp:agent:slow", create_request_message("api", "slow", "work", {"n": n}).to_json())
+    await dispatcher.dispatch("mcp:agent:fast", create_request_message("api", "fast", "work", {}).to_json())
+    await dispatcher.dispatch("mcp:agent:nobody", create_request_message("api", "nobody", "work", {}).to_json())
+    assert await dispatcher.dispatch("mcp:agent:slow", "not json") is None
+    
+    stats = dispatcher.get_stats()
+    assert stats["inboxes"]["slow"]["depth"] == 2
+    assert stats["inboxes"]["slow"]["high_water"] == 2
+    assert stats["inboxes"]["slow"]["dropped"] == 1
+    assert stats["inboxes"]["fast"]["depth"] == 1
+    assert stats["unrouted"] == 1
+    assert stats["decode_errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limit_and_responses_bypass_inbox():
+    """测试并发上限，处理器等待下游响应时响应不被收件箱阻塞"""
+    server = make_server()
+    await server.start()
+    running = {"now": 0, "peak": 0}
+    
+    parser = MCPAgent("parser", "parser", server)
+    evaluator = MCPAgent("evaluator", "evaluator", server, max_in_flight=2)
+    coordinator = MCPAgent("coordinator", "coordinator", server)
+    
+    async def evaluate(message):
+        running["now"] += 1
+        running["peak"] = max(running["peak"], running["now"])
+        parsed = await evaluator.send_request("parser", "parse_jd", {}, timeout=2)
+        await asyncio.sleep(0.02)
+        running["now"] -= 1
+        await evaluator.send_response(message, parsed.payload)
+    
+    async def parse(message):
+        await parser.send_response(message, {"ok": True})
+    
+    evaluator.register_handler("evaluate", evaluate)
+    parser.register_handler("parse_jd", parse)
+    for agent in (parser, evaluator, coordinator):
+        await agent.start()
+    try:
+        responses = await asyncio.gather(*[
+            coordinator.send_request("evaluator", "evaluate", {}, timeout=2) for _ in range(4)
+        ])
+        stats = server.dispatcher.get_stats()
+    finally:
+        for agent in (parser, evaluator, coordinator):
+            await agent.stop()
+        await server.stop()
+    
+    assert all(r.payload == {"ok": True} for r in responses)
+    assert running["peak"] == 2
+    assert stats["inboxes"]["evaluator"]["responses"] == 4
+    assert stats["inboxes"]["coordinator"]["responses"] == 4
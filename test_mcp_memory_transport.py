@@ -0,0 +1,168 @@
+"""测试MCP消息总线的进程内传输（按引用传递、请求-响应、通知、上下文存储和配置选择）"""
+
+import asyncio
+import time
+import pytest
+
+from src.mcp.agent import MCPAgent
+from src.mcp.context import create_context
+from src.mcp.message import MCPMessage, create_request_message
+from src.mcp.server import MCPServer, create_mcp_server_from_settings
+
+
+async def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "等待超时"
+        await asyncio.sleep(0.005)
+
+
+@pytest.fixture
+def no_json(monkeypatch):
+    """进程内传输不应编码或解码消息"""
+    def fail(*args, **kwargs):
+        raise AssertionError("message was serialized")
+    
+    monkeypatch.setattr(MCPMessage, "to_json", fail)
+    monkeypatch.setattr(MCPMessage, "from_json", classmethod(fail))
+    monkeypatch.setattr(MCPMessage, "encode", fail)
+    monkeypatch.setattr(MCPMessage, "decode", classmethod(fail))
+
+
+@pytest.mark.asyncio
+async def test_request_response_by_reference(no_json):
+    """测试请求和响应按引用传递，处理器等待下游响应时不阻塞回复"""
+    server = MCPServer(transport="memory")
+    await server.start()
+    payload = {"jd_text": "x" * 1000}
+    received = []
+    
+    parser = MCPAgent("parser", "parser", server)
+    evaluator = MCPAgent("evaluator", "evaluator", server)
+    coordinator = MCPAgent("coordinator", "coordinator", server)
+    
+    async def evaluate(message):
+        received.append(message)
+        # 处理器内再向下游发请求：响应走回复队列，不会被当前处理阻塞
+        parsed = await evaluator.send_request("parser", "parse_jd", message.payload, timeout=2)
+        await evaluator.send_response(message, {"parsed": parsed.payload})
+    
+    async def parse(message):
+        await parser.send_response(message, {"length": len(message.payload["jd_text"])})
+    
+    evaluator.register_handler("evaluate", evaluate)
+    parser.register_handler("parse_jd", parse)
+    for agent in (parser, evaluator, coordinator):
+        await agent.start()
+    
+    sent = []
+    send = server.transport.send
+    
+    async def record_send(message, **kwargs):
+        sent.append(message)
+        return await send(message, **kwargs)
+    
+    server.transport.send = record_send
+    try:
+        responses = await asyncio.gather(*[
+            coordinator.send_request("evaluator", "evaluate", payload, timeout=2) for _ in range(3)
+        ])
+        stats = await server.get_stats()
+    finally:
+        for agent in (parser, evaluator, coordinator):
+            await agent.stop()
+        await server.stop()
+    
+    requests = [m for m in sent if m.sender == "coordinator"]
+    assert [id(m) for m in received] == [id(m) for m in requests]
+    assert all(any(r is m for m in sent) for r in responses)  # 响应对象也是发送方创建的同一个
+    assert [r.payload["parsed"]["length"] for r in responses] == [1000] * 3
+    assert stats["transport"]["transport"] == "memory"
+    assert stats["transport"]["subscriptions"]["evaluator"]["delivered"] == 3
+    assert stats["transport"]["subscriptions"]["evaluator"]["replies"] == 3
+    assert stats["transport"]["subscriptions"]["coordinator"]["replies"] == 3
+
+
+@pytest.mark.asyncio
+async def test_notifications_and_queued_messages(no_json):
+    """测试广播送达除发送方外的每个Agent，Agent启动前发给它的消息在启动后送达"""
+    server = MCPServer(transport="memory")
+    await server.start()
+    received = []
+    agents = []
+    for agent_id in ("report", "matcher", "coordinator"):
+        agent = MCPAgent(agent_id, agent_id, server)
+        
+        async def handle(message, agent_id=agent_id):
+            received.append((agent_id, message.action, message.payload["n"]))
+        
+        agent.register_handler("refresh", handle)
+        agent.register_handler("parse_jd", handle)
+        agents.append(agent)
+    
+    try:
+        await server.send_message(create_request_message("api", "report", "parse_jd", {"n": 0}))
+        assert (await server.transport.get_stats())["queued"] == {"report": 1}
+        
+        for agent in agents:
+            await agent.start()
+        with pytest.raises(ValueError):
+            await server.transport.subscribe("report", "report")
+        
+        await agents[2].send_notification("refresh", {"n": 1})
+        await wait_until(lambda: len(received) == 3)
+    finally:
+        for agent in agents:
+            await agent.stop()
+        await server.stop()
+    
+    assert sorted(received) == [("matcher", "refresh", 1), ("report", "parse_jd", 0), ("report", "refresh", 1)]
+
+
+@pytest.mark.asyncio
+async def test_contexts_without_redis():
+    """测试memory模式下上下文保存在进程内，读取得到副本，过期后不可见"""
+    server = MCPServer(transport="memory")
+    await server.start()
+    try:
+        context = create_context("task-1", shared_data={"jd": {"title": "工程师"}})
+        await server.save_context(context)
+        
+        loaded = await server.get_context(context.context_id)
+        loaded.shared_data["jd"]["title"] = "改动"
+        assert (await server.get_context(context.context_id)).shared_data["jd"]["title"] == "工程师"
+        
+        await server.update_context(loaded)
+        assert (await server.get_context(context.context_id)).shared_data["jd"]["title"] == "改动"
+        assert await server.list_contexts() == [context.context_id]
+        
+        expired = create_context("task-2", expiration_seconds=60)
+        await server.save_context(expired)
+        server.context_store._contexts[expired.context_id] = (expired, time.time() - 1)
+        assert await server.cleanup_expired_contexts() == 1
+        
+        health = await server.health_check()
+        assert health["status"] == "healthy"
+        assert health["transport"] == "memory"
+        assert health["active_contexts"] == 1
+        
+        await server.delete_context(context.context_id)
+        assert await server.get_context(context.context_id) is None
+    finally:
+        await server.stop()
+    assert server.transport is None
+
+
+def test_transport_selected_from_settings(monkeypatch):
+    """测试MCP_TRANSPORT选择消息传输，未知传输报错"""
+    from src.core.config import settings
+    
+    monkeypatch.setattr(settings, "MCP_TRANSPORT", "memory")
+    monkeypatch.setattr(settings, "MCP_MEMORY_QUEUE_SIZE", 8)
+    server = create_mcp_server_from_settings()
+    assert server.transport_name == "memory"
+    assert server.memory_options == {"max_queue_size": 8}
+    
+    monkeypatch.setattr(settings, "MCP_TRANSPORT", "kafka")
+    with pytest.raises(ValueError):
+        create_mcp_server_from_settings()
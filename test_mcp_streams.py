@@ -0,0 +1,330 @@
+"""测试MCP消息总线的Redis Streams传输（消费者组负载均衡、确认、认领和截断）"""
+
+import asyncio
+import time
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError, ResponseError
+
+from src.mcp.agent import MCPAgent
+from src.mcp.message import create_request_message
+from src.mcp.server import MCPServer
+from src.mcp.streams import DEAD_LETTER_STREAM, RedisStreamsTransport
+
+
+def _parse_id(entry_id):
+    ms, seq = entry_id.split("-")
+    return int(ms), int(seq)
+
+
+class FakeStreamsRedis:
+    """最小化的Redis Streams替身（仅实现传输和Agent注册用到的命令）"""
+    
+    def __init__(self):
+        self.streams = {}  # 流名称 -> [(条目ID, 字段)]
+        self.groups = {}  # (流名称, 组名) -> {"last_id": ..., "pending": {条目ID: [消费者, 投递时间, 投递次数]}}
+        self.sets = {}
+        self.expires = {}  # 流名称 -> EXPIRE调用次数
+        self._seq = 0
+    
+    def _next_id(self):
+        self._seq += 1
+        return f"{int(time.time() * 1000)}-{self._seq}"
+    
+    async def xadd(self, name, fields, maxlen=None, approximate=True):
+        entries = self.streams.setdefault(name, [])
+        entry_id = self._next_id()
+        entries.append((entry_id, dict(fields)))
+        if maxlen is not None:
+            del entries[:-maxlen]
+        return entry_id
+    
+    async def xgroup_create(self, name, groupname, id="$", mkstream=False):
+        if (name, groupname) in self.groups:
+            raise Exception("BUSYGROUP Consumer Group name already exists")
+        self.streams.setdefault(name, [])
+        self.groups[(name, groupname)] = {"last_id": "0-0", "pending": {}}
+    
+    async def xreadgroup(self, groupname, consumername, streams, count=None, block=None, noack=False):
+        result = []
+        for name in streams:
+            if (name, groupname) not in self.groups:
+                raise ResponseError("NOGROUP No such key or consumer group")
+            group = self.groups[(name, groupname)]
+            fresh = [e for e in self.streams.get(name, []) if _parse_id(e[0]) > _parse_id(group["last_id"])][:count]
+            for entry_id, _ in fresh:
+                group["pending"][entry_id] = [consumername, time.monotonic(), 1]
+            if fresh:
+                group["last_id"] = fresh[-1][0]
+                result.append([name, fresh])
+        if not result:
+            await asyncio.sleep(0.002)
+        return result
+    
+    async def xack(self, name, groupname, *ids):
+        pending = self.groups[(name, groupname)]["pending"]
+        return sum(1 for entry_id in ids if pending.pop(entry_id, None) is not None)
+    
+    async def xpending_range(self, name, groupname, min, max, count, consumername=None, idle=None):
+        now = time.monotonic()
+        items = [
+            {"message_id": entry_id, "consumer": owner, "time_since_delivered": int((now - at) * 1000), "times_delivered": n}
+            for entry_id, (owner, at, n) in self.groups[(name, groupname)]["pending"].items()
+            if idle is None or (now - at) * 1000 >= idle
+        ]
+        return items[:count]
+    
+    async def xclaim(self, name, groupname, consumername, min_idle_time, message_ids):
+        pending = self.groups[(name, groupname)]["pending"]
+        entries = dict(self.streams.get(name, []))
+        claimed = []
+        for entry_id in message_ids:
+            owner, _, n = pending[entry_id]
+            pending[entry_id] = [consumername, time.monotonic(), n + 1]
+            claimed.append((entry_id, entries.get(entry_id)))
+        return claimed
+    
+    async def xpending(self, name, groupname):
+        return {"pending": len(self.groups[(name, groupname)]["pending"])}
+    
+    async def xread(self, streams, count=None, block=None):
+        result = []
+        for name, last_id in streams.items():
+            fresh = [e for e in self.streams.get(name, []) if _parse_id(e[0]) > _parse_id(last_id)][:count]
+            if fresh:
+                result.append([name, fresh])
+        if not result:
+            await asyncio.sleep(0.002)
+        return result
+    
+    async def xlen(self, name):
+        return len(self.streams.get(name, []))
+    
+    async def expire(self, name, seconds):
+        self.expires[name] = self.expires.get(name, 0) + 1
+        return True
+    
+    async def delete(self, *names):
+        for name in names:
+            self.streams.pop(name, None)
+            for key in [key for key in self.groups if key[0] == name]:
+                del self.groups[key]
+    
+    async def sadd(self, name, *values):
+        self.sets.setdefault(name, set()).update(values)
+    
+    async def srem(self, name, *values):
+        self.sets.get(name, set()).difference_update(values)
+    
+    async def sismember(self, name, value):
+        return value in self.sets.get(name, set())
+    
+    async def hset(self, name, mapping=None):
+        return 1
+
+
+def make_server(redis_client, **options) -> MCPServer:
+    """创建已"连接"到FakeStreamsRedis的Streams模式服务器"""
+    server = MCPServer(transport="streams")
+    server.redis_client = redis_client
+    server.transport = RedisStreamsTransport(redis_client, block_ms=5, **options)
+    return server
+
+
+async def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "等待超时"
+        await asyncio.sleep(0.005)
+
+
+@pytest.mark.asyncio
+async def test_replicas_share_requests_and_replies_return_to_sender():
+    """测试同ID的多个副本分担请求，每个请求只处理一次，响应回到发出请求的副本"""
+    redis_client = FakeStreamsRedis()
+    handled = {"a": [], "b": []}
+    replicas = []
+    for name in handled:
+        agent = MCPAgent("evaluator", "evaluator", make_server(redis_client, batch_size=1), max_in_flight=1)
+        
+        async def handle(message, name=name, agent=agent):
+            handled[name].append(message.payload["n"])
+            await asyncio.sleep(0.01)
+            await agent.send_response(message, {"n": message.payload["n"], "by": name})
+        
+        agent.register_handler("evaluate", handle)
+        replicas.append(agent)
+    
+    coordinator = MCPAgent("coordinator", "coordinator", make_server(redis_client))
+    for agent in replicas + [coordinator]:
+        await agent.start()
+    try:
+        responses = await asyncio.gather(*[
+            coordinator.send_request("evaluator", "evaluate", {"n": n}, timeout=5) for n in range(6)
+        ])
+    finally:
+        for agent in replicas + [coordinator]:
+            await agent.stop()
+    
+    assert sorted(handled["a"] + handled["b"]) == list(range(6))
+    assert handled["a"] and handled["b"]
+    assert [r.payload["n"] for r in responses] == list(range(6))
+    assert all(r.metadata["reply_to"].startswith("mcp:stream:reply:coordinator:") for r in responses)
+    assert redis_client.groups[("mcp:stream:evaluator", "evaluator")]["pending"] == {}
+
+
+@pytest.mark.asyncio
+async def test_messages_sent_while_agent_down_are_delivered():
+    """测试Agent启动前发给它的消息在启动后送达，流长度按max_len截断"""
+    redis_client = FakeStreamsRedis()
+    sender = make_server(redis_client, max_len=5)
+    for n in range(8):
+        await sender.send_message(create_request_message("api", "parser", "parse_jd", {"n": n}))
+    assert await redis_client.xlen("mcp:stream:parser") == 5
+    
+    received = []
+    agent = MCPAgent("parser", "parser", make_server(redis_client))
+    
+    async def handle(message):
+        received.append(message.payload["n"])
+    
+    agent.register_handler("parse_jd", handle)
+    await agent.start()
+    try:
+        await wait_until(lambda: len(received) == 5)
+    finally:
+        await agent.stop()
+    assert received == [3, 4, 5, 6, 7]
+
+
+@pytest.mark.asyncio
+async def test_reclaim_pending_from_crashed_consumer_and_dead_letter():
+    """测试崩溃副本未确认的消息被其他副本认领，投递次数超限的消息转入死信流"""
+    redis_client = FakeStreamsRedis()
+    transport = RedisStreamsTransport(redis_client, claim_idle_ms=0, max_deliveries=2)
+    await transport.subscribe("evaluator", "evaluator")
+    crashed = transport._subscriptions.pop("evaluator")
+    await transport.subscribe("evaluator", "evaluator")
+    survivor = transport._subscriptions["evaluator"]
+    
+    await transport.send(create_request_message("api", "evaluator", "evaluate", {"n": 1}))
+    await redis_client.xreadgroup("evaluator", crashed.consumer, {crashed.stream: ">"})  # 读取后崩溃，未确认
+    
+    entries = await transport.reclaim(survivor)
+    assert len(entries) == 1
+    assert survivor.stats["reclaimed"] == 1
+    
+    # 认领后再次未确认（投递2次）：下次认领转入死信流
+    survivor.consumer = "evaluator:another"
+    assert await transport.reclaim(survivor) == []
+    assert survivor.stats["dead_lettered"] == 1
+    assert await redis_client.xlen(DEAD_LETTER_STREAM) == 1
+    assert (await redis_client.xpending(crashed.stream, "evaluator"))["pending"] == 0
+
+
+@pytest.mark.asyncio
+async def test_broadcast_reaches_every_replica():
+    """测试广播投递给每个副本，并计入传输统计"""
+    redis_client = FakeStreamsRedis()
+    received = []
+    agents = []
+    for name in ("a", "b"):
+        agent = MCPAgent("report", "report", make_server(redis_client))
+        
+        async def handle(message, name=name):
+            received.append(name)
+        
+        agent.register_handler("refresh", handle)
+        agents.append(agent)
+        await agent.start()
+    
+    notifier = MCPAgent("coordinator", "coordinator", make_server(redis_client))
+    try:
+        await notifier.send_notification("refresh", {})
+        await wait_until(lambda: len(received) == 2)
+        stats = await agents[0].mcp_server.transport.get_stats()
+    finally:
+        for agent in agents:
+            await agent.stop()
+    
+    assert sorted(received) == ["a", "b"]
+    assert stats["subscriptions"]["report"]["broadcasts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_idle_reply_stream_refreshed_and_recreated():
+    """测试不发请求的副本定期续期回复流，回复流过期（消费者组丢失）后重新创建并继续收到响应"""
+    redis_client = FakeStreamsRedis()
+    worker = MCPAgent("parser", "parser", make_server(redis_client))
+    
+    async def parse(message):
+        await worker.send_response(message, {"ok": True})
+    
+    worker.register_handler("parse_jd", parse)
+    coordinator = MCPAgent("coordinator", "coordinator", make_server(redis_client, reply_ttl=0.02))
+    for agent in (worker, coordinator):
+        await agent.start()
+    try:
+        reply_stream = coordinator.mcp_server.transport._subscriptions["coordinator"].reply_stream
+        await wait_until(lambda: redis_client.expires.get(reply_stream, 0) >= 3)
+        
+        # 模拟回复流过期：流和消费者组一起被删除
+        await redis_client.delete(reply_stream)
+        response = await coordinator.send_request("parser", "parse_jd", {}, timeout=2)
+    finally:
+        for agent in (worker, coordinator):
+            await agent.stop()
+    
+    assert response.payload == {"ok": True}
+
+
+class FlakyStreamsRedis(FakeStreamsRedis):
+    """前几次读取点对点流时连接失败，广播读取可注入不可重试的错误"""
+    
+    def __init__(self, failures, broadcast_error=None):
+        super().__init__()
+        self.failures = failures
+        self.broadcast_error = broadcast_error
+        self.reads = 0
+    
+    async def xreadgroup(self, groupname, consumername, streams, count=None, block=None, noack=False):
+        self.reads += 1
+        if "mcp:stream:parser" in streams and self.failures > 0:
+            self.failures -= 1
+            raise RedisConnectionError("Connection reset by peer")
+        return await super().xreadgroup(groupname, consumername, streams, count, block, noack)
+    
+    async def xread(self, streams, count=None, block=None):
+        if self.broadcast_error is not None:
+            await asyncio.sleep(0.02)
+            raise self.broadcast_error
+        return await super().xread(streams, count, block)
+
+
+@pytest.mark.asyncio
+async def test_transient_errors_retried_and_fatal_error_stops_all_readers():
+    """测试连接错误退避重试后继续消费；不可重试的错误结束consume并停止其余读取协程"""
+    redis_client = FlakyStreamsRedis(failures=3)
+    received = []
+    agent = MCPAgent("parser", "parser", make_server(redis_client, retry_backoff=0.001))
+    
+    async def handle(message):
+        received.append(message.payload["n"])
+    
+    agent.register_handler("parse_jd", handle)
+    await agent.start()
+    try:
+        await agent.mcp_server.send_message(create_request_message("api", "parser", "parse_jd", {"n": 1}))
+        await wait_until(lambda: received == [1])
+        stats = await agent.mcp_server.transport.get_stats()
+    finally:
+        await agent.stop()
+    assert stats["subscriptions"]["parser"]["errors"] == 3
+    
+    redis_client = FlakyStreamsRedis(failures=0, broadcast_error=ValueError("bad entry"))
+    transport = RedisStreamsTransport(redis_client, block_ms=5)
+    await transport.subscribe("parser", "parser")
+    with pytest.raises(ValueError):
+        await transport.consume("parser", handle)
+    reads = redis_client.reads
+    await asyncio.sleep(0.05)
+    assert redis_client.reads == reads
@@ -0,0 +1,205 @@
+"""测试MCPAgent的消息处理工作池（并发上限、按动作限流、背压、有序动作和健康检查统计）"""
+
+import asyncio
+import time
+import pytest
+
+from src.mcp.agent import MCPAgent
+from src.mcp.message import create_request_message
+from src.mcp.server import MCPServer
+from src.mcp.worker_pool import LatencyHistogram
+from test_mcp_streams import FakeStreamsRedis, make_server as make_streams_server
+
+
+async def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "等待超时"
+        await asyncio.sleep(0.005)
+
+
+async def start_agents(server, *agents):
+    await server.start()
+    for agent in agents:
+        await agent.start()
+
+
+async def stop_agents(server, *agents):
+    for agent in agents:
+        await agent.stop()
+    await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_slow_handler_does_not_block_other_requests():
+    """测试一个慢处理器运行时，同一Agent的其他请求并发处理，按动作限流"""
+    server = MCPServer(transport="memory")
+    evaluator = MCPAgent("evaluator", "evaluator", server, max_in_flight=4, action_limits={"evaluate": 2})
+    coordinator = MCPAgent("coordinator", "coordinator", server)
+    running = {"evaluate": 0, "peak": 0}
+    slow_done = asyncio.Event()
+    
+    async def evaluate(message):
+        running["evaluate"] += 1
+        running["peak"] = max(running["peak"], running["evaluate"])
+        await asyncio.sleep(0.05)
+        running["evaluate"] -= 1
+        await evaluator.send_response(message, {"n": message.payload["n"]})
+    
+    async def slow(message):
+        await slow_done.wait()
+        await evaluator.send_response(message, {})
+    
+    evaluator.register_handler("evaluate", evaluate)
+    evaluator.register_handler("slow", slow)
+    await start_agents(server, evaluator, coordinator)
+    try:
+        slow_request = asyncio.create_task(coordinator.send_request("evaluator", "slow", {}, timeout=2))
+        responses = await asyncio.gather(*[
+            coordinator.send_request("evaluator", "evaluate", {"n": n}, timeout=2) for n in range(3)
+        ])
+        assert not slow_request.done()
+        slow_done.set()
+        await slow_request
+    finally:
+        await stop_agents(server, evaluator, coordinator)
+    
+    assert [r.payload["n"] for r in responses] == [0, 1, 2]
+    assert running["peak"] == 2
+
+
+@pytest.mark.asyncio
+async def test_backpressure_leaves_messages_in_transport_queue():
+    """测试名额用完时Agent停止取消息，其余消息留在传输队列中"""
+    server = MCPServer(transport="memory")
+    agent = MCPAgent("parser", "parser", server, max_in_flight=2)
+    release = asyncio.Event()
+    handled = []
+    
+    async def parse(message):
+        await release.wait()
+        handled.append(message.payload["n"])
+    
+    agent.register_handler("parse_jd", parse)
+    await start_agents(server, agent)
+    try:
+        for n in range(5):
+            await server.send_message(create_request_message("api", "parser", "parse_jd", {"n": n}))
+        await wait_until(lambda: agent.worker_pool.in_flight == 2)
+        await asyncio.sleep(0.02)
+        
+        assert agent.worker_pool.in_flight == 2
+        # 第3条已取出、等待名额，其余2条留在队列中
+        assert (await server.transport.get_stats())["subscriptions"]["parser"]["queue_depth"] == 2
+        
+        release.set()
+        await wait_until(lambda: len(handled) == 5)
+    finally:
+        await stop_agents(server, agent)
+    assert sorted(handled) == [0, 1, 2, 3, 4]
+
+
+@pytest.mark.asyncio
+async def test_ordered_actions_keep_arrival_order():
+    """测试有序动作按到达顺序逐条处理，其他动作不受影响"""
+    server = MCPServer(transport="memory")
+    agent = MCPAgent("evaluator", "evaluator", server, max_in_flight=8, ordered_actions=["update"])
+    events = []
+    
+    async def update(message):
+        n = message.payload["n"]
+        events.append(("start", n))
+        await asyncio.sleep(0.01 * (4 - n))  # 先到的处理得更久
+        events.append(("end", n))
+    
+    async def ping(message):
+        events.append(("ping", message.payload["n"]))
+    
+    agent.register_handler("update", update)
+    agent.register_handler("ping", ping)
+    await start_agents(server, agent)
+    try:
+        for n in range(4):
+            await server.send_message(create_request_message("api", "evaluator", "update", {"n": n}))
+        await server.send_message(create_request_message("api", "evaluator", "ping", {"n": 9}))
+        await wait_until(lambda: len(events) == 9)
+    finally:
+        await stop_agents(server, agent)
+    
+    updates = [e for e in events if e[0] != "ping"]
+    assert updates == [(kind, n) for n in range(4) for kind in ("start", "end")]
+    # ping不等待有序动作
+    assert events.index(("ping", 9)) < events.index(("end", 0))
+
+
+@pytest.mark.asyncio
+async def test_health_check_reports_in_flight_and_latency():
+    """测试健康检查返回处理中数量、失败数和耗时直方图"""
+    server = MCPServer(transport="memory")
+    agent = MCPAgent("parser", "parser", server, max_in_flight=3)
+    release = asyncio.Event()
+    
+    async def parse(message):
+        await release.wait()
+        if message.payload["n"] == 0:
+            raise ValueError("bad jd")
+    
+    agent.register_handler("parse_jd", parse)
+    await start_agents(server, agent)
+    try:
+        for n in range(2):
+            await server.send_message(create_request_message("api", "parser", "parse_jd", {"n": n}))
+        await wait_until(lambda: agent.worker_pool.in_flight == 2)
+        health = await agent.health_check()
+        assert health["in_flight"] == 2
+        assert health["worker_pool"]["actions"]["parse_jd"]["in_flight"] == 2
+        
+        release.set()
+        await wait_until(lambda: agent.worker_pool.in_flight == 0)
+        pool = (await agent.health_check())["worker_pool"]
+    finally:
+        await stop_agents(server, agent)
+    
+    stats = pool["actions"]["parse_jd"]
+    assert stats["completed"] == 1
+    assert stats["failed"] == 1
+    assert stats["latency"]["count"] == 2
+    assert sum(stats["latency"]["buckets"].values()) == 2
+    assert pool["available"] == 3
+
+
+@pytest.mark.asyncio
+async def test_streams_ack_after_pooled_handler_finishes():
+    """测试Streams传输在工作池处理完成后才确认，处理中的条目保持待处理"""
+    redis_client = FakeStreamsRedis()
+    server = make_streams_server(redis_client)
+    agent = MCPAgent("parser", "parser", server, max_in_flight=2)
+    release = asyncio.Event()
+    
+    async def parse(message):
+        await release.wait()
+    
+    agent.register_handler("parse_jd", parse)
+    await agent.start()
+    try:
+        await server.send_message(create_request_message("api", "parser", "parse_jd", {}))
+        await wait_until(lambda: agent.worker_pool.in_flight == 1)
+        assert (await redis_client.xpending("mcp:stream:parser", "parser"))["pending"] == 1
+        
+        release.set()
+        await wait_until(lambda: redis_client.groups[("mcp:stream:parser", "parser")]["pending"] == {})
+    finally:
+        await agent.stop()
+
+
+def test_latency_histogram_quantiles():
+    """测试直方图按桶计数和估算分位数"""
+    histogram = LatencyHistogram(buckets_ms=(10, 100))
+    for latency in (5, 8, 50, 500):
+        histogram.observe(latency)
+    
+    stats = histogram.get_stats()
+    assert stats["buckets"] == {"10": 2, "100": 1, "+Inf": 1}
+    assert stats["p50_ms"] == 10.0
+    assert stats["p95_ms"] == 500.0
+    assert stats["max_ms"] == 500.0
@@ -0,0 +1,195 @@
+"""测试模拟LLM服务：各Agent提示词的结构化响应、流式输出、故障注入和token统计"""
+
+import json
+import random
+import pytest
+import httpx
+from unittest.mock import Mock, AsyncMock
+
+from src.core.llm_cache import create_memory_cache
+from src.core.llm_client import DeepSeekR1Client
+from src.agents.parser_agent import ParserAgent
+from src.agents.evaluator_agent import StandardEvaluationModel, MercerIPEModel
+from src.agents.matcher_agent import MatcherAgent
+from src.agents.questionnaire_agent import QuestionnaireAgent
+from src.agents.optimizer_agent import OptimizerAgent
+from src.mock_llm import MockLLMConfig, build_response, create_mock_llm_app, sample_latency
+
+
+JD_TEXT = """Python后端工程师
+岗位职责：
+1. 负责后端服务的设计与开发
+2. 负责数据库性能优化
+任职要求：
+1. 本科及以上学历，3年以上开发经验
+2. 熟悉Python、Django和MySQL，了解Redis、Docker
+"""
+
+JD_DATA = {
+    "job_title": "Python后端工程师",
+    "responsibilities": ["负责后端服务的设计与开发"],
+    "required_skills": ["Python", "Django"],
+    "qualifications": ["本科学历"]
+}
+
+
+@pytest.fixture
+def mock_app():
+    """零延迟的模拟服务"""
+    return create_mock_llm_app(MockLLMConfig(latency_ms=0, latency_distribution="fixed"))
+
+
+@pytest.fixture
+def llm_client(mock_app):
+    """通过ASGI传输层直连模拟服务的DeepSeekR1Client"""
+    return DeepSeekR1Client(
+        api_key="test",
+        base_url="http://mock/v1",
+        cache=create_memory_cache(),
+        enable_cache=False,
+        http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=mock_app))
+    )
+
+
+@pytest.fixture
+def mcp_server():
+    """不启动Redis的MCP服务器"""
+    server = Mock()
+    server.register_agent = AsyncMock()
+    server.send_message = AsyncMock()
+    return server
+
+
+@pytest.mark.asyncio
+async def test_parser_prompt_returns_parsed_jd(llm_client, mcp_server):
+    """测试JD解析提示词返回从JD文本提取的结构化结果"""
+    agent = ParserAgent(mcp_server=mcp_server, llm_client=llm_client)
+    result = await agent._parse_jd_with_llm(JD_TEXT, {})
+    
+    assert result["job_title"] == "Python后端工程师"
+    assert "负责后端服务的设计与开发" in result["responsibilities"]
+    assert {"Python", "Django", "MySQL", "Redis", "Docker"} <= set(result["required_skills"])
+    assert any("本科" in q for q in result["qualifications"])
+
+
+@pytest.mark.asyncio
+async def test_evaluator_prompts_return_valid_scores(llm_client):
+    """测试评估提示词返回包含所有维度评分的结果"""
+    standard = await StandardEvaluationModel().evaluate(JD_DATA, llm_client)
+    assert set(standard["dimension_scores"]) == {"完整性", "清晰度", "专业性"}
+    assert all(60 <= score <= 95 for score in standard["dimension_scores"].values())
+    
+    mercer = await MercerIPEModel().evaluate(JD_DATA, llm_client)
+    assert isinstance(mercer, dict)
+    assert "overall_score" in mercer
+
+
+@pytest.mark.asyncio
+async def test_matcher_questionnaire_optimizer_prompts(llm_client, mcp_server):
+    """测试匹配、问卷和优化建议提示词返回结构合法的JSON"""
+    questionnaire_agent = QuestionnaireAgent(mcp_server=mcp_server, llm_client=llm_client)
+    questionnaire = await questionnaire_agent._generate_questionnaire(JD_DATA, "standard")
+    questions = questionnaire["questions"]
+    assert len(questions) >= 10
+    assert {q["question_type"] for q in questions} == {"single_choice", "multiple_choice", "scale", "open_ended"}
+    
+    matcher = MatcherAgent(mcp_server=mcp_server, llm_client=llm_client)
+    match = await matcher._calculate_match(JD_DATA, questionnaire, {"q1": "3-5年"})
+    assert 0 <= match["overall_score"] <= 100
+    assert match["overall_score"] == round(
+        sum(match["dimension_scores"].values()) / len(match["dimension_scores"])
+    )
+    
+    optimizer = OptimizerAgent(mcp_server=mcp_server, llm_client=llm_client)
+    suggestions = await optimizer._generate_suggestions(JD_DATA, {"overall_score": 70, "issues": []})
+    assert suggestions["suggestions"]
+    assert suggestions["suggestions"][0]["priority"]
+
+
+def test_responses_are_deterministic():
+    """测试相同提示词和种子得到相同响应，不同JD的评分不同"""
+    prompt = StandardEvaluationModel.TEMPLATE.render(("岗位信息", JD_TEXT))
+    assert build_response(prompt, seed=1) == build_response(prompt, seed=1)
+    
+    scores = {
+        json.dumps(json.loads(build_response(prompt + f"\n{i}")[1])["dimension_scores"])
+        for i in range(5)
+    }
+    assert len(scores) > 1
+
+
+@pytest.mark.asyncio
+async def test_streaming_and_token_accounting(llm_client, mock_app):
+    """测试流式输出拼接后与非流式响应一致，并统计token用量"""
+    prompt = StandardEvaluationModel.TEMPLATE.render(("岗位信息", JD_TEXT))
+    chunks = [chunk async for chunk in llm_client.generate_stream(prompt)]
+    assert len(chunks) > 1
+    assert "".join(chunks) == await llm_client.generate(prompt)
+    
+    stats = mock_app.state.stats.get_stats()
+    assert stats["requests"] == 2
+    assert stats["stream_requests"] == 1
+    assert stats["requests_by_kind"] == {"evaluator": 2}
+    assert stats["prompt_tokens"] > 0
+    assert stats["completion_tokens"] > 0
+    assert stats["in_flight"] == 0
+    
+    token_stats = llm_client.get_token_stats()
+    assert token_stats["calls"] == 2
+    assert token_stats["completion_tokens"] == stats["completion_tokens"]
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_and_timeout_injection(mock_app):
+    """测试429和超时注入"""
+    request = {"model": "mock", "messages": [{"role": "user", "content": "你好"}]}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=mock_app), base_url="http://mock") as http:
+        await http.post("/mock/config", json={"rate_limit_rate": 1.0, "retry_after": 3})
+        response = await http.post("/v1/chat/completions", json=request)
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "3"
+        assert response.json()["error"]["type"] == "rate_limit_exceeded"
+        
+        await http.post("/mock/config", json={"rate_limit_rate": 0.0, "timeout_rate": 1.0, "hang_seconds": 0.01})
+        response = await http.post("/v1/chat/completions", json=request)
+        assert response.status_code == 504
+        
+        stats = (await http.get("/mock/stats")).json()
+        assert stats["rate_limited"] == 1
+        assert stats["timeouts"] == 1
+        
+        response = await http.post("/mock/config", json={"latency_distribution": "bimodal"})
+        assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_maps_to_client_error(mock_app):
+    """测试注入的429被客户端识别为LLMRateLimitError"""
+    from src.core.llm_client import LLMRateLimitError
+    
+    mock_app.state.config.rate_limit_rate = 1.0
+    client = DeepSeekR1Client(
+        api_key="test",
+        base_url="http://mock/v1",
+        cache=create_memory_cache(),
+        enable_cache=False,
+        http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=mock_app))
+    )
+    
+    with pytest.raises(LLMRateLimitError):
+        await client._call_api.retry_with(stop=lambda state: True)(
+            client, [{"role": "user", "content": "你好"}], "mock", 0.7, 100
+        )
+
+
+def test_latency_distributions():
+    """测试各延迟分布的均值接近配置值"""
+    rng = random.Random(0)
+    for distribution in ("fixed", "uniform", "normal", "lognormal"):
+        config = MockLLMConfig(latency_ms=200, latency_distribution=distribution, latency_jitter_ms=50)
+        samples = [sample_latency(config, rng) for _ in range(2000)]
+        assert all(s >= 0 for s in samples)
+        assert abs(sum(samples) / len(samples) - 0.2) < 0.01
+    
+    with pytest.raises(ValueError):
+        MockLLMConfig(latency_distribution="bimodal")